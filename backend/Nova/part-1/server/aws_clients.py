@@ -0,0 +1,474 @@
+"""Process-wide AWS clients, shared by the sessions of a bot process.
+
+Every session used to build its own AWS clients from the ``AWS_*``
+variables, so the first request of each session resolved the credentials
+again and opened a new connection (TCP and TLS handshakes) to the endpoint.
+``AWSClients`` keeps them for the life of the process instead:
+
+- one ``boto3.Session`` per region and credentials, so credentials are
+  resolved once
+- one client per service, region and credentials, with a connection pool of
+  at most ``AWS_MAX_POOL_CONNECTIONS`` connections per endpoint and TCP
+  keep-alive, so later requests and sessions reuse open connections
+- credentials that expire (``AWS_ROLE_ARN`` assumed with STS, or instance,
+  container and SSO credentials from the default chain) are refreshed in the
+  background before they expire, instead of in the middle of a request.
+  Static ``AWS_SESSION_TOKEN`` credentials cannot be refreshed
+- the services are built on them with ``sharing_aws_clients``: the Polly
+  and Bedrock services without clients of their own, and the services that
+  sign their own requests (Transcribe's websocket URL, Nova Sonic's stream
+  client) with the current credentials
+
+It counts clients created and reused, requests, connections opened and
+credential refreshes. Each bot posts what its process counted since the
+last report to the server (``AWS_CLIENTS_STATS_URL``) when a session ends,
+and closes the clients' connections once its last session has ended.
+
+A forked process (see ``bot_zygote``) starts with clients of its own: the
+parent's connections are never shared.
+"""
+
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Tuple
+
+import boto3
+from botocore.config import Config
+from botocore.credentials import ReadOnlyCredentials, RefreshableCredentials
+from botocore.session import get_session
+from loguru import logger
+
+from pipecat.services.aws.llm import AWSBedrockLLMService
+from pipecat.services.aws.tts import AWSPollyTTSService
+
+from stats_reporting import post_stats
+
+# Whether the bots share their AWS clients between sessions
+SHARED_AWS_CLIENTS = os.getenv("SHARED_AWS_CLIENTS", "true").lower() in ("1", "true", "yes")
+
+# Connections kept open per endpoint and client
+AWS_MAX_POOL_CONNECTIONS = int(os.getenv("AWS_MAX_POOL_CONNECTIONS", "10"))
+
+# Role assumed for the bots' credentials, refreshed before it expires; unset
+# to use the keys of the environment or the default credential chain
+AWS_ROLE_ARN = os.getenv("AWS_ROLE_ARN")
+AWS_ROLE_SESSION_SECS = int(os.getenv("AWS_ROLE_SESSION_SECS", "3600"))
+
+# Server endpoint the client counters are posted to; only logged when unset
+AWS_CLIENTS_STATS_URL = os.getenv("AWS_CLIENTS_STATS_URL")
+
+# Seconds between background checks of expiring credentials; botocore
+# refreshes them within 15 minutes of their expiry
+REFRESH_CHECK_SECS = 60
+
+# Name of the bots' sessions of the assumed role
+ROLE_SESSION_NAME = "nova-voice-bot"
+
+# Counters posted to the server, as differences since the last report
+REPORTED_COUNTERS = ("clients_created", "clients_reused", "credential_refreshes", "requests", "new_connections")
+
+
+class AWSClients:
+    """AWS sessions and clients cached by service, region and credentials.
+
+    Args:
+        max_pool_connections: Connections kept open per endpoint and client
+        role_arn: Role assumed for the credentials, or None for the keys of
+            the environment or the default credential chain
+        role_session_secs: Duration of the assumed role's credentials
+    """
+
+    def __init__(
+        self,
+        max_pool_connections: int = AWS_MAX_POOL_CONNECTIONS,
+        role_arn: Optional[str] = AWS_ROLE_ARN,
+        role_session_secs: int = AWS_ROLE_SESSION_SECS,
+    ):
+        self._max_pool_connections = max_pool_connections
+        self._role_arn = role_arn
+        self._role_session_secs = role_session_secs
+        self._lock = threading.Lock()
+        self._sessions: Dict[Tuple, boto3.Session] = {}
+        self._clients: Dict[Tuple, Any] = {}
+        self._stream_clients: Dict[str, Tuple[ReadOnlyCredentials, Any]] = {}
+        self._refresh_thread: Optional[threading.Thread] = None
+        self._closed = threading.Event()
+        self._pool_counters_unknown = False
+        self._counters = {"clients_created": 0, "clients_reused": 0, "credential_refreshes": 0}
+        self._reported = dict.fromkeys(REPORTED_COUNTERS, 0)
+        self.pid = os.getpid()
+
+    def session(self, region: Optional[str] = None) -> boto3.Session:
+        """The session of ``region`` (``AWS_REGION`` by default) with the process's credentials."""
+        region = region or os.getenv("AWS_REGION") or "us-east-1"
+        key = self._credentials_key(region)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = self._sessions[key] = self._new_session(region)
+                if isinstance(session.get_credentials(), RefreshableCredentials):
+                    self._start_refreshing()
+            return session
+
+    def client(
+        self,
+        service: str,
+        region: Optional[str] = None,
+        *,
+        endpoint_url: Optional[str] = None,
+        verify: Optional[bool] = None,
+        **config: Any,
+    ) -> Any:
+        """The shared boto client of ``service``.
+
+        Args:
+            service: Service name, e.g. ``"polly"`` or ``"bedrock-runtime"``
+            region: Region; ``AWS_REGION`` by default
+            endpoint_url: Endpoint to use instead of the region's
+            verify: Whether to verify the endpoint's TLS certificate
+            **config: ``botocore.config.Config`` settings, e.g. ``read_timeout``
+
+        Returns:
+            The client, created on the first call with these arguments
+        """
+        session = self.session(region)
+        key = (service, session.region_name, self._credentials_key(session.region_name), endpoint_url, verify, repr(sorted(config.items())))
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._counters["clients_reused"] += 1
+                return client
+            client_config = Config(**{"max_pool_connections": self._max_pool_connections, "tcp_keepalive": True, **config})
+            client = self._clients[key] = session.client(
+                service, config=client_config, endpoint_url=endpoint_url, verify=verify
+            )
+            self._counters["clients_created"] += 1
+            return client
+
+    def credentials(self, region: Optional[str] = None) -> ReadOnlyCredentials:
+        """Current credentials of the process, for services that sign their own requests."""
+        return self.session(region).get_credentials().get_frozen_credentials()
+
+    def bedrock_stream_client(self, region: Optional[str] = None) -> Any:
+        """The shared client of Nova Sonic's bidirectional streams, as ``AWSNovaSonicLLMService`` creates it.
+
+        A new client is created when the credentials were refreshed; streams
+        already open keep theirs.
+        """
+        from aws_sdk_bedrock_runtime.client import BedrockRuntimeClient
+        from aws_sdk_bedrock_runtime.config import Config as StreamConfig
+        from aws_sdk_bedrock_runtime.config import HTTPAuthSchemeResolver, SigV4AuthScheme
+        from smithy_aws_core.credentials_resolvers.static import StaticCredentialsResolver
+        from smithy_aws_core.identity import AWSCredentialsIdentity
+
+        region = region or os.getenv("AWS_REGION") or "us-east-1"
+        credentials = self.credentials(region)
+        with self._lock:
+            cached = self._stream_clients.get(region)
+            if cached is not None and cached[0] == credentials:
+                self._counters["clients_reused"] += 1
+                return cached[1]
+            config = StreamConfig(
+                endpoint_uri=f"https://bedrock-runtime.{region}.amazonaws.com",
+                region=region,
+                aws_credentials_identity_resolver=StaticCredentialsResolver(
+                    credentials=AWSCredentialsIdentity(
+                        access_key_id=credentials.access_key,
+                        secret_access_key=credentials.secret_key,
+                        session_token=credentials.token,
+                    )
+                ),
+                http_auth_scheme_resolver=HTTPAuthSchemeResolver(),
+                http_auth_schemes={"aws.auth#sigv4": SigV4AuthScheme()},
+            )
+            client = BedrockRuntimeClient(config=config)
+            self._stream_clients[region] = (credentials, client)
+            self._counters["clients_created"] += 1
+            return client
+
+    def stats(self) -> Dict[str, Any]:
+        """Client counters of the process.
+
+        Returns:
+            dict: clients created and reused, credential refreshes, requests
+            and connections opened by the boto clients, and the fraction of
+            requests sent on a connection already open
+        """
+        requests, connections = self._pool_counters() or (None, None)
+        return {
+            **self._counters,
+            "requests": requests,
+            "new_connections": connections,
+            "connection_reuse_rate": 1 - connections / requests if requests else None,
+        }
+
+    async def report(self):
+        """Log the counters and post what changed since the last report to ``AWS_CLIENTS_STATS_URL``."""
+        stats = self.stats()
+        reported = [name for name in REPORTED_COUNTERS if stats[name] is not None]
+        counters = {name: stats[name] - self._reported[name] for name in reported}
+        self._reported.update((name, stats[name]) for name in reported)
+        logger.info(f"AWS clients {stats}")
+        await post_stats(AWS_CLIENTS_STATS_URL, counters, "AWS client stats")
+
+    def close(self):
+        """Close the connections of the boto clients and stop refreshing credentials.
+
+        The clients must not be used afterwards.
+        """
+        self._closed.set()
+        with self._lock:
+            clients = list(self._clients.values())
+            self._stream_clients.clear()
+        for client in clients:
+            client.close()
+
+    def _credentials_key(self, region: str) -> Tuple:
+        return (
+            region,
+            os.getenv("AWS_ACCESS_KEY_ID"),
+            os.getenv("AWS_SECRET_ACCESS_KEY"),
+            os.getenv("AWS_SESSION_TOKEN"),
+            self._role_arn,
+        )
+
+    def _new_session(self, region: str) -> boto3.Session:
+        # Keys of the environment, or the default chain when unset
+        session = boto3.Session(region_name=region)
+        if not self._role_arn:
+            return session
+        botocore_session = get_session()
+        botocore_session._credentials = RefreshableCredentials.create_from_metadata(
+            metadata=self._assume_role(session, refresh=False),
+            refresh_using=lambda: self._assume_role(session, refresh=True),
+            method="sts-assume-role",
+        )
+        return boto3.Session(botocore_session=botocore_session, region_name=region)
+
+    def _assume_role(self, session: boto3.Session, refresh: bool) -> Dict[str, str]:
+        response = session.client("sts").assume_role(
+            RoleArn=self._role_arn,
+            RoleSessionName=ROLE_SESSION_NAME,
+            DurationSeconds=self._role_session_secs,
+        )
+        if refresh:
+            self._counters["credential_refreshes"] += 1
+            logger.info(f"Refreshed the credentials of {self._role_arn}")
+        credentials = response["Credentials"]
+        return {
+            "access_key": credentials["AccessKeyId"],
+            "secret_key": credentials["SecretAccessKey"],
+            "token": credentials["SessionToken"],
+            "expiry_time": credentials["Expiration"].isoformat(),
+        }
+
+    def _start_refreshing(self):
+        if self._refresh_thread is None:
+            self._refresh_thread = threading.Thread(target=self._refresh_loop, name="aws-credentials", daemon=True)
+            self._refresh_thread.start()
+
+    def _refresh_loop(self):
+        while not self._closed.wait(REFRESH_CHECK_SECS):
+            with self._lock:
+                sessions = list(self._sessions.values())
+            for session in sessions:
+                try:
+                    # Refreshes the credentials if they expire soon
+                    session.get_credentials().get_frozen_credentials()
+                except Exception as e:
+                    logger.warning(f"Failed to refresh AWS credentials: {e}")
+
+    def _pool_counters(self) -> Optional[Tuple[int, int]]:
+        """Requests sent and connections opened by the boto clients, or None if unknown.
+
+        Neither botocore nor urllib3 exposes these, so they are read from
+        botocore's urllib3 pool manager (``_endpoint.http_session._manager``),
+        as of the botocore and urllib3 versions pipecat 0.0.67 installs. Should
+        those internals change, the counters are reported as unknown.
+        """
+        requests = connections = 0
+        with self._lock:
+            clients = list(self._clients.values())
+        try:
+            for client in clients:
+                # The pools of botocore's urllib3 session, one per endpoint
+                pools = client._endpoint.http_session._manager.pools
+                for key in pools.keys():
+                    pool = pools.get(key)
+                    if pool is not None:
+                        requests += pool.num_requests
+                        connections += pool.num_connections
+        except AttributeError as e:
+            if not self._pool_counters_unknown:
+                self._pool_counters_unknown = True
+                logger.warning(f"Cannot count the AWS clients' requests and connections: {e}")
+            return None
+        return requests, connections
+
+
+_shared_clients: Optional[AWSClients] = None
+
+
+def shared_aws_clients() -> AWSClients:
+    """The process-wide clients, configured from the ``AWS_*`` variables."""
+    global _shared_clients
+    if _shared_clients is None or _shared_clients.pid != os.getpid():
+        _shared_clients = AWSClients()
+    return _shared_clients
+
+
+class _SharedBoto3:
+    """Stand-in for the ``boto3`` module of a pipecat AWS service, handing out the shared clients.
+
+    Credentials passed to ``client`` or ``Session`` are ignored: the shared
+    clients resolve them, from the default chain or ``AWS_ROLE_ARN`` too.
+    """
+
+    def __init__(self, region: Optional[str] = None):
+        self._region = region
+
+    def client(self, service_name: str, *, region_name: Optional[str] = None, config: Optional[Config] = None, **credentials) -> Any:
+        return shared_aws_clients().client(service_name, region_name or self._region, **_config_settings(config))
+
+    def Session(self, *, region_name: Optional[str] = None, **credentials) -> "_SharedBoto3":
+        return _SharedBoto3(region_name)
+
+
+def _config_settings(config: Optional[Config]) -> Dict[str, Any]:
+    """Settings of ``config`` that differ from botocore's defaults."""
+    if config is None:
+        return {}
+    return {
+        name: getattr(config, name)
+        for name, default in Config.OPTION_DEFAULTS.items()
+        if getattr(config, name) != default
+    }
+
+
+@contextmanager
+def _building_on_shared_clients(service_class: type):
+    """Answer the ``boto3`` calls of ``service_class``'s module with the shared clients.
+
+    Services are built synchronously on the event loop's thread, so no other
+    code runs while the module's ``boto3`` is replaced.
+    """
+    module = sys.modules[service_class.__module__]
+    original = module.boto3
+    module.boto3 = _SharedBoto3()
+    try:
+        yield
+    finally:
+        module.boto3 = original
+
+
+class SharedPollyClientMixin:
+    """Builds ``AWSPollyTTSService`` on the shared Polly client, instead of a client of its own.
+
+    ``AWSPollyTTSService.__init__`` runs unchanged; only its ``boto3.client``
+    call is answered with the shared client. The service insists on keys, so
+    without keys in the arguments or the environment it is given the shared
+    clients' current credentials.
+    """
+
+    def __init__(
+        self,
+        *,
+        api_key: Optional[str] = None,
+        aws_access_key_id: Optional[str] = None,
+        aws_session_token: Optional[str] = None,
+        region: Optional[str] = None,
+        **kwargs,
+    ):
+        if not (aws_access_key_id or os.getenv("AWS_ACCESS_KEY_ID")):
+            credentials = shared_aws_clients().credentials(region)
+            aws_access_key_id, api_key, aws_session_token = (
+                credentials.access_key,
+                credentials.secret_key,
+                credentials.token,
+            )
+        with _building_on_shared_clients(AWSPollyTTSService):
+            super().__init__(
+                api_key=api_key,
+                aws_access_key_id=aws_access_key_id,
+                aws_session_token=aws_session_token,
+                region=region,
+                **kwargs,
+            )
+
+
+class SharedBedrockClientMixin:
+    """Builds ``AWSBedrockLLMService`` on the shared Bedrock client, instead of a session and client of its own.
+
+    ``AWSBedrockLLMService.__init__`` runs unchanged; its ``boto3.Session``
+    and ``client`` calls are answered with the shared client, which has the
+    timeouts and retries of the service's client configuration.
+    """
+
+    def __init__(self, *, aws_region: Optional[str] = None, **kwargs):
+        with _building_on_shared_clients(AWSBedrockLLMService):
+            # AWSBedrockLLMService defaults to us-east-1, the shared clients to AWS_REGION
+            super().__init__(aws_region=aws_region, **kwargs)
+
+
+class SharedTranscribeCredentialsMixin:
+    """Presigns each websocket URL of ``AWSTranscribeSTTService`` with the process's current credentials."""
+
+    async def _connect(self):
+        credentials = shared_aws_clients().credentials(self._credentials["region"])
+        self._credentials.update(
+            aws_access_key_id=credentials.access_key,
+            aws_secret_access_key=credentials.secret_key,
+            aws_session_token=credentials.token,
+        )
+        await super()._connect()
+
+
+class SharedNovaSonicClientMixin:
+    """Opens the streams of ``AWSNovaSonicLLMService`` with the shared stream client.
+
+    The client signs with the process's current credentials, session token
+    included, which the service does not pass on its own.
+    """
+
+    def _create_client(self) -> Any:
+        return shared_aws_clients().bedrock_stream_client(self._region)
+
+
+# Shared-client mixin of each AWS service class, by class name: the Nova
+# Sonic service cannot be imported without its SDK
+SHARED_CLIENT_MIXINS = {
+    "AWSPollyTTSService": SharedPollyClientMixin,
+    "AWSBedrockLLMService": SharedBedrockClientMixin,
+    "AWSTranscribeSTTService": SharedTranscribeCredentialsMixin,
+    "AWSNovaSonicLLMService": SharedNovaSonicClientMixin,
+}
+
+
+def sharing_aws_clients(service_class: type) -> type:
+    """A subclass of ``service_class`` on the process's shared clients and current credentials.
+
+    The mixin goes right above pipecat's AWS service class, below subclasses
+    such as ``CachedPollyTTSService`` and the other mixins of the service.
+
+    Args:
+        service_class: A pipecat AWS service class of ``SHARED_CLIENT_MIXINS`` or a subclass
+
+    Raises:
+        TypeError: If ``service_class`` is not a pipecat AWS service with a shared-client mixin
+    """
+    aws_class = next(
+        (
+            cls
+            for cls in service_class.__mro__
+            if cls.__name__ in SHARED_CLIENT_MIXINS and cls.__module__.startswith("pipecat.")
+        ),
+        None,
+    )
+    if aws_class is None:
+        raise TypeError(f"No shared AWS clients for {service_class.__name__}")
+    shared = type(f"SharedClients{aws_class.__name__}", (SHARED_CLIENT_MIXINS[aws_class.__name__], aws_class), {})
+    if service_class is aws_class:
+        return shared
+    return type(f"SharedClients{service_class.__name__}", (service_class, shared), {})
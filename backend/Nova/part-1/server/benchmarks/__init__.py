@@ -0,0 +1,4 @@
+"""Offline benchmarks for the bot server.
+
+Run from the ``server`` directory, e.g. ``python -m benchmarks.session_density``.
+"""
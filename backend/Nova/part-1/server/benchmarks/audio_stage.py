@@ -0,0 +1,174 @@
+"""CPU and allocations of the bot's output audio conversion, with and without the audio stage.
+
+Converts ``--utterances`` Polly replies of ``--seconds`` each the way the
+output reaches the call, without the pipeline around it. Three setups:
+
+- ``current``: Polly's TTS resamples the whole response to the transport's
+  ``--sample-rate`` and yields 1024-byte frames; the transport's
+  ``MediaSender`` resamples each frame again (a no-op at the same rate) and
+  cuts its buffer into 40 ms chunks
+- ``audio_stage``: Polly's 16 kHz frames go through ``AudioOutputStage``,
+  resampling them to ``--sample-rate`` as a stream, then the same
+  ``MediaSender``
+- ``audio_stage_polly_rate``: the same with the transport at Polly's rate,
+  as part 1's bot runs it with ``AUDIO_OUT_POLLY_RATE``: nothing is resampled
+
+and reports per setup:
+
+- CPU milliseconds per minute of audio (process time, best of ``--repeats``)
+- frames created per second of audio, from the TTS to the transport's chunks
+- KiB allocated per second of audio: the sum, over the conversion steps, of
+  the memory each step peaked at above what it started with (tracemalloc), a
+  lower bound of what was allocated
+
+Usage:
+    python -m benchmarks.audio_stage --utterances 100 --output audio_stage.json
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+from typing import Awaitable, Callable, List
+
+from pipecat.audio.resamplers.soxr_resampler import SOXRAudioResampler
+from pipecat.frames.frames import Frame, StartFrame, TTSAudioRawFrame
+from pipecat.processors.frame_processor import FrameDirection
+from pipecat.transports.base_output import BaseOutputTransport
+from pipecat.transports.base_transport import TransportParams
+
+from audio_stage import OUTPUT_10MS_CHUNKS, POLLY_SAMPLE_RATE, AudioOutputStage
+from aws_emulators import speech_audio
+from tts_cache import CHUNK_SIZE
+
+# Text of the replies; the audio is repeated to the asked length
+REPLY = "Your booking is confirmed for the first week of July in Maui."
+
+
+class Counter:
+    """Counts the frames the conversion creates and takes the transport's chunks."""
+
+    def __init__(self, sample_rate: int):
+        self.frames = 0
+        self.sender = BaseOutputTransport.MediaSender(
+            None,
+            destination=None,
+            sample_rate=sample_rate,
+            audio_chunk_size=sample_rate // 100 * OUTPUT_10MS_CHUNKS * 2,
+            params=TransportParams(audio_out_enabled=True),
+        )
+        self.sender._audio_queue = asyncio.Queue()
+
+    async def transport(self, frame: TTSAudioRawFrame):
+        """Count ``frame``, hand it to the transport and take the chunks it cut."""
+        self.frames += 1
+        await self.sender.handle_audio_frame(frame)
+        while not self.sender._audio_queue.empty():
+            self.sender._audio_queue.get_nowait()
+            self.frames += 1
+
+
+class _Stage(AudioOutputStage):
+    """The audio stage, pushing its frames straight to the transport."""
+
+    def __init__(self, transport: Callable[[Frame], Awaitable[None]], sample_rate: int):
+        super().__init__()
+        self._transport = transport
+        self._start(StartFrame(clock=None, task_manager=None, audio_out_sample_rate=sample_rate))
+
+    async def push_frame(self, frame: Frame, direction: FrameDirection = FrameDirection.DOWNSTREAM):
+        await self._transport(frame)
+
+
+def current_steps(audio: bytes, counter: Counter, sample_rate: int) -> List[Callable[[], Awaitable[None]]]:
+    """Conversion steps of one reply through Polly's resampling and the transport."""
+    converted = {}
+
+    async def polly():
+        converted["audio"] = await SOXRAudioResampler().resample(audio, POLLY_SAMPLE_RATE, sample_rate)
+
+    async def frame(i: int):
+        await counter.transport(TTSAudioRawFrame(converted["audio"][i : i + CHUNK_SIZE], sample_rate, 1))
+
+    resampled_size = len(audio) * sample_rate // POLLY_SAMPLE_RATE
+    return [polly] + [lambda i=i: frame(i) for i in range(0, resampled_size, CHUNK_SIZE)]
+
+
+def stage_steps(audio: bytes, counter: Counter, stage: _Stage) -> List[Callable[[], Awaitable[None]]]:
+    """Conversion steps of one reply through the audio stage and the transport."""
+
+    async def frame(i: int):
+        counter.frames += 1
+        await stage._write(TTSAudioRawFrame(audio[i : i + CHUNK_SIZE], POLLY_SAMPLE_RATE, 1))
+
+    return [lambda i=i: frame(i) for i in range(0, len(audio), CHUNK_SIZE)] + [stage._flush]
+
+
+async def run_setup(with_stage: bool, audio: bytes, utterances: int, sample_rate: int, repeats: int) -> dict:
+    def steps(counter: Counter):
+        stage = _Stage(counter.transport, sample_rate) if with_stage else None
+        for _ in range(utterances):
+            if stage:
+                yield from stage_steps(audio, counter, stage)
+            else:
+                yield from current_steps(audio, counter, sample_rate)
+
+    audio_secs = utterances * len(audio) / (POLLY_SAMPLE_RATE * 2)
+
+    cpu_secs = []
+    for _ in range(repeats):
+        counter = Counter(sample_rate)
+        started = time.process_time()
+        for step in steps(counter):
+            await step()
+        cpu_secs.append(time.process_time() - started)
+
+    counter = Counter(sample_rate)
+    allocated = 0
+    tracemalloc.start()
+    for step in steps(counter):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        await step()
+        allocated += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+
+    return {
+        "audio_secs": audio_secs,
+        "cpu_ms_per_audio_minute": min(cpu_secs) * 1000 / (audio_secs / 60),
+        "frames_per_audio_sec": counter.frames / audio_secs,
+        "allocated_kib_per_audio_sec": allocated / 1024 / audio_secs,
+    }
+
+
+async def benchmark(utterances: int, seconds: float, sample_rate: int, repeats: int) -> dict:
+    reply = speech_audio(REPLY, POLLY_SAMPLE_RATE)
+    size = int(seconds * POLLY_SAMPLE_RATE) * 2
+    audio = (reply * (size // len(reply) + 1))[:size]
+    setups = {
+        "current": (False, sample_rate),
+        "audio_stage": (True, sample_rate),
+        "audio_stage_polly_rate": (True, POLLY_SAMPLE_RATE),
+    }
+    return {
+        setup: await run_setup(with_stage, audio, utterances, rate, repeats)
+        for setup, (with_stage, rate) in setups.items()
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Audio stage micro-benchmark")
+    parser.add_argument("--utterances", type=int, default=100, help="Replies converted")
+    parser.add_argument("--seconds", type=float, default=4, help="Length of each reply")
+    parser.add_argument("--sample-rate", type=int, default=24000, help="Sample rate of the transport")
+    parser.add_argument("--repeats", type=int, default=5, help="CPU measurements, the best one is kept")
+    parser.add_argument("--output", type=str, help="Write the results to this JSON file")
+
+    config = parser.parse_args()
+
+    results = asyncio.run(benchmark(config.utterances, config.seconds, config.sample_rate, config.repeats))
+    print(json.dumps(results, indent=2))
+    if config.output:
+        with open(config.output, "w") as f:
+            json.dump(results, f, indent=2)
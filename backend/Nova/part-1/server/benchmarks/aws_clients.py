@@ -0,0 +1,183 @@
+"""First-request latency of a session's AWS calls: clients per session versus shared clients.
+
+Serves Polly's ``SynthesizeSpeech`` over HTTPS on a local endpoint that
+answers after ``--latency-ms`` and, on every new connection, first waits
+``--handshake-ms``, standing in for the TCP and TLS round trips to a regional
+endpoint. ``--sessions`` sessions, ``--concurrency`` at a time, each
+synthesize ``--requests`` phrases. Two setups:
+
+- ``per_session``: each session creates its clients, as the bots did
+  (``boto3.client`` with the ``AWS_*`` credentials)
+- ``shared``: sessions get their clients from the process's ``AWSClients``
+  (see ``aws_clients``)
+
+and reports per setup the latency (ms) of each session's first request,
+including creating its client, and of its later requests, the connections
+the endpoint accepted, and the reuse counters of ``AWSClients``.
+
+Usage:
+    python -m benchmarks.aws_clients --sessions 50 --output aws_clients.json
+"""
+
+import argparse
+import json
+import os
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Tuple
+
+import boto3
+from urllib3.exceptions import InsecureRequestWarning
+
+from aws_clients import AWSClients
+from benchmarks.load_test import summarize
+
+REGION = "us-east-1"
+
+# Audio returned per request
+AUDIO = b"\x00" * 3200
+
+
+class PollyHandler(BaseHTTPRequestHandler):
+    """Answers every request with audio, as Polly's ``SynthesizeSpeech`` does."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.server.latency_secs)
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/pcm")
+        self.send_header("x-amzn-RequestCharacters", "10")
+        self.send_header("Content-Length", str(len(AUDIO)))
+        self.end_headers()
+        self.wfile.write(AUDIO)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class PollyEndpoint(ThreadingHTTPServer):
+    """Local HTTPS endpoint, slow to set up connections like a remote one.
+
+    Args:
+        handshake_secs: Delay before the first request of a connection is read
+        latency_secs: Delay before each request is answered
+        certfile: PEM file with the endpoint's certificate and key
+    """
+
+    daemon_threads = True
+
+    def __init__(self, handshake_secs: float, latency_secs: float, certfile: str):
+        super().__init__(("127.0.0.1", 0), PollyHandler)
+        self.handshake_secs = handshake_secs
+        self.latency_secs = latency_secs
+        self.connections = 0
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(certfile)
+        self.socket = context.wrap_socket(self.socket, server_side=True)
+
+    @property
+    def url(self) -> str:
+        return f"https://127.0.0.1:{self.server_address[1]}"
+
+    def process_request_thread(self, request, client_address):
+        self.connections += 1
+        time.sleep(self.handshake_secs)
+        super().process_request_thread(request, client_address)
+
+
+def create_certificate(directory: str) -> str:
+    path = os.path.join(directory, "endpoint.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-subj", "/CN=127.0.0.1", "-keyout", path, "-out", path],
+        check=True,
+        capture_output=True,
+    )
+    return path
+
+
+def session(create_client, requests: int, think_secs: float) -> Tuple[float, List[float]]:
+    latencies = []
+    started = time.perf_counter()
+    polly = create_client()
+    for i in range(requests):
+        if i:
+            time.sleep(think_secs)
+            started = time.perf_counter()
+        response = polly.synthesize_speech(Text="One moment.", OutputFormat="pcm", VoiceId="Joanna")
+        response["AudioStream"].read()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies[0], latencies[1:]
+
+
+def run_setup(shared: bool, config: argparse.Namespace, certfile: str) -> Dict[str, Any]:
+    endpoint = PollyEndpoint(config.handshake_ms / 1000, config.latency_ms / 1000, certfile)
+    threading.Thread(target=endpoint.serve_forever, daemon=True).start()
+    clients = AWSClients(max_pool_connections=config.concurrency)
+
+    def create_client():
+        if shared:
+            return clients.client("polly", REGION, endpoint_url=endpoint.url, verify=False)
+        return boto3.client(
+            "polly",
+            region_name=REGION,
+            aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+            aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+            aws_session_token=os.getenv("AWS_SESSION_TOKEN"),
+            endpoint_url=endpoint.url,
+            verify=False,
+        )
+
+    with ThreadPoolExecutor(config.concurrency) as executor:
+        results = list(
+            executor.map(
+                lambda _: session(create_client, config.requests, config.think_ms / 1000), range(config.sessions)
+            )
+        )
+    endpoint.shutdown()
+    endpoint.server_close()
+    return {
+        "first_request_ms": summarize([first for first, _ in results]),
+        "later_request_ms": summarize([latency for _, later in results for latency in later]),
+        "connections": endpoint.connections,
+        **({"clients": clients.stats()} if shared else {}),
+    }
+
+
+def benchmark(config: argparse.Namespace) -> Dict[str, Any]:
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "benchmark")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "benchmark")
+    warnings.simplefilter("ignore", InsecureRequestWarning)
+    with tempfile.TemporaryDirectory() as directory:
+        certfile = create_certificate(directory)
+        return {
+            "per_session": run_setup(False, config, certfile),
+            "shared": run_setup(True, config, certfile),
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shared AWS clients benchmark")
+    parser.add_argument("--sessions", type=int, default=50, help="Sessions in total")
+    parser.add_argument("--concurrency", type=int, default=5, help="Sessions at the same time")
+    parser.add_argument("--requests", type=int, default=5, help="Requests per session")
+    parser.add_argument("--think-ms", type=float, default=200, help="Time between the requests of a session")
+    parser.add_argument("--handshake-ms", type=float, default=60, help="Connection setup (TCP and TLS round trips)")
+    parser.add_argument("--latency-ms", type=float, default=80, help="Time the endpoint takes to answer")
+    parser.add_argument("--output", type=str, help="Write the results to this JSON file")
+
+    config = parser.parse_args()
+
+    results = benchmark(config)
+    print(json.dumps(results, indent=2))
+    if config.output:
+        with open(config.output, "w") as f:
+            json.dump(results, f, indent=2)
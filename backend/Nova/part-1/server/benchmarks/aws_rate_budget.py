@@ -0,0 +1,187 @@
+"""Throttling and request latency of bot processes sharing an AWS quota, with and without the rate budget.
+
+Emulates an AWS API with a quota of ``--quota`` requests per second (a token
+bucket holding a second of requests) that answers after ``--latency-ms``
+and rejects requests beyond the quota as throttled. ``--processes`` bot
+processes run ``--sessions`` sessions each, starting within ``--ramp-secs``.
+Each session sends a greeting request when it starts and then a turn request
+every ``--turn-secs`` (± 50%) for ``--duration-secs``. A throttled request is
+retried like botocore's standard retry mode does: after a random back-off of
+up to 2^attempt seconds, at most 3 attempts in all. Two setups:
+
+- ``unbudgeted``: each process sends its requests as they come
+- ``budgeted``: each request first waits for a permit from a
+  ``RateCoordinator`` at the quota (see ``rate_budget``)
+
+and reports per setup the latency (ms) of turn and greeting requests,
+including waits for permits and retries, the requests the API throttled,
+those that failed after 3 attempts, and the coordinator's counters.
+
+Usage:
+    python -m benchmarks.aws_rate_budget --processes 12 --output aws_rate_budget.json
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from benchmarks.load_test import summarize
+from rate_budget import GREETING, TURN, RateBudgetClient, RateCoordinator
+
+API = "polly"
+REGION = "us-east-1"
+
+# Attempts per request, as botocore's standard retry mode
+MAX_ATTEMPTS = 3
+
+# Longest back-off in seconds, as botocore's standard retry mode
+MAX_BACKOFF_SECS = 20
+
+
+class QuotaEndpoint:
+    """Emulated AWS API throttling requests beyond its quota, on a Unix socket.
+
+    Args:
+        quota: Requests per second
+        latency_secs: Time to answer a request within the quota
+    """
+
+    def __init__(self, quota: float, latency_secs: float):
+        self._quota = quota
+        self._latency_secs = latency_secs
+        self._tokens = quota
+        self._updated = time.monotonic()
+        self._server: Optional[asyncio.AbstractServer] = None
+        self.throttled = 0
+
+    async def start(self, path: str):
+        self._server = await asyncio.start_unix_server(self._serve, path=path)
+
+    async def stop(self):
+        self._server.close()
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        while await reader.readline():
+            now = time.monotonic()
+            self._tokens = min(self._quota, self._tokens + (now - self._updated) * self._quota)
+            self._updated = now
+            if self._tokens < 1:
+                self.throttled += 1
+                writer.write(b"throttled\n")
+                continue
+            self._tokens -= 1
+            await asyncio.sleep(self._latency_secs)
+            writer.write(b"ok\n")
+
+
+async def request(endpoint: Tuple[asyncio.StreamReader, asyncio.StreamWriter], budget, priority: str) -> bool:
+    reader, writer = endpoint
+    for attempt in range(MAX_ATTEMPTS):
+        if budget:
+            await budget.acquire(API, REGION, priority)
+        writer.write(b"request\n")
+        if await reader.readline() == b"ok\n":
+            return True
+        if attempt < MAX_ATTEMPTS - 1:
+            await asyncio.sleep(min(random.random() * 2**attempt, MAX_BACKOFF_SECS))
+    return False
+
+
+async def session(endpoint_path: str, budget, config: argparse.Namespace) -> List[Tuple[str, float, bool]]:
+    results = []
+    await asyncio.sleep(random.uniform(0, config.ramp_secs))
+    # A connection per session, like a client per session with one request in flight
+    endpoint = await asyncio.open_unix_connection(endpoint_path)
+    ends_at = time.monotonic() + config.duration_secs
+    priority = GREETING
+    while True:
+        started = time.perf_counter()
+        ok = await request(endpoint, budget, priority)
+        results.append((priority, (time.perf_counter() - started) * 1000, ok))
+        priority = TURN
+        await asyncio.sleep(config.turn_secs * random.uniform(0.5, 1.5))
+        if time.monotonic() >= ends_at:
+            break
+    endpoint[1].close()
+    return results
+
+
+def bot_process(endpoint_path: str, budget_path: Optional[str], config: argparse.Namespace, results):
+    async def run():
+        budget = RateBudgetClient(budget_path, max_wait_ms=config.max_wait_ms) if budget_path else None
+        sessions = await asyncio.gather(*(session(endpoint_path, budget, config) for _ in range(config.sessions)))
+        return [result for session_results in sessions for result in session_results]
+
+    results.put(asyncio.run(run()))
+
+
+async def run_setup(budgeted: bool, config: argparse.Namespace, directory: str) -> Dict[str, Any]:
+    endpoint_path = os.path.join(directory, f"endpoint-{budgeted}.sock")
+    endpoint = QuotaEndpoint(config.quota, config.latency_ms / 1000)
+    await endpoint.start(endpoint_path)
+    coordinator = budget_path = None
+    if budgeted:
+        budget_path = os.path.join(directory, "budget.sock")
+        coordinator = RateCoordinator({API: config.quota})
+        await coordinator.start(budget_path)
+
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    processes = [
+        context.Process(target=bot_process, args=(endpoint_path, budget_path, config, queue))
+        for _ in range(config.processes)
+    ]
+    for process in processes:
+        process.start()
+    results = []
+    for _ in processes:
+        results.extend(await asyncio.to_thread(queue.get))
+    for process in processes:
+        await asyncio.to_thread(process.join)
+
+    await endpoint.stop()
+    if coordinator:
+        await coordinator.stop()
+    return {
+        "turn_latency_ms": summarize([latency for priority, latency, _ in results if priority == TURN]),
+        "greeting_latency_ms": summarize([latency for priority, latency, _ in results if priority == GREETING]),
+        "requests": len(results),
+        "throttled": endpoint.throttled,
+        "failed": sum(1 for _, _, ok in results if not ok),
+        **({"budget": coordinator.stats()} if coordinator else {}),
+    }
+
+
+async def benchmark(config: argparse.Namespace) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory() as directory:
+        return {
+            "unbudgeted": await run_setup(False, config, directory),
+            "budgeted": await run_setup(True, config, directory),
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AWS rate budget benchmark")
+    parser.add_argument("--processes", type=int, default=12, help="Bot processes")
+    parser.add_argument("--sessions", type=int, default=4, help="Sessions per process")
+    parser.add_argument("--quota", type=float, default=8, help="Requests per second the API allows")
+    parser.add_argument("--latency-ms", type=float, default=100, help="Time the API takes to answer")
+    parser.add_argument("--ramp-secs", type=float, default=10, help="Time over which the sessions start")
+    parser.add_argument("--turn-secs", type=float, default=6, help="Mean time between the turns of a session")
+    parser.add_argument("--duration-secs", type=float, default=30, help="Length of each session")
+    parser.add_argument("--max-wait-ms", type=float, default=2000, help="Longest a bot waits for a permit")
+    parser.add_argument("--output", type=str, help="Write the results to this JSON file")
+
+    config = parser.parse_args()
+
+    results = asyncio.run(benchmark(config))
+    print(json.dumps(results, indent=2))
+    if config.output:
+        with open(config.output, "w") as f:
+            json.dump(results, f, indent=2)
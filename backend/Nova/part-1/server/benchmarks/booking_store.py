@@ -0,0 +1,137 @@
+"""Function handler latency against the booking store: awaited versus pooled writes.
+
+Runs ``--conversations`` conversations at the same time, each storing what the
+flow's handlers store, in order: the destination, the dates twice (the user
+changes their mind), the activities and the confirmation, ``--think-ms``
+apart. Two setups:
+
+- ``awaited``: every handler writes to the backend itself and waits for its
+  write
+- ``pooled``: handlers write through a ``BookingStore`` and only wait for
+  the confirmation; the other writes are batched (see ``booking_store``)
+
+Both use ``--pool-size`` connections to the backend, and run against two
+backends: in memory with a ``--latency-ms`` round trip, standing in for the
+booking backend, and a SQLite file. Reports per setup and backend:
+
+- the time each handler waits for the store, per handler
+- writes to the backend, and bookings whose stored fields differ from the last
+  ones the conversation wrote (should be 0)
+
+Usage:
+    python -m benchmarks.booking_store --conversations 100 --output booking_store.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Tuple
+
+from benchmarks.load_test import summarize
+from booking_store import BOOKING_BATCH_MS, BOOKING_POOL_SIZE, BookingStore, MemoryBackend, SQLiteBackend
+
+# What each conversation stores, handler by handler
+WRITES: List[Tuple[str, Dict[str, Any], bool]] = [
+    ("select_destination", {"destination": "Maui"}, False),
+    ("record_dates", {"check_in": "2025-07-01", "check_out": "2025-07-08"}, False),
+    ("record_dates", {"check_in": "2025-07-08", "check_out": "2025-07-15"}, False),
+    ("record_activities", {"activities": ["snorkeling", "surfing"]}, False),
+    ("confirm_booking", {"status": "confirmed"}, True),
+]
+
+
+def expected_booking() -> Dict[str, Any]:
+    booking = {}
+    for _, fields, _ in WRITES:
+        booking.update(fields)
+    return booking
+
+
+async def conversation(write, booking_id: str, start_secs: float, think_secs: float, waits):
+    await asyncio.sleep(start_secs)
+    for handler, fields, must_wait in WRITES:
+        await asyncio.sleep(think_secs)
+        started = time.perf_counter()
+        await write(booking_id, fields, must_wait)
+        waits[handler].append((time.perf_counter() - started) * 1000)
+
+
+async def run_setup(backend, awaited: bool, conversations: int, think_secs: float, batch_secs: float) -> dict:
+    # A generous timeout: the benchmark measures waiting, it should not fail
+    store = BookingStore(backend, timeout_secs=30, batch_secs=batch_secs)
+    if awaited:
+        async def write(booking_id, fields, must_wait):
+            await backend.write({booking_id: fields})
+    else:
+        async def write(booking_id, fields, must_wait):
+            await store.update(booking_id, fields, wait=must_wait)
+
+    # Conversations start spread over one think time, as they would not all talk at once
+    starts = random.Random(0)
+    waits: Dict[str, List[float]] = defaultdict(list)
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(
+            conversation(write, f"booking-{i}", starts.uniform(0, think_secs), think_secs, waits)
+            for i in range(conversations)
+        )
+    )
+    wall_secs = time.perf_counter() - started
+    await store.flush()
+
+    expected = expected_booking()
+    stored = [await backend.read(f"booking-{i}") for i in range(conversations)]
+    await store.close()
+    return {
+        "wall_secs": wall_secs,
+        "handler_wait_ms": {handler: summarize(values) for handler, values in waits.items()},
+        "backend_writes": conversations * len(WRITES) if awaited else store.stats()["batches"],
+        "wrong_bookings": sum(booking != expected for booking in stored),
+    }
+
+
+async def benchmark(conversations: int, pool_size: int, latency_ms: float, think_secs: float, batch_secs: float) -> dict:
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for setup in ("awaited", "pooled"):
+            awaited = setup == "awaited"
+            backends = {
+                "memory": MemoryBackend(pool_size, latency_ms / 1000),
+                "sqlite": SQLiteBackend(os.path.join(tmp, f"{setup}.db"), pool_size),
+            }
+            for name, backend in backends.items():
+                results.setdefault(name, {})[setup] = await run_setup(
+                    backend, awaited, conversations, think_secs, batch_secs
+                )
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Booking store benchmark")
+    parser.add_argument("--conversations", type=int, default=100, help="Concurrent conversations")
+    parser.add_argument("--pool-size", type=int, default=BOOKING_POOL_SIZE, help="Connections to the backend")
+    parser.add_argument("--latency-ms", type=float, default=20, help="Round trip of the in-memory backend")
+    parser.add_argument("--think-ms", type=int, default=500, help="Time between two handler calls")
+    parser.add_argument("--batch-ms", type=int, default=BOOKING_BATCH_MS, help="Write batching window")
+    parser.add_argument("--output", type=str, help="Write the results to this JSON file")
+
+    config = parser.parse_args()
+
+    results = asyncio.run(
+        benchmark(
+            config.conversations,
+            config.pool_size,
+            config.latency_ms,
+            config.think_ms / 1000,
+            config.batch_ms / 1000,
+        )
+    )
+    print(json.dumps(results, indent=2))
+    if config.output:
+        with open(config.output, "w") as f:
+            json.dump(results, f, indent=2)
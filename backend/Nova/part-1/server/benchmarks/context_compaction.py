@@ -0,0 +1,212 @@
+"""Per-turn LLM latency versus conversation length, with and without compaction.
+
+Plays a long conversation against the Bedrock LLM service, starting from the
+system prompt and start node of the part-1 flow, in two setups:
+
+- ``append_only``: the context keeps every turn
+- ``compacted``: a ``ContextCompactor`` summarizes the older turns while the
+  user speaks and applies the summary when they stop (see ``context_compaction``)
+
+and reports, per block of ``--block`` turns:
+
+- time to first token: from the request to the first LLM text
+- input tokens of the request, as reported by Bedrock
+
+Prompt cache checkpoints are not added, so the input is processed in full
+every turn. Bedrock is emulated (see ``aws_emulators``; the emulated time to
+first token grows with the input at ``EMULATOR_LLM_PREFILL_RATE``) unless
+``--aws`` is given.
+
+Usage:
+    python -m benchmarks.context_compaction --turns 60 --output context_compaction.json
+    python -m benchmarks.context_compaction --aws
+"""
+
+import argparse
+import asyncio
+import json
+import os
+from typing import Dict, List
+
+from pipecat.frames.frames import (
+    EndFrame,
+    Frame,
+    LLMFullResponseEndFrame,
+    LLMTextFrame,
+    MetricsFrame,
+    StartFrame,
+    UserStartedSpeakingFrame,
+    UserStoppedSpeakingFrame,
+)
+from pipecat.metrics.metrics import LLMUsageMetricsData
+from pipecat.pipeline.pipeline import Pipeline
+from pipecat.pipeline.runner import PipelineRunner
+from pipecat.pipeline.task import PipelineParams, PipelineTask
+from pipecat.processors.aggregators.openai_llm_context import OpenAILLMContextFrame
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+from pipecat.services.aws.llm import AWSBedrockLLMContext, AWSBedrockLLMService
+
+from aws_emulators import ConversationScript, EmulatedBedrockClient
+from benchmarks.load_test import summarize
+from context_compaction import CONTEXT_KEEP_TURNS, CONTEXT_TOKEN_BUDGET, BedrockSummarizer, ContextCompactor
+from flow import flow_config
+
+USER_TURNS = [
+    "I'd like to go somewhere warm in July, maybe a beach with good snorkeling.",
+    "What about Maui? How far is it from the airport to the beaches?",
+    "Actually, can we change the dates to the second week of July instead?",
+    "Let's add surfing lessons and a sunset dinner cruise to the activities.",
+    "Can you go over the whole plan again, including the dates and activities?",
+    "Hmm, let me think about the dates again. What about the third week?",
+]
+
+REPLIES = [
+    "Maui is a wonderful choice for July, with calm mornings for snorkeling at Molokini and "
+    "warm water all month. Would you like me to look at dates next?",
+    "I've updated your trip to the second week of July. The beaches on the west side are about "
+    "an hour from the airport. Shall we pick some activities?",
+    "Surfing lessons in Lahaina and a sunset dinner cruise are both on your itinerary now. "
+    "Is there anything else you'd like to add before we review the plan?",
+    "Here's your plan: Maui from the second week of July, with snorkeling, surfing lessons and "
+    "a sunset dinner cruise. Would you like to confirm or change anything?",
+]
+
+
+class ReplySink(FrameProcessor):
+    """Records the first token time, text and input tokens of each reply."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.started = asyncio.Event()
+        self.reply_done = asyncio.Event()
+        self.first_token_at = None
+        self.text = ""
+        self.input_tokens = 0
+
+    def reset(self):
+        self.reply_done.clear()
+        self.first_token_at = None
+        self.text = ""
+        self.input_tokens = 0
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+        if isinstance(frame, StartFrame):
+            self.started.set()
+        elif isinstance(frame, LLMTextFrame):
+            if self.first_token_at is None:
+                self.first_token_at = asyncio.get_running_loop().time()
+            self.text += frame.text
+        elif isinstance(frame, MetricsFrame):
+            for data in frame.data:
+                if isinstance(data, LLMUsageMetricsData):
+                    usage = data.value
+                    self.input_tokens += (
+                        usage.prompt_tokens
+                        + (usage.cache_read_input_tokens or 0)
+                        + (usage.cache_creation_input_tokens or 0)
+                    )
+        elif isinstance(frame, LLMFullResponseEndFrame):
+            self.reply_done.set()
+        await self.push_frame(frame, direction)
+
+
+def create_llm(aws: bool) -> AWSBedrockLLMService:
+    credentials = {} if aws else {"aws_access_key": "emulated", "aws_secret_key": "emulated"}
+    llm = AWSBedrockLLMService(
+        **credentials,
+        aws_region=os.getenv("AWS_REGION", "us-east-1"),
+        model="us.anthropic.claude-3-5-haiku-20241022-v1:0",
+        params=AWSBedrockLLMService.InputParams(temperature=0.3, latency="optimized"),
+    )
+    if not aws:
+        llm._client = EmulatedBedrockClient(ConversationScript({"replies": REPLIES}))
+    return llm
+
+
+def create_context() -> AWSBedrockLLMContext:
+    start = flow_config["nodes"]["start"]
+    return AWSBedrockLLMContext.from_messages(
+        [*start["role_messages"], *start["task_messages"]]
+    )
+
+
+async def run_setup(compacted: bool, aws: bool, turns: int, speaking_secs: float, budget: int) -> List[dict]:
+    llm = create_llm(aws)
+    context = create_context()
+    sink = ReplySink()
+    processors = []
+    if compacted:
+        summarizer = BedrockSummarizer(llm._client, llm.model_name)
+        processors.append(
+            ContextCompactor(context, summarizer, token_budget=budget, keep_turns=CONTEXT_KEEP_TURNS)
+        )
+    # No idle monitor: cancelling it can hang when the benchmark ends the task
+    task = PipelineTask(
+        Pipeline([*processors, llm, sink]),
+        params=PipelineParams(enable_metrics=True, enable_usage_metrics=True),
+        idle_timeout_secs=None,
+    )
+    runner = asyncio.create_task(PipelineRunner(handle_sigint=False).run(task))
+    await sink.started.wait()
+
+    loop = asyncio.get_running_loop()
+    results = []
+    for turn in range(turns):
+        await task.queue_frame(UserStartedSpeakingFrame())
+        await asyncio.sleep(speaking_secs)
+        await task.queue_frame(UserStoppedSpeakingFrame())
+
+        sink.reset()
+        context.add_message({"role": "user", "content": USER_TURNS[turn % len(USER_TURNS)]})
+        requested_at = loop.time()
+        await task.queue_frame(OpenAILLMContextFrame(context))
+        await sink.reply_done.wait()
+        context.add_message({"role": "assistant", "content": sink.text.strip() or "(empty)"})
+        results.append(
+            {
+                "ttft_ms": (sink.first_token_at - requested_at) * 1000,
+                "input_tokens": sink.input_tokens,
+            }
+        )
+
+    await task.queue_frame(EndFrame())
+    await runner
+    return results
+
+
+def by_block(results: List[dict], block: int) -> Dict[str, dict]:
+    blocks = {}
+    for start in range(0, len(results), block):
+        turns = results[start : start + block]
+        blocks[f"turns {start + 1}-{start + len(turns)}"] = {
+            metric: summarize([turn[metric] for turn in turns]) for metric in ("ttft_ms", "input_tokens")
+        }
+    return blocks
+
+
+async def benchmark(aws: bool, turns: int, block: int, speaking_secs: float, budget: int) -> dict:
+    return {
+        setup: by_block(await run_setup(setup == "compacted", aws, turns, speaking_secs, budget), block)
+        for setup in ("append_only", "compacted")
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Context compaction benchmark")
+    parser.add_argument("--turns", type=int, default=60, help="User turns per conversation")
+    parser.add_argument("--block", type=int, default=10, help="Turns per reported block")
+    parser.add_argument("--speaking-ms", type=int, default=1000, help="How long the user speaks per turn")
+    parser.add_argument("--budget", type=int, default=CONTEXT_TOKEN_BUDGET, help="Context token budget")
+    parser.add_argument("--aws", action="store_true", help="Use Amazon Bedrock instead of the emulator")
+    parser.add_argument("--output", type=str, help="Write the results to this JSON file")
+
+    config = parser.parse_args()
+
+    results = asyncio.run(
+        benchmark(config.aws, config.turns, config.block, config.speaking_ms / 1000, config.budget)
+    )
+    print(json.dumps(results, indent=2))
+    if config.output:
+        with open(config.output, "w") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,190 @@
+"""Silence during slow function calls, with and without filler audio.
+
+Runs ``--sessions`` sessions at once, each making ``--calls`` function calls
+one after the other. A call takes a random time (log-normal around
+``--call-ms``); the reply audio follows its result after ``--reply-ms`` (the
+LLM and TTS answering). A stand-in for the output transport plays the audio
+in real time and reports when the bot starts and stops speaking, as
+``transport.output()`` does. Two setups:
+
+- ``silence``: nothing plays until the reply
+- ``filler``: ``FunctionCallFiller`` with ``--threshold-ms`` in front of the
+  output (clips rendered by the emulated Polly, see ``aws_emulators``)
+
+and reports per setup, over all calls:
+
+- perceived latency: from the call until the caller hears the bot again
+- reply delay: how long the reply waited for a filler clip to finish playing
+- filler trigger rate
+
+Usage:
+    python -m benchmarks.filler_audio --sessions 10 --output filler_audio.json
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import tempfile
+from typing import Dict, List, Optional
+
+from pipecat.frames.frames import (
+    BotStartedSpeakingFrame,
+    BotStoppedSpeakingFrame,
+    EndFrame,
+    Frame,
+    FunctionCallInProgressFrame,
+    FunctionCallResultFrame,
+    OutputAudioRawFrame,
+    StartFrame,
+    TTSAudioRawFrame,
+)
+from pipecat.pipeline.pipeline import Pipeline
+from pipecat.pipeline.runner import PipelineRunner
+from pipecat.pipeline.task import PipelineTask
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+
+from aws_emulators import EmulatedPollyClient, speech_audio
+from benchmarks.load_test import summarize
+from filler_audio import SAMPLE_RATE, FillerClips, FunctionCallFiller
+
+# Length of the audio of each reply
+REPLY = "Your booking is confirmed for the first week of July in Maui."
+
+# Spread of the log-normal call time
+CALL_SIGMA = 0.8
+
+
+class Speaker(FrameProcessor):
+    """Stands in for the output transport: plays audio in real time."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.started = asyncio.Event()
+        self.quiet = asyncio.Event()
+        self.quiet.set()
+        # When the audio of each frame started playing, and when it arrived
+        self.played: List[tuple] = []
+        self._playing_until = 0.0
+        self._stop_task: Optional[asyncio.Task] = None
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+        loop = asyncio.get_running_loop()
+        if isinstance(frame, StartFrame):
+            self.started.set()
+        elif isinstance(frame, OutputAudioRawFrame):
+            now = loop.time()
+            starts = max(now, self._playing_until)
+            self.played.append((starts, now, isinstance(frame, TTSAudioRawFrame)))
+            self._playing_until = starts + len(frame.audio) / (frame.sample_rate * 2)
+            if self.quiet.is_set():
+                self.quiet.clear()
+                await self.push_frame(BotStartedSpeakingFrame(), FrameDirection.UPSTREAM)
+            if self._stop_task:
+                self._stop_task.cancel()
+            self._stop_task = asyncio.create_task(self._stop_speaking())
+            return
+        await self.push_frame(frame, direction)
+
+    async def _stop_speaking(self):
+        await asyncio.sleep(self._playing_until - asyncio.get_running_loop().time())
+        self.quiet.set()
+        await self.push_frame(BotStoppedSpeakingFrame(), FrameDirection.UPSTREAM)
+
+
+async def run_session(
+    index: int, clips: Optional[FillerClips], calls: int, call_secs: float, reply_secs: float, threshold_secs: float
+) -> Dict[str, list]:
+    rng = random.Random(index)
+    speaker = Speaker()
+    filler = FunctionCallFiller(clips, threshold_secs=threshold_secs) if clips is not None else None
+    processors = [filler] if filler else []
+    # No idle monitor: cancelling it can hang when the benchmark ends the task
+    task = PipelineTask(Pipeline([*processors, speaker]), idle_timeout_secs=None)
+    runner = asyncio.create_task(PipelineRunner(handle_sigint=False).run(task))
+    await speaker.started.wait()
+    if clips is not None:
+        await clips.load()
+
+    loop = asyncio.get_running_loop()
+    reply = speech_audio(REPLY, SAMPLE_RATE)
+    results = {"perceived_ms": [], "reply_delay_ms": []}
+    for call in range(calls):
+        await asyncio.sleep(rng.uniform(0.2, 0.6))
+        speaker.played = []
+        started = loop.time()
+        arguments = {"destination": "Maui"}
+        await task.queue_frame(FunctionCallInProgressFrame("record_destination", f"call_{call}", arguments))
+        await asyncio.sleep(rng.lognormvariate(0, CALL_SIGMA) * call_secs)
+        await task.queue_frame(
+            FunctionCallResultFrame("record_destination", f"call_{call}", arguments, {"status": "success"})
+        )
+        await asyncio.sleep(reply_secs)
+        for i in range(0, len(reply), SAMPLE_RATE // 50 * 2):
+            await task.queue_frame(TTSAudioRawFrame(reply[i : i + SAMPLE_RATE // 50 * 2], SAMPLE_RATE, 1))
+        # Wait for the reply to start playing, then to end
+        while not any(is_reply for _, _, is_reply in speaker.played):
+            await asyncio.sleep(0.01)
+        await speaker.quiet.wait()
+
+        results["perceived_ms"].append((speaker.played[0][0] - started) * 1000)
+        reply_starts, reply_arrives, _ = next(played for played in speaker.played if played[2])
+        results["reply_delay_ms"].append((reply_starts - reply_arrives) * 1000)
+
+    await task.queue_frame(EndFrame())
+    await runner
+    if filler:
+        results["fillers"] = [sum(tool["fillers"] for tool in filler.stats().values())]
+    return results
+
+
+async def run_setup(with_filler: bool, sessions: int, calls: int, call_secs, reply_secs, threshold_secs) -> dict:
+    clips = None
+    if with_filler:
+        clips = FillerClips(EmulatedPollyClient(), directory=tempfile.mkdtemp(prefix="filler-benchmark-"))
+    outcomes = await asyncio.gather(
+        *(run_session(i, clips, calls, call_secs, reply_secs, threshold_secs) for i in range(sessions))
+    )
+    perceived = [value for outcome in outcomes for value in outcome["perceived_ms"]]
+    delays = [value for outcome in outcomes for value in outcome["reply_delay_ms"]]
+    fillers = sum(sum(outcome.get("fillers", [])) for outcome in outcomes)
+    return {
+        "calls": len(perceived),
+        "perceived_ms": summarize(perceived),
+        "reply_delay_ms": summarize(delays),
+        "filler_trigger_rate": fillers / len(perceived),
+    }
+
+
+async def benchmark(sessions: int, calls: int, call_secs: float, reply_secs: float, threshold_secs: float) -> dict:
+    return {
+        setup: await run_setup(setup == "filler", sessions, calls, call_secs, reply_secs, threshold_secs)
+        for setup in ("silence", "filler")
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Filler audio benchmark")
+    parser.add_argument("--sessions", type=int, default=10, help="Concurrent sessions")
+    parser.add_argument("--calls", type=int, default=10, help="Function calls per session")
+    parser.add_argument("--call-ms", type=float, default=500, help="Median function call time")
+    parser.add_argument("--reply-ms", type=float, default=400, help="Time from a call's result to its reply audio")
+    parser.add_argument("--threshold-ms", type=float, default=700, help="Silence before a filler clip")
+    parser.add_argument("--output", type=str, help="Write the results to this JSON file")
+
+    config = parser.parse_args()
+
+    results = asyncio.run(
+        benchmark(
+            config.sessions,
+            config.calls,
+            config.call_ms / 1000,
+            config.reply_ms / 1000,
+            config.threshold_ms / 1000,
+        )
+    )
+    print(json.dumps(results, indent=2))
+    if config.output:
+        with open(config.output, "w") as f:
+            json.dump(results, f, indent=2)
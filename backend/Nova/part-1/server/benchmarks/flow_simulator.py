@@ -0,0 +1,327 @@
+"""Offline flow simulator: many synthetic conversations through ``flow_config``.
+
+Drives the ``FlowManager`` of each conversation with a fake LLM that calls one
+of the functions of the current node, with no audio, pipeline or LLM
+requests, so the flow logic, its handlers and the cost of ``pipecat_flows``
+transitions can be exercised at scale. The fake LLM either:
+
+- ``random``: calls one of the node's functions at random, with random
+  arguments following the function's schema
+- ``scripted``: answers each turn as the emulated Bedrock does (see
+  ``aws_emulators.ConversationScript``; ``EMULATOR_SCRIPT`` names the script)
+
+Function calls go through the functions the flow registered with the LLM and
+through their result callbacks, as in a pipeline, so handlers, transitions
+and pre- and post-actions all run. All conversations run concurrently in one
+event loop. Reports:
+
+- transitions and function calls per second
+- memory per conversation (traced in a second, identical run)
+- time per transition (``set_node``) and per function call, in microseconds
+- handler latency per handler, in microseconds
+
+With ``--baseline``, the run is compared against an earlier result file and
+the command fails if a metric regressed by more than ``--tolerance``.
+
+Usage:
+    python -m benchmarks.flow_simulator --conversations 2000 --output flow_simulator.json
+    python -m benchmarks.flow_simulator --llm scripted --manager flow --baseline flow_simulator.json
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+import tracemalloc
+import uuid
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+
+from pipecat.frames.frames import BotStoppedSpeakingFrame, EndFrame, Frame, LLMSetToolsFrame
+from pipecat.services.aws.llm import AWSBedrockLLMService
+from pipecat.services.llm_service import FunctionCallParams
+from pipecat_flows import FlowManager
+from pipecat_flows.actions import FunctionActionFrame
+
+from aws_emulators import ConversationScript
+from benchmarks.load_test import compare, summarize
+from flow import compiled_flow, flow_config
+from flow_graph import CompiledFlowManager
+
+# Metrics compared against a baseline (all "lower is better")
+REGRESSION_METRICS = (
+    ("transition_us", "p50"),
+    ("transition_us", "p95"),
+    ("function_call_us", "p95"),
+    ("memory_kib_per_conversation", None),
+)
+
+
+class SimulatedTask:
+    """Stands in for the ``PipelineTask``: keeps what the flow queues that matters.
+
+    Function action frames reach the end of the pipeline as soon as they are
+    queued, and the bot stops speaking whenever ``bot_stopped_speaking`` is
+    called (which runs deferred post-actions).
+    """
+
+    def __init__(self):
+        self.tools: List[Dict[str, Any]] = []
+        self.ended = False
+        self.frames = 0
+        self._handlers: Dict[str, Callable] = {}
+
+    def set_reached_downstream_filter(self, types: Tuple[type, ...]):
+        pass
+
+    def event_handler(self, event_name: str):
+        def decorator(handler):
+            self._handlers[event_name] = handler
+            return handler
+
+        return decorator
+
+    async def queue_frame(self, frame: Frame):
+        await self.queue_frames([frame])
+
+    async def queue_frames(self, frames: Iterable[Frame]):
+        for frame in frames:
+            self.frames += 1
+            if isinstance(frame, LLMSetToolsFrame):
+                self.tools = frame.tools
+            elif isinstance(frame, EndFrame):
+                self.ended = True
+            elif isinstance(frame, FunctionActionFrame):
+                await self._reached_downstream(frame)
+
+    async def bot_stopped_speaking(self):
+        await self._reached_downstream(BotStoppedSpeakingFrame())
+
+    async def _reached_downstream(self, frame: Frame):
+        handler = self._handlers.get("on_frame_reached_downstream")
+        if handler:
+            await handler(self, frame)
+
+
+class SimulatedTTS:
+    """Stands in for the TTS service of ``tts_say`` actions."""
+
+    def __init__(self):
+        self.said: List[str] = []
+
+    async def say(self, text: str):
+        self.said.append(text)
+
+
+class SimulatedLLM:
+    """Stands in for the LLM service: holds the functions the flow registers."""
+
+    def __init__(self):
+        self.functions: Dict[str, Callable] = {}
+
+    def register_function(self, function_name: str, handler: Callable, start_callback=None, **kwargs):
+        self.functions[function_name] = handler
+
+
+class RandomLLM:
+    """Calls one of the available functions at random, with random arguments."""
+
+    def __init__(self, seed: int):
+        self._random = random.Random(seed)
+
+    def choose(self, tools: List[Dict[str, Any]]) -> Optional[Tuple[str, Dict[str, Any]]]:
+        spec = self._random.choice(tools)["toolSpec"]
+        return spec["name"], self._arguments(spec["inputSchema"]["json"])
+
+    def _arguments(self, schema: Dict[str, Any]) -> Dict[str, Any]:
+        properties = schema.get("properties", {})
+        return {name: self._value(properties[name]) for name in schema.get("required", []) if name in properties}
+
+    def _value(self, schema: Dict[str, Any]) -> Any:
+        if schema.get("enum"):
+            return self._random.choice(schema["enum"])
+        kind = schema.get("type", "string")
+        if kind == "array":
+            count = self._random.randint(schema.get("minItems", 1), schema.get("maxItems", 3))
+            return [self._value(schema.get("items", {})) for _ in range(count)]
+        if kind == "object":
+            return self._arguments(schema)
+        if kind in ("integer", "number"):
+            return self._random.randint(schema.get("minimum", 1), schema.get("maximum", 10))
+        if kind == "boolean":
+            return self._random.random() < 0.5
+        if schema.get("format") == "date":
+            return f"2025-{self._random.randint(1, 12):02d}-{self._random.randint(1, 28):02d}"
+        return uuid.UUID(int=self._random.getrandbits(128)).hex[:8]
+
+
+class ScriptedLLM:
+    """Answers each user turn as the emulated Bedrock would (see ``ConversationScript``)."""
+
+    def __init__(self):
+        self._script = ConversationScript()
+
+    def choose(self, tools: List[Dict[str, Any]]) -> Optional[Tuple[str, Dict[str, Any]]]:
+        self._script.next_transcript()
+        schemas = [(tool["toolSpec"]["name"], tool["toolSpec"]["inputSchema"]["json"]) for tool in tools]
+        answer = self._script.respond(schemas, user_message=True)
+        return (answer["call"], answer["arguments"]) if "call" in answer else None
+
+
+# Fake LLMs by name, made from the conversation's seed
+LLMS = {"random": RandomLLM, "scripted": lambda seed: ScriptedLLM()}
+
+
+def timed(manager_class: type) -> type:
+    """``manager_class`` recording the time of each transition and handler call."""
+
+    class TimedFlowManager(manager_class):
+        def __init__(self, *, recorder: Dict[str, List[float]], **kwargs):
+            super().__init__(**kwargs)
+            self._recorder = recorder
+
+        async def set_node(self, node_id, node_config):
+            started = time.perf_counter()
+            await super().set_node(node_id, node_config)
+            self._recorder["transition_us"].append((time.perf_counter() - started) * 1e6)
+
+        async def _call_handler(self, handler, args):
+            started = time.perf_counter()
+            try:
+                return await super()._call_handler(handler, args)
+            finally:
+                self._recorder[f"handler:{handler.__name__}"].append((time.perf_counter() - started) * 1e6)
+
+    return TimedFlowManager
+
+
+MANAGERS = {
+    "flow": (timed(FlowManager), {"flow_config": flow_config}),
+    "compiled": (timed(CompiledFlowManager), {"compiled_flow": compiled_flow}),
+}
+
+
+async def run_conversation(
+    index: int, manager: str, llm: str, seed: int, max_turns: int, adapter_llm, recorder: Dict[str, List[float]]
+) -> bool:
+    """One conversation; returns whether the flow ended it."""
+    task = SimulatedTask()
+    manager_class, flow = MANAGERS[manager]
+    # pipecat_flows picks its LLM adapter by the service's class name; the
+    # functions of each conversation are then registered with its own SimulatedLLM
+    flow_manager = manager_class(
+        task=task, llm=adapter_llm, context_aggregator=None, tts=SimulatedTTS(), recorder=recorder, **flow
+    )
+    simulated_llm = flow_manager.llm = SimulatedLLM()
+    fake_llm = LLMS[llm](seed + index)
+
+    await flow_manager.initialize()
+    for turn in range(max_turns):
+        if task.ended or not task.tools:
+            break
+        answer = fake_llm.choose(task.tools)
+        if answer is None:
+            break
+        name, arguments = answer
+
+        async def result_callback(result, *, properties=None):
+            if properties and properties.on_context_updated:
+                await properties.on_context_updated()
+
+        started = time.perf_counter()
+        await simulated_llm.functions[name](
+            FunctionCallParams(
+                function_name=name,
+                tool_call_id=f"call_{index}_{turn}",
+                arguments=arguments,
+                llm=simulated_llm,
+                context=None,
+                result_callback=result_callback,
+            )
+        )
+        recorder["function_call_us"].append((time.perf_counter() - started) * 1e6)
+        await task.bot_stopped_speaking()
+        # Let the other conversations take their turn
+        await asyncio.sleep(0)
+    return task.ended
+
+
+async def simulate(conversations: int, manager: str, llm: str, seed: int, max_turns: int) -> Tuple[dict, float]:
+    adapter_llm = AWSBedrockLLMService(
+        aws_access_key="simulated",
+        aws_secret_key="simulated",
+        aws_region="us-east-1",
+        model="us.anthropic.claude-3-5-haiku-20241022-v1:0",
+    )
+    recorder: Dict[str, List[float]] = defaultdict(list)
+    started = time.perf_counter()
+    ended = await asyncio.gather(
+        *(
+            run_conversation(i, manager, llm, seed, max_turns, adapter_llm, recorder)
+            for i in range(conversations)
+        )
+    )
+    return {"recorder": recorder, "ended": sum(ended)}, time.perf_counter() - started
+
+
+def run(conversations: int, manager: str, llm: str, seed: int, max_turns: int) -> dict:
+    outcome, wall_secs = asyncio.run(simulate(conversations, manager, llm, seed, max_turns))
+    recorder = outcome["recorder"]
+
+    # Same conversations again, traced: tracing slows everything down, so it is not timed
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    asyncio.run(simulate(conversations, manager, llm, seed, max_turns))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    handlers = sorted(key for key in recorder if key.startswith("handler:"))
+    return {
+        "conversations": conversations,
+        "manager": manager,
+        "llm": llm,
+        "ended_conversations": outcome["ended"],
+        "wall_secs": wall_secs,
+        "transitions": len(recorder["transition_us"]),
+        "transitions_per_sec": len(recorder["transition_us"]) / wall_secs,
+        "function_calls_per_sec": len(recorder["function_call_us"]) / wall_secs,
+        "memory_kib_per_conversation": (peak - baseline) / conversations / 1024,
+        "transition_us": summarize(recorder["transition_us"]),
+        "function_call_us": summarize(recorder["function_call_us"]),
+        "handler_latency_us": {key.split(":", 1)[1]: summarize(recorder[key]) for key in handlers},
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline flow simulator")
+    parser.add_argument("--conversations", type=int, default=1000, help="Concurrent conversations")
+    parser.add_argument("--manager", choices=sorted(MANAGERS), default="compiled", help="Flow manager to drive")
+    parser.add_argument("--llm", choices=sorted(LLMS), default="random", help="How the fake LLM picks functions")
+    parser.add_argument("--max-turns", type=int, default=50, help="Function calls per conversation at most")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the random LLM")
+    parser.add_argument("--output", type=str, help="Write the results to this JSON file")
+    parser.add_argument("--baseline", type=str, help="Compare against this earlier result file")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed regression (0.1 = 10%%)")
+
+    config = parser.parse_args()
+
+    # The flow logs every transition and function call at debug level
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    results = run(config.conversations, config.manager, config.llm, config.seed, config.max_turns)
+    print(json.dumps(results, indent=2))
+    if config.output:
+        with open(config.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if config.baseline:
+        with open(config.baseline) as f:
+            regressions = compare(results, json.load(f), config.tolerance, REGRESSION_METRICS)
+        for regression in regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
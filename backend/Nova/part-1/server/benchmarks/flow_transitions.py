@@ -0,0 +1,181 @@
+"""Cost of a flow node transition: FlowManager versus CompiledFlowManager.
+
+Walks the same random path through a flow graph with both managers, calling
+``set_node`` for each transition, in two graphs:
+
+- ``travel_planner``: the part-1 flow (see ``flow``)
+- ``synthetic``: a generated graph of ``--nodes`` nodes, each with a task
+  message, two transitions and two node functions with parameters
+
+and reports per graph:
+
+- the one-time cost of ``compile_flow``
+- the time per transition of each manager, in microseconds
+
+The pipeline task is not run and the LLM is not called: only the work the
+managers do on a transition is measured. Logging is turned off, since both
+managers log each transition the same way.
+
+Usage:
+    python -m benchmarks.flow_transitions --transitions 20000 --output flow_transitions.json
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import random
+import time
+from typing import Any, Dict, Iterable, List
+
+from loguru import logger
+
+from pipecat.frames.frames import Frame
+from pipecat.pipeline.pipeline import Pipeline
+from pipecat.pipeline.task import PipelineTask
+from pipecat.services.aws.llm import AWSBedrockLLMService
+from pipecat_flows import FlowArgs, FlowConfig, FlowManager, FlowResult, FlowsFunctionSchema
+
+from benchmarks.load_test import summarize
+from flow import flow_config
+from flow_graph import CompiledFlowManager, compile_flow
+
+TASK_MESSAGE = (
+    "Handle step {i} of the booking. Use the available functions:\n"
+    " - Use record_choice_{i} when the user picks one of the options\n"
+    " - Use record_notes_{i} for anything else they want us to remember\n\n"
+    "Be concise and confirm what was recorded before moving on."
+)
+
+
+async def record(args: FlowArgs) -> FlowResult:
+    return {"status": "success", **args}
+
+
+def synthetic_flow(nodes: int) -> FlowConfig:
+    """A flow of ``nodes`` nodes, each reachable from the first."""
+
+    def node(i: int) -> Dict[str, Any]:
+        return {
+            "task_messages": [{"role": "user", "content": TASK_MESSAGE.format(i=i)}],
+            "functions": [
+                FlowsFunctionSchema(
+                    name=f"record_choice_{i}",
+                    description=f"Record the option the user picked at step {i}",
+                    properties={
+                        "option": {"type": "string", "enum": ["basic", "plus", "premium"]},
+                        "quantity": {"type": "integer", "minimum": 1, "maximum": 10},
+                    },
+                    required=["option"],
+                    handler=record,
+                ),
+                FlowsFunctionSchema(
+                    name=f"record_notes_{i}",
+                    description=f"Record notes about step {i}",
+                    properties={"notes": {"type": "array", "items": {"type": "string"}}},
+                    required=["notes"],
+                    handler=record,
+                ),
+                FlowsFunctionSchema(
+                    name=f"next_{i}",
+                    description="Continue with the next step",
+                    properties={},
+                    required=[],
+                    transition_to=f"node_{(i + 1) % nodes}",
+                ),
+                FlowsFunctionSchema(
+                    name=f"jump_{i}",
+                    description="Skip ahead",
+                    properties={},
+                    required=[],
+                    transition_to=f"node_{(i * 7 + 3) % nodes}",
+                ),
+            ],
+        }
+
+    config = {"initial_node": "node_0", "nodes": {f"node_{i}": node(i) for i in range(nodes)}}
+    config["nodes"]["node_0"]["role_messages"] = flow_config["nodes"]["start"]["role_messages"]
+    return config
+
+
+def random_path(config: FlowConfig, transitions: int, seed: int = 0) -> List[str]:
+    """Node ids of a random walk along the transitions of a flow, restarting at dead ends."""
+    rng = random.Random(seed)
+    path = []
+    node_id = config["initial_node"]
+    for _ in range(transitions):
+        targets = [f.transition_to for f in config["nodes"][node_id]["functions"] if f.transition_to]
+        node_id = rng.choice(targets) if targets else config["initial_node"]
+        path.append(node_id)
+    return path
+
+
+class DiscardingTask(PipelineTask):
+    """Pipeline task dropping the frames queued to it, as it is never run."""
+
+    async def queue_frame(self, frame: Frame):
+        pass
+
+    async def queue_frames(self, frames: Iterable[Frame]):
+        pass
+
+
+def create_manager(compiled, config: FlowConfig) -> FlowManager:
+    llm = AWSBedrockLLMService(
+        aws_access_key="benchmark",
+        aws_secret_key="benchmark",
+        aws_region="us-east-1",
+        model="us.anthropic.claude-3-5-haiku-20241022-v1:0",
+    )
+    task = DiscardingTask(Pipeline([]), idle_timeout_secs=None)
+    kwargs = {"task": task, "llm": llm, "context_aggregator": None}
+    if compiled:
+        return CompiledFlowManager(compiled_flow=compiled, **kwargs)
+    return FlowManager(flow_config=config, **kwargs)
+
+
+async def time_transitions(manager: FlowManager, path: List[str]) -> List[float]:
+    await manager.initialize()
+    gc.collect()
+    durations = []
+    for node_id in path:
+        started = time.perf_counter()
+        await manager.set_node(node_id, manager.nodes[node_id])
+        durations.append((time.perf_counter() - started) * 1e6)
+    return durations
+
+
+async def benchmark_graph(config: FlowConfig, transitions: int) -> dict:
+    started = time.perf_counter()
+    compiled = compile_flow(config)
+    compile_ms = (time.perf_counter() - started) * 1000
+
+    path = random_path(config, transitions)
+    results = {"nodes": len(config["nodes"]), "compile_ms": compile_ms}
+    for setup, flow in (("flow_manager", None), ("compiled_flow_manager", compiled)):
+        results[f"{setup}_us"] = summarize(await time_transitions(create_manager(flow, config), path))
+    results["speedup"] = results["flow_manager_us"]["mean"] / results["compiled_flow_manager_us"]["mean"]
+    return results
+
+
+async def benchmark(transitions: int, nodes: int) -> dict:
+    return {
+        "travel_planner": await benchmark_graph(flow_config, transitions),
+        "synthetic": await benchmark_graph(synthetic_flow(nodes), transitions),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Flow transition benchmark")
+    parser.add_argument("--transitions", type=int, default=20000, help="Transitions per manager and graph")
+    parser.add_argument("--nodes", type=int, default=500, help="Nodes of the synthetic graph")
+    parser.add_argument("--output", type=str, help="Write the results to this JSON file")
+
+    config = parser.parse_args()
+
+    logger.remove()
+    results = asyncio.run(benchmark(config.transitions, config.nodes))
+    print(json.dumps(results, indent=2))
+    if config.output:
+        with open(config.output, "w") as f:
+            json.dump(results, f, indent=2)
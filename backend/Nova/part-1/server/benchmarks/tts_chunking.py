@@ -0,0 +1,161 @@
+"""Time to first audio: sentence-aggregated TTS versus chunked, pipelined TTS.
+
+Streams the same LLM replies, token by token at the LLM's throughput, into
+two TTS setups:
+
+- ``sentences``: ``AWSPollyTTSService`` with its default sentence
+  aggregation, synthesizing one sentence after the other
+- ``chunked``: ``SpeakableTextChunker`` in front of a ``pipelined`` Polly
+  service (see ``tts_chunking``)
+
+and reports per setup, over all replies:
+
+- time to first audio: from the first LLM token to the first audio chunk
+- playback stalls: time a listener would wait in the middle of a reply
+  because the audio of the next fragment was not ready yet
+- time to last audio: from the first LLM token to the last audio chunk
+
+Polly is emulated (see ``aws_emulators``, ``EMULATOR_TTS_*`` and
+``EMULATOR_LLM_THROUGHPUT``) unless ``--aws`` is given.
+
+Usage:
+    python -m benchmarks.tts_chunking --output tts_chunking.json
+    python -m benchmarks.tts_chunking --aws
+"""
+
+import argparse
+import asyncio
+import json
+from typing import Dict, List
+
+from pipecat.frames.frames import (
+    EndFrame,
+    Frame,
+    LLMFullResponseEndFrame,
+    LLMFullResponseStartFrame,
+    LLMTextFrame,
+    StartFrame,
+    TTSAudioRawFrame,
+)
+from pipecat.pipeline.pipeline import Pipeline
+from pipecat.pipeline.runner import PipelineRunner
+from pipecat.pipeline.task import PipelineTask
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+from pipecat.services.aws.tts import AWSPollyTTSService
+
+from aws_emulators import EmulatedPollyClient, llm_profile
+from benchmarks.load_test import summarize
+from tts_chunking import SpeakableTextChunker, pipelined
+
+REPLIES = [
+    "Based on your love of warm weather and quiet beaches, I'd suggest the Maldives, Bali or Fiji. "
+    "Which of these sounds best to you?",
+    "Great choice! The beaches of the Maldives are stunning this time of year. "
+    "Would you like me to check flights from Sydney, or do you already have a departure city in mind?",
+    "I've found a lovely overwater villa with a private pool. "
+    "It's available for your dates, and breakfast is included. Shall I book it for you?",
+    "Fantastic, your dream vacation is confirmed! "
+    "You'll receive the itinerary by email shortly. Is there anything else I can help you with today?",
+]
+
+
+class AudioSink(FrameProcessor):
+    """Records when the audio of each reply arrives."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.started = asyncio.Event()
+        self.reply_done = asyncio.Event()
+        self.arrivals: List[tuple] = []
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+        loop = asyncio.get_running_loop()
+        if isinstance(frame, StartFrame):
+            self.started.set()
+        elif isinstance(frame, TTSAudioRawFrame):
+            self.arrivals.append((loop.time(), len(frame.audio) / (frame.sample_rate * 2)))
+        elif isinstance(frame, LLMFullResponseEndFrame):
+            self.reply_done.set()
+        await self.push_frame(frame, direction)
+
+
+def reply_metrics(first_token: float, arrivals: List[tuple]) -> Dict[str, float]:
+    """Time to first audio, playback stalls and time to last audio of a reply."""
+    playing_until = arrivals[0][0]
+    stall = 0.0
+    for arrival, duration in arrivals:
+        stall += max(arrival - playing_until, 0.0)
+        playing_until = max(playing_until, arrival) + duration
+    return {
+        "first_audio_ms": (arrivals[0][0] - first_token) * 1000,
+        "stall_ms": stall * 1000,
+        "last_audio_ms": (arrivals[-1][0] - first_token) * 1000,
+    }
+
+
+def create_tts(chunked: bool, aws: bool) -> AWSPollyTTSService:
+    tts_class = pipelined(AWSPollyTTSService) if chunked else AWSPollyTTSService
+    credentials = {} if aws else {"api_key": "emulated", "aws_access_key_id": "emulated", "region": "us-east-1"}
+    tts = tts_class(
+        **credentials,
+        **({"aggregate_sentences": False} if chunked else {}),
+        voice_id="Joanna",
+        params=AWSPollyTTSService.InputParams(engine="generative", language="en-AU", rate="1.1"),
+    )
+    if not aws:
+        tts._polly_client = EmulatedPollyClient()
+    return tts
+
+
+async def run_setup(chunked: bool, aws: bool, repeats: int) -> Dict[str, dict]:
+    sink = AudioSink()
+    processors = [SpeakableTextChunker()] if chunked else []
+    # No idle monitor: cancelling it can hang when the benchmark ends the task
+    task = PipelineTask(Pipeline([*processors, create_tts(chunked, aws), sink]), idle_timeout_secs=None)
+    runner = asyncio.create_task(PipelineRunner(handle_sigint=False).run(task))
+    await sink.started.wait()
+
+    token_secs = 1 / llm_profile().throughput
+    loop = asyncio.get_running_loop()
+    replies = []
+    for reply in REPLIES * repeats:
+        sink.arrivals = []
+        sink.reply_done.clear()
+        await task.queue_frame(LLMFullResponseStartFrame())
+        first_token = loop.time()
+        for word in reply.split(" "):
+            await task.queue_frame(LLMTextFrame(word + " "))
+            await asyncio.sleep(token_secs)
+        await task.queue_frame(LLMFullResponseEndFrame())
+        await sink.reply_done.wait()
+        replies.append(reply_metrics(first_token, sink.arrivals))
+
+    await task.queue_frame(EndFrame())
+    await runner
+    return {
+        metric: summarize([reply[metric] for reply in replies])
+        for metric in ("first_audio_ms", "stall_ms", "last_audio_ms")
+    }
+
+
+async def benchmark(aws: bool, repeats: int) -> dict:
+    return {
+        "sentences": await run_setup(chunked=False, aws=aws, repeats=repeats),
+        "chunked": await run_setup(chunked=True, aws=aws, repeats=repeats),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="TTS chunking benchmark")
+    parser.add_argument("--repeats", type=int, default=3, help="Times each reply is spoken")
+    parser.add_argument("--aws", action="store_true", help="Use Amazon Polly instead of the emulator")
+    parser.add_argument("--output", type=str, help="Write the results to this JSON file")
+
+    config = parser.parse_args()
+
+    results = asyncio.run(benchmark(config.aws, config.repeats))
+    print(json.dumps(results, indent=2))
+    if config.output:
+        with open(config.output, "w") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,85 @@
+"""CPU per stream: per-session Silero VAD versus the shared batched VAD.
+
+Feeds the same synthetic audio (alternating speech-like tone bursts and
+silence) to N concurrent streams, once with a ``SileroVADAnalyzer`` per stream
+and once with ``SharedSileroVADAnalyzer`` instances backed by one batched
+model, and reports the process CPU time spent per stream per second of audio.
+Audio is processed as fast as possible, with every stream submitting its next
+chunk in the same step, which is how streams line up in real time.
+
+Usage:
+    python -m benchmarks.vad_batching --streams 1 10 50 --seconds 20 --output vad.json
+"""
+
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from pipecat.audio.vad.silero import SileroVADAnalyzer
+from pipecat.audio.vad.vad_analyzer import VADParams
+
+from shared_vad import SharedSileroVADAnalyzer, SharedSileroVADService
+
+SAMPLE_RATE = 16000
+
+
+def synthetic_chunks(seconds: float, chunk_samples: int) -> list:
+    """Alternating one second tone bursts and silence with a little noise."""
+    samples = int(seconds * SAMPLE_RATE)
+    t = np.arange(samples) / SAMPLE_RATE
+    tone = 0.3 * np.sin(2 * np.pi * 220 * t) * (np.floor(t) % 2 == 0)
+    noise = 0.01 * np.random.default_rng(0).standard_normal(samples)
+    audio = ((tone + noise) * 32767).astype(np.int16)
+    return [
+        audio[i : i + chunk_samples].tobytes()
+        for i in range(0, samples - chunk_samples + 1, chunk_samples)
+    ]
+
+
+def run_streams(analyzers, chunks) -> float:
+    """Feed every chunk to every analyzer; returns the CPU seconds used."""
+    with ThreadPoolExecutor(max_workers=len(analyzers)) as executor:
+        started = time.process_time()
+        for chunk in chunks:
+            list(executor.map(lambda analyzer: analyzer.voice_confidence(chunk), analyzers))
+        return time.process_time() - started
+
+
+def benchmark(streams: int, seconds: float) -> dict:
+    params = VADParams(stop_secs=0.5)
+
+    separate = [SileroVADAnalyzer(params=params) for _ in range(streams)]
+    service = SharedSileroVADService()
+    shared = [SharedSileroVADAnalyzer(service=service, params=params) for _ in range(streams)]
+    for analyzer in separate + shared:
+        analyzer.set_sample_rate(SAMPLE_RATE)
+
+    chunks = synthetic_chunks(seconds, separate[0].num_frames_required())
+    separate_cpu = run_streams(separate, chunks)
+    shared_cpu = run_streams(shared, chunks)
+
+    audio_secs = streams * seconds
+    return {
+        "streams": streams,
+        "separate_cpu_ms_per_stream_second": separate_cpu / audio_secs * 1000,
+        "shared_cpu_ms_per_stream_second": shared_cpu / audio_secs * 1000,
+        "shared_mean_batch_size": service.stats()["mean_batch_size"],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shared VAD benchmark")
+    parser.add_argument("--streams", type=int, nargs="+", default=[1, 10, 50], help="Stream counts")
+    parser.add_argument("--seconds", type=float, default=20.0, help="Seconds of audio per stream")
+    parser.add_argument("--output", type=str, help="Write the results to this JSON file")
+
+    config = parser.parse_args()
+
+    results = [benchmark(streams, config.seconds) for streams in config.streams]
+    print(json.dumps(results, indent=2))
+    if config.output:
+        with open(config.output, "w") as f:
+            json.dump(results, f, indent=2)
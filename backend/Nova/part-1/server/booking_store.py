@@ -0,0 +1,456 @@
+"""Pooled async persistence for the flow's function handlers.
+
+The function handlers of ``flow.py`` run on the live audio path: the LLM
+waits for their result before it goes on, so a slow booking backend means
+dead air. ``BookingStore`` is the data-access layer they share (one per
+process, across sessions):
+
+- a pool of ``BOOKING_POOL_SIZE`` connections to the backend
+- a timeout of ``BOOKING_TIMEOUT_MS`` on every call a handler waits for
+- writes a handler need not wait for (recording a choice the user can still
+  change) are merged per booking and written in one batch ``BOOKING_BATCH_MS``
+  later, after the handler has returned; a write that must be stored before
+  the conversation goes on (confirming the booking) waits for its batch
+
+A batch that fails is kept and retried ``BOOKING_RETRY_MS`` later, or written
+with the next batch if that comes first.
+
+``BOOKING_STORE_URL`` selects the backend:
+
+- ``memory://`` (default): in-process dicts; ``memory://?latency_ms=20`` adds
+  a round trip to every call, standing in for a remote backend offline
+- ``sqlite:///path/to/bookings.db``: a local SQLite database
+- ``http://...`` or ``https://...``: the booking backend's REST API, where
+  ``GET {url}/bookings/{booking_id}`` returns a booking and
+  ``POST {url}/bookings/batch`` merges ``[{"booking_id": ..., "fields": {...}}]``
+
+``instrumented`` records the latency of function handlers by name, in
+``handler_latency``.
+"""
+
+import asyncio
+import functools
+import json
+import os
+import sqlite3
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set
+from urllib.parse import parse_qs, quote, urlparse
+
+import aiohttp
+from loguru import logger
+
+from stats_reporting import percentile
+
+# Where bookings are stored: memory://, sqlite:///<path> or the backend's http(s) URL
+BOOKING_STORE_URL = os.getenv("BOOKING_STORE_URL", "memory://")
+
+# Connections to the booking backend per process
+BOOKING_POOL_SIZE = int(os.getenv("BOOKING_POOL_SIZE", "8"))
+
+# How long a handler waits for the booking backend
+BOOKING_TIMEOUT_MS = int(os.getenv("BOOKING_TIMEOUT_MS", "300"))
+
+# How long writes that are not waited for are collected before they are written
+BOOKING_BATCH_MS = int(os.getenv("BOOKING_BATCH_MS", "20"))
+
+# How long after a failed batch its writes are retried
+BOOKING_RETRY_MS = int(os.getenv("BOOKING_RETRY_MS", "1000"))
+
+# Number of handler latency samples kept per function for reporting
+LATENCY_WINDOW = 500
+
+
+class BookingStoreError(Exception):
+    """Raised when the booking backend fails or does not answer in time."""
+
+
+class MemoryBackend:
+    """Bookings in process memory.
+
+    Args:
+        pool_size: Calls served at the same time at most, as with a connection pool
+        latency_secs: Simulated round trip of each call
+    """
+
+    def __init__(self, pool_size: int = BOOKING_POOL_SIZE, latency_secs: float = 0.0):
+        self._bookings: Dict[str, Dict[str, Any]] = {}
+        self._pool = asyncio.Semaphore(pool_size)
+        self._latency_secs = latency_secs
+
+    async def read(self, booking_id: str) -> Dict[str, Any]:
+        async with self._pool:
+            await asyncio.sleep(self._latency_secs)
+            return dict(self._bookings.get(booking_id, {}))
+
+    async def write(self, batch: Dict[str, Dict[str, Any]]):
+        async with self._pool:
+            await asyncio.sleep(self._latency_secs)
+            for booking_id, fields in batch.items():
+                self._bookings.setdefault(booking_id, {}).update(fields)
+
+    async def close(self):
+        pass
+
+
+class SQLiteBackend:
+    """Bookings in a SQLite database, as JSON objects.
+
+    Calls run in threads, each on one of ``pool_size`` connections.
+
+    Args:
+        path: Database file
+        pool_size: Connections to the database
+    """
+
+    def __init__(self, path: str, pool_size: int = BOOKING_POOL_SIZE):
+        self._path = path
+        self._pool: asyncio.Queue = asyncio.Queue()
+        # Connections are opened when first needed
+        for _ in range(pool_size):
+            self._pool.put_nowait(None)
+        self._connections: List[sqlite3.Connection] = []
+
+    async def read(self, booking_id: str) -> Dict[str, Any]:
+        async with self._connection() as connection:
+            row = await asyncio.to_thread(
+                lambda: connection.execute(
+                    "SELECT data FROM bookings WHERE booking_id = ?", (booking_id,)
+                ).fetchone()
+            )
+        return json.loads(row[0]) if row else {}
+
+    async def write(self, batch: Dict[str, Dict[str, Any]]):
+        rows = [(booking_id, json.dumps(fields)) for booking_id, fields in batch.items()]
+
+        def write_rows(connection: sqlite3.Connection):
+            with connection:
+                connection.executemany(
+                    "INSERT INTO bookings (booking_id, data) VALUES (?, ?) "
+                    "ON CONFLICT (booking_id) DO UPDATE SET data = json_patch(data, excluded.data)",
+                    rows,
+                )
+
+        async with self._connection() as connection:
+            await asyncio.to_thread(write_rows, connection)
+
+    async def close(self):
+        for connection in self._connections:
+            connection.close()
+        self._connections.clear()
+
+    @asynccontextmanager
+    async def _connection(self):
+        connection = await self._pool.get()
+        try:
+            if connection is None:
+                connection = await asyncio.to_thread(self._connect)
+            yield connection
+        finally:
+            self._pool.put_nowait(connection)
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self._path, check_same_thread=False, timeout=5)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS bookings (booking_id TEXT PRIMARY KEY, data TEXT NOT NULL)"
+        )
+        self._connections.append(connection)
+        return connection
+
+
+class HttpBackend:
+    """Bookings in the booking backend, over its REST API with keep-alive connections.
+
+    Args:
+        url: Base URL of the API
+        pool_size: Connections to the backend
+    """
+
+    def __init__(self, url: str, pool_size: int = BOOKING_POOL_SIZE):
+        self._url = url.rstrip("/")
+        self._pool_size = pool_size
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def read(self, booking_id: str) -> Dict[str, Any]:
+        async with self._client().get(f"{self._url}/bookings/{quote(booking_id)}") as response:
+            if response.status == 404:
+                return {}
+            response.raise_for_status()
+            return await response.json()
+
+    async def write(self, batch: Dict[str, Dict[str, Any]]):
+        payload = [{"booking_id": booking_id, "fields": fields} for booking_id, fields in batch.items()]
+        async with self._client().post(f"{self._url}/bookings/batch", json=payload) as response:
+            response.raise_for_status()
+
+    async def close(self):
+        if self._session:
+            await self._session.close()
+            self._session = None
+
+    def _client(self) -> aiohttp.ClientSession:
+        # Created on first use, in the event loop that uses it
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self._pool_size))
+        return self._session
+
+
+def open_backend(url: str, pool_size: int = BOOKING_POOL_SIZE):
+    """Backend for a ``BOOKING_STORE_URL``.
+
+    Raises:
+        ValueError: If the URL's scheme is not supported
+    """
+    parsed = urlparse(url)
+    if parsed.scheme == "memory":
+        latency_ms = float(parse_qs(parsed.query).get("latency_ms", ["0"])[0])
+        return MemoryBackend(pool_size, latency_ms / 1000)
+    if parsed.scheme == "sqlite":
+        return SQLiteBackend(parsed.netloc + parsed.path, pool_size)
+    if parsed.scheme in ("http", "https"):
+        return HttpBackend(url, pool_size)
+    raise ValueError(f"Unsupported booking store URL: {url}")
+
+
+class BookingStore:
+    """Bookings by id, read and written through a pooled backend.
+
+    Args:
+        backend: ``MemoryBackend``, ``SQLiteBackend`` or ``HttpBackend``
+        timeout_secs: How long callers wait for the backend
+        batch_secs: How long writes that are not waited for are collected
+        retry_secs: How long after a failed batch its writes are retried
+    """
+
+    def __init__(
+        self,
+        backend,
+        *,
+        timeout_secs: float = BOOKING_TIMEOUT_MS / 1000,
+        batch_secs: float = BOOKING_BATCH_MS / 1000,
+        retry_secs: float = BOOKING_RETRY_MS / 1000,
+    ):
+        self._backend = backend
+        self._timeout_secs = timeout_secs
+        self._batch_secs = batch_secs
+        self._retry_secs = retry_secs
+        # Writes not written yet, and those being written, merged per booking
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._writing: Dict[str, Dict[str, Any]] = {}
+        self._write_done = asyncio.Condition()
+        self._batch_scheduled = False
+        self._closed = False
+        self._tasks: Set[asyncio.Task] = set()
+        self._counters = {"reads": 0, "writes": 0, "batches": 0, "timeouts": 0, "errors": 0}
+
+    def stats(self) -> Dict[str, int]:
+        """Reads, writes, batches written, timeouts and backend errors so far."""
+        return dict(self._counters)
+
+    async def get(self, booking_id: str) -> Dict[str, Any]:
+        """A booking, including the writes not written yet.
+
+        Raises:
+            BookingStoreError: If the backend fails or times out
+        """
+        self._counters["reads"] += 1
+        booking = await self._wait(self._backend.read(booking_id), "read")
+        return {**booking, **self._writing.get(booking_id, {}), **self._pending.get(booking_id, {})}
+
+    async def update(self, booking_id: str, fields: Dict[str, Any], *, wait: bool = False):
+        """Merge fields into a booking.
+
+        Args:
+            booking_id: The booking
+            fields: Fields to set
+            wait: Return once the fields are stored; otherwise they are
+                written with the next batch, after this returns
+
+        Raises:
+            BookingStoreError: If waiting and the backend fails or times out
+        """
+        self._counters["writes"] += 1
+        self._pending.setdefault(booking_id, {}).update(fields)
+        if wait:
+            # Shielded: a write the caller gave up on still completes
+            await self._wait(asyncio.shield(self.flush(booking_id)), "write")
+        else:
+            self._schedule_batch()
+
+    async def flush(self, booking_id: Optional[str] = None):
+        """Write the pending writes now.
+
+        Writes of a booking land in order: a booking with a write in flight
+        stays pending until that write is done.
+
+        Args:
+            booking_id: Wait until the earlier writes of this booking (by
+                default, of every pending booking) are done, so its pending
+                writes are in this batch
+
+        Raises:
+            Exception: The backend's error; the writes stay pending
+        """
+        async with self._write_done:
+            await self._write_done.wait_for(
+                lambda: booking_id not in self._writing
+                if booking_id
+                else not self._pending.keys() & self._writing.keys()
+            )
+        await self._write_batch()
+
+    async def close(self):
+        """Write the pending writes and close the backend."""
+        self._closed = True
+        for task in list(self._tasks):
+            task.cancel()
+        # A batch cancelled before it started never gets to reset this itself
+        self._batch_scheduled = False
+        try:
+            await self.flush()
+        finally:
+            await self._backend.close()
+
+    def _schedule_batch(self, delay_secs: Optional[float] = None):
+        if not self._batch_scheduled and not self._closed:
+            self._batch_scheduled = True
+            task = asyncio.create_task(self._flush_later(self._batch_secs if delay_secs is None else delay_secs))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _flush_later(self, delay_secs: float):
+        try:
+            await asyncio.sleep(delay_secs)
+        finally:
+            # Also when cancelled, so that later writes schedule a batch again
+            self._batch_scheduled = False
+        try:
+            await self._write_batch()
+        except Exception as e:
+            self._counters["errors"] += 1
+            logger.warning(
+                f"Failed to write {len(self._pending)} bookings, retrying in {self._retry_secs * 1000:.0f} ms: {e}"
+            )
+
+    async def _write_batch(self):
+        # Batches of different bookings are written at the same time, over the pool
+        batch = {
+            booking_id: fields
+            for booking_id, fields in self._pending.items()
+            if booking_id not in self._writing
+        }
+        if not batch:
+            return
+        for booking_id in batch:
+            del self._pending[booking_id]
+        self._writing.update(batch)
+        try:
+            await self._backend.write(batch)
+            self._counters["batches"] += 1
+        except BaseException as e:
+            # Keep them for the next batch, under any newer writes
+            for booking_id, fields in batch.items():
+                self._pending[booking_id] = {**fields, **self._pending.get(booking_id, {})}
+            if isinstance(e, Exception):
+                # Retried even if no other write comes
+                self._schedule_batch(self._retry_secs)
+            raise
+        else:
+            if self._pending:
+                # Writes that waited for this batch
+                self._schedule_batch()
+        finally:
+            for booking_id in batch:
+                del self._writing[booking_id]
+            async with self._write_done:
+                self._write_done.notify_all()
+
+    async def _wait(self, call: Awaitable, operation: str) -> Any:
+        try:
+            return await asyncio.wait_for(call, self._timeout_secs)
+        except asyncio.TimeoutError as e:
+            self._counters["timeouts"] += 1
+            raise BookingStoreError(
+                f"Booking {operation} timed out after {self._timeout_secs * 1000:.0f} ms"
+            ) from e
+        except Exception as e:
+            self._counters["errors"] += 1
+            raise BookingStoreError(f"Booking {operation} failed: {e}") from e
+
+
+_store: Optional[BookingStore] = None
+_store_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def booking_store() -> BookingStore:
+    """The process's booking store, opened from ``BOOKING_STORE_URL`` on first use.
+
+    Must be called from the event loop; a new loop (e.g. another
+    ``asyncio.run``) gets a new store.
+    """
+    global _store, _store_loop
+    loop = asyncio.get_running_loop()
+    if _store is None or _store_loop is not loop:
+        _store = BookingStore(open_backend(BOOKING_STORE_URL, BOOKING_POOL_SIZE))
+        _store_loop = loop
+    return _store
+
+
+class HandlerLatency:
+    """Latency of function handlers, by function name.
+
+    Args:
+        window: Latency samples kept per function
+    """
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._window = window
+        self._samples: Dict[str, Deque[float]] = {}
+        self._calls: Dict[str, int] = {}
+
+    def record(self, name: str, latency_ms: float):
+        self._samples.setdefault(name, deque(maxlen=self._window)).append(latency_ms)
+        self._calls[name] = self._calls.get(name, 0) + 1
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Calls and latency percentiles (over the last samples) per function."""
+        stats = {}
+        for name, samples in self._samples.items():
+            latencies = sorted(samples)
+            stats[name] = {
+                "calls": self._calls[name],
+                "p50_ms": percentile(latencies, 50),
+                "p95_ms": percentile(latencies, 95),
+                "p99_ms": percentile(latencies, 99),
+                "max_ms": latencies[-1],
+            }
+        return stats
+
+
+handler_latency = HandlerLatency()
+
+
+def instrumented(handler: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+    """Record the latency of a function handler in ``handler_latency``.
+
+    The wrapper keeps the handler's signature, which the ``FlowManager``
+    inspects to decide how to call it.
+    """
+    name = handler.__name__
+
+    @functools.wraps(handler)
+    async def wrapper(*args):
+        started = time.perf_counter()
+        try:
+            return await handler(*args)
+        finally:
+            latency_ms = (time.perf_counter() - started) * 1000
+            handler_latency.record(name, latency_ms)
+            if latency_ms > BOOKING_TIMEOUT_MS:
+                logger.warning(f"Function handler {name} took {latency_ms:.0f} ms")
+
+    return wrapper
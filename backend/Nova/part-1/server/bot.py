@@ -13,26 +13,73 @@ from pipecat.services.aws.stt import AWSTranscribeSTTService
 from pipecat.services.aws.tts import AWSPollyTTSService
 from pipecat.services.aws.llm import AWSBedrockLLMService, AWSBedrockLLMContext
 from pipecat.transports.services.daily import DailyParams, DailyTransport
+from pipecat_flows.adapters import AWSBedrockAdapter
 
-from pipecat_flows import FlowManager
 
-from flow import flow_config
+from audio_stage import AUDIO_OUT_POLLY_RATE, AUDIO_STAGE, POLLY_SAMPLE_RATE, AudioOutputStage
+from aws_clients import SHARED_AWS_CLIENTS, shared_aws_clients, sharing_aws_clients
+from aws_emulators import (
+    AWS_EMULATORS,
+    ConversationScript,
+    EmulatedTranscribeSTTService,
+    emulate_bedrock,
+    emulate_polly,
+)
+from booking_store import booking_store, handler_latency
+from context_compaction import CONTEXT_COMPACTION, CONTEXT_SUMMARY_MODEL, BedrockSummarizer, ContextCompactor
+from filler_audio import FILLER_AUDIO, FunctionCallFiller, shared_filler_clips
+from flow import compiled_flow, flow_config
+from flow_graph import CompiledFlowManager
+from latency_tracing import TurnLatencyTracer
+from llm_speculation import LLM_SPECULATION, InterimSpeculator, SpeculativeBedrockClient
+from prompt_caching import PROMPT_CACHE, PromptCacheStats, PromptCachingBedrockClient, task_message_texts
+from rate_budget import AWS_RATE_BUDGET, RateBudgetedBedrockClient, rate_budgeted
+from tts_cache import TTS_CACHE, CachedPollyTTSService, tts_say_phrases
+from tts_chunking import TTS_CHUNKING, SpeakableTextChunker, pipelined
 
 load_dotenv(override=True)
 
 
-async def main(room_url, token):
-    """Main bot execution function.
+def create_vad_analyzer(shared=False):
+    """Create the Silero VAD analyzer used by the Daily transport.
+
+    Loading the Silero model is one of the slowest parts of bot startup, so
+    pre-warmed workers call this before they are assigned a room.
+
+    Args:
+        shared: Use the process-wide batched VAD model (see ``shared_vad``)
+            instead of a model per session
+    """
+    params = VADParams(stop_secs=0.5)
+    if shared:
+        from shared_vad import SharedSileroVADAnalyzer
+
+        return SharedSileroVADAnalyzer(params=params)
+    return SileroVADAnalyzer(params=params)
+
 
-    Sets up and runs the bot pipeline including:
+async def create_bot(room_url, token, vad_analyzer=None, transport=None):
+    """Build the bot pipeline for a room without running it.
+
+    Sets up the bot pipeline including:
     - Set up WebRTC transport
     - Speech-to-text and text-to-speech services
     - Language model integration
+
+    Args:
+        room_url: Daily room URL to join
+        token: Daily meeting token for the room
+        vad_analyzer: Optional pre-loaded VAD analyzer (see ``create_vad_analyzer``)
+        transport: Optional transport to use instead of joining the Daily room
+            (e.g. ``replay_transport.ReplayTransport`` for offline benchmarks)
+
+    Returns:
+        PipelineTask: The task to run with a ``PipelineRunner``
     """
-    async with aiohttp.ClientSession() as session:
-        print(f"Starting server with room: {room_url}")
+    print(f"Starting server with room: {room_url}")
 
-        # Set up Daily transport with audio parameters
+    # Set up Daily transport with audio parameters
+    if transport is None:
         transport = DailyTransport(
             room_url,
             token,
@@ -43,95 +90,222 @@ async def main(room_url, token):
                 camera_in_enabled=False,
                 camera_out_enabled=False,
                 vad_enabled=True,
-                vad_analyzer=SileroVADAnalyzer(
-                    params=VADParams(stop_secs=0.5)
-                ),
+                vad_analyzer=vad_analyzer or create_vad_analyzer(),
                 transcription_enabled=True,
             ),
         )
 
-        # Initialize speech-to-text service
-        stt = AWSTranscribeSTTService(
+    # Initialize speech-to-text service
+    if AWS_EMULATORS:
+        script = ConversationScript()
+        stt = EmulatedTranscribeSTTService(script)
+    else:
+        stt_class = AWSTranscribeSTTService
+        # Connect once the server's AWS rate budget allows (see rate_budget)
+        if AWS_RATE_BUDGET:
+            stt_class = rate_budgeted(stt_class)
+        # Presign each connection with the process's current credentials (see aws_clients)
+        if SHARED_AWS_CLIENTS:
+            stt_class = sharing_aws_clients(stt_class)
+        stt = stt_class(
             api_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
             aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
             aws_session_token=os.getenv("AWS_SESSION_TOKEN"),
             region=os.getenv("AWS_REGION")
         )
 
-        # Initialize text-to-speech service
-        tts = AWSPollyTTSService(
-            api_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
-            aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-            aws_session_token=os.getenv("AWS_SESSION_TOKEN"),
-            region=os.getenv("AWS_REGION"),
-            voice_id="Joanna",
-            params=AWSPollyTTSService.InputParams(
-                engine="generative",
-                language="en-AU",
-                rate="1.1"
-            )
+    # Initialize text-to-speech service, caching repeated phrases (see tts_cache)
+    # and synthesizing the fragments of a reply concurrently (see tts_chunking)
+    tts_class = CachedPollyTTSService if TTS_CACHE else AWSPollyTTSService
+    tts_params = {"warmup_phrases": tts_say_phrases(flow_config)} if TTS_CACHE else {}
+    if TTS_CHUNKING:
+        tts_class = pipelined(tts_class)
+        tts_params["aggregate_sentences"] = False
+    # Synthesize once the server's AWS rate budget allows (see rate_budget)
+    if AWS_RATE_BUDGET:
+        tts_class = rate_budgeted(tts_class)
+    # Synthesize with the Polly client shared with the other sessions of the
+    # process, instead of a client of its own (see aws_clients)
+    if SHARED_AWS_CLIENTS and not AWS_EMULATORS:
+        tts_class = sharing_aws_clients(tts_class)
+    tts = tts_class(
+        **tts_params,
+        api_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+        aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+        aws_session_token=os.getenv("AWS_SESSION_TOKEN"),
+        region=os.getenv("AWS_REGION"),
+        voice_id="Joanna",
+        params=AWSPollyTTSService.InputParams(
+            engine="generative",
+            language="en-AU",
+            rate="1.1"
         )
+    )
 
-        # Initialize LLM service
-        llm = AWSBedrockLLMService(
-            aws_access_key=os.getenv("AWS_ACCESS_KEY_ID"),
-            aws_secret_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
-            aws_session_token=os.getenv("AWS_SESSION_TOKEN"),
-            aws_region=os.getenv("AWS_REGION"),
-            model="us.anthropic.claude-3-5-haiku-20241022-v1:0",
-            params=AWSBedrockLLMService.InputParams(
-                temperature=0.3,
-                latency="optimized",
-                additional_model_request_fields={}
-            )
+    # Initialize LLM service, acquiring a permit of the server's AWS rate budget for each reply (see rate_budget)
+    llm_class = rate_budgeted(AWSBedrockLLMService) if AWS_RATE_BUDGET else AWSBedrockLLMService
+    # Request with the Bedrock client shared with the other sessions of the
+    # process, instead of a session and client of its own (see aws_clients)
+    if SHARED_AWS_CLIENTS and not AWS_EMULATORS:
+        llm_class = sharing_aws_clients(llm_class)
+    llm = llm_class(
+        aws_access_key=os.getenv("AWS_ACCESS_KEY_ID"),
+        aws_secret_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+        aws_session_token=os.getenv("AWS_SESSION_TOKEN"),
+        aws_region=os.getenv("AWS_REGION"),
+        model="us.anthropic.claude-3-5-haiku-20241022-v1:0",
+        params=AWSBedrockLLMService.InputParams(
+            temperature=0.3,
+            latency="optimized",
+            additional_model_request_fields={}
         )
+    )
 
-        context = OpenAILLMContext()
-        context_aggregator = llm.create_context_aggregator(context)
-
-        pipeline = Pipeline(
-            [
-                transport.input(),
-                stt,
-                context_aggregator.user(),
-                llm,
-                tts,
-                transport.output(),
-                context_aggregator.assistant(),
-            ]
-        )
+    # Local stand-ins for Polly and Bedrock (see aws_emulators)
+    if AWS_EMULATORS:
+        emulate_polly(tts)
+        emulate_bedrock(llm, script)
 
-        task = PipelineTask(
-            pipeline,
-            params=PipelineParams(
-                allow_interruptions=True,
-                enable_metrics=True,
-                enable_usage_metrics=True,
-            ),
-        )
+    # A permit of the server's AWS rate budget for each Bedrock request,
+    # speculative replies and summaries included (see rate_budget)
+    if AWS_RATE_BUDGET:
+        llm._client = RateBudgetedBedrockClient(llm._client)
 
-        flow_manager = FlowManager(
-            task=task,
-            llm=llm,
-            context_aggregator=context_aggregator,
-            tts=tts,
-            flow_config=flow_config,
-        )
+    # Cache checkpoints after the stable prefix of each request (see prompt_caching)
+    if PROMPT_CACHE:
+        llm._client = PromptCachingBedrockClient(llm._client, task_message_texts(flow_config))
+
+    # Answer stable interim transcripts before the final one arrives (see llm_speculation)
+    if LLM_SPECULATION:
+        llm._client = SpeculativeBedrockClient(llm._client)
 
-        @transport.event_handler("on_first_participant_joined")
-        async def on_first_participant_joined(transport, participant):
-            await transport.capture_participant_transcription(participant["id"])
-            # await task.queue_frames([context_aggregator.user().get_context_frame()])
-            await flow_manager.initialize()
+    context = OpenAILLMContext()
+    context_aggregator = llm.create_context_aggregator(context)
+
+    # Summarize the older turns of long conversations (see context_compaction)
+    compaction = []
+    if CONTEXT_COMPACTION:
+        summarizer = BedrockSummarizer(llm._client, CONTEXT_SUMMARY_MODEL or llm.model_name)
+        compaction = [
+            ContextCompactor(
+                context_aggregator.user().context,
+                summarizer,
+                pinned_texts=task_message_texts(flow_config),
+            )
+        ]
 
-        @transport.event_handler("on_participant_left")
-        async def on_participant_left(transport, participant, reason):
-            print(f"Participant left: {participant}")
-            await task.cancel()
+    # Voice-to-voice latency of every turn, broken down by stage
+    tracer = TurnLatencyTracer()
+
+    # "One moment" while a slow flow handler leaves the caller in silence (see filler_audio)
+    filler = []
+    if FILLER_AUDIO:
+        filler = [FunctionCallFiller(shared_filler_clips(lambda: tts._polly_client, voice_id="Joanna"))]
+
+    # Output audio converted into whole transport chunks in preallocated buffers (see audio_stage)
+    audio_stage = [AudioOutputStage()] if AUDIO_STAGE else []
+
+    pipeline = Pipeline(
+        [
+            transport.input(),
+            stt,
+            tracer.tap("vad_stop", "stt_final"),
+            *([InterimSpeculator(llm, context_aggregator.user().context)] if LLM_SPECULATION else []),
+            *compaction,
+            context_aggregator.user(),
+            llm,
+            tracer.tap("llm_first_token"),
+            *([PromptCacheStats()] if PROMPT_CACHE else []),
+            *([SpeakableTextChunker()] if TTS_CHUNKING else []),
+            tts,
+            tracer.tap("tts_first_audio"),
+            *filler,
+            *audio_stage,
+            transport.output(),
+            tracer.tap("first_audio_out"),
+            context_aggregator.assistant(),
+        ]
+    )
+
+    task = PipelineTask(
+        pipeline,
+        params=PipelineParams(
+            allow_interruptions=True,
+            enable_metrics=True,
+            enable_usage_metrics=True,
+            # Polly renders 16 kHz at most: played at its own rate, the reply
+            # is not resampled at all (see audio_stage)
+            **({"audio_out_sample_rate": POLLY_SAMPLE_RATE} if AUDIO_OUT_POLLY_RATE else {}),
+        ),
+    )
+
+    flow_manager = CompiledFlowManager(
+        task=task,
+        llm=llm,
+        context_aggregator=context_aggregator,
+        tts=tts,
+        compiled_flow=compiled_flow,
+        # Picked by class name otherwise, which the subclasses of
+        # AWSBedrockLLMService above do not keep
+        adapter=AWSBedrockAdapter(),
+    )
+
+    @transport.event_handler("on_first_participant_joined")
+    async def on_first_participant_joined(transport, participant):
+        await transport.capture_participant_transcription(participant["id"])
+        # await task.queue_frames([context_aggregator.user().get_context_frame()])
+        await flow_manager.initialize()
+
+    @transport.event_handler("on_participant_left")
+    async def on_participant_left(transport, participant, reason):
+        print(f"Participant left: {participant}")
+        await task.cancel()
+
+    return task
+
+
+async def main(room_url, token, vad_analyzer=None):
+    """Main bot execution function.
+
+    Builds the bot pipeline with ``create_bot`` and runs it until the call ends.
+
+    Args:
+        room_url: Daily room URL to join
+        token: Daily meeting token for the room
+        vad_analyzer: Optional pre-loaded VAD analyzer (see ``create_vad_analyzer``)
+    """
+    async with aiohttp.ClientSession() as session:
+        task = await create_bot(room_url, token, vad_analyzer=vad_analyzer)
 
         runner = PipelineRunner(handle_sigint=False)
         await runner.run(task)
 
+        await end_session()
+        await end_process()
+
+
+async def end_session():
+    """Write out and report what the sessions of this process share, once a session has ended.
+
+    The booking store stays open for the process's other sessions; its
+    pending bookings are written, and a failure is left to its retries.
+    """
+    try:
+        await booking_store().flush()
+    except Exception as e:
+        print(f"Failed to write the pending bookings: {e}")
+    print(f"Function handler latency: {handler_latency.stats()}")
+    if SHARED_AWS_CLIENTS:
+        await shared_aws_clients().report()
+
+
+async def end_process():
+    """Close what the sessions of this process share, once the last one has ended."""
+    # Write the bookings still pending before the process exits
+    await booking_store().close()
+    if SHARED_AWS_CLIENTS:
+        shared_aws_clients().close()
+
 
 if __name__ == "__main__":
     # Parse command line arguments for server configuration
@@ -0,0 +1,161 @@
+"""Pool of pre-warmed bot worker processes.
+
+Starting ``python3 -m bot`` for every connection means each caller waits for a
+fresh interpreter to import pipecat, boto and the Silero VAD model. The pool
+keeps a configurable number of ``bot_worker`` processes that have already done
+that work and are waiting for a ``(room_url, token)`` assignment on stdin, so
+handing a session to a warm worker only costs a pipe write.
+
+The pool refills itself in the background whenever a worker is handed out or
+dies, and keeps hit/miss counters so callers can tell how often they had to
+fall back to a cold start.
+"""
+
+import asyncio
+import json
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from loguru import logger
+
+WORKER_MODULE = "bot_worker"
+READY_MESSAGE = b"ready"
+
+
+class BotWorkerPool:
+    """Keeps ``size`` idle bot workers ready to be assigned a room.
+
+    Args:
+        size: Number of idle workers to keep warm
+        cwd: Working directory the workers are started in
+        warmup_timeout: Seconds to wait for a new worker to report ready
+    """
+
+    def __init__(self, size: int, cwd: str, warmup_timeout: float = 120.0):
+        self._size = size
+        self._cwd = cwd
+        self._warmup_timeout = warmup_timeout
+        self._idle: Deque[asyncio.subprocess.Process] = deque()
+        self._starting = 0
+        self._refill_event = asyncio.Event()
+        self._refill_task: Optional[asyncio.Task] = None
+        self._hits = 0
+        self._misses = 0
+        self._failed_starts = 0
+        self._last_warmup_secs: Optional[float] = None
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    async def start(self):
+        """Start the background refill loop."""
+        if self._size <= 0:
+            return
+        self._refill_task = asyncio.create_task(self._refill_loop())
+        self._refill_event.set()
+
+    async def stop(self):
+        """Stop refilling and terminate every idle worker."""
+        if self._refill_task:
+            self._refill_task.cancel()
+            try:
+                await self._refill_task
+            except asyncio.CancelledError:
+                pass
+            self._refill_task = None
+        while self._idle:
+            proc = self._idle.popleft()
+            if proc.returncode is None:
+                proc.terminate()
+                await proc.wait()
+
+    async def acquire(self, room_url: str, token: str) -> Optional[asyncio.subprocess.Process]:
+        """Hand a room to an idle worker.
+
+        Args:
+            room_url: Daily room URL the bot should join
+            token: Daily meeting token for the room
+
+        Returns:
+            asyncio.subprocess.Process | None: The assigned worker, or None when
+            no warm worker is available and the caller has to cold start a bot
+        """
+        while self._idle:
+            proc = self._idle.popleft()
+            if proc.returncode is not None:
+                continue
+            try:
+                assignment = json.dumps({"room_url": room_url, "token": token})
+                proc.stdin.write(f"{assignment}\n".encode())
+                await proc.stdin.drain()
+                proc.stdin.close()
+            except (BrokenPipeError, ConnectionResetError):
+                logger.warning(f"Warm bot worker {proc.pid} went away before assignment")
+                continue
+            self._hits += 1
+            self._refill_event.set()
+            return proc
+
+        self._misses += 1
+        self._refill_event.set()
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        """Current pool size and hit/miss counters."""
+        requests = self._hits + self._misses
+        return {
+            "target_size": self._size,
+            "idle": len(self._idle),
+            "starting": self._starting,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": self._hits / requests if requests else None,
+            "failed_starts": self._failed_starts,
+            "last_warmup_secs": self._last_warmup_secs,
+        }
+
+    async def _refill_loop(self):
+        while True:
+            await self._refill_event.wait()
+            self._refill_event.clear()
+
+            self._idle = deque(proc for proc in self._idle if proc.returncode is None)
+            missing = self._size - len(self._idle) - self._starting
+            for _ in range(max(missing, 0)):
+                self._starting += 1
+                asyncio.create_task(self._start_worker())
+
+    async def _start_worker(self):
+        started = time.monotonic()
+        proc = None
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                "python3",
+                "-m",
+                WORKER_MODULE,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                cwd=self._cwd,
+            )
+            line = await asyncio.wait_for(proc.stdout.readline(), timeout=self._warmup_timeout)
+            if line.strip() != READY_MESSAGE:
+                raise RuntimeError(f"unexpected worker handshake: {line!r}")
+        except Exception as e:
+            self._failed_starts += 1
+            logger.error(f"Failed to start warm bot worker: {e}")
+            if proc and proc.returncode is None:
+                proc.kill()
+                await proc.wait()
+            # Back off before the next attempt so a broken environment does
+            # not turn into a tight respawn loop.
+            await asyncio.sleep(5)
+            self._refill_event.set()
+            return
+        finally:
+            self._starting -= 1
+
+        self._last_warmup_secs = time.monotonic() - started
+        logger.debug(f"Warm bot worker {proc.pid} ready in {self._last_warmup_secs:.2f}s")
+        self._idle.append(proc)
@@ -0,0 +1,139 @@
+"""Registry of bot processes started by the server.
+
+Bot processes are indexed by pid, by state and by room, so looking up a bot,
+counting the bots running in a room and listing running bots are all O(1)
+instead of a scan over every process ever spawned.
+
+Finished bots are reaped asynchronously: every registered process gets a
+task awaiting ``proc.wait()``, which asyncio's child watcher resolves when the
+child exits. Finished entries are kept for a retention window so
+``/status/{pid}`` can still report them, then dropped.
+
+Besides ``asyncio.subprocess.Process``, any handle with ``pid``, ``returncode``,
+``wait()`` and ``terminate()`` can be registered, such as the sessions hosted by
+multi-session workers.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Set
+
+from loguru import logger
+
+RUNNING = "running"
+FINISHED = "finished"
+
+
+@dataclass
+class BotEntry:
+    pid: int
+    proc: asyncio.subprocess.Process
+    room_url: str
+    started_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    returncode: Optional[int] = None
+
+    @property
+    def state(self) -> str:
+        return RUNNING if self.finished_at is None else FINISHED
+
+
+class BotRegistry:
+    """Tracks bot processes and reaps them as they exit.
+
+    Args:
+        retention: Seconds a finished entry is kept before it is pruned
+    """
+
+    def __init__(self, retention: float = 3600):
+        self._retention = retention
+        self._entries: Dict[int, BotEntry] = {}
+        self._running: Dict[int, BotEntry] = {}
+        # Finished entries in the order they finished, oldest first
+        self._finished: "OrderedDict[int, BotEntry]" = OrderedDict()
+        self._running_by_room: Dict[str, Set[int]] = defaultdict(set)
+        self._reapers: Dict[int, asyncio.Task] = {}
+        self._exit_callbacks: List[Callable[[BotEntry], None]] = []
+
+    def add(self, proc: asyncio.subprocess.Process, room_url: str) -> BotEntry:
+        """Register a newly started bot process and start reaping it.
+
+        Args:
+            proc: The bot process
+            room_url: Daily room the bot joined
+        """
+        self._prune()
+        # The OS may have recycled the pid of a finished bot we still retain
+        self._finished.pop(proc.pid, None)
+        entry = BotEntry(pid=proc.pid, proc=proc, room_url=room_url)
+        self._entries[entry.pid] = entry
+        self._running[entry.pid] = entry
+        self._running_by_room[room_url].add(entry.pid)
+        self._reapers[entry.pid] = asyncio.create_task(self._reap(entry))
+        return entry
+
+    def get(self, pid: int) -> Optional[BotEntry]:
+        """Look up a running or recently finished bot by pid."""
+        self._prune()
+        return self._entries.get(pid)
+
+    def running_in_room(self, room_url: str) -> int:
+        """Number of bots currently running in a room."""
+        pids = self._running_by_room.get(room_url)
+        return len(pids) if pids else 0
+
+    def running(self) -> List[BotEntry]:
+        """All currently running bots."""
+        return list(self._running.values())
+
+    def on_exit(self, callback: Callable[[BotEntry], None]):
+        """Register a callback invoked with the entry of every bot that exits."""
+        self._exit_callbacks.append(callback)
+
+    def counts(self) -> Dict[str, int]:
+        """Number of tracked bots per state."""
+        self._prune()
+        return {RUNNING: len(self._running), FINISHED: len(self._finished)}
+
+    async def terminate_all(self):
+        """Terminate every running bot and wait for it to be reaped."""
+        for entry in self.running():
+            if entry.proc.returncode is None:
+                entry.proc.terminate()
+        await asyncio.gather(*self._reapers.values(), return_exceptions=True)
+
+    async def _reap(self, entry: BotEntry):
+        try:
+            returncode = await entry.proc.wait()
+        finally:
+            self._reapers.pop(entry.pid, None)
+
+        entry.returncode = returncode
+        entry.finished_at = time.time()
+        self._running.pop(entry.pid, None)
+        room_pids = self._running_by_room.get(entry.room_url)
+        if room_pids is not None:
+            room_pids.discard(entry.pid)
+            if not room_pids:
+                del self._running_by_room[entry.room_url]
+        self._finished[entry.pid] = entry
+        logger.debug(f"Bot {entry.pid} in {entry.room_url} exited with code {returncode}")
+
+        for callback in self._exit_callbacks:
+            try:
+                callback(entry)
+            except Exception as e:
+                logger.error(f"Bot exit callback failed: {e}")
+
+        self._prune()
+
+    def _prune(self):
+        cutoff = time.time() - self._retention
+        while self._finished:
+            pid, entry = next(iter(self._finished.items()))
+            if entry.finished_at > cutoff:
+                break
+            self._finished.popitem(last=False)
+            del self._entries[pid]
@@ -0,0 +1,238 @@
+"""Zygote-based bot spawner.
+
+Starting ``python3 -m bot`` repeats the heavy imports of ``bot.py`` and the
+Silero model load for every call. ``ZygoteSpawner`` starts one ``bot_zygote``
+process that does that work once, then asks it to fork a child per session.
+Children start with everything already imported and share the preloaded
+pages copy-on-write, which cuts spawn-to-ready latency and per-bot unique
+memory.
+
+Spawn latency is measured from the spawn request until the zygote reports the
+forked child, and reported as percentiles.
+"""
+
+import asyncio
+import itertools
+import json
+import os
+import signal
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from loguru import logger
+
+from stats_reporting import percentile
+
+ZYGOTE_MODULE = "bot_zygote"
+
+# Number of spawn latency samples kept for reporting
+LATENCY_WINDOW = 500
+
+
+class ForkedBot:
+    """Handle for a bot forked by the zygote.
+
+    Behaves like ``asyncio.subprocess.Process`` (``pid``, ``returncode``,
+    ``wait()``, ``terminate()``) so it can be tracked by the bot registry. The
+    bot is a child of the zygote, which reports its exit status.
+    """
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.returncode: Optional[int] = None
+        self._exited = asyncio.Event()
+
+    def terminate(self):
+        self._signal(signal.SIGTERM)
+
+    def kill(self):
+        self._signal(signal.SIGKILL)
+
+    async def wait(self) -> int:
+        await self._exited.wait()
+        return self.returncode
+
+    def finish(self, returncode: int):
+        if self.returncode is None:
+            self.returncode = returncode
+            self._exited.set()
+
+    def _signal(self, signum: int):
+        if self.returncode is None:
+            try:
+                os.kill(self.pid, signum)
+            except ProcessLookupError:
+                pass
+
+
+class ZygoteSpawner:
+    """Forks bots from a zygote that has preloaded the bot modules.
+
+    Args:
+        cwd: Working directory the zygote is started in
+        startup_timeout: Seconds to wait for the zygote to finish preloading
+        spawn_timeout: Seconds to wait for the zygote to fork a bot
+    """
+
+    def __init__(self, cwd: str, startup_timeout: float = 120.0, spawn_timeout: float = 10.0):
+        self._cwd = cwd
+        self._startup_timeout = startup_timeout
+        self._spawn_timeout = spawn_timeout
+        self._proc: Optional[asyncio.subprocess.Process] = None
+        self._reader: Optional[asyncio.Task] = None
+        self._request_ids = itertools.count(1)
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._bots: Dict[int, ForkedBot] = {}
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._spawned = 0
+        self._failed = 0
+        self._restarts = 0
+        self._stopping = False
+
+    async def start(self):
+        """Start the zygote and wait until it has preloaded the bot modules."""
+        started = time.monotonic()
+        proc = await asyncio.create_subprocess_exec(
+            "python3",
+            "-m",
+            ZYGOTE_MODULE,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            cwd=self._cwd,
+        )
+        try:
+            line = await asyncio.wait_for(proc.stdout.readline(), timeout=self._startup_timeout)
+            if json.loads(line or b"{}").get("event") != "ready":
+                raise RuntimeError(f"unexpected zygote handshake: {line!r}")
+        except BaseException:
+            if proc.returncode is None:
+                proc.kill()
+            raise
+
+        self._proc = proc
+        self._reader = asyncio.create_task(self._read_events(proc))
+        logger.info(f"Bot zygote {proc.pid} ready in {time.monotonic() - started:.2f}s")
+
+    async def stop(self):
+        """Stop the zygote. Bots it forked are terminated by the registry."""
+        self._stopping = True
+        if self._proc and self._proc.returncode is None:
+            self._proc.stdin.close()
+            await self._proc.wait()
+        if self._reader:
+            await self._reader
+
+    async def spawn(self, room_url: str, token: str) -> ForkedBot:
+        """Fork a bot for the given room.
+
+        Args:
+            room_url: Daily room URL the bot should join
+            token: Daily meeting token for the room
+
+        Returns:
+            ForkedBot: Handle for the new bot
+
+        Raises:
+            RuntimeError: If the zygote did not fork the bot in time
+        """
+        return await self._spawn({"room_url": room_url, "token": token})
+
+    async def spawn_idle(self, hold_secs: float) -> ForkedBot:
+        """Fork a child that stays alive for ``hold_secs`` without joining a room.
+
+        Used by benchmarks to measure spawn latency and memory.
+        """
+        return await self._spawn({"hold_secs": hold_secs})
+
+    def stats(self) -> Dict[str, Any]:
+        """Spawn counters and spawn-to-ready latency percentiles in milliseconds."""
+        latencies = sorted(latency * 1000 for latency in self._latencies)
+        return {
+            "zygote_pid": self._proc.pid if self._proc else None,
+            "spawned": self._spawned,
+            "failed": self._failed,
+            "running": len(self._bots),
+            "restarts": self._restarts,
+            "spawn_latency_ms": {
+                "p50": percentile(latencies, 50),
+                "p90": percentile(latencies, 90),
+                "p99": percentile(latencies, 99),
+                "max": latencies[-1] if latencies else None,
+            },
+        }
+
+    async def _spawn(self, params: Dict[str, Any]) -> ForkedBot:
+        if not self._proc or self._proc.returncode is not None:
+            self._failed += 1
+            raise RuntimeError("Failed to fork bot: the bot zygote is not running")
+
+        started = time.monotonic()
+        request_id = next(self._request_ids)
+        spawned = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = spawned
+        try:
+            command = {"cmd": "spawn", "id": request_id, **params}
+            self._proc.stdin.write((json.dumps(command) + "\n").encode())
+            await self._proc.stdin.drain()
+            pid = await asyncio.wait_for(spawned, timeout=self._spawn_timeout)
+        except Exception as e:
+            self._failed += 1
+            raise RuntimeError(f"Failed to fork bot: {e}")
+        finally:
+            self._pending.pop(request_id, None)
+
+        self._spawned += 1
+        self._latencies.append(time.monotonic() - started)
+        # The handle is registered by the reader, which may already have seen
+        # the bot exit
+        return self._bots.get(pid) or _exited_bot(pid)
+
+    async def _read_events(self, proc: asyncio.subprocess.Process):
+        while True:
+            line = await proc.stdout.readline()
+            if not line:
+                break
+            try:
+                event = json.loads(line)
+            except json.JSONDecodeError:
+                logger.error(f"Invalid zygote event: {line!r}")
+                continue
+
+            if event.get("event") == "spawned":
+                self._bots[event["pid"]] = ForkedBot(event["pid"])
+                future = self._pending.get(event["id"])
+                if future and not future.done():
+                    future.set_result(event["pid"])
+            elif event.get("event") == "exited":
+                bot = self._bots.pop(event["pid"], None)
+                if bot:
+                    bot.finish(event["returncode"])
+
+        returncode = await proc.wait()
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(RuntimeError("the bot zygote exited"))
+        if self._stopping:
+            return
+
+        # Bots forked by the dead zygote are orphaned and can no longer be
+        # reaped through it; report them as finished and start a new zygote.
+        logger.error(f"Bot zygote {proc.pid} exited with code {returncode}, restarting it")
+        for bot in self._bots.values():
+            bot.finish(-1)
+        self._bots.clear()
+        self._restarts += 1
+        while not self._stopping:
+            try:
+                await self.start()
+                return
+            except Exception as e:
+                logger.error(f"Failed to restart the bot zygote: {e}")
+                await asyncio.sleep(5)
+
+
+def _exited_bot(pid: int) -> ForkedBot:
+    bot = ForkedBot(pid)
+    bot.finish(-1)
+    return bot
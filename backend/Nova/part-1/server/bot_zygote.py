@@ -0,0 +1,120 @@
+"""Bot zygote: a preloaded process that forks one bot per session.
+
+The zygote imports the heavy modules of ``bot.py`` (pipecat services, Daily
+transport, flows) and loads the Silero VAD model once, then forks a child for
+every session. Children start with everything already in memory and share
+those pages copy-on-write with the zygote and with each other.
+
+The server (``bot_spawner.ZygoteSpawner``) drives the zygote with JSON lines on
+stdin:
+
+    {"cmd": "spawn", "id": 1, "room_url": "https://...", "token": "..."}
+
+and the zygote reports on its original stdout:
+
+    {"event": "ready"}
+    {"event": "spawned", "id": 1, "pid": 1234}
+    {"event": "exited", "pid": 1234, "returncode": 0}
+
+The zygote is the parent of every bot it forks, so it reaps them and reports
+their exit status. It stays single-threaded, which keeps forking safe.
+"""
+
+import asyncio
+import json
+import os
+import select
+import signal
+import sys
+import time
+
+import bot
+
+# Loaded once in the zygote; each forked bot runs a single session and uses
+# its own copy-on-write copy of this analyzer.
+vad_analyzer = bot.create_vad_analyzer()
+
+# Seconds between checks for exited children while no command arrives
+REAP_INTERVAL = 0.2
+
+
+def run_child(command, events):
+    """Body of a forked bot process; never returns."""
+    code = 0
+    try:
+        events.close()
+        sys.stdin.close()
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        if command.get("hold_secs") is not None:
+            # Benchmark mode: stay alive without joining a room
+            time.sleep(command["hold_secs"])
+        else:
+            asyncio.run(bot.main(command["room_url"], command["token"], vad_analyzer=vad_analyzer))
+    except BaseException as e:
+        print(f"Forked bot failed: {e}", file=sys.stderr)
+        code = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(code)
+
+
+def reap_children(emit):
+    while True:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            return
+        if pid == 0:
+            return
+        emit("exited", pid=pid, returncode=os.waitstatus_to_exitcode(status))
+
+
+def run():
+    # Keep the original stdout for zygote events only; bots print to stderr.
+    events = os.fdopen(os.dup(sys.stdout.fileno()), "w")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+    def emit(event, **kwargs):
+        events.write(json.dumps({"event": event, **kwargs}) + "\n")
+        events.flush()
+
+    emit("ready")
+    stdin_fd = sys.stdin.fileno()
+    pending = b""
+    while True:
+        readable, _, _ = select.select([stdin_fd], [], [], REAP_INTERVAL)
+        reap_children(emit)
+        if not readable:
+            continue
+
+        chunk = os.read(stdin_fd, 65536)
+        if not chunk:
+            # The server went away; bots keep running until their calls end
+            break
+        pending += chunk
+        while b"\n" in pending:
+            line, pending = pending.split(b"\n", 1)
+            handle_command(line, events, emit)
+
+
+def handle_command(line, events, emit):
+    try:
+        command = json.loads(line)
+    except json.JSONDecodeError:
+        print(f"Invalid zygote command: {line!r}", file=sys.stderr)
+        return
+    if command.get("cmd") != "spawn":
+        print(f"Unknown zygote command: {command}", file=sys.stderr)
+        return
+
+    sys.stdout.flush()
+    sys.stderr.flush()
+    pid = os.fork()
+    if pid == 0:
+        run_child(command, events)
+    emit("spawned", id=command["id"], pid=pid)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,91 @@
+"""Local stand-in for the Daily REST API.
+
+Implements just enough of the Daily REST API for ``DailyRESTHelper`` to create
+rooms and meeting tokens, so the server and ``room_pool.RoomPool`` can be run
+and measured without a Daily account or network access. Rooms are kept in
+memory and no media is served.
+
+Usage:
+    python daily_stub.py --port 9000 --latency-ms 150
+    DAILY_API_URL=http://localhost:9000 python server.py
+"""
+
+import argparse
+import asyncio
+import secrets
+import time
+import uuid
+
+from aiohttp import web
+
+
+def create_app(latency_ms: float = 0.0, domain: str = "stub.daily.co") -> web.Application:
+    """Build the stub application.
+
+    Args:
+        latency_ms: Artificial delay added to every request
+        domain: Domain used to build room URLs
+    """
+    rooms = {}
+
+    async def delay():
+        if latency_ms > 0:
+            await asyncio.sleep(latency_ms / 1000)
+
+    async def create_room(request: web.Request) -> web.Response:
+        await delay()
+        body = await request.json() if request.can_read_body else {}
+        name = body.get("name") or uuid.uuid4().hex[:12]
+        if name in rooms:
+            return web.json_response({"error": "invalid-request-error"}, status=400)
+        room = {
+            "id": str(uuid.uuid4()),
+            "name": name,
+            "api_created": True,
+            "privacy": body.get("privacy", "public"),
+            "url": f"https://{domain}/{name}",
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime()),
+            "config": body.get("properties", {}),
+        }
+        rooms[name] = room
+        return web.json_response(room)
+
+    async def get_room(request: web.Request) -> web.Response:
+        await delay()
+        room = rooms.get(request.match_info["name"])
+        if not room:
+            return web.json_response({"error": "not-found"}, status=404)
+        return web.json_response(room)
+
+    async def delete_room(request: web.Request) -> web.Response:
+        await delay()
+        name = request.match_info["name"]
+        if rooms.pop(name, None) is None:
+            return web.json_response({"error": "not-found"}, status=404)
+        return web.json_response({"deleted": True, "name": name})
+
+    async def create_token(request: web.Request) -> web.Response:
+        await delay()
+        body = await request.json() if request.can_read_body else {}
+        room_name = body.get("properties", {}).get("room_name")
+        if room_name and room_name not in rooms:
+            return web.json_response({"error": "not-found"}, status=404)
+        return web.json_response({"token": secrets.token_urlsafe(32)})
+
+    app = web.Application()
+    app.router.add_post("/rooms", create_room)
+    app.router.add_get("/rooms/{name}", get_room)
+    app.router.add_delete("/rooms/{name}", delete_room)
+    app.router.add_post("/meeting-tokens", create_token)
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local Daily REST API stub")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Host address")
+    parser.add_argument("--port", type=int, default=9000, help="Port number")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay added to every request")
+
+    config = parser.parse_args()
+
+    web.run_app(create_app(latency_ms=config.latency_ms), host=config.host, port=config.port)
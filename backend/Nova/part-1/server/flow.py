@@ -5,12 +5,16 @@
 #
 
 import sys
+import uuid
 from pathlib import Path
 from typing import List
 from dotenv import load_dotenv
 from loguru import logger
 
-from pipecat_flows import FlowArgs, FlowConfig, FlowResult, FlowsFunctionSchema
+from pipecat_flows import FlowArgs, FlowConfig, FlowManager, FlowResult, FlowsFunctionSchema
+
+from booking_store import booking_store, instrumented
+from flow_graph import compile_flow
 
 sys.path.append(str(Path(__file__).parent.parent))
 
@@ -80,28 +84,53 @@ class ActivitiesResult(FlowResult):
 
 
 # Function handlers
-async def select_destination(args: FlowArgs) -> DestinationResult:
+#
+# Choices the user can still change are stored in the background (see
+# booking_store), so the handlers return without waiting for the backend.
+def booking_id(flow_manager: FlowManager) -> str:
+    """Id of the conversation's booking, kept in the flow state."""
+    return flow_manager.state.setdefault("booking_id", uuid.uuid4().hex)
+
+
+@instrumented
+async def select_destination(args: FlowArgs, flow_manager: FlowManager) -> DestinationResult:
     """Handler for destination selection."""
     destination = args["destination"]
-    # In a real app, this would store the selection
+    await booking_store().update(booking_id(flow_manager), {"destination": destination})
     return DestinationResult(destination=destination)
 
 
-async def record_dates(args: FlowArgs) -> DatesResult:
+@instrumented
+async def record_dates(args: FlowArgs, flow_manager: FlowManager) -> DatesResult:
     """Handler for travel date recording."""
     check_in = args["check_in"]
     check_out = args["check_out"]
-    # In a real app, this would validate and store the dates
+    await booking_store().update(
+        booking_id(flow_manager), {"check_in": check_in, "check_out": check_out}
+    )
     return DatesResult(check_in=check_in, check_out=check_out)
 
 
-async def record_activities(args: FlowArgs) -> ActivitiesResult:
+@instrumented
+async def record_activities(args: FlowArgs, flow_manager: FlowManager) -> ActivitiesResult:
     """Handler for activity selection."""
     activities = args["activities"]
-    # In a real app, this would validate and store the activities
+    await booking_store().update(booking_id(flow_manager), {"activities": activities})
     return ActivitiesResult(activities=activities)
 
 
+@instrumented
+async def confirm_booking(args: FlowArgs, flow_manager: FlowManager) -> FlowResult:
+    """Handler for booking confirmation.
+
+    Waits until the booking is stored. If the store fails, the error goes back
+    to the LLM and the flow stays on verify_itinerary instead of announcing a
+    confirmation.
+    """
+    await booking_store().update(booking_id(flow_manager), {"status": "confirmed"}, wait=True)
+    return {"status": "success"}
+
+
 flow_config: FlowConfig = {
   "initial_node": "start",
   "nodes": {
@@ -109,7 +138,7 @@ flow_config: FlowConfig = {
       "role_messages": [
         {
           "role": "system",
-          "content": [{"text": "You are a travel planning assistant with Summit and Sand Getaways. You must ALWAYS use one of the available functions to progress the conversation. This is a phone conversation and your responses will be converted to audio. Avoid outputting special characters and emojis. Keep your responses concise and to the point."}]
+          "content": "You are a travel planning assistant with Summit and Sand Getaways. You must ALWAYS use one of the available functions to progress the conversation. This is a phone conversation and your responses will be converted to audio. Avoid outputting special characters and emojis. Keep your responses concise and to the point."
         }
       ],
       "task_messages": [
@@ -258,6 +287,7 @@ flow_config: FlowConfig = {
             description="Confirm the booking and proceed to end",
             properties={},
             required=[],
+            handler=confirm_booking,
             transition_to="confirm_booking"
         )
       ]
@@ -312,4 +342,7 @@ flow_config: FlowConfig = {
       ]
     }
   }
-}
\ No newline at end of file
+}
+
+# Validated and compiled once, at import (see flow_graph)
+compiled_flow = compile_flow(flow_config)
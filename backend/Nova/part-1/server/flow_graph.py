@@ -0,0 +1,371 @@
+"""Flow configuration compiled once, for cheap node transitions.
+
+On every transition ``FlowManager.set_node`` redoes the same work for a
+configuration that never changes once the module is loaded: it validates
+the node, converts its functions to ``FlowsFunctionSchema``, formats them into
+the LLM's tool payload and builds the node's message list.
+
+``compile_flow`` does all of that once, for every node of the flow:
+
+- validates the whole graph: the initial node and every ``transition_to``
+  target exist, every node can be reached from the initial node, and every
+  handler and transition callback is an async function the ``FlowManager``
+  can call
+- freezes each node's messages and Bedrock tool payload into read-only
+  structures
+
+``CompiledFlowManager`` transitions with those: the tools sent to the LLM
+are the same object every time a node is entered, and the functions are only
+wrapped for the LLM the first time. The messages are still copied on each
+transition, because the LLM context rewrites the messages it is given into
+its own format in place.
+"""
+
+import inspect
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Set, Tuple
+
+from loguru import logger
+
+import pipecat_flows.manager
+from pipecat_flows import FlowConfig, FlowError, FlowManager, FlowsFunctionSchema, FlowTransitionError
+from pipecat_flows.adapters import AWSBedrockAdapter, LLMAdapter
+from pipecat_flows.types import ActionConfig, ContextStrategyConfig, NodeConfig
+
+
+class FlowGraphError(FlowError):
+    """Raised when a flow configuration does not compile.
+
+    Args:
+        problems: Everything wrong with the configuration, one line each
+    """
+
+    def __init__(self, problems: List[str]):
+        super().__init__("Invalid flow configuration:\n" + "\n".join(f"- {p}" for p in problems))
+        self.problems = problems
+
+
+class FrozenDict(dict):
+    """Read-only ``dict``; its copies (``copy``, ``deepcopy``, pickling) are plain dicts."""
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError(f"{type(self).__name__} is read-only")
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+    def __reduce__(self):
+        return dict, (dict(self),)
+
+
+class FrozenList(list):
+    """Read-only ``list``; its copies (``copy``, ``deepcopy``, pickling) are plain lists.
+
+    A list rather than a tuple: botocore only takes lists in JSON documents
+    (such as the ``inputSchema`` of a tool).
+    """
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError(f"{type(self).__name__} is read-only")
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only
+    append = clear = extend = insert = pop = remove = reverse = sort = _read_only
+
+    def __reduce__(self):
+        return list, (list(self),)
+
+
+def freeze(value: Any) -> Any:
+    """Read-only copy of a JSON-like value: dicts become ``FrozenDict``, lists ``FrozenList``."""
+    if isinstance(value, dict):
+        return FrozenDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return FrozenList(freeze(item) for item in value)
+    return value
+
+
+def thaw(value: Any) -> Any:
+    """Mutable copy of a value made by ``freeze``."""
+    if isinstance(value, dict):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [thaw(item) for item in value]
+    return value
+
+
+@dataclass(frozen=True)
+class CompiledNode:
+    """A node of a compiled flow, ready to be entered."""
+
+    node_id: str
+    # The node's configuration, as given
+    config: NodeConfig
+    # Role and task messages, frozen
+    messages: Sequence[Mapping[str, Any]]
+    # The functions, formatted for the LLM and frozen
+    tools: Sequence[Mapping[str, Any]]
+    functions: Tuple[FlowsFunctionSchema, ...]
+    pre_actions: Tuple[ActionConfig, ...]
+    post_actions: Tuple[ActionConfig, ...]
+    respond_immediately: bool
+    context_strategy: Optional[ContextStrategyConfig]
+
+
+@dataclass(frozen=True)
+class CompiledFlow:
+    """A validated flow configuration with its nodes compiled."""
+
+    # The flow configuration, as given
+    config: FlowConfig
+    initial_node: str
+    nodes: Mapping[str, CompiledNode]
+    # Type of the adapter that formatted the tools
+    adapter_type: type
+
+
+def compile_flow(flow_config: FlowConfig, adapter: Optional[LLMAdapter] = None) -> CompiledFlow:
+    """Validate a static flow configuration and compile its nodes.
+
+    Args:
+        flow_config: The flow configuration
+        adapter: Formats the tools for the LLM; Bedrock's by default
+
+    Returns:
+        CompiledFlow: The compiled flow
+
+    Raises:
+        FlowGraphError: If the configuration is invalid, listing every problem
+    """
+    adapter = adapter or AWSBedrockAdapter()
+    nodes = flow_config.get("nodes", {})
+    initial_node = flow_config.get("initial_node")
+    problems = []
+    if initial_node not in nodes:
+        problems.append(f"initial node '{initial_node}' is not a node")
+
+    compiled = {}
+    edges: Dict[str, Set[str]] = {}
+    dynamic = False
+    for node_id, node_config in nodes.items():
+        missing = [field for field in ("task_messages", "functions") if field not in node_config]
+        if missing:
+            problems.append(f"node '{node_id}' has no {' or '.join(missing)}")
+            continue
+
+        functions = []
+        for function in node_config["functions"]:
+            try:
+                schema = (
+                    function
+                    if isinstance(function, FlowsFunctionSchema)
+                    else adapter.convert_to_function_schema(function)
+                )
+            except Exception as e:
+                problems.append(f"a function of node '{node_id}' has an invalid format: {e}")
+                continue
+            problems.extend(
+                _function_problems(node_id, schema, nodes, functions, terminal=_ends_conversation(node_config))
+            )
+            functions.append(schema)
+        edges[node_id] = {f.transition_to for f in functions if f.transition_to in nodes}
+        dynamic = dynamic or any(f.transition_callback for f in functions)
+
+        messages = [*node_config.get("role_messages", []), *node_config["task_messages"]]
+        tools = adapter.format_functions(
+            [schema.to_function_schema() for schema in functions],
+            original_configs=node_config["functions"],
+        )
+        pre_actions = tuple(node_config.get("pre_actions") or ())
+        post_actions = tuple(node_config.get("post_actions") or ())
+        compiled[node_id] = CompiledNode(
+            node_id=node_id,
+            config=node_config,
+            messages=freeze(messages),
+            tools=freeze(tools),
+            functions=tuple(functions),
+            pre_actions=pre_actions,
+            post_actions=post_actions,
+            respond_immediately=node_config.get("respond_immediately", True),
+            context_strategy=node_config.get("context_strategy"),
+        )
+
+    if initial_node in nodes and not dynamic:
+        # Transition callbacks pick their node at runtime; only static flows are checked
+        reachable = {initial_node}
+        queue = deque([initial_node])
+        while queue:
+            for target in edges.get(queue.popleft(), ()):
+                if target not in reachable:
+                    reachable.add(target)
+                    queue.append(target)
+        problems.extend(
+            f"node '{node_id}' cannot be reached from '{initial_node}'"
+            for node_id in nodes
+            if node_id not in reachable
+        )
+
+    if problems:
+        raise FlowGraphError(problems)
+    return CompiledFlow(
+        config=flow_config,
+        initial_node=initial_node,
+        nodes=MappingProxyType(compiled),
+        adapter_type=type(adapter),
+    )
+
+
+def _function_problems(
+    node_id: str,
+    schema: FlowsFunctionSchema,
+    nodes: Mapping[str, Any],
+    previous: List[FlowsFunctionSchema],
+    terminal: bool = False,
+) -> List[str]:
+    name = f"function '{schema.name}' of node '{node_id}'"
+    problems = []
+    if any(other.name == schema.name for other in previous):
+        problems.append(f"{name} is defined twice")
+    if schema.transition_to and schema.transition_to not in nodes:
+        problems.append(f"{name} transitions to '{schema.transition_to}', which is not a node")
+    if schema.transition_to and schema.transition_callback:
+        problems.append(f"{name} has both transition_to and transition_callback")
+
+    handler = schema.handler
+    if isinstance(handler, str):
+        # "__function__:<name>" handlers are looked up in __main__ when the node is entered
+        if not handler.startswith("__function__:"):
+            problems.append(f"{name} has handler '{handler}', which is not a function")
+    elif handler is not None:
+        if not _is_async(handler):
+            problems.append(f"{name} has a handler that is not async")
+        elif _parameter_count(handler) > 2:
+            problems.append(f"{name} has a handler taking more than (args, flow_manager)")
+
+    callback = schema.transition_callback
+    if callback is not None:
+        if not _is_async(callback):
+            problems.append(f"{name} has a transition callback that is not async")
+        elif _parameter_count(callback) not in (2, 3):
+            problems.append(f"{name} has a transition callback not taking (args, [result,] flow_manager)")
+
+    # A node ending the conversation has nowhere to go, so its functions need not lead anywhere
+    if handler is None and not schema.transition_to and not callback and schema.name not in nodes:
+        if not terminal:
+            logger.warning(f"{name} has neither handler, transition_to, nor transition_callback")
+    return problems
+
+
+def _ends_conversation(node_config: Mapping[str, Any]) -> bool:
+    actions = [*(node_config.get("pre_actions") or ()), *(node_config.get("post_actions") or ())]
+    return any(action.get("type") == "end_conversation" for action in actions)
+
+
+def _is_async(function: Callable) -> bool:
+    return inspect.iscoroutinefunction(function) or inspect.iscoroutinefunction(
+        getattr(function, "__call__", None)
+    )
+
+
+def _parameter_count(function: Callable) -> int:
+    # Same count as FlowManager._call_handler: bound methods already have their self
+    return len(inspect.signature(function).parameters)
+
+
+@contextmanager
+def _adapter_created(adapter: Optional[LLMAdapter]):
+    # FlowManager.__init__ calls its module's create_adapter, synchronously
+    if adapter is None:
+        yield
+        return
+    create_adapter = pipecat_flows.manager.create_adapter
+    pipecat_flows.manager.create_adapter = lambda llm: adapter
+    try:
+        yield
+    finally:
+        pipecat_flows.manager.create_adapter = create_adapter
+
+
+class CompiledFlowManager(FlowManager):
+    """``FlowManager`` entering the nodes of a compiled flow from their cached payloads.
+
+    Nodes set at runtime with a configuration that is not part of the
+    compiled flow (dynamic flows) go through the regular ``FlowManager``.
+
+    Args:
+        compiled_flow: The flow to run (see ``compile_flow``)
+        adapter: Adapter of the LLM service. ``FlowManager`` picks it by the
+            exact class name of the service, which subclasses such as
+            ``aws_clients.sharing_aws_clients`` do not keep
+        **kwargs: The other ``FlowManager`` arguments, ``flow_config`` excepted
+    """
+
+    def __init__(self, *, compiled_flow: CompiledFlow, adapter: Optional[LLMAdapter] = None, **kwargs):
+        with _adapter_created(adapter):
+            super().__init__(flow_config=compiled_flow.config, **kwargs)
+        if not isinstance(self.adapter, compiled_flow.adapter_type):
+            raise FlowError(
+                f"Flow compiled for {compiled_flow.adapter_type.__name__}, "
+                f"but the LLM uses {type(self.adapter).__name__}"
+            )
+        self._compiled_flow = compiled_flow
+        self._transition_funcs: Dict[Tuple[str, str], Callable] = {}
+
+    async def set_node(self, node_id: str, node_config: NodeConfig) -> None:
+        node = self._compiled_flow.nodes.get(node_id)
+        if node is None or node.config is not node_config:
+            await super().set_node(node_id, node_config)
+            return
+
+        if not self.initialized:
+            raise FlowTransitionError(f"{self.__class__.__name__} must be initialized first")
+
+        try:
+            logger.debug(f"Setting node: {node_id}")
+            self.action_manager.clear_deferred_post_actions()
+            for action in node.pre_actions + node.post_actions:
+                self._register_action_from_config(action)
+            if node.pre_actions:
+                await self._execute_actions(pre_actions=list(node.pre_actions))
+
+            # As FlowManager: functions still registered from the last node are kept as they are
+            new_functions: Set[str] = set()
+            for schema in node.functions:
+                if schema.name not in self.current_functions:
+                    self.llm.register_function(schema.name, await self._transition_func(node, schema))
+                    new_functions.add(schema.name)
+
+            await self._update_llm_context(
+                thaw(node.messages), node.tools, strategy=node.context_strategy
+            )
+
+            self.current_node = node_id
+            self.current_functions = new_functions
+
+            if self._context_aggregator and node.respond_immediately:
+                await self.task.queue_frames([self._context_aggregator.user().get_context_frame()])
+
+            if node.post_actions:
+                if node.respond_immediately:
+                    await self._execute_actions(post_actions=list(node.post_actions))
+                else:
+                    self._schedule_deferred_post_actions(post_actions=list(node.post_actions))
+
+            logger.debug(f"Successfully set node: {node_id}")
+
+        except Exception as e:
+            logger.error(f"Error setting node {node_id}: {str(e)}")
+            raise FlowError(f"Failed to set node {node_id}: {str(e)}") from e
+
+    async def _transition_func(self, node: CompiledNode, schema: FlowsFunctionSchema) -> Callable:
+        key = (node.node_id, schema.name)
+        if key not in self._transition_funcs:
+            handler = schema.handler
+            if isinstance(handler, str):
+                handler = self._lookup_function(handler.split(":")[1])
+            self._transition_funcs[key] = await self._create_transition_func(
+                schema.name, handler, schema.transition_to, schema.transition_callback
+            )
+        return self._transition_funcs[key]
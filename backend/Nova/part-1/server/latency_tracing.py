@@ -0,0 +1,232 @@
+"""Per-turn voice-to-voice latency tracing.
+
+A turn starts when the user stops speaking and ends when the first bot audio
+frame of the reply is written by the output transport. In between,
+``TurnLatencyTracer`` timestamps the stages of the reply:
+
+- ``vad_stop``: VAD detected the end of the user's speech
+- ``stt_final``: the final transcript of the user's speech arrived
+- ``llm_first_token``: the LLM produced its first token
+- ``tts_first_audio``: speech synthesis produced its first audio chunk
+- ``first_audio_out``: the output transport started writing the reply
+
+The marks are recorded by pass-through tap processors placed after the
+pipeline stages that produce the corresponding frames. Stages that do not
+exist in a pipeline (e.g. the speech-to-speech Nova Sonic model in part-2
+has no separate STT and TTS) are left out, and the next stage is measured
+from the previous mark that was recorded.
+
+Completed turns are reported as a stage breakdown in milliseconds. Bots post
+them to the server (``LATENCY_TRACE_URL``), which aggregates them in a
+``TurnLatencyStats`` histogram per stage.
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Sequence
+
+from loguru import logger
+
+from pipecat.frames.frames import (
+    Frame,
+    LLMTextFrame,
+    OutputAudioRawFrame,
+    TranscriptionFrame,
+    TTSAudioRawFrame,
+    UserStartedSpeakingFrame,
+    UserStoppedSpeakingFrame,
+)
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+
+from stats_reporting import percentile, post_stats
+
+# Server endpoint completed turns are posted to; tracing only logs turns when unset
+LATENCY_TRACE_URL = os.getenv("LATENCY_TRACE_URL")
+
+# Marks in the order they happen during a turn
+MARKS = ("vad_stop", "stt_final", "llm_first_token", "tts_first_audio", "first_audio_out")
+
+# Name of the stage that ends at each mark
+STAGES = {
+    "stt_final": "stt",
+    "llm_first_token": "llm",
+    "tts_first_audio": "tts",
+    "first_audio_out": "transport",
+}
+
+# Frames that set each mark
+MARK_FRAMES = {
+    "vad_stop": UserStoppedSpeakingFrame,
+    "stt_final": TranscriptionFrame,
+    "llm_first_token": LLMTextFrame,
+    "tts_first_audio": TTSAudioRawFrame,
+    "first_audio_out": OutputAudioRawFrame,
+}
+
+# Upper bounds in milliseconds of the histogram buckets
+BUCKETS_MS = (50, 100, 200, 300, 500, 750, 1000, 1500, 2000, 3000, 5000, 10000)
+
+# Number of samples per stage kept for percentiles
+SAMPLE_WINDOW = 1000
+
+
+class TurnLatencyTracer:
+    """Collects the marks of each turn of one session.
+
+    Args:
+        reporter: Called with every completed turn (see ``stage_breakdown``)
+    """
+
+    def __init__(self, reporter: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self._reporter = reporter or post_trace
+        self._marks: Dict[str, float] = {}
+
+    def tap(self, *marks: str) -> "LatencyTap":
+        """Create a tap processor recording the given marks.
+
+        Place it right after the processor producing the marks' frames.
+        """
+        for mark in marks:
+            if mark not in MARK_FRAMES:
+                raise ValueError(f"Unknown latency mark: {mark}")
+        return LatencyTap(self, marks)
+
+    def on_frame(self, frame: Frame, marks: Sequence[str]):
+        now = time.monotonic()
+
+        if isinstance(frame, UserStartedSpeakingFrame) and "vad_stop" in marks:
+            # A new user turn; drops a turn the user interrupted before the bot spoke
+            self._marks = {}
+            return
+
+        for mark in marks:
+            if not isinstance(frame, MARK_FRAMES[mark]):
+                continue
+            if mark == "vad_stop":
+                # Keep a final transcript that arrived before VAD stop
+                self._marks = {key: value for key, value in self._marks.items() if key == "stt_final"}
+                self._marks["vad_stop"] = now
+            elif mark == "stt_final":
+                # The last final transcript before the LLM answers counts
+                if "llm_first_token" not in self._marks:
+                    self._marks["stt_final"] = now
+            elif "vad_stop" in self._marks and mark not in self._marks:
+                self._marks[mark] = now
+                if mark == "first_audio_out":
+                    self._complete()
+
+    def _complete(self):
+        trace = stage_breakdown(self._marks)
+        self._marks = {}
+        logger.debug(f"Turn latency: {trace}")
+        try:
+            self._reporter(trace)
+        except Exception as e:
+            logger.warning(f"Failed to report turn latency: {e}")
+
+
+class LatencyTap(FrameProcessor):
+    """Pass-through processor reporting the frames it sees to a tracer."""
+
+    def __init__(self, tracer: TurnLatencyTracer, marks: Sequence[str], **kwargs):
+        super().__init__(**kwargs)
+        self._tracer = tracer
+        self._marks = marks
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+        if direction == FrameDirection.DOWNSTREAM:
+            self._tracer.on_frame(frame, self._marks)
+        await self.push_frame(frame, direction)
+
+
+def stage_breakdown(marks: Dict[str, float]) -> Dict[str, Any]:
+    """Turn the marks of a completed turn into stage durations.
+
+    A stage starts at the latest earlier mark, so a transcript that arrived
+    before VAD stop counts as a zero STT stage rather than a negative one.
+
+    Returns:
+        dict: ``{"stages": {stage: ms}, "total_ms": ms}``
+    """
+    stages = {}
+    start = marks["vad_stop"]
+    for mark in MARKS[1:]:
+        if mark not in marks:
+            continue
+        end = max(marks[mark], start)
+        stages[STAGES[mark]] = (end - start) * 1000
+        start = end
+    return {"stages": stages, "total_ms": (start - marks["vad_stop"]) * 1000}
+
+
+_pending_posts = set()
+
+
+def post_trace(trace: Dict[str, Any]):
+    """Post a completed turn to ``LATENCY_TRACE_URL`` without blocking the pipeline."""
+    if not LATENCY_TRACE_URL:
+        return
+    task = asyncio.get_running_loop().create_task(post_stats(LATENCY_TRACE_URL, trace, "turn latency"))
+    _pending_posts.add(task)
+    task.add_done_callback(_pending_posts.discard)
+
+
+class LatencyHistogram:
+    """Histogram of one stage's latency, with percentiles over recent samples."""
+
+    def __init__(self):
+        self._buckets = [0] * (len(BUCKETS_MS) + 1)
+        self._samples: Deque[float] = deque(maxlen=SAMPLE_WINDOW)
+        self._count = 0
+        self._sum = 0.0
+
+    def record(self, value_ms: float):
+        index = next((i for i, bound in enumerate(BUCKETS_MS) if value_ms <= bound), len(BUCKETS_MS))
+        self._buckets[index] += 1
+        self._samples.append(value_ms)
+        self._count += 1
+        self._sum += value_ms
+
+    def stats(self) -> Dict[str, Any]:
+        samples = sorted(self._samples)
+        buckets = {f"le_{bound}": count for bound, count in zip(BUCKETS_MS, self._buckets)}
+        buckets["inf"] = self._buckets[-1]
+        return {
+            "count": self._count,
+            "mean_ms": self._sum / self._count if self._count else None,
+            "p50_ms": percentile(samples, 50),
+            "p90_ms": percentile(samples, 90),
+            "p99_ms": percentile(samples, 99),
+            "buckets": buckets,
+        }
+
+
+class TurnLatencyStats:
+    """Per-stage latency histograms of the turns reported by all bots."""
+
+    def __init__(self):
+        self._stages: Dict[str, LatencyHistogram] = {}
+        self._turns = 0
+
+    def record(self, trace: Dict[str, Any]):
+        """Add a turn reported by a bot (see ``stage_breakdown``)."""
+        for stage, value_ms in trace.get("stages", {}).items():
+            self._stages.setdefault(stage, LatencyHistogram()).record(float(value_ms))
+        self._stages.setdefault("total", LatencyHistogram()).record(float(trace["total_ms"]))
+        self._turns += 1
+
+    @property
+    def turns(self) -> int:
+        return self._turns
+
+    def stats(self) -> Dict[str, Any]:
+        order = [STAGES[mark] for mark in MARKS[1:]] + ["total"]
+        return {
+            "turns": self._turns,
+            "stages": {
+                stage: self._stages[stage].stats() for stage in order if stage in self._stages
+            },
+        }
@@ -0,0 +1,401 @@
+"""Speculative Bedrock generation on interim transcripts.
+
+Transcribe's interim results settle on the user's words well before the final
+transcript arrives and the VAD stop window closes. ``InterimSpeculator``
+watches the interim transcripts: once one has not changed for
+``SPECULATION_STABLE_MS``, it starts the Bedrock request the LLM would make
+for it (the current context plus that user message). The request runs in a
+background thread of ``SpeculativeBedrockClient``, which wraps the LLM
+service's boto client.
+
+When the LLM then makes the real request for the final transcript, the client
+compares the two requests. If they are the same up to the user's last words,
+and those words are at least ``SPECULATION_SIMILARITY`` alike, the
+speculative response (already streaming, or complete) is used. Otherwise the
+speculative request is dropped and the real one is sent.
+
+The client counts hits, misses, latency saved and the tokens spent on
+speculative requests that were dropped. Each bot posts its session's counters
+to the server (``SPECULATION_STATS_URL``) when the session ends.
+"""
+
+import asyncio
+import copy
+import difflib
+import json
+import os
+import queue
+import re
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from loguru import logger
+
+from pipecat.frames.frames import (
+    Frame,
+    InterimTranscriptionFrame,
+    TranscriptionFrame,
+    UserStartedSpeakingFrame,
+)
+from pipecat.processors.aggregators.openai_llm_context import OpenAILLMContext
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+from pipecat.services.aws.llm import AWSBedrockLLMContext, AWSBedrockLLMService
+
+from stats_reporting import post_stats
+
+# Whether the bot starts LLM requests on stable interim transcripts
+LLM_SPECULATION = os.getenv("LLM_SPECULATION", "false").lower() in ("1", "true", "yes")
+
+# How alike (0-1, by words) the speculated and final user words must be for a hit
+SPECULATION_SIMILARITY = float(os.getenv("SPECULATION_SIMILARITY", "0.85"))
+
+# How long an interim transcript must stay unchanged before speculating
+SPECULATION_STABLE_MS = int(os.getenv("SPECULATION_STABLE_MS", "300"))
+
+# Fewest words worth speculating on
+SPECULATION_MIN_WORDS = int(os.getenv("SPECULATION_MIN_WORDS", "3"))
+
+# Server endpoint the session counters are posted to; only logged when unset
+SPECULATION_STATS_URL = os.getenv("SPECULATION_STATS_URL")
+
+# Rough characters per token, to estimate the tokens of dropped requests
+CHARS_PER_TOKEN = 4
+
+_END = object()
+
+
+def transcript_similarity(a: str, b: str) -> float:
+    """Similarity (0-1) of two transcripts, by words, ignoring case and punctuation."""
+    words_a = re.findall(r"\w+", a.lower())
+    words_b = re.findall(r"\w+", b.lower())
+    if not words_a and not words_b:
+        return 1.0
+    return difflib.SequenceMatcher(None, words_a, words_b).ratio()
+
+
+def bedrock_request(llm: AWSBedrockLLMService, context: AWSBedrockLLMContext) -> Dict[str, Any]:
+    """The ``converse_stream`` parameters ``llm`` sends for ``context``.
+
+    Mirrors ``AWSBedrockLLMService._process_context``; if the two drift apart,
+    speculative requests stop matching (misses), they are never used wrongly.
+    """
+    params = {
+        "modelId": llm.model_name,
+        "messages": context.messages,
+        "inferenceConfig": {
+            "maxTokens": llm._settings["max_tokens"],
+            "temperature": llm._settings["temperature"],
+            "topP": llm._settings["top_p"],
+        },
+        "additionalModelRequestFields": llm._settings["additional_model_request_fields"],
+        "system": context.system,
+    }
+    if context.tools:
+        tool_config = {"tools": context.tools}
+        if context.tool_choice == "auto":
+            tool_config["toolChoice"] = {"auto": {}}
+        elif isinstance(context.tool_choice, dict) and "function" in context.tool_choice:
+            tool_config["toolChoice"] = {"tool": {"name": context.tool_choice["function"]["name"]}}
+        params["toolConfig"] = tool_config
+    if llm._settings["latency"] in ["standard", "optimized"]:
+        params["performanceConfig"] = {"latency": llm._settings["latency"]}
+    return params
+
+
+def _message_texts(message: Dict[str, Any]) -> List[str]:
+    content = message["content"]
+    if isinstance(content, str):
+        return [content]
+    return [block.get("text", json.dumps(block)) for block in content]
+
+
+def _estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN
+
+
+class Speculation:
+    """A speculative ``converse_stream`` request running in a background thread.
+
+    Events are buffered as they arrive, so the request keeps generating while
+    nobody reads it yet.
+
+    Args:
+        client: boto ``bedrock-runtime`` client
+        params: ``converse_stream`` parameters
+        transcript: The user words the request was made for
+    """
+
+    def __init__(self, client, params: Dict[str, Any], transcript: str):
+        self.params = params
+        self.transcript = transcript
+        self.started_at = time.monotonic()
+        self.ready_at: Optional[float] = None
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self._output_chars = 0
+        self._events: queue.Queue = queue.Queue()
+        self._cancelled = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(client,), daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def tokens(self) -> Dict[str, int]:
+        """Tokens used so far: reported by Bedrock once complete, estimated until then."""
+        if self.input_tokens or self.output_tokens:
+            return {"input": self.input_tokens, "output": self.output_tokens}
+        request = json.dumps([self.params["messages"], self.params.get("system")], default=str)
+        return {"input": _estimate_tokens(request), "output": self._output_chars // CHARS_PER_TOKEN}
+
+    def stream(self) -> Iterator[Dict[str, Any]]:
+        """The response events: the buffered ones, then the rest as they arrive."""
+        while True:
+            event = self._events.get()
+            if event is _END:
+                return
+            if isinstance(event, Exception):
+                raise event
+            yield event
+
+    def _run(self, client):
+        try:
+            response = client.converse_stream(**self.params)
+            self.ready_at = time.monotonic()
+            stream = response["stream"]
+            for event in stream:
+                if self._cancelled.is_set():
+                    if hasattr(stream, "close"):
+                        stream.close()
+                    break
+                self._count(event)
+                self._events.put(event)
+        except Exception as e:
+            self._events.put(e)
+        finally:
+            self._events.put(_END)
+
+    def _count(self, event: Dict[str, Any]):
+        if "contentBlockDelta" in event:
+            delta = event["contentBlockDelta"]["delta"]
+            self._output_chars += len(delta.get("text", "")) + len(delta.get("toolUse", {}).get("input", ""))
+        if "metadata" in event and "usage" in event["metadata"]:
+            self.input_tokens = event["metadata"]["usage"].get("inputTokens", 0)
+            self.output_tokens = event["metadata"]["usage"].get("outputTokens", 0)
+
+
+class SpeculativeBedrockClient:
+    """boto ``bedrock-runtime`` client that can answer requests speculatively.
+
+    Everything other than ``converse_stream`` goes to the wrapped client.
+
+    Args:
+        client: The boto client to wrap
+        similarity: Minimum ``transcript_similarity`` of the speculated and
+            final user words for a speculative response to be used
+    """
+
+    def __init__(self, client, similarity: float = SPECULATION_SIMILARITY):
+        self._client = client
+        self._similarity = similarity
+        self._speculation: Optional[Speculation] = None
+        self._counters = {
+            "speculations": 0,
+            "hits": 0,
+            "misses": 0,
+            "cancelled": 0,
+            "latency_saved_ms": 0,
+            "wasted_input_tokens": 0,
+            "wasted_output_tokens": 0,
+        }
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    @property
+    def speculation(self) -> Optional[Speculation]:
+        return self._speculation
+
+    def speculate(self, params: Dict[str, Any], transcript: str):
+        """Start a speculative request, replacing any earlier one."""
+        self.cancel()
+        self._speculation = Speculation(self._client, params, transcript)
+        self._counters["speculations"] += 1
+
+    def cancel(self):
+        """Drop the speculative request, e.g. because the user kept talking."""
+        if self._speculation:
+            self._drop(self._speculation)
+            self._counters["cancelled"] += 1
+            self._speculation = None
+
+    def converse_stream(self, **params) -> Dict[str, Any]:
+        speculation, self._speculation = self._speculation, None
+        if speculation:
+            if self._matches(speculation, params):
+                now = time.monotonic()
+                # Without speculation the response would have started this
+                # much later (at most by the time Bedrock took to respond)
+                saved = now - speculation.started_at
+                if speculation.ready_at:
+                    saved = min(saved, speculation.ready_at - speculation.started_at)
+                self._counters["hits"] += 1
+                self._counters["latency_saved_ms"] += int(saved * 1000)
+                logger.debug(f"Speculation hit [{speculation.transcript}], saved {saved * 1000:.0f} ms")
+                return {"stream": speculation.stream()}
+            logger.debug(f"Speculation miss [{speculation.transcript}]")
+            self._drop(speculation)
+            self._counters["misses"] += 1
+        return self._client.converse_stream(**params)
+
+    def stats(self) -> Dict[str, Any]:
+        """Speculation counters of this session.
+
+        Returns:
+            dict: speculative requests started, hits, misses (final request
+            differed), cancelled (superseded before the final request), hit
+            rate, mean latency saved per hit, and tokens spent on dropped requests
+        """
+        decided = self._counters["hits"] + self._counters["misses"]
+        hits = self._counters["hits"]
+        return {
+            **self._counters,
+            "hit_rate": hits / decided if decided else None,
+            "mean_latency_saved_ms": self._counters["latency_saved_ms"] / hits if hits else None,
+        }
+
+    def _matches(self, speculation: Speculation, params: Dict[str, Any]) -> bool:
+        speculated = speculation.params
+        if {k: v for k, v in speculated.items() if k != "messages"} != {
+            k: v for k, v in params.items() if k != "messages"
+        }:
+            return False
+        messages, final_messages = speculated["messages"], params["messages"]
+        if len(messages) != len(final_messages) or messages[:-1] != final_messages[:-1]:
+            return False
+        if messages[-1]["role"] != "user" or final_messages[-1]["role"] != "user":
+            return False
+
+        # The last user message may also hold earlier content (Bedrock merges
+        # consecutive user messages); it must be the same up to the user's words
+        texts, final_texts = _message_texts(messages[-1]), _message_texts(final_messages[-1])
+        if len(texts) != len(final_texts) or texts[:-1] != final_texts[:-1]:
+            return False
+        return transcript_similarity(texts[-1], final_texts[-1]) >= self._similarity
+
+    def _drop(self, speculation: Speculation):
+        speculation.cancel()
+        tokens = speculation.tokens()
+        self._counters["wasted_input_tokens"] += tokens["input"]
+        self._counters["wasted_output_tokens"] += tokens["output"]
+
+
+class InterimSpeculator(FrameProcessor):
+    """Starts speculative LLM requests on stable interim transcripts.
+
+    Place it between the STT service and the user context aggregator.
+
+    Args:
+        llm: The Bedrock LLM service, whose ``_client`` is a ``SpeculativeBedrockClient``
+        context: The conversation context (of the context aggregators)
+        stable_secs: How long an interim transcript must stay unchanged
+        min_words: Fewest words worth speculating on
+    """
+
+    def __init__(
+        self,
+        llm: AWSBedrockLLMService,
+        context: OpenAILLMContext,
+        *,
+        stable_secs: float = SPECULATION_STABLE_MS / 1000,
+        min_words: int = SPECULATION_MIN_WORDS,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self._llm = llm
+        self._client: SpeculativeBedrockClient = llm._client
+        self._context = context
+        self._stable_secs = stable_secs
+        self._min_words = min_words
+        # Final transcripts of the current user turn, and the latest interim one
+        self._finals: List[str] = []
+        self._interim = ""
+        self._changed = asyncio.Event()
+        self._stability_task = None
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if isinstance(frame, UserStartedSpeakingFrame):
+            # Whatever was speculated before belongs to an earlier turn
+            self._client.cancel()
+            self._finals = []
+            self._interim = ""
+        elif isinstance(frame, InterimTranscriptionFrame):
+            self._interim = frame.text
+            self._on_transcript_changed()
+        elif isinstance(frame, TranscriptionFrame) and frame.text.strip():
+            # The user aggregator joins the final transcripts of a turn like this
+            self._finals.append(frame.text)
+            self._interim = ""
+            self._on_transcript_changed()
+
+        await self.push_frame(frame, direction)
+
+    async def cleanup(self):
+        if self._stability_task:
+            await self.cancel_task(self._stability_task)
+            self._stability_task = None
+        self._client.cancel()
+        await super().cleanup()
+        await self._report()
+
+    def _transcript(self) -> str:
+        return " ".join(self._finals + ([self._interim] if self._interim else []))
+
+    def _on_transcript_changed(self):
+        transcript = self._transcript()
+        speculation = self._client.speculation
+        if speculation and transcript_similarity(speculation.transcript, transcript) < SPECULATION_SIMILARITY:
+            # The user kept talking or Transcribe revised its guess
+            self._client.cancel()
+        self._changed.set()
+        if not self._stability_task:
+            self._stability_task = self.create_task(self._stability_task_handler())
+
+    async def _stability_task_handler(self):
+        while True:
+            await self._changed.wait()
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), self._stable_secs)
+                # Changed again before it was stable
+                continue
+            except asyncio.TimeoutError:
+                pass
+            self._speculate()
+
+    def _speculate(self):
+        transcript = self._transcript()
+        speculation = self._client.speculation
+        if len(transcript.split()) < self._min_words or (
+            speculation and speculation.transcript == transcript
+        ):
+            return
+        # The context the LLM will get once the user aggregator adds the turn
+        context = copy.copy(self._context)
+        context._messages = copy.deepcopy(self._context._messages)
+        context.system = copy.deepcopy(getattr(self._context, "system", None))
+        context.add_message({"role": "user", "content": transcript})
+        context = AWSBedrockLLMContext.upgrade_to_bedrock(context)
+        logger.debug(f"{self}: speculating on [{transcript}]")
+        self._client.speculate(bedrock_request(self._llm, context), transcript)
+
+    async def _report(self):
+        stats = self._client.stats()
+        logger.info(f"{self}: LLM speculation {stats}")
+        if not SPECULATION_STATS_URL:
+            return
+        counters = {key: value for key, value in stats.items() if isinstance(value, int)}
+        await post_stats(SPECULATION_STATS_URL, counters, "LLM speculation stats")
@@ -0,0 +1,219 @@
+"""Bedrock prompt caching of the stable prefix of each request.
+
+Every request of the flow repeats most of its input: the tools of the current
+node, the system prompt (the ``role_messages`` of the ``start`` node), the
+``task_messages`` of the nodes visited so far and the conversation up to the
+user's last words. ``PromptCachingBedrockClient`` wraps the LLM service's
+boto client and adds Bedrock cache checkpoints (``cachePoint`` blocks) to
+each request:
+
+- after the system prompt, covering the tools and the system prompt
+- after the task message of the current node, so the history up to the last
+  node transition is read from the cache for the rest of the node
+- after the last two user messages: the newest one writes the turn to the
+  cache, the previous one reads what the last request wrote
+
+Bedrock only caches prefixes of at least ``PROMPT_CACHE_MIN_TOKENS`` tokens,
+so a checkpoint is only added once the estimated length of the request up to
+it reaches that size. The checkpoints are computed from each request, so they follow the
+``FlowManager``'s node transitions without any hooks into the flow: a new
+node changes the tools and adds a task message, and the checkpoints move
+with them. The context itself is never changed.
+
+``PromptCacheStats`` sums the cache read and write token counts of the LLM
+usage metrics. Each bot posts its session's counters to the server
+(``PROMPT_CACHE_STATS_URL``) when the session ends.
+"""
+
+import json
+import os
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from loguru import logger
+
+from pipecat.frames.frames import Frame, MetricsFrame
+from pipecat.metrics.metrics import LLMUsageMetricsData
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+
+from stats_reporting import post_stats
+
+# Whether the bot adds cache checkpoints to its Bedrock requests
+PROMPT_CACHE = os.getenv("PROMPT_CACHE", "false").lower() in ("1", "true", "yes")
+
+# Server endpoint the session counters are posted to; only logged when unset
+PROMPT_CACHE_STATS_URL = os.getenv("PROMPT_CACHE_STATS_URL")
+
+# Shortest prefix Bedrock caches, in tokens (1,024 for Claude Sonnet and Nova
+# models); checkpoints after a shorter prefix are not added
+PROMPT_CACHE_MIN_TOKENS = int(os.getenv("PROMPT_CACHE_MIN_TOKENS", "1024"))
+
+# Most checkpoints Bedrock accepts per request
+MAX_CACHE_POINTS = 4
+
+# Characters per token, to estimate the length of a prefix without a tokenizer
+CHARS_PER_TOKEN = 4
+
+CACHE_POINT = {"cachePoint": {"type": "default"}}
+
+
+def task_message_texts(flow_config: Dict[str, Any]) -> List[str]:
+    """Texts of the ``task_messages`` of all nodes of a flow configuration."""
+    texts = []
+    for node in flow_config.get("nodes", {}).values():
+        for message in node.get("task_messages", []):
+            content = message["content"]
+            blocks = [content] if isinstance(content, str) else [block.get("text") for block in content]
+            texts.extend(text for text in blocks if text and text not in texts)
+    return texts
+
+
+def add_cache_points(
+    params: Dict[str, Any], stable_texts: Set[str], min_tokens: int = PROMPT_CACHE_MIN_TOKENS
+) -> Dict[str, Any]:
+    """``converse_stream`` parameters with cache checkpoints after the stable prefixes.
+
+    Args:
+        params: Request parameters; left unchanged
+        stable_texts: Texts of the task messages (see ``task_message_texts``)
+        min_tokens: Shortest prefix, in estimated tokens, a checkpoint is added after
+
+    Returns:
+        Dict[str, Any]: A copy of ``params`` with ``cachePoint`` blocks added
+    """
+    params = dict(params)
+    points = MAX_CACHE_POINTS
+    min_chars = min_tokens * CHARS_PER_TOKEN
+
+    prefix_chars = _length(params.get("toolConfig"))
+    system = params.get("system")
+    if isinstance(system, str):
+        system = [{"text": system}]
+    prefix_chars += _length(system)
+    if system and prefix_chars >= min_chars:
+        params["system"] = [*system, CACHE_POINT]
+        points -= 1
+
+    messages = params["messages"]
+    # (message, block) positions to checkpoint after, most valuable first
+    positions: List[Tuple[int, int]] = []
+    task_position = _last_block(messages, lambda block: block.get("text") in stable_texts)
+    if task_position:
+        positions.append(task_position)
+    user_messages = [i for i, message in enumerate(messages) if message["role"] == "user"]
+    for i in reversed(user_messages[-2:]):
+        positions.append((i, len(messages[i]["content"]) - 1))
+
+    # Length of the request up to the end of each block
+    ends: Dict[Tuple[int, int], int] = {}
+    for i, message in enumerate(messages):
+        for block, content in enumerate(message["content"]):
+            prefix_chars += _length(content)
+            ends[(i, block)] = prefix_chars
+
+    positions = [
+        position for position in dict.fromkeys(positions) if ends.get(position, 0) >= min_chars
+    ][:points]
+    if not positions:
+        return params
+
+    messages = list(messages)
+    for i, block in sorted(positions, reverse=True):
+        content = list(messages[i]["content"])
+        content.insert(block + 1, CACHE_POINT)
+        messages[i] = {**messages[i], "content": content}
+    params["messages"] = messages
+    return params
+
+
+def _length(value: Any) -> int:
+    return len(json.dumps(value, default=str)) if value else 0
+
+
+def _last_block(messages: List[Dict[str, Any]], matches) -> Optional[Tuple[int, int]]:
+    for i in range(len(messages) - 1, -1, -1):
+        content = messages[i]["content"]
+        if isinstance(content, str):
+            continue
+        for block in range(len(content) - 1, -1, -1):
+            if matches(content[block]):
+                return i, block
+    return None
+
+
+class PromptCachingBedrockClient:
+    """boto ``bedrock-runtime`` client that adds cache checkpoints to ``converse_stream``.
+
+    Everything else goes to the wrapped client.
+
+    Args:
+        client: The boto client to wrap
+        stable_texts: Texts of the task messages, checkpointed where they
+            appear (see ``task_message_texts``)
+    """
+
+    def __init__(self, client, stable_texts: Iterable[str] = ()):
+        self._client = client
+        self._stable_texts = set(stable_texts)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    def converse_stream(self, **params) -> Dict[str, Any]:
+        if any(isinstance(message["content"], str) for message in params["messages"]):
+            # Not in Bedrock's block format yet; nothing to attach checkpoints to
+            return self._client.converse_stream(**params)
+        return self._client.converse_stream(**add_cache_points(params, self._stable_texts))
+
+
+class PromptCacheStats(FrameProcessor):
+    """Sums the prompt cache token counts of the LLM usage metrics of a session.
+
+    Place it after the LLM service; usage metrics must be enabled on the task.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._counters = {
+            "requests": 0,
+            "input_tokens": 0,
+            "cache_read_input_tokens": 0,
+            "cache_write_input_tokens": 0,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """Prompt cache counters of this session.
+
+        Returns:
+            dict: requests, uncached input tokens, input tokens read from and
+            written to the cache, and the share of input tokens read from it
+        """
+        total = (
+            self._counters["input_tokens"]
+            + self._counters["cache_read_input_tokens"]
+            + self._counters["cache_write_input_tokens"]
+        )
+        return {
+            **self._counters,
+            "cache_read_ratio": self._counters["cache_read_input_tokens"] / total if total else None,
+        }
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+        if isinstance(frame, MetricsFrame):
+            for data in frame.data:
+                if isinstance(data, LLMUsageMetricsData):
+                    usage = data.value
+                    self._counters["requests"] += 1
+                    self._counters["input_tokens"] += usage.prompt_tokens
+                    self._counters["cache_read_input_tokens"] += usage.cache_read_input_tokens or 0
+                    self._counters["cache_write_input_tokens"] += usage.cache_creation_input_tokens or 0
+        await self.push_frame(frame, direction)
+
+    async def cleanup(self):
+        await super().cleanup()
+        await self._report()
+
+    async def _report(self):
+        stats = self.stats()
+        logger.info(f"{self}: prompt cache {stats}")
+        await post_stats(PROMPT_CACHE_STATS_URL, self._counters, "prompt cache stats")
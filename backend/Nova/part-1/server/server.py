@@ -24,7 +24,7 @@ import uvicorn
 import argparse
 import os
 import logging
-import subprocess
+import tempfile
 from contextlib import asynccontextmanager
 from typing import Any, Dict
 from logger_config import logger
@@ -39,7 +39,16 @@ from fastapi import FastAPI, HTTPException, Request, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse, RedirectResponse, FileResponse
 
-from pipecat.transports.services.helpers.daily_rest import DailyRESTHelper, DailyRoomParams
+from pipecat.transports.services.helpers.daily_rest import DailyRESTHelper
+
+from admission import AdmissionController, AdmissionRejected, BotResourceSampler
+from bot_pool import BotWorkerPool
+from bot_registry import BotRegistry
+from bot_spawner import ZygoteSpawner
+from latency_tracing import TurnLatencyStats
+from rate_budget import AWS_RATE_BUDGET, RateCoordinator
+from room_pool import RoomPool
+from session_scheduler import WorkerScheduler
 # from pipecat.transports.network.webrtc_connection import SmallWebRTCConnection
 
 # Load environment variables from .env file
@@ -50,8 +59,92 @@ logger = logging.getLogger("pc")
 # Maximum number of bot instances allowed per room
 MAX_BOTS_PER_ROOM = 1
 
-# Dictionary to track bot processes: {pid: (process, room_url)}
-bot_procs = {}
+# How bots are run: "process" starts one process per call, "zygote" forks
+# one process per call from a preloaded zygote, "worker" runs many sessions
+# in each of a fixed number of worker processes
+BOT_MODE = os.getenv("BOT_MODE", "process")
+
+# Number of multi-session worker processes in worker mode
+WORKER_COUNT = int(os.getenv("WORKER_COUNT", str(os.cpu_count() or 1)))
+
+# Maximum number of sessions hosted by one worker process in worker mode
+WORKER_MAX_SESSIONS = int(os.getenv("WORKER_MAX_SESSIONS", "8"))
+
+# Number of pre-warmed bot workers to keep ready (0 disables the pool); each
+# one keeps pipecat and the Silero VAD model loaded while it waits
+BOT_POOL_SIZE = int(os.getenv("BOT_POOL_SIZE", "0"))
+
+# Number of Daily rooms and tokens to keep pre-provisioned (0 disables the pool)
+ROOM_POOL_SIZE = int(os.getenv("ROOM_POOL_SIZE", "0"))
+
+# Lifetime in seconds of pre-provisioned rooms and tokens
+ROOM_POOL_TTL = int(os.getenv("ROOM_POOL_TTL", "3600"))
+
+# Maximum number of rooms provisioned concurrently by the pool
+ROOM_POOL_PARALLELISM = int(os.getenv("ROOM_POOL_PARALLELISM", "2"))
+
+# Seconds to keep finished bot processes visible through /status/{pid}
+BOT_RETENTION_SECS = int(os.getenv("BOT_RETENTION_SECS", "3600"))
+
+# Registry of bot processes, indexed by pid, state and room
+bot_registry = BotRegistry(retention=BOT_RETENTION_SECS)
+
+# Maximum number of concurrent bot sessions on this node
+MAX_SESSIONS_PER_NODE = int(os.getenv("MAX_SESSIONS_PER_NODE", str(2 * (os.cpu_count() or 1))))
+
+# Maximum number of new sessions waiting for a free slot
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "16"))
+
+# Seconds a new session may wait for a free slot
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "10"))
+
+# Seconds suggested to rejected clients through the Retry-After header
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "5"))
+
+# Derive the session cap from the CPU and memory measured per running bot
+ADMISSION_AUTO_CAP = os.getenv("ADMISSION_AUTO_CAP", "false").lower() in ("1", "true", "yes")
+
+# Admission controller for new sessions; every running bot holds one slot
+admission = AdmissionController(
+    max_sessions=MAX_SESSIONS_PER_NODE,
+    queue_size=ADMISSION_QUEUE_SIZE,
+    queue_timeout=ADMISSION_QUEUE_TIMEOUT,
+    retry_after=ADMISSION_RETRY_AFTER,
+)
+bot_registry.on_exit(lambda entry: admission.release())
+resource_sampler = BotResourceSampler(
+    admission,
+    pids=lambda: [entry.pid for entry in bot_registry.running()],
+    max_sessions=MAX_SESSIONS_PER_NODE,
+)
+
+# Voice-to-voice latency per stage of the turns reported by the bots
+latency_stats = TurnLatencyStats()
+
+# Synthesized-speech cache counters summed over the sessions reported by the bots
+tts_cache_totals: Dict[str, int] = {}
+
+# Speculative LLM generation counters summed over the sessions reported by the bots
+speculation_totals: Dict[str, int] = {}
+
+# Bedrock prompt cache token counters summed over the sessions reported by the bots
+prompt_cache_totals: Dict[str, int] = {}
+
+# Function-call tool cache counters summed over the reports of the bots
+tool_cache_totals: Dict[str, int] = {}
+
+# Function call filler counters, per tool ("<tool>.<counter>"), summed over the sessions reported by the bots
+filler_totals: Dict[str, int] = {}
+
+# Nova Sonic session rotation counters summed over the sessions reported by the bots
+session_rotation_totals: Dict[str, int] = {}
+
+# Shared AWS client counters summed over the sessions reported by the bots
+aws_clients_totals: Dict[str, int] = {}
+
+# Background pools (pre-warmed bot workers, Daily rooms, session workers,
+# zygote spawner) and the AWS rate budget, created in the lifespan manager
+pools = {}
 
 # Store Daily API helpers
 daily_helpers = {}
@@ -59,27 +152,135 @@ daily_helpers = {}
 # pcs_map: Dict[str, SmallWebRTCConnection] = {}
 
 
-def cleanup():
+async def cleanup():
     """Cleanup function to terminate all bot processes.
 
     Called during server shutdown.
     """
-    for entry in bot_procs.values():
-        proc = entry[0]
-        proc.terminate()
-        proc.wait()
+    await pools["bot_workers"].stop()
+    await pools["rooms"].stop()
+    await resource_sampler.stop()
+    await bot_registry.terminate_all()
+    if "session_workers" in pools:
+        await pools["session_workers"].stop()
+    if "zygote" in pools:
+        # After the bots, since the zygote reports their exits
+        await pools["zygote"].stop()
+    if "aws_rate" in pools:
+        await pools["aws_rate"].stop()
 
 
 def get_bot_file():
     return "bot"
 
 
+async def start_bot(room_url: str, token: str) -> asyncio.subprocess.Process:
+    """Start a bot for the given room.
+
+    In worker mode the session is placed on a multi-session worker, and in
+    zygote mode the bot is forked from the preloaded zygote. Otherwise
+    the room is handed to a pre-warmed worker when one is idle, falling back to
+    cold starting a new bot process.
+
+    Args:
+        room_url (str): Daily room URL the bot should join
+        token (str): Daily meeting token for the room
+
+    Returns:
+        asyncio.subprocess.Process: The bot process, or a handle that behaves
+            like one (worker session, forked bot)
+
+    Raises:
+        HTTPException: If the bot process could not be started, or 503 with a
+            Retry-After header if every session worker is full
+    """
+    try:
+        if BOT_MODE == "worker":
+            proc = await pools["session_workers"].start_session(room_url, token)
+        elif BOT_MODE == "zygote":
+            proc = await pools["zygote"].spawn(room_url, token)
+        else:
+            proc = await pools["bot_workers"].acquire(room_url, token)
+        if proc is None:
+            bot_file = get_bot_file()
+            proc = await asyncio.create_subprocess_exec(
+                "python3",
+                "-m",
+                bot_file,
+                "-u",
+                room_url,
+                "-t",
+                token,
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+            )
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=e.reason,
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to start subprocess: {e}")
+
+    bot_registry.add(proc, room_url)
+    return proc
+
+
+async def admit_session():
+    """Wait for a free session slot on this node.
+
+    Raises:
+        HTTPException: 429 if the wait queue is full, 503 if the wait timed out,
+            both with a Retry-After header
+    """
+    try:
+        await admission.acquire()
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=e.reason,
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+
+async def start_session() -> tuple[str, str]:
+    """Admit a new session, get a room for it and start its bot.
+
+    Returns:
+        tuple[str, str]: A tuple containing (room_url, token)
+
+    Raises:
+        HTTPException: If the session is not admitted, or room creation, token
+            generation or bot startup fails
+    """
+    await admit_session()
+    try:
+        print("Creating room")
+        room_url, token = await create_room_and_token()
+        print(f"Room URL: {room_url}")
+
+        # Check if there is already an existing process running in this room
+        if bot_registry.running_in_room(room_url) >= MAX_BOTS_PER_ROOM:
+            raise HTTPException(status_code=500, detail=f"Max bot limit reached for room: {room_url}")
+
+        await start_bot(room_url, token)
+    except BaseException:
+        # The slot is only released by the registry once a bot was started
+        admission.release()
+        raise
+    return room_url, token
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """FastAPI lifespan manager that handles startup and shutdown tasks.
 
     - Creates aiohttp session
     - Initializes Daily API helper
+    - Starts the pre-warmed bot worker and Daily room pools
+    - Starts the multi-session workers in worker mode
+    - Starts the preloaded bot zygote in zygote mode
+    - Hands out AWS request permits to the bots (see ``rate_budget``)
     - Cleans up resources on shutdown
     """
     aiohttp_session = aiohttp.ClientSession()
@@ -88,9 +289,42 @@ async def lifespan(app: FastAPI):
         daily_api_url=os.getenv("DAILY_API_URL", "https://api.daily.co/v1"),
         aiohttp_session=aiohttp_session,
     )
+    if AWS_RATE_BUDGET:
+        # Before any bot starts, so they all inherit the socket
+        pools["aws_rate"] = RateCoordinator()
+        await pools["aws_rate"].start(
+            os.environ.setdefault(
+                "AWS_RATE_SOCKET", os.path.join(tempfile.gettempdir(), f"nova-aws-rate-{os.getpid()}.sock")
+            )
+        )
+    if BOT_MODE == "worker":
+        pools["session_workers"] = WorkerScheduler(
+            num_workers=WORKER_COUNT,
+            max_sessions_per_worker=WORKER_MAX_SESSIONS,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            retry_after=ADMISSION_RETRY_AFTER,
+        )
+        await pools["session_workers"].start()
+    if BOT_MODE == "zygote":
+        pools["zygote"] = ZygoteSpawner(cwd=os.path.dirname(os.path.abspath(__file__)))
+        await pools["zygote"].start()
+    pools["bot_workers"] = BotWorkerPool(
+        size=BOT_POOL_SIZE if BOT_MODE == "process" else 0,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    await pools["bot_workers"].start()
+    pools["rooms"] = RoomPool(
+        daily_helpers["rest"],
+        size=ROOM_POOL_SIZE,
+        ttl=ROOM_POOL_TTL,
+        parallelism=ROOM_POOL_PARALLELISM,
+    )
+    await pools["rooms"].start()
+    if ADMISSION_AUTO_CAP:
+        await resource_sampler.start()
     yield
     await aiohttp_session.close()
-    cleanup()
+    await cleanup()
 
 
 # Initialize FastAPI app with lifespan manager
@@ -106,7 +340,10 @@ app.add_middleware(
 
 
 async def create_room_and_token() -> tuple[str, str]:
-    """Helper function to create a Daily room and generate an access token.
+    """Helper function to get a Daily room and access token.
+
+    Takes a pre-provisioned room from the room pool, or creates one on demand
+    when the pool is empty.
 
     Returns:
         tuple[str, str]: A tuple containing (room_url, token)
@@ -114,15 +351,10 @@ async def create_room_and_token() -> tuple[str, str]:
     Raises:
         HTTPException: If room creation or token generation fails
     """
-    room = await daily_helpers["rest"].create_room(DailyRoomParams())
-    if not room.url:
-        raise HTTPException(status_code=500, detail="Failed to create room")
-
-    token = await daily_helpers["rest"].get_token(room.url)
-    if not token:
-        raise HTTPException(status_code=500, detail=f"Failed to get token for room: {room.url}")
-
-    return room.url, token
+    try:
+        return await pools["rooms"].acquire()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/")
@@ -137,29 +369,7 @@ async def start_agent(request: Request):
     Raises:
         HTTPException: If room creation, token generation, or bot startup fails
     """
-    print("Creating room")
-    room_url, token = await create_room_and_token()
-    print(f"Room URL: {room_url}")
-
-    # Check if there is already an existing process running in this room
-    num_bots_in_room = sum(
-        1 for proc in bot_procs.values() if proc[1] == room_url and proc[0].poll() is None
-    )
-    if num_bots_in_room >= MAX_BOTS_PER_ROOM:
-        raise HTTPException(status_code=500, detail=f"Max bot limit reached for room: {room_url}")
-
-    # Spawn a new bot process
-    try:
-        bot_file = get_bot_file()
-        proc = subprocess.Popen(
-            ["python3", "-m", bot_file, "-u", room_url, "-t", token],
-            shell=False,
-            bufsize=1,
-            cwd=os.path.dirname(os.path.abspath(__file__)),
-        )
-        bot_procs[proc.pid] = (proc, room_url)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to start subprocess: {e}")
+    room_url, _ = await start_session()
 
     return RedirectResponse(room_url)
 
@@ -176,22 +386,7 @@ async def rtvi_connect(request: Request) -> Dict[Any, Any]:
     Raises:
         HTTPException: If room creation, token generation, or bot startup fails
     """
-    print("Creating room for RTVI connection")
-    room_url, token = await create_room_and_token()
-    print(f"Room URL: {room_url}")
-
-    # Start the bot process
-    try:
-        bot_file = get_bot_file()
-        proc = subprocess.Popen(
-            ["python3", "-m", bot_file, "-u", room_url, "-t", token],
-            shell=False,
-            bufsize=1,
-            cwd=os.path.dirname(os.path.abspath(__file__)),
-        )
-        bot_procs[proc.pid] = (proc, room_url)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to start subprocess: {e}")
+    room_url, token = await start_session()
 
     # Return the authentication bundle in format expected by DailyTransport
     return {"room_url": room_url, "token": token}
@@ -211,15 +406,385 @@ def get_status(pid: int):
         HTTPException: If the specified bot process is not found
     """
     # Look up the subprocess
-    proc = bot_procs.get(pid)
+    entry = bot_registry.get(pid)
 
     # If the subprocess doesn't exist, return an error
-    if not proc:
+    if not entry:
         raise HTTPException(status_code=404, detail=f"Bot with process id: {pid} not found")
 
-    # Check the status of the subprocess
-    status = "running" if proc[0].poll() is None else "finished"
-    return JSONResponse({"bot_id": pid, "status": status})
+    return JSONResponse({"bot_id": pid, "status": entry.state})
+
+
+@app.get("/pool")
+def get_pool_status():
+    """Get the size and hit/miss counters of the pre-warmed bot worker pool.
+
+    Returns:
+        JSONResponse: Pool statistics
+    """
+    return JSONResponse(pools["bot_workers"].stats())
+
+
+@app.get("/workers")
+def get_workers_status():
+    """Get the sessions hosted by each multi-session worker (worker mode only).
+
+    Returns:
+        JSONResponse: Worker statistics
+
+    Raises:
+        HTTPException: If the server is not running in worker mode
+    """
+    if "session_workers" not in pools:
+        raise HTTPException(status_code=404, detail="Server is not running in worker mode")
+    return JSONResponse(pools["session_workers"].stats())
+
+
+@app.get("/spawner")
+def get_spawner_status():
+    """Get spawn counters and spawn latency percentiles (zygote mode only).
+
+    Returns:
+        JSONResponse: Spawner statistics
+
+    Raises:
+        HTTPException: If the server is not running in zygote mode
+    """
+    if "zygote" not in pools:
+        raise HTTPException(status_code=404, detail="Server is not running in zygote mode")
+    return JSONResponse(pools["zygote"].stats())
+
+
+@app.get("/admission")
+def get_admission_status():
+    """Get the session cap, queue depth and admission counters of this node.
+
+    Returns:
+        JSONResponse: Admission statistics
+    """
+    return JSONResponse({**admission.stats(), **resource_sampler.stats()})
+
+
+@app.get("/rooms/pool")
+def get_room_pool_status():
+    """Get the depth, hit/miss counters and refill latency of the Daily room pool.
+
+    Returns:
+        JSONResponse: Room pool statistics
+    """
+    return JSONResponse(pools["rooms"].stats())
+
+
+@app.post("/latency/traces")
+async def report_latency_trace(request: Request):
+    """Record the stage latencies of a completed turn, as posted by the bots.
+
+    Args:
+        request: Turn trace with ``stages`` and ``total_ms`` in milliseconds
+
+    Returns:
+        JSONResponse: Number of turns recorded so far
+
+    Raises:
+        HTTPException: If the trace is malformed
+    """
+    try:
+        latency_stats.record(await request.json())
+    except (KeyError, TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid latency trace: {e}")
+    return JSONResponse({"turns": latency_stats.turns})
+
+
+@app.get("/latency")
+def get_latency_stats():
+    """Get voice-to-voice latency histograms and percentiles per stage.
+
+    Returns:
+        JSONResponse: Per-stage latency statistics of all reported turns
+    """
+    return JSONResponse(latency_stats.stats())
+
+
+async def add_session_counters(request: Request, totals: Dict[str, int], kind: str) -> Dict[str, int]:
+    """Add the counters of a session, as posted by a bot, to ``totals``.
+
+    Args:
+        request: Request whose JSON body maps counter names to integers
+        totals: Counters summed over all reported sessions, updated in place
+        kind: What the counters are, for the error message
+
+    Returns:
+        Dict[str, int]: The updated totals, including the number of sessions
+
+    Raises:
+        HTTPException: If the counters are malformed
+    """
+    try:
+        counters = {name: int(value) for name, value in (await request.json()).items()}
+    except (AttributeError, TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid {kind}: {e}")
+    for name, value in counters.items():
+        totals[name] = totals.get(name, 0) + value
+    totals["sessions"] = totals.get("sessions", 0) + 1
+    return totals
+
+
+@app.post("/tts-cache/stats")
+async def report_tts_cache_stats(request: Request):
+    """Add the synthesized-speech cache counters of a session, as posted by the bots.
+
+    Args:
+        request: Session counters, e.g. ``hits``, ``misses`` and ``bytes_saved``
+
+    Returns:
+        JSONResponse: Counters summed over all reported sessions
+
+    Raises:
+        HTTPException: If the counters are malformed
+    """
+    return JSONResponse(await add_session_counters(request, tts_cache_totals, "TTS cache stats"))
+
+
+@app.get("/tts-cache")
+def get_tts_cache_stats():
+    """Get the hit rate and bytes saved by the synthesized-speech cache.
+
+    Returns:
+        JSONResponse: Cache counters summed over all reported sessions
+    """
+    lookups = tts_cache_totals.get("hits", 0) + tts_cache_totals.get("misses", 0)
+    hit_rate = tts_cache_totals.get("hits", 0) / lookups if lookups else None
+    return JSONResponse({**tts_cache_totals, "hit_rate": hit_rate})
+
+
+@app.post("/speculation/stats")
+async def report_speculation_stats(request: Request):
+    """Add the speculative LLM generation counters of a session, as posted by the bots.
+
+    Args:
+        request: Session counters, e.g. ``hits``, ``misses`` and ``latency_saved_ms``
+
+    Returns:
+        JSONResponse: Counters summed over all reported sessions
+
+    Raises:
+        HTTPException: If the counters are malformed
+    """
+    return JSONResponse(await add_session_counters(request, speculation_totals, "speculation stats"))
+
+
+@app.get("/speculation")
+def get_speculation_stats():
+    """Get the hit rate, latency saved and tokens wasted by speculative LLM generation.
+
+    Returns:
+        JSONResponse: Speculation counters summed over all reported sessions
+    """
+    hits = speculation_totals.get("hits", 0)
+    decided = hits + speculation_totals.get("misses", 0)
+    return JSONResponse(
+        {
+            **speculation_totals,
+            "hit_rate": hits / decided if decided else None,
+            "mean_latency_saved_ms": speculation_totals.get("latency_saved_ms", 0) / hits if hits else None,
+        }
+    )
+
+
+@app.post("/prompt-cache/stats")
+async def report_prompt_cache_stats(request: Request):
+    """Add the Bedrock prompt cache token counters of a session, as posted by the bots.
+
+    Args:
+        request: Session counters, e.g. ``cache_read_input_tokens`` and ``cache_write_input_tokens``
+
+    Returns:
+        JSONResponse: Counters summed over all reported sessions
+
+    Raises:
+        HTTPException: If the counters are malformed
+    """
+    return JSONResponse(await add_session_counters(request, prompt_cache_totals, "prompt cache stats"))
+
+
+@app.get("/prompt-cache")
+def get_prompt_cache_stats():
+    """Get the input tokens read from and written to the Bedrock prompt cache.
+
+    Returns:
+        JSONResponse: Prompt cache counters summed over all reported sessions
+    """
+    read = prompt_cache_totals.get("cache_read_input_tokens", 0)
+    total = (
+        read
+        + prompt_cache_totals.get("cache_write_input_tokens", 0)
+        + prompt_cache_totals.get("input_tokens", 0)
+    )
+    return JSONResponse({**prompt_cache_totals, "cache_read_ratio": read / total if total else None})
+
+
+@app.post("/tool-cache/stats")
+async def report_tool_cache_stats(request: Request):
+    """Add the function-call tool cache counters of a bot process since its last report, as posted by the bots.
+
+    Args:
+        request: Counters, e.g. ``hits``, ``misses`` and ``coalesced``
+
+    Returns:
+        JSONResponse: Counters summed over all reports
+
+    Raises:
+        HTTPException: If the counters are malformed
+    """
+    return JSONResponse(await add_session_counters(request, tool_cache_totals, "tool cache stats"))
+
+
+@app.get("/tool-cache")
+def get_tool_cache_stats():
+    """Get the hit and coalesce rates of the function-call tool cache.
+
+    Returns:
+        JSONResponse: Tool cache counters summed over all reports
+    """
+    calls = sum(tool_cache_totals.get(name, 0) for name in ("hits", "misses", "coalesced"))
+    return JSONResponse(
+        {
+            **tool_cache_totals,
+            "hit_rate": tool_cache_totals.get("hits", 0) / calls if calls else None,
+            "coalesce_rate": tool_cache_totals.get("coalesced", 0) / calls if calls else None,
+        }
+    )
+
+
+@app.post("/filler/stats")
+async def report_filler_stats(request: Request):
+    """Add the function call filler counters of a session, as posted by the bots.
+
+    Args:
+        request: Session counters per tool, e.g. ``get_current_weather.calls``
+            and ``get_current_weather.fillers``
+
+    Returns:
+        JSONResponse: Counters summed over all reported sessions
+
+    Raises:
+        HTTPException: If the counters are malformed
+    """
+    return JSONResponse(await add_session_counters(request, filler_totals, "filler stats"))
+
+
+@app.get("/filler")
+def get_filler_stats():
+    """Get the filler trigger rate and perceived latency of function calls, per tool.
+
+    Returns:
+        JSONResponse: Per tool, counters summed over all reported sessions,
+            the fraction of calls that played a filler clip, and the mean
+            call time and perceived latency (until the caller heard the bot)
+    """
+    tools: Dict[str, Dict[str, int]] = {}
+    for name, value in filler_totals.items():
+        if "." in name:
+            tool, counter = name.rsplit(".", 1)
+            tools.setdefault(tool, {})[counter] = value
+
+    stats = {}
+    for tool, counters in tools.items():
+        calls, heard = counters.get("calls", 0), counters.get("heard", 0)
+        stats[tool] = {
+            **counters,
+            "trigger_rate": counters.get("fillers", 0) / calls if calls else None,
+            "mean_call_ms": counters.get("call_ms", 0) / calls if calls else None,
+            "mean_perceived_ms": counters.get("perceived_ms", 0) / heard if heard else None,
+        }
+    return JSONResponse({"sessions": filler_totals.get("sessions", 0), "tools": stats})
+
+
+@app.post("/session-rotation/stats")
+async def report_session_rotation_stats(request: Request):
+    """Add the Nova Sonic session rotation counters of a session, as posted by the bots.
+
+    Args:
+        request: Session counters, e.g. ``rotations``, ``forced`` and ``gap_ms``
+
+    Returns:
+        JSONResponse: Counters summed over all reported sessions
+
+    Raises:
+        HTTPException: If the counters are malformed
+    """
+    return JSONResponse(await add_session_counters(request, session_rotation_totals, "session rotation stats"))
+
+
+@app.get("/session-rotation")
+def get_session_rotation_stats():
+    """Get the Nova Sonic session rotations and the audio gap of their handovers.
+
+    Returns:
+        JSONResponse: Rotation counters summed over all reported sessions,
+            the fraction of rotations forced without a silence window, and
+            the mean audio gap of a handover
+    """
+    rotations, gaps = session_rotation_totals.get("rotations", 0), session_rotation_totals.get("gaps", 0)
+    return JSONResponse(
+        {
+            **session_rotation_totals,
+            "forced_rate": session_rotation_totals.get("forced", 0) / rotations if rotations else None,
+            "mean_gap_ms": session_rotation_totals.get("gap_ms", 0) / gaps if gaps else None,
+        }
+    )
+
+
+@app.post("/aws-clients/stats")
+async def report_aws_clients_stats(request: Request):
+    """Add the shared AWS client counters of a bot process since its last report, as posted by the bots.
+
+    Args:
+        request: Counters, e.g. ``clients_reused``, ``requests`` and ``new_connections``
+
+    Returns:
+        JSONResponse: Counters summed over all reports
+
+    Raises:
+        HTTPException: If the counters are malformed
+    """
+    return JSONResponse(await add_session_counters(request, aws_clients_totals, "AWS client stats"))
+
+
+@app.get("/aws-clients")
+def get_aws_clients_stats():
+    """Get how often the bots reused AWS clients and their open connections.
+
+    Returns:
+        JSONResponse: Client counters summed over all reports, and the
+            fractions of clients reused and of requests sent on a connection
+            already open
+    """
+    clients = aws_clients_totals.get("clients_created", 0) + aws_clients_totals.get("clients_reused", 0)
+    requests = aws_clients_totals.get("requests", 0)
+    return JSONResponse(
+        {
+            **aws_clients_totals,
+            "client_reuse_rate": aws_clients_totals.get("clients_reused", 0) / clients if clients else None,
+            "connection_reuse_rate": (
+                1 - aws_clients_totals.get("new_connections", 0) / requests if requests else None
+            ),
+        }
+    )
+
+
+@app.get("/aws-rate")
+def get_aws_rate_stats():
+    """Get the AWS request permits handed out to the bots.
+
+    Returns:
+        JSONResponse: Per AWS API and region, the permitted rate, permits
+            granted, requests held back (throttled) and their wait times per
+            priority (in-progress turns, greetings), and the requests waiting
+    """
+    if "aws_rate" not in pools:
+        raise HTTPException(status_code=404, detail="AWS rate budget is disabled")
+    return JSONResponse(pools["aws_rate"].stats())
 
 
 if __name__ == "__main__":
@@ -234,6 +799,17 @@ if __name__ == "__main__":
 
     config = parser.parse_args()
 
+    # Bots started by this server report their turn latencies, TTS cache, LLM
+    # speculation and prompt cache counters back to it
+    os.environ.setdefault("LATENCY_TRACE_URL", f"http://127.0.0.1:{config.port}/latency/traces")
+    os.environ.setdefault("TTS_CACHE_STATS_URL", f"http://127.0.0.1:{config.port}/tts-cache/stats")
+    os.environ.setdefault("SPECULATION_STATS_URL", f"http://127.0.0.1:{config.port}/speculation/stats")
+    os.environ.setdefault("PROMPT_CACHE_STATS_URL", f"http://127.0.0.1:{config.port}/prompt-cache/stats")
+    os.environ.setdefault("TOOL_CACHE_STATS_URL", f"http://127.0.0.1:{config.port}/tool-cache/stats")
+    os.environ.setdefault("FILLER_STATS_URL", f"http://127.0.0.1:{config.port}/filler/stats")
+    os.environ.setdefault("SESSION_ROTATION_STATS_URL", f"http://127.0.0.1:{config.port}/session-rotation/stats")
+    os.environ.setdefault("AWS_CLIENTS_STATS_URL", f"http://127.0.0.1:{config.port}/aws-clients/stats")
+
     # Start the FastAPI server
     uvicorn.run(
         "server:app",
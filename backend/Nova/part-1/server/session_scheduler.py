@@ -0,0 +1,217 @@
+"""Scheduling of bot sessions across multi-session worker processes.
+
+In worker mode the server keeps a fixed number of ``session_worker`` processes
+(about one per core) and places each new session on the least loaded one,
+instead of starting a new process per call. Workers that die are replaced,
+and the sessions they were hosting are reported as finished.
+
+Each session is represented by a ``WorkerSession`` handle that behaves like the
+``asyncio.subprocess.Process`` of a process-per-call bot (``pid``,
+``returncode``, ``wait()``, ``terminate()``), so the bot registry, ``/status``
+and admission control work the same in both modes.
+"""
+
+import asyncio
+import itertools
+import json
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+from admission import AdmissionRejected
+
+WORKER_MODULE = "session_worker"
+
+# Session ids start above Linux's largest possible pid so they never collide
+# with the pid of a process-per-call bot.
+SESSION_ID_BASE = 1 << 22
+
+
+class WorkerSession:
+    """Handle for a bot session hosted by a worker process."""
+
+    def __init__(self, session_id: int, worker: "WorkerProcess"):
+        self.pid = session_id
+        self.returncode: Optional[int] = None
+        self._worker = worker
+        self._done = asyncio.Event()
+
+    async def wait(self) -> int:
+        await self._done.wait()
+        return self.returncode
+
+    def terminate(self):
+        if self.returncode is None:
+            self._worker.send({"cmd": "stop", "session_id": self.pid})
+
+    def kill(self):
+        self.terminate()
+
+    def finish(self, returncode: int):
+        if self.returncode is None:
+            self.returncode = returncode
+            self._done.set()
+
+
+class WorkerProcess:
+    """A running ``session_worker`` process and the sessions it hosts."""
+
+    def __init__(self, proc: asyncio.subprocess.Process):
+        self.proc = proc
+        self.sessions: Dict[int, WorkerSession] = {}
+        self.reader: Optional[asyncio.Task] = None
+
+    @property
+    def alive(self) -> bool:
+        return self.proc.returncode is None
+
+    def send(self, command: Dict[str, Any]):
+        try:
+            self.proc.stdin.write((json.dumps(command) + "\n").encode())
+        except (BrokenPipeError, ConnectionResetError):
+            logger.warning(f"Session worker {self.proc.pid} is gone, dropping {command['cmd']}")
+
+
+class WorkerScheduler:
+    """Runs bot sessions on a fixed set of multi-session worker processes.
+
+    Args:
+        num_workers: Number of worker processes to keep running
+        max_sessions_per_worker: Maximum number of sessions placed on one worker
+        cwd: Working directory the workers are started in
+        startup_timeout: Seconds to wait for a new worker to report ready
+        retry_after: Seconds suggested to callers rejected because every worker is full
+    """
+
+    def __init__(
+        self,
+        num_workers: int,
+        max_sessions_per_worker: int,
+        cwd: str,
+        startup_timeout: float = 120.0,
+        retry_after: int = 5,
+    ):
+        self._num_workers = max(num_workers, 1)
+        self._max_sessions_per_worker = max_sessions_per_worker
+        self._cwd = cwd
+        self._startup_timeout = startup_timeout
+        self._retry_after = retry_after
+        self._workers: List[WorkerProcess] = []
+        self._session_ids = itertools.count(SESSION_ID_BASE)
+        self._stopping = False
+        self._restarts = 0
+
+    async def start(self):
+        """Start all worker processes."""
+        await asyncio.gather(*(self._spawn_worker() for _ in range(self._num_workers)))
+
+    async def stop(self):
+        """Stop every worker; their sessions end when stdin closes."""
+        self._stopping = True
+        for worker in self._workers:
+            if worker.alive:
+                worker.proc.stdin.close()
+        await asyncio.gather(
+            *(worker.reader for worker in self._workers if worker.reader), return_exceptions=True
+        )
+
+    async def start_session(self, room_url: str, token: str) -> WorkerSession:
+        """Place a new session on the least loaded worker.
+
+        Args:
+            room_url: Daily room URL the bot should join
+            token: Daily meeting token for the room
+
+        Returns:
+            WorkerSession: Handle for the new session
+
+        Raises:
+            AdmissionRejected: With status 503 if every worker is down or at capacity
+        """
+        candidates = [
+            worker
+            for worker in self._workers
+            if worker.alive and len(worker.sessions) < self._max_sessions_per_worker
+        ]
+        if not candidates:
+            raise AdmissionRejected(
+                503, self._retry_after, "No session worker has capacity for a new session"
+            )
+
+        worker = min(candidates, key=lambda w: len(w.sessions))
+        session = WorkerSession(next(self._session_ids), worker)
+        worker.sessions[session.pid] = session
+        worker.send(
+            {"cmd": "start", "session_id": session.pid, "room_url": room_url, "token": token}
+        )
+        await worker.proc.stdin.drain()
+        return session
+
+    def stats(self) -> Dict[str, Any]:
+        """Sessions per worker and restart counter."""
+        return {
+            "workers": [
+                {"pid": worker.proc.pid, "alive": worker.alive, "sessions": len(worker.sessions)}
+                for worker in self._workers
+            ],
+            "max_sessions_per_worker": self._max_sessions_per_worker,
+            "sessions": sum(len(worker.sessions) for worker in self._workers),
+            "restarts": self._restarts,
+        }
+
+    async def _spawn_worker(self):
+        proc = await asyncio.create_subprocess_exec(
+            "python3",
+            "-m",
+            WORKER_MODULE,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            cwd=self._cwd,
+        )
+        try:
+            line = await asyncio.wait_for(proc.stdout.readline(), timeout=self._startup_timeout)
+            if json.loads(line or b"{}").get("event") != "ready":
+                raise RuntimeError(f"unexpected worker handshake: {line!r}")
+        except Exception as e:
+            logger.error(f"Session worker {proc.pid} failed to start: {e}")
+            if proc.returncode is None:
+                proc.kill()
+                await proc.wait()
+            raise
+
+        worker = WorkerProcess(proc)
+        worker.reader = asyncio.create_task(self._read_events(worker))
+        self._workers.append(worker)
+        logger.debug(f"Session worker {proc.pid} ready")
+
+    async def _read_events(self, worker: WorkerProcess):
+        while True:
+            line = await worker.proc.stdout.readline()
+            if not line:
+                break
+            try:
+                event = json.loads(line)
+            except json.JSONDecodeError:
+                logger.error(f"Invalid session worker event: {line!r}")
+                continue
+
+            if event.get("event") == "ended":
+                session = worker.sessions.pop(event["session_id"], None)
+                if session:
+                    session.finish(0 if event.get("error") is None else 1)
+
+        returncode = await worker.proc.wait()
+        for session in worker.sessions.values():
+            session.finish(returncode if returncode else -1)
+        worker.sessions.clear()
+        self._workers.remove(worker)
+
+        if not self._stopping:
+            logger.warning(f"Session worker {worker.proc.pid} exited with code {returncode}")
+            self._restarts += 1
+            while not self._stopping:
+                try:
+                    await self._spawn_worker()
+                    break
+                except Exception:
+                    await asyncio.sleep(5)
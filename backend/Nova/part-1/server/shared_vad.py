@@ -0,0 +1,219 @@
+"""Shared, batched Silero VAD inference for multi-session processes.
+
+Every ``SileroVADAnalyzer`` owns an ONNX session and runs one inference per
+20-30 ms audio chunk, so with dozens of calls in one process most VAD time is
+spent on per-call inference overhead. ``SharedSileroVADService`` owns a single
+ONNX session; ``SharedSileroVADAnalyzer`` instances (one per session) submit
+their chunks to it, and a batching thread runs all chunks pending within one
+tick as a single NumPy-batched inference before handing each session back its
+speech probability.
+
+Each analyzer keeps its own recurrent model state and audio context, resets it
+on the same schedule as ``SileroVADAnalyzer`` and inherits ``VADAnalyzer``'s
+handling of ``VADParams``, so speech start/stop behaviour is unchanged.
+"""
+
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+from typing import Dict, List, Optional
+
+import numpy as np
+from loguru import logger
+
+from pipecat.audio.vad.silero import SileroOnnxModel
+from pipecat.audio.vad.vad_analyzer import VADAnalyzer, VADParams
+
+# Same model state reset interval as SileroVADAnalyzer
+MODEL_RESET_STATES_TIME = 5.0
+
+# Size of the Silero recurrent state per stream
+STATE_SIZE = 128
+
+
+class _Request:
+    __slots__ = ("stream", "audio", "sample_rate", "future")
+
+    def __init__(self, stream: "SharedSileroVADAnalyzer", audio: np.ndarray, sample_rate: int):
+        self.stream = stream
+        self.audio = audio
+        self.sample_rate = sample_rate
+        self.future: Future = Future()
+
+
+class SharedSileroVADService:
+    """Runs Silero VAD for many sessions as batched inferences.
+
+    Args:
+        tick_secs: Longest time a chunk waits for other sessions' chunks
+            before its batch is run
+    """
+
+    def __init__(self, tick_secs: float = 0.005):
+        self._tick_secs = tick_secs
+        self._session = SileroOnnxModel(_silero_model_path(), force_onnx_cpu=True).session
+        self._pending: List[_Request] = []
+        self._condition = threading.Condition()
+        self._streams = weakref.WeakSet()
+        self._batches = 0
+        self._chunks = 0
+        self._thread = threading.Thread(target=self._run, name="shared-vad", daemon=True)
+        self._thread.start()
+
+    def register(self, stream: "SharedSileroVADAnalyzer"):
+        with self._condition:
+            self._streams.add(stream)
+
+    def submit(self, stream: "SharedSileroVADAnalyzer", audio: np.ndarray, sample_rate: int) -> Future:
+        """Queue a chunk for the next batch.
+
+        Returns:
+            Future: Resolves to the chunk's speech probability
+        """
+        request = _Request(stream, audio, sample_rate)
+        with self._condition:
+            self._pending.append(request)
+            self._condition.notify()
+        return request.future
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "streams": len(self._streams),
+            "batches": self._batches,
+            "chunks": self._chunks,
+            "mean_batch_size": self._chunks / self._batches if self._batches else 0.0,
+        }
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                # Wait for the other sessions' chunks, but no longer than a tick
+                deadline = time.monotonic() + self._tick_secs
+                while len(self._pending) < len(self._streams):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                batch, self._pending = self._pending, []
+
+            by_rate: Dict[int, List[_Request]] = {}
+            for request in batch:
+                by_rate.setdefault(request.sample_rate, []).append(request)
+            for sample_rate, requests in by_rate.items():
+                try:
+                    self._infer(requests, sample_rate)
+                except Exception as e:
+                    logger.error(f"Shared VAD inference failed: {e}")
+                    for request in requests:
+                        if not request.future.done():
+                            request.future.set_result(0.0)
+
+    def _infer(self, requests: List[_Request], sample_rate: int):
+        # A stream may only have one chunk in flight, so stacking per-stream
+        # state is safe.
+        audio = np.stack(
+            [np.concatenate((r.stream._context, r.audio)) for r in requests]
+        ).astype(np.float32, copy=False)
+        state = np.stack([r.stream._state for r in requests], axis=1)
+
+        out, new_state = self._session.run(
+            None, {"input": audio, "state": state, "sr": np.array(sample_rate, dtype=np.int64)}
+        )
+
+        context_size = requests[0].stream._context.shape[0]
+        for i, request in enumerate(requests):
+            request.stream._state = new_state[:, i, :].copy()
+            request.stream._context = audio[i, -context_size:].copy()
+            request.future.set_result(float(out[i][0]))
+
+        self._batches += 1
+        self._chunks += len(requests)
+
+
+class SharedSileroVADAnalyzer(VADAnalyzer):
+    """Per-session Silero VAD analyzer backed by a shared, batched model.
+
+    Args:
+        service: Shared VAD service; defaults to the process-wide one
+        sample_rate: Optional fixed sample rate (8000 or 16000)
+        params: Voice activity detection parameters
+    """
+
+    def __init__(
+        self,
+        *,
+        service: Optional[SharedSileroVADService] = None,
+        sample_rate: Optional[int] = None,
+        params: VADParams = VADParams(),
+    ):
+        super().__init__(sample_rate=sample_rate, params=params)
+        self._service = service or shared_vad_service()
+        self._service.register(self)
+        self._last_reset_time = 0.0
+        self._reset_states()
+
+    def set_sample_rate(self, sample_rate: int):
+        if sample_rate != 16000 and sample_rate != 8000:
+            raise ValueError(
+                f"Silero VAD sample rate needs to be 16000 or 8000 (sample rate: {sample_rate})"
+            )
+        super().set_sample_rate(sample_rate)
+        self._reset_states()
+
+    def num_frames_required(self) -> int:
+        return 512 if self.sample_rate == 16000 else 256
+
+    def voice_confidence(self, buffer) -> float:
+        try:
+            audio = np.frombuffer(buffer, np.int16).astype(np.float32) / 32768.0
+            confidence = self._service.submit(self, audio, self.sample_rate).result()
+
+            # Reset the model state every few seconds, like SileroVADAnalyzer
+            now = time.time()
+            if now - self._last_reset_time >= MODEL_RESET_STATES_TIME:
+                self._reset_states()
+                self._last_reset_time = now
+
+            return confidence
+        except Exception as e:
+            logger.error(f"Error analyzing audio with shared Silero VAD: {e}")
+            return 0
+
+    def _reset_states(self):
+        context_size = 64 if self.sample_rate == 16000 else 32
+        self._state = np.zeros((2, STATE_SIZE), dtype=np.float32)
+        self._context = np.zeros(context_size, dtype=np.float32)
+
+
+_shared_service: Optional[SharedSileroVADService] = None
+_shared_service_lock = threading.Lock()
+
+
+def shared_vad_service() -> SharedSileroVADService:
+    """The process-wide shared VAD service, created on first use."""
+    global _shared_service
+    with _shared_service_lock:
+        if _shared_service is None:
+            _shared_service = SharedSileroVADService()
+        return _shared_service
+
+
+def _silero_model_path() -> str:
+    # Same lookup as SileroVADAnalyzer
+    model_name = "silero_vad.onnx"
+    package_path = "pipecat.audio.vad.data"
+    try:
+        import importlib_resources as impresources
+
+        return str(impresources.files(package_path).joinpath(model_name))
+    except BaseException:
+        from importlib import resources as impresources
+
+        try:
+            with impresources.path(package_path, model_name) as f:
+                return str(f)
+        except BaseException:
+            return str(impresources.files(package_path).joinpath(model_name))
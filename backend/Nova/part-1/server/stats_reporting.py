@@ -0,0 +1,38 @@
+"""Helpers of the modules that keep counters and latency samples.
+
+``percentile`` summarizes latency samples for the stats endpoints, and
+``post_stats`` posts a session's counters to the server endpoint of a
+feature (the ``*_STATS_URL`` variables). A failed post is logged, never
+raised: reporting must not end a session.
+"""
+
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+from loguru import logger
+
+
+def percentile(sorted_values: List[float], percent: float) -> Optional[float]:
+    """Nearest-rank ``percent`` percentile of ascending samples, or None without samples."""
+    if not sorted_values:
+        return None
+    index = min(int(round(percent / 100 * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+async def post_stats(url: Optional[str], payload: Dict[str, Any], what: str):
+    """Post ``payload`` as JSON to ``url``, logging a warning if it fails.
+
+    Args:
+        url: Server endpoint; nothing is posted when unset
+        payload: Counters to post
+        what: What is posted, for the warning, e.g. ``"TTS cache stats"``
+    """
+    if not url:
+        return
+    try:
+        async with aiohttp.ClientSession() as session:
+            async with session.post(url, json=payload, timeout=aiohttp.ClientTimeout(total=5)) as response:
+                response.raise_for_status()
+    except Exception as e:
+        logger.warning(f"Failed to post {what} to {url}: {e}")
@@ -0,0 +1,116 @@
+import asyncio
+
+import pytest
+
+from admission import AdmissionController, AdmissionRejected
+
+
+def controller(max_sessions=2, queue_size=2, queue_timeout=1.0):
+    return AdmissionController(max_sessions, queue_size, queue_timeout, retry_after=7)
+
+
+def test_admits_up_to_the_cap():
+    async def run():
+        admission = controller()
+        await admission.acquire()
+        await admission.acquire()
+
+        stats = admission.stats()
+        assert stats["active"] == 2
+        assert stats["admitted"] == 2
+        assert stats["queue_depth"] == 0
+
+    asyncio.run(run())
+
+
+def test_queued_session_gets_the_released_slot():
+    async def run():
+        admission = controller(max_sessions=1)
+        await admission.acquire()
+        queued = asyncio.create_task(admission.acquire())
+        await asyncio.sleep(0)
+        assert admission.stats()["queue_depth"] == 1
+        assert not queued.done()
+
+        admission.release()
+        await queued
+
+        stats = admission.stats()
+        assert stats["active"] == 1
+        assert stats["admitted"] == 2
+        assert stats["queued"] == 1
+        assert stats["queue_depth"] == 0
+
+    asyncio.run(run())
+
+
+def test_rejects_with_429_when_the_queue_is_full():
+    async def run():
+        admission = controller(max_sessions=1, queue_size=1)
+        await admission.acquire()
+        queued = asyncio.create_task(admission.acquire())
+        await asyncio.sleep(0)
+
+        with pytest.raises(AdmissionRejected) as rejected:
+            await admission.acquire()
+        assert rejected.value.status_code == 429
+        assert rejected.value.retry_after == 7
+        assert admission.stats()["rejected_queue_full"] == 1
+
+        queued.cancel()
+        await asyncio.gather(queued, return_exceptions=True)
+
+    asyncio.run(run())
+
+
+def test_rejects_with_503_after_the_queue_timeout():
+    async def run():
+        admission = controller(max_sessions=1, queue_timeout=0.01)
+        await admission.acquire()
+
+        with pytest.raises(AdmissionRejected) as rejected:
+            await admission.acquire()
+        assert rejected.value.status_code == 503
+        assert rejected.value.retry_after == 7
+
+        stats = admission.stats()
+        assert stats["rejected_timeout"] == 1
+        assert stats["queue_depth"] == 0
+        assert stats["active"] == 1
+
+    asyncio.run(run())
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def run():
+        admission = controller(max_sessions=1)
+        await admission.acquire()
+        queued = asyncio.create_task(admission.acquire())
+        await asyncio.sleep(0)
+
+        queued.cancel()
+        await asyncio.gather(queued, return_exceptions=True)
+        assert admission.stats()["queue_depth"] == 0
+
+        admission.release()
+        assert admission.stats()["active"] == 0
+        await admission.acquire()
+        assert admission.stats()["active"] == 1
+
+    asyncio.run(run())
+
+
+def test_raising_the_cap_admits_queued_sessions():
+    async def run():
+        admission = controller(max_sessions=1)
+        await admission.acquire()
+        queued = asyncio.create_task(admission.acquire())
+        await asyncio.sleep(0)
+
+        admission.set_max_sessions(2)
+        await queued
+
+        assert admission.max_sessions == 2
+        assert admission.stats()["active"] == 2
+
+    asyncio.run(run())
@@ -0,0 +1,94 @@
+import copy
+
+from prompt_caching import CACHE_POINT, MAX_CACHE_POINTS, add_cache_points, task_message_texts
+
+TASK = "Ask the caller where they want to travel."
+
+
+def message(role, *texts):
+    return {"role": role, "content": [{"text": text} for text in texts]}
+
+
+def request():
+    return {
+        "system": [{"text": "You are a travel agent."}],
+        "toolConfig": {"tools": [{"toolSpec": {"name": "choose_destination"}}]},
+        "messages": [
+            message("user", TASK),
+            message("assistant", "Where would you like to go?"),
+            message("user", "Paris, please."),
+            message("assistant", "Great choice."),
+            message("user", "In May."),
+        ],
+    }
+
+
+def cache_points(params):
+    """(message, block) positions of the checkpoints in the messages."""
+    return [
+        (i, block)
+        for i, message in enumerate(params["messages"])
+        for block, content in enumerate(message["content"])
+        if content == CACHE_POINT
+    ]
+
+
+def test_checkpoints_system_prompt_task_message_and_last_user_turns():
+    params = add_cache_points(request(), {TASK}, min_tokens=0)
+
+    assert params["system"][-1] == CACHE_POINT
+    # After the task message, and after each of the last two user messages
+    assert cache_points(params) == [(0, 1), (2, 1), (4, 1)]
+
+
+def test_leaves_the_request_unchanged():
+    params = request()
+    original = copy.deepcopy(params)
+    add_cache_points(params, {TASK}, min_tokens=0)
+    assert params == original
+
+
+def test_skips_checkpoints_after_a_short_prefix():
+    params = add_cache_points(request(), {TASK}, min_tokens=1024)
+
+    assert CACHE_POINT not in params["system"]
+    assert cache_points(params) == []
+
+
+def test_only_checkpoints_once_the_prefix_is_long_enough():
+    params = request()
+    params["messages"][2] = message("user", "x" * 400)
+    params = add_cache_points(params, {TASK}, min_tokens=100)
+
+    assert CACHE_POINT not in params["system"]
+    # The task message comes before the long user message, so is too short
+    assert cache_points(params) == [(2, 1), (4, 1)]
+
+
+def test_checkpoints_a_block_only_once():
+    params = request()
+    params["messages"] = params["messages"][:1]
+    params = add_cache_points(params, {TASK}, min_tokens=0)
+
+    # The task message is also the last user message
+    assert cache_points(params) == [(0, 1)]
+    assert params["system"].count(CACHE_POINT) + len(cache_points(params)) <= MAX_CACHE_POINTS
+
+
+def test_accepts_a_string_system_prompt():
+    params = request()
+    params["system"] = "You are a travel agent."
+    params = add_cache_points(params, set(), min_tokens=0)
+
+    assert params["system"] == [{"text": "You are a travel agent."}, CACHE_POINT]
+
+
+def test_task_message_texts_of_a_flow():
+    flow = {
+        "nodes": {
+            "start": {"task_messages": [{"role": "system", "content": TASK}]},
+            "dates": {"task_messages": [{"role": "system", "content": [{"text": "Ask for dates."}]}]},
+            "again": {"task_messages": [{"role": "system", "content": TASK}]},
+        }
+    }
+    assert task_message_texts(flow) == [TASK, "Ask for dates."]
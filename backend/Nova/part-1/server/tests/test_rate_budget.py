@@ -0,0 +1,146 @@
+import asyncio
+import os
+import tempfile
+
+import pytest
+
+from rate_budget import GREETING, TURN, RateBudgetClient, RateCoordinator, parse_limits
+
+
+def test_parse_limits():
+    assert parse_limits("polly=8, bedrock=2.5,") == {"polly": 8.0, "bedrock": 2.5}
+    with pytest.raises(ValueError):
+        parse_limits("polly=0")
+    with pytest.raises(ValueError):
+        parse_limits("polly")
+
+
+def test_bucket_allows_a_burst_then_the_rate():
+    async def run():
+        coordinator = RateCoordinator({"polly": 20}, burst_secs=0.25)
+        waits = [await coordinator.acquire("polly", "us-east-1") for _ in range(5)]
+
+        # Five permits in a burst, then one every 50 ms
+        assert waits[:5] == [0.0] * 5
+        wait = await coordinator.acquire("polly", "us-east-1")
+        assert 0.02 < wait < 0.2
+
+        stats = coordinator.stats()["polly/us-east-1"]
+        assert stats["turn_permits"] == 6
+        assert stats["turn_throttled"] == 1
+        await coordinator.stop()
+
+    asyncio.run(run())
+
+
+def test_apis_without_a_limit_are_not_held_back():
+    async def run():
+        coordinator = RateCoordinator({"polly": 1}, burst_secs=1)
+        waits = [await coordinator.acquire("bedrock", "us-east-1") for _ in range(10)]
+
+        assert waits == [0.0] * 10
+        assert coordinator.stats() == {}
+
+    asyncio.run(run())
+
+
+def test_each_region_has_its_own_bucket():
+    async def run():
+        coordinator = RateCoordinator({"polly": 1}, burst_secs=1)
+
+        assert await coordinator.acquire("polly", "us-east-1") == 0.0
+        assert await coordinator.acquire("polly", "eu-west-1") == 0.0
+        assert set(coordinator.stats()) == {"polly/us-east-1", "polly/eu-west-1"}
+
+    asyncio.run(run())
+
+
+def test_turns_are_served_before_greetings():
+    async def run():
+        coordinator = RateCoordinator({"polly": 20}, burst_secs=0.05)
+        await coordinator.acquire("polly", "us-east-1")
+
+        granted = []
+
+        async def acquire(priority):
+            await coordinator.acquire("polly", "us-east-1", priority)
+            granted.append(priority)
+
+        greeting = asyncio.create_task(acquire(GREETING))
+        await asyncio.sleep(0)
+        turn = asyncio.create_task(acquire(TURN))
+        await asyncio.gather(greeting, turn)
+
+        assert granted == [TURN, GREETING]
+        await coordinator.stop()
+
+    asyncio.run(run())
+
+
+def test_cancelled_waiters_do_not_take_a_permit():
+    async def run():
+        coordinator = RateCoordinator({"polly": 10}, burst_secs=0.1)
+        await coordinator.acquire("polly", "us-east-1")
+
+        cancelled = asyncio.create_task(coordinator.acquire("polly", "us-east-1"))
+        await asyncio.sleep(0)
+        waiting = asyncio.create_task(coordinator.acquire("polly", "us-east-1"))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.gather(cancelled, return_exceptions=True)
+
+        # The next permit goes to the request still waiting
+        assert await waiting < 0.2
+        stats = coordinator.stats()["polly/us-east-1"]
+        assert stats["cancelled"] == 1
+        assert stats["turn_permits"] == 2
+        assert stats["queued"] == 0
+        await coordinator.stop()
+
+    asyncio.run(run())
+
+
+def test_bots_acquire_permits_over_the_socket():
+    async def run():
+        path = os.path.join(tempfile.mkdtemp(), "rate.sock")
+        coordinator = RateCoordinator({"polly": 10}, burst_secs=0.1)
+        await coordinator.start(path)
+        client = RateBudgetClient(path, max_wait_ms=1000)
+
+        assert await client.acquire("polly", "us-east-1") < 0.05
+        assert 0.05 < await client.acquire("polly", "us-east-1") < 0.5
+        assert coordinator.stats()["polly/us-east-1"]["turn_permits"] == 2
+
+        await coordinator.stop()
+        assert not os.path.exists(path)
+
+    asyncio.run(run())
+
+
+def test_bots_send_anyway_after_the_maximum_wait():
+    async def run():
+        path = os.path.join(tempfile.mkdtemp(), "rate.sock")
+        coordinator = RateCoordinator({"polly": 0.1}, burst_secs=1)
+        await coordinator.start(path)
+        client = RateBudgetClient(path, max_wait_ms=50)
+
+        await client.acquire("polly", "us-east-1")
+        assert await client.acquire("polly", "us-east-1") < 0.5
+        # The server drops the request the bot gave up on
+        await asyncio.sleep(0.05)
+        stats = coordinator.stats()["polly/us-east-1"]
+        assert stats["cancelled"] == 1
+        assert stats["queued"] == 0
+
+        await coordinator.stop()
+
+    asyncio.run(run())
+
+
+def test_bots_without_a_server_are_not_held_back():
+    async def run():
+        client = RateBudgetClient(os.path.join(tempfile.mkdtemp(), "missing.sock"))
+        assert await client.acquire("polly", "us-east-1") == 0.0
+        assert await client.acquire("polly", "us-east-1") == 0.0
+
+    asyncio.run(run())
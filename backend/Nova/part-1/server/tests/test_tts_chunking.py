@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+from pipecat.frames.frames import (
+    LLMFullResponseEndFrame,
+    LLMFullResponseStartFrame,
+    LLMTextFrame,
+)
+from pipecat.tests.utils import SleepFrame, run_test
+
+from tts_chunking import SENTENCE_BOUNDARY, SpeakableTextChunker
+
+
+def chunk(tokens, expected_fragments, sleep=None, **kwargs):
+    """Run ``tokens`` through a chunker and return the text fragments it sends."""
+    frames = [LLMFullResponseStartFrame()]
+    frames += [LLMTextFrame(token) for token in tokens]
+    if sleep:
+        frames.append(SleepFrame(sleep))
+    frames.append(LLMFullResponseEndFrame())
+    expected = (
+        [LLMFullResponseStartFrame]
+        + [LLMTextFrame] * expected_fragments
+        + [LLMFullResponseEndFrame]
+    )
+    received, _ = asyncio.run(
+        run_test(SpeakableTextChunker(**kwargs), frames_to_send=frames, expected_down_frames=expected)
+    )
+    return [frame.text for frame in received if isinstance(frame, LLMTextFrame)]
+
+
+@pytest.mark.parametrize(
+    "text, ends",
+    [
+        ("Hello there. How are you", [12]),
+        ("Plan B. Then we go", [7]),
+        ("Take vitamin C! It helps", [15]),
+        ("Was it I? Yes", [9]),
+        ('He said "hi." Then left', [13]),
+        ("Wait... okay", [7]),
+        ("Call Dr. Smith now", []),
+        ("Mrs. Jones called", []),
+        ("In the U.S. it rains", []),
+        ("We leave at 3 p.m. tomorrow", []),
+        ("Bring snacks, e.g. the fruit", []),
+        ("It costs 3.5 dollars", []),
+        ("No whitespace yet.", []),
+    ],
+)
+def test_sentence_boundaries(text, ends):
+    assert [match.end() for match in SENTENCE_BOUNDARY.finditer(text)] == ends
+
+
+def test_cuts_streamed_text_at_sentence_ends():
+    fragments = chunk(
+        ["Hello the", "re. How are", " you? I", " am fine."], 3, first_clause=False
+    )
+    assert fragments == ["Hello there.", " How are you?", " I am fine."]
+
+
+def test_cuts_the_first_fragment_at_a_long_enough_clause():
+    fragments = chunk(
+        ["Sure, I can help", " with your trip to Paris, of course. Which", " dates work?"],
+        3,
+        min_chars=20,
+    )
+    assert fragments == ["Sure, I can help with your trip to Paris,", " of course.", " Which dates work?"]
+
+
+def test_sends_complete_words_after_the_maximum_wait():
+    fragments = chunk(
+        ["Let me check the flight times for", " you"],
+        2,
+        sleep=0.3,
+        max_wait_secs=0.1,
+        first_clause=False,
+    )
+    # The rest is flushed before the end of the reply is passed on
+    assert fragments == ["Let me check the flight times for", " you"]
@@ -0,0 +1,360 @@
+"""Persistent cache of synthesized speech for repeated phrases.
+
+Many bot phrases repeat across calls: the static ``tts_say`` lines of the
+flow (e.g. the booking confirmation) and common LLM replies. Synthesizing
+them again costs a Polly round trip every time. ``CachedPollyTTSService``
+keeps the audio of everything it synthesizes, keyed on the text and the
+voice settings (voice, engine, language, rate) plus the output sample rate,
+in two tiers:
+
+- memory: an LRU of recently used phrases in the bot process
+- disk: one file per phrase in ``TTS_CACHE_DIR``, shared by all bot
+  processes of the host (files are written atomically, so concurrent bots
+  never read partial audio). Only the static ``tts_say`` phrases go to disk
+  unless ``TTS_CACHE_DISK_ALL`` is set: LLM replies hold caller details
+  (names, dates, bookings) that should not outlive the process
+
+Cache hits stream the stored audio without calling Polly; the disk tier is
+read and written in a worker thread, off the event loop. When the first
+session of a bot process starts, the static ``tts_say`` phrases of the flow
+are synthesized in the background, so even the first caller hears them from
+the cache. Warm-up calls Polly directly, so it does not show up in the
+session's TTFB and usage metrics.
+
+Each bot posts its session's counters (hits, misses, bytes saved) to the
+server (``TTS_CACHE_STATS_URL``) when the session ends.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+from collections import OrderedDict
+from typing import Any, AsyncGenerator, Dict, Iterable, List, Optional
+
+from botocore.exceptions import BotoCoreError, ClientError
+from loguru import logger
+
+from pipecat.frames.frames import (
+    ErrorFrame,
+    Frame,
+    StartFrame,
+    TTSAudioRawFrame,
+    TTSStartedFrame,
+    TTSStoppedFrame,
+)
+from pipecat.services.aws.tts import AWSPollyTTSService
+
+from stats_reporting import post_stats
+
+# Whether the bot caches synthesized speech
+TTS_CACHE = os.getenv("TTS_CACHE", "true").lower() in ("1", "true", "yes")
+
+# Directory of the disk tier, shared by the bot processes of the host
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", os.path.join(tempfile.gettempdir(), "nova-tts-cache"))
+
+# Whether LLM replies are written to the disk tier too, not only the flow's
+# static phrases
+TTS_CACHE_DISK_ALL = os.getenv("TTS_CACHE_DISK_ALL", "false").lower() in ("1", "true", "yes")
+
+# Size limits of the memory tier (per bot process) and of the disk tier
+TTS_CACHE_MEMORY_MB = int(os.getenv("TTS_CACHE_MEMORY_MB", "64"))
+TTS_CACHE_DISK_MB = int(os.getenv("TTS_CACHE_DISK_MB", "1024"))
+
+# Server endpoint the session counters are posted to; only logged when unset
+TTS_CACHE_STATS_URL = os.getenv("TTS_CACHE_STATS_URL")
+
+# Size of the audio chunks streamed on a hit, as AWSPollyTTSService does
+CHUNK_SIZE = 1024
+
+# Sample rate Polly synthesizes PCM at, as AWSPollyTTSService requests it
+POLLY_SAMPLE_RATE = 16000
+
+# Number of disk writes between checks of the disk tier size
+PRUNE_INTERVAL = 100
+
+
+class TTSCache:
+    """Two-tier (memory LRU and disk) store of synthesized audio.
+
+    Args:
+        directory: Directory of the disk tier, or None for memory only
+        memory_bytes: Maximum size of the audio kept in memory
+        disk_bytes: Size of the disk tier above which the least recently
+            written phrases are removed
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = TTS_CACHE_DIR,
+        memory_bytes: int = TTS_CACHE_MEMORY_MB * 1024 * 1024,
+        disk_bytes: int = TTS_CACHE_DISK_MB * 1024 * 1024,
+    ):
+        self._directory = directory
+        self._memory_bytes = memory_bytes
+        self._disk_bytes = disk_bytes
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._size = 0
+        self._writes = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(text: str, **settings: Any) -> str:
+        """Cache key of a phrase synthesized with the given settings."""
+        payload = json.dumps([text, settings], sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        """Get the audio of a phrase, or None if it is not cached.
+
+        Returns:
+            Optional[bytes]: The audio, from memory or else from disk
+        """
+        audio = self._entries.get(key)
+        if audio is not None:
+            self._entries.move_to_end(key)
+            return audio
+
+        if not self._directory:
+            return None
+        audio = await asyncio.to_thread(self._read, key)
+        if audio is not None:
+            self._remember(key, audio)
+        return audio
+
+    def in_memory(self, key: str) -> bool:
+        return key in self._entries
+
+    async def put(self, key: str, audio: bytes, persist: bool = True):
+        """Store the audio of a phrase in memory, and on disk if ``persist``."""
+        self._remember(key, audio)
+        if self._directory and persist:
+            await asyncio.to_thread(self._write, key, audio)
+
+    def _read(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write(self, key: str, audio: bytes):
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write then rename, so other bots never read a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(audio)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Failed to write TTS cache entry {path}: {e}")
+            return
+
+        self._writes += 1
+        if self._writes % PRUNE_INTERVAL == 0:
+            self._prune_disk()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self._directory, key[:2], f"{key}.pcm")
+
+    def _remember(self, key: str, audio: bytes):
+        if len(audio) > self._memory_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._size -= len(previous)
+        self._entries[key] = audio
+        self._size += len(audio)
+        while self._size > self._memory_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+
+    def _prune_disk(self):
+        files = []
+        for root, _, names in os.walk(self._directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self._disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+
+_shared_cache: Optional[TTSCache] = None
+
+# Cache keys the process has already warmed up (or is warming up), so later
+# sessions do not look them up or synthesize them again
+_warmed_up_keys: set = set()
+
+
+def shared_tts_cache() -> TTSCache:
+    """The process-wide cache, configured from the ``TTS_CACHE_*`` variables."""
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = TTSCache()
+    return _shared_cache
+
+
+def tts_say_phrases(flow_config: Dict[str, Any]) -> List[str]:
+    """Static ``tts_say`` texts of all nodes of a flow configuration."""
+    phrases = []
+    for node in flow_config.get("nodes", {}).values():
+        for action in node.get("pre_actions", []) + node.get("post_actions", []):
+            if action.get("type") == "tts_say" and action.get("text") not in phrases:
+                phrases.append(action["text"])
+    return phrases
+
+
+class CachedPollyTTSService(AWSPollyTTSService):
+    """Polly TTS service that serves repeated phrases from a ``TTSCache``.
+
+    Args:
+        cache: Cache to use; defaults to the process-wide ``shared_tts_cache()``
+        warmup_phrases: Phrases synthesized into the cache when the pipeline
+            starts, unless already cached; unless ``TTS_CACHE_DISK_ALL`` is
+            set, the only phrases written to the disk tier
+        **kwargs: Arguments of ``AWSPollyTTSService``
+    """
+
+    def __init__(
+        self,
+        *,
+        cache: Optional[TTSCache] = None,
+        warmup_phrases: Iterable[str] = (),
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self._cache = cache or shared_tts_cache()
+        self._warmup_phrases = list(warmup_phrases)
+        self._persist_phrases = set(self._warmup_phrases)
+        self._warmup_task = None
+        self._counters = {
+            "hits": 0,
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "bytes_saved": 0,
+            "warmed_up": 0,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache counters of this session.
+
+        Returns:
+            dict: hits (from memory and disk), misses, hit rate, audio bytes
+            served without calling Polly, and phrases synthesized by warm-up
+        """
+        lookups = self._counters["hits"] + self._counters["misses"]
+        return {
+            **self._counters,
+            "hit_rate": self._counters["hits"] / lookups if lookups else None,
+        }
+
+    async def start(self, frame: StartFrame):
+        await super().start(frame)
+        if self._warmup_phrases and not self._warmup_task:
+            self._warmup_task = self.create_task(self._warm_up())
+
+    async def cleanup(self):
+        if self._warmup_task:
+            await self.cancel_task(self._warmup_task)
+            self._warmup_task = None
+        await super().cleanup()
+        await self._report()
+
+    async def run_tts(self, text: str) -> AsyncGenerator[Frame, None]:
+        key = self._key(text)
+        in_memory = self._cache.in_memory(key)
+        audio = await self._cache.get(key)
+        if audio is not None:
+            logger.debug(f"{self}: TTS cache hit [{text}]")
+            self._counters["hits"] += 1
+            self._counters["memory_hits" if in_memory else "disk_hits"] += 1
+            self._counters["bytes_saved"] += len(audio)
+
+            await self.start_ttfb_metrics()
+            yield TTSStartedFrame()
+            for i in range(0, len(audio), CHUNK_SIZE):
+                if i == 0:
+                    await self.stop_ttfb_metrics()
+                yield TTSAudioRawFrame(audio[i : i + CHUNK_SIZE], self.sample_rate, 1)
+            yield TTSStoppedFrame()
+            return
+
+        self._counters["misses"] += 1
+        chunks = []
+        complete = False
+        async for frame in super().run_tts(text):
+            if isinstance(frame, TTSAudioRawFrame):
+                chunks.append(frame.audio)
+            elif isinstance(frame, ErrorFrame):
+                chunks = []
+            elif isinstance(frame, TTSStoppedFrame) and chunks:
+                complete = True
+            yield frame
+        if complete:
+            persist = TTS_CACHE_DISK_ALL or text in self._persist_phrases
+            await self._cache.put(key, b"".join(chunks), persist=persist)
+
+    def _key(self, text: str) -> str:
+        return TTSCache.key(
+            text,
+            voice=self._voice_id,
+            engine=self._settings["engine"],
+            language=self._settings["language"],
+            rate=self._settings["rate"],
+            sample_rate=self.sample_rate,
+        )
+
+    async def _warm_up(self):
+        for text in self._warmup_phrases:
+            key = self._key(text)
+            if key in _warmed_up_keys:
+                continue
+            _warmed_up_keys.add(key)
+            if await self._cache.get(key) is not None:
+                continue
+            try:
+                audio = await self._synthesize(text)
+            except (BotoCoreError, ClientError) as e:
+                logger.warning(f"{self}: TTS cache warm-up failed for [{text}]: {e}")
+                continue
+            if audio:
+                await self._cache.put(key, audio)
+                self._counters["warmed_up"] += 1
+
+    async def _synthesize(self, text: str) -> Optional[bytes]:
+        """Synthesize ``text`` like ``run_tts`` does, without frames or metrics."""
+        params = {
+            "Text": self._construct_ssml(text),
+            "TextType": "ssml",
+            "OutputFormat": "pcm",
+            "VoiceId": self._voice_id,
+            "Engine": self._settings["engine"],
+            "SampleRate": str(POLLY_SAMPLE_RATE),
+        }
+        params = {k: v for k, v in params.items() if v is not None}
+        response = await asyncio.to_thread(self._polly_client.synthesize_speech, **params)
+        if "AudioStream" not in response:
+            return None
+        audio = await asyncio.to_thread(response["AudioStream"].read)
+        return await self._resampler.resample(audio, POLLY_SAMPLE_RATE, self.sample_rate)
+
+    async def _report(self):
+        stats = self.stats()
+        logger.info(f"{self}: TTS cache {stats}")
+        await post_stats(TTS_CACHE_STATS_URL, self._counters, "TTS cache stats")
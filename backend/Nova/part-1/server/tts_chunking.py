@@ -0,0 +1,293 @@
+"""Sentence-chunked streaming from the LLM to speech synthesis.
+
+By default the TTS service aggregates LLM tokens into whole sentences and
+synthesizes them one after the other: the next Polly request only starts once
+the previous one has returned all of its audio. Two pieces shorten the time
+to first audio and remove the gaps between sentences:
+
+- ``SpeakableTextChunker`` sits between the LLM and the TTS service and cuts
+  the token stream into speakable fragments: at sentence boundaries, at clause
+  boundaries (commas, colons, dashes) for the first fragment of a reply, and
+  after a maximum wait when no boundary comes. Clauses and timed-out text
+  shorter than a minimum length wait for more text; a complete sentence is
+  always sent, so a short "Sure!" is spoken right away.
+- ``pipelined(tts_class)`` makes a TTS service start synthesizing each
+  fragment as soon as it is queued, with a bounded number of requests in
+  flight. Audio is still played in fragment order: the service consumes the
+  fragments one by one as before, but their audio is usually ready by then.
+"""
+
+import asyncio
+import os
+import re
+from collections import deque
+from typing import AsyncGenerator, Deque, Optional, Tuple
+
+from loguru import logger
+
+from pipecat.frames.frames import (
+    EndFrame,
+    Frame,
+    InterimTranscriptionFrame,
+    LLMFullResponseEndFrame,
+    LLMFullResponseStartFrame,
+    LLMTextFrame,
+    StartInterruptionFrame,
+    SystemFrame,
+    TextFrame,
+    TranscriptionFrame,
+    TTSSpeakFrame,
+)
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+
+# Whether the bot chunks LLM text into fragments synthesized concurrently
+TTS_CHUNKING = os.getenv("TTS_CHUNKING", "true").lower() in ("1", "true", "yes")
+
+# Shortest fragment cut at a clause boundary or after the maximum wait, in characters
+TTS_CHUNK_MIN_CHARS = int(os.getenv("TTS_CHUNK_MIN_CHARS", "20"))
+
+# Longest time text waits for a boundary before it is sent anyway, in milliseconds
+TTS_CHUNK_MAX_WAIT_MS = int(os.getenv("TTS_CHUNK_MAX_WAIT_MS", "400"))
+
+# Maximum number of synthesis requests in flight per bot
+TTS_MAX_CONCURRENT = int(os.getenv("TTS_MAX_CONCURRENT", "3"))
+
+# End of a sentence, followed by whitespace. Not matched: decimals ("3.5"),
+# titles ("Dr."), dotted abbreviations ("U.S.", "p.m.") and a single letter
+# followed by a lowercase word ("e.g. the"); "Plan B. Then" still ends a sentence
+SENTENCE_BOUNDARY = re.compile(
+    r"(?<!\bMrs)(?<!\b(?:Mr|Ms|Dr|St))(?<!\b[A-Za-z]\.[A-Za-z])"
+    r"(?:[.!?;]+|\.\.\.)[\"')\]]*(?=\s)"
+    r"(?!(?<=\b[A-Za-z]\.)\s+[a-z])"
+)
+
+# End of a clause, followed by whitespace
+CLAUSE_BOUNDARY = re.compile(r"(?:[,:]|\s[-–—])(?=\s)")
+
+
+class SpeakableTextChunker(FrameProcessor):
+    """Cuts streamed LLM text into fragments the TTS service can speak.
+
+    Text is never held back behind a later frame: pending text is sent before
+    any other frame is passed on (e.g. a function call or the end of the reply).
+
+    Args:
+        min_chars: Shortest fragment cut at a clause boundary or after the
+            maximum wait, in characters
+        max_wait_secs: Longest time text waits for a boundary; it is then sent
+            up to the last complete word
+        first_clause: Cut the first fragment of a reply at a clause boundary
+            when no sentence has ended yet
+    """
+
+    def __init__(
+        self,
+        *,
+        min_chars: int = TTS_CHUNK_MIN_CHARS,
+        max_wait_secs: float = TTS_CHUNK_MAX_WAIT_MS / 1000,
+        first_clause: bool = True,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self._min_chars = min_chars
+        self._max_wait_secs = max_wait_secs
+        self._first_clause = first_clause
+        self._text = ""
+        self._first_fragment = True
+        # Time by which buffered text is sent, if no boundary comes first
+        self._deadline: Optional[float] = None
+        self._text_waiting = asyncio.Event()
+        self._timeout_task = None
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if direction != FrameDirection.DOWNSTREAM:
+            await self.push_frame(frame, direction)
+        elif isinstance(frame, LLMTextFrame):
+            self._text += frame.text
+            await self._push_fragments()
+            if self._text:
+                self._start_timeout()
+        elif isinstance(frame, StartInterruptionFrame):
+            await self._reset()
+            await self.push_frame(frame, direction)
+        elif isinstance(frame, SystemFrame):
+            await self.push_frame(frame, direction)
+        else:
+            await self._flush()
+            if isinstance(frame, (LLMFullResponseStartFrame, LLMFullResponseEndFrame, EndFrame)):
+                self._first_fragment = True
+            await self.push_frame(frame, direction)
+
+    async def cleanup(self):
+        if self._timeout_task:
+            await self.cancel_task(self._timeout_task)
+            self._timeout_task = None
+        await super().cleanup()
+
+    def next_boundary(self, text: str) -> Optional[int]:
+        """End of the first fragment of ``text``, or None if it must wait for more text."""
+        ends = [match.end() for match in SENTENCE_BOUNDARY.finditer(text)]
+        if self._first_fragment and self._first_clause:
+            ends += [
+                match.end()
+                for match in CLAUSE_BOUNDARY.finditer(text)
+                if len(text[: match.end()].strip()) >= self._min_chars
+            ]
+        return min(ends) if ends else None
+
+    async def _push_fragments(self):
+        while True:
+            end = self.next_boundary(self._text)
+            if end is None:
+                return
+            fragment, self._text = self._text[:end], self._text[end:]
+            await self._push_fragment(fragment)
+
+    async def _push_fragment(self, fragment: str):
+        self._cancel_timeout()
+        self._first_fragment = False
+        await self.push_frame(LLMTextFrame(fragment))
+
+    async def _flush(self):
+        if self._text:
+            fragment, self._text = self._text, ""
+            await self._push_fragment(fragment)
+        else:
+            self._cancel_timeout()
+
+    async def _reset(self):
+        self._text = ""
+        self._first_fragment = True
+        self._cancel_timeout()
+
+    def _start_timeout(self):
+        if self._deadline is None:
+            self._deadline = asyncio.get_running_loop().time() + self._max_wait_secs
+            self._text_waiting.set()
+        if not self._timeout_task:
+            self._timeout_task = self.create_task(self._timeout_task_handler())
+
+    def _cancel_timeout(self):
+        self._deadline = None
+        self._text_waiting.clear()
+
+    async def _timeout_task_handler(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._text_waiting.wait()
+            if self._deadline is None:
+                continue
+            delay = self._deadline - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+
+            self._cancel_timeout()
+            # Send the complete words; a partial word waits for the rest of it
+            end = self._text.rfind(" ")
+            if end <= 0 or len(self._text[:end].strip()) < self._min_chars:
+                # Too little text to speak yet; the next token restarts the timer
+                continue
+            fragment, self._text = self._text[:end], self._text[end:]
+            await self._push_fragment(fragment)
+
+
+class PipelinedTTSMixin:
+    """Starts synthesizing queued text before the TTS service gets to it.
+
+    Mix into a TTS service class with ``pipelined``. Each text the service
+    will synthesize as is (LLM text when sentence aggregation is off, and
+    ``TTSSpeakFrame`` text) starts a synthesis task when it is queued. When
+    the service then calls ``run_tts`` for that text, the frames of the task
+    are replayed as they are produced.
+
+    Args:
+        max_concurrent: Maximum number of synthesis requests in flight
+    """
+
+    def __init__(self, *, max_concurrent: int = TTS_MAX_CONCURRENT, **kwargs):
+        super().__init__(**kwargs)
+        self._prefetches: Deque[Tuple[str, asyncio.Task, asyncio.Queue]] = deque()
+        self._synthesis_slots = asyncio.Semaphore(max_concurrent)
+        self._prefetch_count = 0
+
+    async def queue_frame(self, frame: Frame, direction: FrameDirection = FrameDirection.DOWNSTREAM, callback=None):
+        if direction == FrameDirection.DOWNSTREAM and not self._cancelling:
+            text = self._prefetch_text(frame)
+            if text:
+                self._prefetch(text)
+        await super().queue_frame(frame, direction, callback)
+
+    async def cleanup(self):
+        await self._cancel_prefetches()
+        await super().cleanup()
+
+    async def run_tts(self, text: str) -> AsyncGenerator[Frame, None]:
+        if not any(prefetched == text for prefetched, _, _ in self._prefetches):
+            async for frame in super().run_tts(text):
+                yield frame
+            return
+
+        while self._prefetches[0][0] != text:
+            # Text the service skipped (e.g. only whitespace after filtering)
+            _, task, _ = self._prefetches.popleft()
+            await self.cancel_task(task)
+
+        _, task, frames = self._prefetches.popleft()
+        while True:
+            frame = await frames.get()
+            if frame is _DONE:
+                break
+            yield frame
+        await self.wait_for_task(task)
+
+    async def _handle_interruption(self, frame: StartInterruptionFrame, direction: FrameDirection):
+        await self._cancel_prefetches()
+        await super()._handle_interruption(frame, direction)
+
+    def _prefetch_text(self, frame: Frame) -> Optional[str]:
+        if isinstance(frame, TTSSpeakFrame):
+            text = frame.text
+        elif (
+            isinstance(frame, TextFrame)
+            and not isinstance(frame, (InterimTranscriptionFrame, TranscriptionFrame))
+            and not self._aggregate_sentences
+            and not self._text_filters
+        ):
+            text = frame.text
+        else:
+            return None
+        # Same clean-up as TTSService._push_tts_frames
+        text = text.lstrip("\n")
+        return text if text.strip() else None
+
+    def _prefetch(self, text: str):
+        frames = asyncio.Queue()
+        self._prefetch_count += 1
+        task = self.create_task(self._synthesize(text, frames), f"synthesize#{self._prefetch_count}")
+        self._prefetches.append((text, task, frames))
+
+    async def _synthesize(self, text: str, frames: asyncio.Queue):
+        try:
+            async with self._synthesis_slots:
+                async for frame in super().run_tts(text):
+                    await frames.put(frame)
+        except Exception as e:
+            logger.error(f"{self}: synthesis of [{text}] failed: {e}")
+        finally:
+            await frames.put(_DONE)
+
+    async def _cancel_prefetches(self):
+        while self._prefetches:
+            _, task, _ = self._prefetches.popleft()
+            await self.cancel_task(task)
+
+
+_DONE = object()
+
+
+def pipelined(tts_class: type) -> type:
+    """A subclass of ``tts_class`` that synthesizes queued text concurrently."""
+    return type(f"Pipelined{tts_class.__name__}", (PipelinedTTSMixin, tts_class), {})
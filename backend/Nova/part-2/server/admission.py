@@ -0,0 +1,284 @@
+"""Capacity-aware admission control for new bot sessions.
+
+Every bot shares the node's CPU with every other live call, so admitting more
+sessions than the node can run in real time makes audio stutter for everyone.
+``AdmissionController`` caps the number of concurrent sessions on the node and
+queues a bounded number of new sessions for a limited time while the node is
+full. Callers that cannot be admitted are rejected quickly with a hint of when
+to retry:
+
+- queue full: ``429 Too Many Requests``
+- waited too long in the queue: ``503 Service Unavailable``
+
+The cap is either fixed or derived from the CPU and RSS actually used by the
+running bots, sampled from ``/proc`` by ``BotResourceSampler``.
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional
+
+from loguru import logger
+
+from stats_reporting import percentile
+
+# Number of wait time samples kept for reporting
+WAIT_WINDOW = 200
+
+
+class AdmissionRejected(Exception):
+    """Raised when a session cannot be admitted.
+
+    Args:
+        status_code: HTTP status code to answer with (429 or 503)
+        retry_after: Seconds the caller should wait before retrying
+        reason: Human readable reason
+    """
+
+    def __init__(self, status_code: int, retry_after: int, reason: str):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class AdmissionController:
+    """Limits concurrent sessions and queues new ones while the node is full.
+
+    Args:
+        max_sessions: Maximum number of concurrent sessions on this node
+        queue_size: Maximum number of sessions waiting for a slot
+        queue_timeout: Seconds a session may wait for a slot before it is rejected
+        retry_after: Seconds suggested to rejected callers through ``Retry-After``
+    """
+
+    def __init__(self, max_sessions: int, queue_size: int, queue_timeout: float, retry_after: int):
+        self._max_sessions = max(max_sessions, 1)
+        self._queue_size = queue_size
+        self._queue_timeout = queue_timeout
+        self._retry_after = retry_after
+        self._active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._admitted = 0
+        self._queued = 0
+        self._rejected_full = 0
+        self._rejected_timeout = 0
+        self._max_queue_depth = 0
+        self._wait_times: Deque[float] = deque(maxlen=WAIT_WINDOW)
+
+    @property
+    def max_sessions(self) -> int:
+        return self._max_sessions
+
+    def set_max_sessions(self, max_sessions: int):
+        """Change the session cap, admitting queued sessions if it grew."""
+        self._max_sessions = max(max_sessions, 1)
+        self._wake_waiters()
+
+    async def acquire(self):
+        """Wait for a session slot.
+
+        Raises:
+            AdmissionRejected: If the queue is full or the wait timed out
+        """
+        if self._active < self._max_sessions and not self._waiters:
+            self._active += 1
+            self._admitted += 1
+            self._wait_times.append(0.0)
+            return
+
+        if len(self._waiters) >= self._queue_size:
+            self._rejected_full += 1
+            raise AdmissionRejected(429, self._retry_after, "Session queue is full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._queued += 1
+        self._max_queue_depth = max(self._max_queue_depth, len(self._waiters))
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(waiter, timeout=self._queue_timeout)
+        except BaseException as e:
+            granted = waiter.done() and not waiter.cancelled()
+            if not granted:
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            if isinstance(e, asyncio.TimeoutError):
+                if not granted:
+                    self._rejected_timeout += 1
+                    raise AdmissionRejected(
+                        503, self._retry_after, "Timed out waiting for a session slot"
+                    )
+            else:
+                # The caller went away; give back a slot handed over meanwhile
+                if granted:
+                    self.release()
+                raise
+        # The slot was handed over by release(), which already counted it
+        self._admitted += 1
+        self._wait_times.append(time.monotonic() - started)
+
+    def release(self):
+        """Give back a session slot, handing it to the next queued session."""
+        self._active = max(self._active - 1, 0)
+        self._wake_waiters()
+
+    def stats(self) -> Dict[str, Any]:
+        """Current capacity, queue depth and admission counters."""
+        waits = sorted(self._wait_times)
+        return {
+            "max_sessions": self._max_sessions,
+            "active": self._active,
+            "queue_depth": len(self._waiters),
+            "queue_size": self._queue_size,
+            "max_queue_depth": self._max_queue_depth,
+            "admitted": self._admitted,
+            "queued": self._queued,
+            "rejected_queue_full": self._rejected_full,
+            "rejected_timeout": self._rejected_timeout,
+            "wait_secs": {
+                "p50": percentile(waits, 50),
+                "p95": percentile(waits, 95),
+                "max": waits[-1] if waits else None,
+            },
+        }
+
+    def _wake_waiters(self):
+        while self._waiters and self._active < self._max_sessions:
+            waiter = self._waiters.popleft()
+            if waiter.done():
+                continue
+            self._active += 1
+            waiter.set_result(None)
+
+
+class BotResourceSampler:
+    """Derives the session cap from the CPU and RSS used by running bots.
+
+    Samples ``/proc/<pid>`` of the running bots periodically, keeps a moving
+    average of CPU cores and resident memory per bot and sets the controller's
+    cap to what the node can hold at the target utilisation. Only available on
+    Linux; elsewhere the controller keeps its fixed cap.
+
+    Args:
+        controller: Admission controller whose cap is updated
+        pids: Callable returning the pids of the running bots
+        target_utilization: Fraction of the node's CPU and memory bots may use
+        min_sessions: Lower bound for the derived cap
+        max_sessions: Upper bound for the derived cap
+        interval: Seconds between samples
+    """
+
+    def __init__(
+        self,
+        controller: AdmissionController,
+        pids: Callable[[], Iterable[int]],
+        target_utilization: float = 0.75,
+        min_sessions: int = 1,
+        max_sessions: int = 64,
+        interval: float = 5.0,
+    ):
+        self._controller = controller
+        self._pids = pids
+        self._target = target_utilization
+        self._min_sessions = min_sessions
+        self._max_sessions = max_sessions
+        self._interval = interval
+        self._clock_ticks = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+        self._cpu_times: Dict[int, float] = {}
+        self._cpu_per_bot: Optional[float] = None
+        self._rss_mb_per_bot: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if not os.path.exists("/proc/self/stat"):
+            logger.warning("Resource based admission cap needs /proc, keeping the fixed cap")
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"cpu_cores_per_bot": self._cpu_per_bot, "rss_mb_per_bot": self._rss_mb_per_bot}
+
+    async def _run(self):
+        last = time.monotonic()
+        while True:
+            await asyncio.sleep(self._interval)
+            now = time.monotonic()
+            self._sample(now - last)
+            last = now
+
+    def _sample(self, elapsed: float):
+        cpu_samples: List[float] = []
+        rss_samples: List[float] = []
+        cpu_times = {}
+        for pid in self._pids():
+            usage = _read_proc_usage(pid, self._clock_ticks)
+            if usage is None:
+                continue
+            cpu_time, rss_mb = usage
+            cpu_times[pid] = cpu_time
+            rss_samples.append(rss_mb)
+            if pid in self._cpu_times and elapsed > 0:
+                cpu_samples.append((cpu_time - self._cpu_times[pid]) / elapsed)
+        self._cpu_times = cpu_times
+
+        if cpu_samples:
+            self._cpu_per_bot = _ewma(self._cpu_per_bot, sum(cpu_samples) / len(cpu_samples))
+        if rss_samples:
+            self._rss_mb_per_bot = _ewma(self._rss_mb_per_bot, sum(rss_samples) / len(rss_samples))
+
+        limits = []
+        if self._cpu_per_bot:
+            limits.append((os.cpu_count() or 1) * self._target / self._cpu_per_bot)
+        total_mb = _total_memory_mb()
+        if self._rss_mb_per_bot and total_mb:
+            limits.append(total_mb * self._target / self._rss_mb_per_bot)
+        if not limits:
+            return
+
+        cap = int(max(self._min_sessions, min(self._max_sessions, min(limits))))
+        if cap != self._controller.max_sessions:
+            logger.info(
+                f"Admission cap {self._controller.max_sessions} -> {cap} "
+                f"(cpu/bot={self._cpu_per_bot:.2f}, rss/bot={self._rss_mb_per_bot or 0:.0f}MB)"
+            )
+            self._controller.set_max_sessions(cap)
+
+
+def _read_proc_usage(pid: int, clock_ticks: int) -> Optional[tuple[float, float]]:
+    """CPU seconds used so far and resident memory in MB of a process."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # The command name may contain spaces, so split after its closing paren
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open(f"/proc/{pid}/statm") as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    cpu_secs = (int(fields[11]) + int(fields[12])) / clock_ticks
+    rss_mb = resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    return cpu_secs, rss_mb
+
+
+def _total_memory_mb() -> Optional[float]:
+    try:
+        return os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def _ewma(previous: Optional[float], value: float, alpha: float = 0.3) -> float:
+    return value if previous is None else alpha * value + (1 - alpha) * previous
@@ -0,0 +1,339 @@
+"""Output audio conversion with preallocated buffers.
+
+The output transport converts the bot's audio frame by frame: every frame is
+resampled on its own (``soxr.resample`` at very high quality, from scratch,
+through a float copy), appended to a growing ``bytearray`` and cut into
+transport chunks by slicing that buffer, which copies what is left of it for
+every chunk. Polly's TTS first resamples its whole response the same way, so
+the reply audio of part 1 is converted twice. With ``AUDIO_OUT_POLLY_RATE``,
+part 1 plays the reply at Polly's own rate (``POLLY_SAMPLE_RATE``), with or
+without the stage, and nothing resamples it; filler clips are resampled once
+when loaded (see ``filler_audio``).
+
+``AudioOutputStage`` sits right before ``transport.output()`` and does the
+conversion once per session, with buffers allocated when the pipeline starts:
+
+- frames are read as zero-copy ``int16`` views of their audio
+- audio at another rate goes through a streaming resampler, one per input
+  rate, keeping its filter state between frames instead of restarting it on
+  every frame (which also removes the clicks at frame boundaries); it is
+  flushed at the end of each reply and dropped on interruption
+- the audio is written into a preallocated ring buffer per session
+- only whole transport chunks leave the stage, so the transport has nothing
+  left to resample and its buffer never holds a partial chunk. Once the
+  transport has ``LEAD_MS`` of audio queued, the chunks wait in the ring and
+  leave together, in one frame, when the transport gets close to running
+  out: a reply rendered faster than real time crosses the stage in a few
+  frames instead of one per TTS frame
+- what is left at the end of a reply (``LLMFullResponseEndFrame``, or the bot
+  stopping speaking), or when the audio stops coming (a filler clip) just
+  before the transport runs out, is padded with silence to a whole chunk
+  instead of waiting in the transport for the next reply. The end of each TTS
+  utterance is not padded: with ``TTS_CHUNKING`` a reply is several
+  utterances, and silence between them would be heard as gaps
+
+The transport still cuts each frame into one frame per chunk (the chunk is
+what it writes to the call); the stage only saves the frames and copies
+before it.
+"""
+
+import asyncio
+import os
+import time
+from typing import Dict, Optional
+
+import numpy as np
+import soxr
+
+from pipecat.frames.frames import (
+    BotStoppedSpeakingFrame,
+    CancelFrame,
+    EndFrame,
+    Frame,
+    LLMFullResponseEndFrame,
+    OutputAudioRawFrame,
+    StartFrame,
+    StartInterruptionFrame,
+)
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+
+# Whether the bot's output audio goes through the audio stage
+AUDIO_STAGE = os.getenv("AUDIO_STAGE", "false").lower() in ("1", "true", "yes")
+
+# soxr quality of the stage's resampling: "QQ", "LQ", "MQ", "HQ" or "VHQ"
+AUDIO_STAGE_QUALITY = os.getenv("AUDIO_STAGE_QUALITY", "HQ")
+
+# Whether part 1 plays its output audio at Polly's rate instead of the transport's default
+AUDIO_OUT_POLLY_RATE = os.getenv("AUDIO_OUT_POLLY_RATE", "false").lower() in ("1", "true", "yes")
+
+# Highest rate Polly renders PCM at
+POLLY_SAMPLE_RATE = 16000
+
+# Audio a session's ring buffer holds, in milliseconds
+RING_MS = 1000
+
+# Size of the transport's chunks in 10 ms steps, as ``audio_out_10ms_chunks``
+OUTPUT_10MS_CHUNKS = 4
+
+# Audio, in milliseconds, the transport is kept ahead of playback; the stage
+# holds back whole chunks beyond it and pushes them together
+LEAD_MS = 200
+
+
+class PCMRingBuffer:
+    """Preallocated ring buffer of 16-bit mono PCM samples.
+
+    Args:
+        capacity: Samples the buffer holds
+    """
+
+    def __init__(self, capacity: int):
+        self._samples = np.zeros(capacity, dtype=np.int16)
+        self._start = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def free(self) -> int:
+        """Samples that can still be written."""
+        return len(self._samples) - self._size
+
+    def write(self, samples: np.ndarray):
+        """Copy ``samples`` in after the buffered ones.
+
+        Args:
+            samples: The samples, at most ``free`` of them
+
+        Raises:
+            ValueError: If the samples do not fit
+        """
+        count = len(samples)
+        if count > self.free:
+            raise ValueError(f"{count} samples do not fit in {self.free} free samples")
+        capacity = len(self._samples)
+        end = (self._start + self._size) % capacity
+        first = min(count, capacity - end)
+        self._samples[end : end + first] = samples[:first]
+        self._samples[: count - first] = samples[first:]
+        self._size += count
+
+    def pad(self, count: int):
+        """Append ``count`` samples of silence."""
+        if count > self.free:
+            raise ValueError(f"{count} samples do not fit in {self.free} free samples")
+        capacity = len(self._samples)
+        end = (self._start + self._size) % capacity
+        first = min(count, capacity - end)
+        self._samples[end : end + first] = 0
+        self._samples[: count - first] = 0
+        self._size += count
+
+    def read(self, count: int) -> bytes:
+        """Take the ``count`` oldest samples out of the buffer.
+
+        Returns:
+            bytes: The samples, in a single copy out of the buffer
+        """
+        count = min(count, self._size)
+        capacity = len(self._samples)
+        first = min(count, capacity - self._start)
+        if first == count:
+            audio = self._samples[self._start : self._start + count].tobytes()
+        else:
+            audio = b"".join((self._samples[self._start :].data, self._samples[: count - first].data))
+        self._start = (self._start + count) % capacity
+        self._size -= count
+        return audio
+
+    def clear(self):
+        """Drop every buffered sample."""
+        self._start = 0
+        self._size = 0
+
+
+class StreamResampler:
+    """Resamples one stream of 16-bit mono PCM, keeping the filter state between chunks.
+
+    Args:
+        in_rate: Sample rate of the stream
+        out_rate: Sample rate to convert to
+        quality: soxr quality
+    """
+
+    def __init__(self, in_rate: int, out_rate: int, quality: str = AUDIO_STAGE_QUALITY):
+        self._stream = soxr.ResampleStream(in_rate, out_rate, 1, dtype="int16", quality=quality)
+
+    def resample(self, samples: np.ndarray, last: bool = False) -> np.ndarray:
+        """Resample the next chunk of the stream; ``last`` flushes the filter."""
+        return self._stream.resample_chunk(samples, last=last)
+
+    def reset(self):
+        """Start a new stream."""
+        self._stream.clear()
+
+
+class AudioOutputStage(FrameProcessor):
+    """Converts the bot's audio into whole transport chunks at the transport's rate.
+
+    Place it right before ``transport.output()``.
+
+    Args:
+        sample_rate: Sample rate of the transport; the pipeline's output rate
+            by default
+        output_10ms_chunks: Size of the transport's chunks in 10 ms steps
+        quality: soxr quality of the resampling
+    """
+
+    def __init__(
+        self,
+        sample_rate: Optional[int] = None,
+        output_10ms_chunks: int = OUTPUT_10MS_CHUNKS,
+        quality: str = AUDIO_STAGE_QUALITY,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self._init_sample_rate = sample_rate
+        self._output_10ms_chunks = output_10ms_chunks
+        self._quality = quality
+        self._sample_rate = 0
+        self._chunk_samples = 0
+        self._ring: Optional[PCMRingBuffer] = None
+        self._resamplers: Dict[int, StreamResampler] = {}
+        # Type of the last audio frame, given to the frames leaving the stage
+        self._frame_type = OutputAudioRawFrame
+        # When the transport runs out of the audio pushed so far, and when the
+        # last audio came in
+        self._playing_until = 0.0
+        self._written_at = 0.0
+        # Whether audio is held back (whole chunks, a partial chunk or the
+        # resampler's delay), pushed by the push loop
+        self._held = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._push_task: Optional[asyncio.Task] = None
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if isinstance(frame, StartFrame):
+            self._start(frame)
+            await self.push_frame(frame, direction)
+            self._push_task = self.create_task(self._push_loop())
+            return
+        elif (
+            isinstance(frame, OutputAudioRawFrame)
+            and direction == FrameDirection.DOWNSTREAM
+            and self._ring is not None
+            and frame.num_channels == 1
+            and frame.transport_destination is None
+        ):
+            async with self._lock:
+                await self._write(frame)
+            return
+        elif isinstance(frame, StartInterruptionFrame):
+            self._clear()
+        elif isinstance(frame, (LLMFullResponseEndFrame, BotStoppedSpeakingFrame)):
+            async with self._lock:
+                await self._flush()
+        elif isinstance(frame, (EndFrame, CancelFrame)):
+            await self._stop()
+            if isinstance(frame, EndFrame):
+                async with self._lock:
+                    await self._flush()
+
+        await self.push_frame(frame, direction)
+
+    async def cleanup(self):
+        await super().cleanup()
+        await self._stop()
+
+    def _start(self, frame: StartFrame):
+        self._sample_rate = self._init_sample_rate or frame.audio_out_sample_rate
+        self._chunk_samples = self._sample_rate // 100 * self._output_10ms_chunks
+        # Whole chunks, so the largest frame written at once always fits
+        chunks = max(1, self._sample_rate * RING_MS // 1000 // self._chunk_samples)
+        self._ring = PCMRingBuffer(chunks * self._chunk_samples)
+
+    def _resampler(self, in_rate: int) -> StreamResampler:
+        if in_rate not in self._resamplers:
+            self._resamplers[in_rate] = StreamResampler(in_rate, self._sample_rate, self._quality)
+        return self._resamplers[in_rate]
+
+    async def _write(self, frame: OutputAudioRawFrame):
+        self._frame_type = type(frame)
+        samples = np.frombuffer(frame.audio, dtype=np.int16)
+        if frame.sample_rate != self._sample_rate:
+            samples = self._resampler(frame.sample_rate).resample(samples)
+        await self._write_samples(samples)
+        self._written_at = time.monotonic()
+        # While the transport has enough audio queued, whole chunks wait for
+        # more and leave the stage together, in fewer frames
+        if self._playing_until - self._written_at < LEAD_MS / 1000:
+            await self._push_chunks()
+        self._held.set()
+
+    async def _write_samples(self, samples: np.ndarray):
+        while len(samples):
+            if not self._ring.free:
+                await self._push_chunks()
+            written = min(len(samples), self._ring.free)
+            self._ring.write(samples[:written])
+            samples = samples[written:]
+
+    async def _push_chunks(self):
+        whole = len(self._ring) // self._chunk_samples * self._chunk_samples
+        if whole:
+            audio = self._ring.read(whole)
+            self._playing_until = max(self._playing_until, time.monotonic()) + whole / self._sample_rate
+            await self.push_frame(self._frame_type(audio, self._sample_rate, 1))
+
+    async def _flush(self):
+        """Push everything held back, the last chunk padded with silence."""
+        self._held.clear()
+        if self._ring is None:
+            return
+        for resampler in self._resamplers.values():
+            await self._write_samples(resampler.resample(np.zeros(0, dtype=np.int16), last=True))
+            resampler.reset()
+        partial = len(self._ring) % self._chunk_samples
+        if partial:
+            self._ring.pad(self._chunk_samples - partial)
+        await self._push_chunks()
+
+    def _clear(self):
+        self._held.clear()
+        self._playing_until = 0.0
+        if self._ring is not None:
+            self._ring.clear()
+        for resampler in self._resamplers.values():
+            resampler.reset()
+
+    def _push_at(self) -> float:
+        """When the audio held back must leave the stage."""
+        lead_at = self._playing_until - LEAD_MS / 1000
+        if len(self._ring) >= self._chunk_samples:
+            return lead_at
+        # Only a partial chunk: more of the same audio may still come
+        return max(lead_at, self._written_at + self._chunk_samples / self._sample_rate)
+
+    async def _push_loop(self):
+        while True:
+            await self._held.wait()
+            # Writes in the meantime move the push later: it finds out when it wakes up
+            while self._held.is_set() and self._push_at() > time.monotonic():
+                await asyncio.sleep(self._push_at() - time.monotonic())
+            if not self._held.is_set():
+                continue
+            async with self._lock:
+                if len(self._ring) >= self._chunk_samples:
+                    await self._push_chunks()
+                else:
+                    # The audio stopped coming (a filler clip, say) with the
+                    # transport about to run out of audio
+                    await self._flush()
+
+    async def _stop(self):
+        task, self._push_task = self._push_task, None
+        if task:
+            await self.cancel_task(task)
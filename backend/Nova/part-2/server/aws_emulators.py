@@ -0,0 +1,789 @@
+"""Local stand-ins for the AWS services used by the bots.
+
+With ``AWS_EMULATORS=true`` the bots run without AWS, deterministically, so
+pipeline overhead and tail latency can be measured separately from AWS
+variance:
+
+- ``EmulatedTranscribeSTTService`` replaces ``AWSTranscribeSTTService``. It
+  emits interim transcripts while the user speaks (per VAD) and a final
+  transcript after the user stops, taken from the conversation script.
+- ``EmulatedBedrockClient`` replaces the boto ``bedrock-runtime`` client of
+  ``AWSBedrockLLMService`` and streams ``converse_stream`` events, including
+  tool calls, so the service's own streaming and function calling code runs.
+  Like boto, it blocks the caller while waiting for the first byte. Its usage
+  reports prompt cache reads and writes for requests with cache checkpoints.
+- ``EmulatedPollyClient`` replaces the boto Polly client of
+  ``AWSPollyTTSService`` and returns PCM audio whose length follows the text.
+- ``EmulatedNovaSonicLLMService`` replaces ``AWSNovaSonicLLMService``: on each
+  user turn it reports the user transcript, then streams the reply text and
+  audio or calls a function. Like the service, it opens its stream when the
+  pipeline starts and sets up the prompt (system prompt and tools) when it
+  gets its first context. Its sessions end after
+  ``EMULATOR_SONIC_SESSION_SECS``, and it then resets the conversation as the
+  service does (see ``session_rotation``).
+
+Every emulator has a latency profile read from the environment, where
+``<SERVICE>`` is ``STT``, ``LLM``, ``TTS`` or ``SONIC``:
+
+- ``EMULATOR_<SERVICE>_TTFB_MS``: time to first byte
+- ``EMULATOR_<SERVICE>_JITTER_MS``: up to this much extra random delay
+- ``EMULATOR_<SERVICE>_THROUGHPUT``: interim transcripts per second (STT),
+  tokens per second (LLM) or seconds of audio per second (TTS, SONIC)
+- ``EMULATOR_<SERVICE>_THROTTLE_RATE``: fraction of requests failing with a
+  throttling error
+
+Before its first byte, the emulated LLM also processes the input at
+``EMULATOR_LLM_PREFILL_RATE`` tokens per second, so longer prompts answer later.
+Emulated Nova Sonic takes ``EMULATOR_SONIC_CONNECT_MS`` to open its stream and
+``EMULATOR_SONIC_SETUP_MS`` to set up the prompt.
+
+``EMULATOR_SEED`` makes jitter and throttling reproducible. What the user says
+and what the LLM answers come from ``EMULATOR_SCRIPT`` (see
+``ConversationScript``), by default a conversation through the travel flow of
+part-1.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+from botocore.exceptions import ClientError
+from loguru import logger
+
+from pipecat.adapters.schemas.tools_schema import ToolsSchema
+from pipecat.adapters.services.bedrock_adapter import AWSBedrockLLMAdapter
+from pipecat.frames.frames import (
+    CancelFrame,
+    EndFrame,
+    ErrorFrame,
+    Frame,
+    InputAudioRawFrame,
+    InterimTranscriptionFrame,
+    LLMFullResponseEndFrame,
+    LLMFullResponseStartFrame,
+    LLMTextFrame,
+    StartFrame,
+    StartInterruptionFrame,
+    TranscriptionFrame,
+    TTSAudioRawFrame,
+    TTSStartedFrame,
+    TTSStoppedFrame,
+    TTSTextFrame,
+    UserStartedSpeakingFrame,
+    UserStoppedSpeakingFrame,
+)
+from pipecat.processors.aggregators.llm_response import (
+    LLMAssistantAggregatorParams,
+    LLMUserAggregatorParams,
+)
+from pipecat.processors.aggregators.openai_llm_context import (
+    OpenAILLMContext,
+    OpenAILLMContextFrame,
+)
+from pipecat.processors.frame_processor import FrameDirection
+from pipecat.services.aws.llm import (
+    AWSBedrockAssistantContextAggregator,
+    AWSBedrockContextAggregatorPair,
+    AWSBedrockLLMContext,
+    AWSBedrockUserContextAggregator,
+)
+from pipecat.services.llm_service import LLMService
+from pipecat.services.stt_service import STTService
+from pipecat.utils.time import time_now_iso8601
+
+# Use the emulators instead of AWS
+AWS_EMULATORS = os.getenv("AWS_EMULATORS", "false").lower() in ("1", "true", "yes")
+
+# Input tokens per second the emulated LLM processes before its first byte
+# (0 disables); tokens read from the prompt cache take a tenth of the time
+LLM_PREFILL_RATE = float(os.getenv("EMULATOR_LLM_PREFILL_RATE", "5000"))
+
+# Time the emulated Nova Sonic takes to open its bidirectional stream, and to
+# set up the prompt (system prompt, tool configuration, audio input)
+SONIC_CONNECT_MS = float(os.getenv("EMULATOR_SONIC_CONNECT_MS", "500"))
+SONIC_SETUP_MS = float(os.getenv("EMULATOR_SONIC_SETUP_MS", "400"))
+
+# Longest an emulated Nova Sonic session lasts before its stream is closed
+SONIC_SESSION_SECS = float(os.getenv("EMULATOR_SONIC_SESSION_SECS", "480"))
+
+# Speaking rate of emulated speech, in words per second
+WORDS_PER_SECOND = 2.5
+
+# Emulated speech is a quiet tone, so captured audio is audible
+TONE_HZ = 220
+
+DEFAULT_SCRIPT = {
+    "transcripts": [
+        "I'd like to go to the beach.",
+        "Maui sounds great.",
+        "From July first to July eighth.",
+        "Snorkeling and surfing, please.",
+        "That looks perfect, please book it.",
+        "No, that's all, thank you.",
+    ],
+    "replies": ["Sure, I can help with that. What would you like to do next?"],
+    "calls": [
+        {"name": "choose_beach", "arguments": {}},
+        {"name": "select_destination", "arguments": {"destination": "Maui"}},
+        {"name": "record_dates", "arguments": {"check_in": "2025-07-01", "check_out": "2025-07-08"}},
+        {"name": "record_activities", "arguments": {"activities": ["snorkeling", "surfing"]}},
+        {"name": "confirm_booking", "arguments": {}},
+        {"name": "end_conversation", "arguments": {}},
+    ],
+}
+
+if AWS_EMULATORS:
+    # The AWS services still want a region and credentials to create their
+    # (unused) clients
+    os.environ.setdefault("AWS_REGION", "us-east-1")
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "emulated")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "emulated")
+
+_random = random.Random(int(os.environ["EMULATOR_SEED"]) if os.getenv("EMULATOR_SEED") else None)
+
+
+@dataclass
+class LatencyProfile:
+    """Latency and error behaviour of one emulated service."""
+
+    ttfb_ms: float
+    jitter_ms: float = 0.0
+    throughput: float = 1.0
+    throttle_rate: float = 0.0
+
+    @classmethod
+    def from_env(cls, service: str, ttfb_ms: float, throughput: float) -> "LatencyProfile":
+        def setting(name: str, default: float) -> float:
+            return float(os.getenv(f"EMULATOR_{service}_{name}", str(default)))
+
+        return cls(
+            ttfb_ms=setting("TTFB_MS", ttfb_ms),
+            jitter_ms=setting("JITTER_MS", 0.0),
+            throughput=setting("THROUGHPUT", throughput),
+            throttle_rate=setting("THROTTLE_RATE", 0.0),
+        )
+
+    def first_byte_secs(self) -> float:
+        return (self.ttfb_ms + _random.uniform(0, self.jitter_ms)) / 1000
+
+    def throttled(self) -> bool:
+        return _random.random() < self.throttle_rate
+
+
+def stt_profile() -> LatencyProfile:
+    return LatencyProfile.from_env("STT", ttfb_ms=300, throughput=2)
+
+
+def llm_profile() -> LatencyProfile:
+    return LatencyProfile.from_env("LLM", ttfb_ms=400, throughput=60)
+
+
+def tts_profile() -> LatencyProfile:
+    return LatencyProfile.from_env("TTS", ttfb_ms=200, throughput=20)
+
+
+def sonic_profile() -> LatencyProfile:
+    return LatencyProfile.from_env("SONIC", ttfb_ms=600, throughput=2)
+
+
+class ConversationScript:
+    """What the emulated user says and how the emulated LLM answers.
+
+    The script is a JSON object (``EMULATOR_SCRIPT`` names the file):
+
+    - ``transcripts``: what the user says, one per turn (the last one repeats)
+    - ``calls``: the function the LLM calls in answer to each user turn, as
+      ``{"name": ..., "arguments": {...}}``
+    - ``replies``: texts the LLM says, used in turn
+
+    The LLM answers each user turn with its scripted call. When that function
+    is not available in the current context (e.g. a different flow node), it
+    calls the available function it has called least, with arguments derived
+    from the function's schema; that walks any flow forward. Answers to
+    anything other than a user turn (greetings, function results) are
+    scripted replies.
+    """
+
+    def __init__(self, script: Optional[Dict[str, Any]] = None):
+        if script is None:
+            path = os.getenv("EMULATOR_SCRIPT")
+            if path:
+                with open(path) as f:
+                    script = json.load(f)
+            else:
+                script = DEFAULT_SCRIPT
+        self._transcripts = script.get("transcripts") or DEFAULT_SCRIPT["transcripts"]
+        self._replies = script.get("replies") or DEFAULT_SCRIPT["replies"]
+        self._calls = script.get("calls", [])
+        self._user_turns = 0
+        self._answered_turns = 0
+        self._reply_count = 0
+        self._call_counts: Dict[str, int] = {}
+        self._turn_answer: Optional[Tuple[int, Dict[str, Any]]] = None
+
+    def next_transcript(self) -> str:
+        """What the user says next; counts as a new user turn."""
+        transcript = self._transcripts[min(self._user_turns, len(self._transcripts) - 1)]
+        self._user_turns += 1
+        return transcript
+
+    def respond(
+        self, tools: List[Tuple[str, Dict[str, Any]]], user_message: bool = False
+    ) -> Dict[str, Any]:
+        """Decide the LLM's next answer.
+
+        Args:
+            tools: Available functions as ``(name, JSON schema)`` pairs
+            user_message: The request ends with what the user said (rather than
+                e.g. a function result); asking again for the same user turn
+                (e.g. a speculative request reissued) gets the same answer
+
+        Returns:
+            dict: ``{"text": ...}`` or ``{"call": name, "arguments": {...}}``
+        """
+        turn = self._user_turns - 1
+        if self._user_turns > self._answered_turns:
+            self._answered_turns = self._user_turns
+            answer = self._call(turn, tools) if tools else self._reply()
+            self._turn_answer = (turn, answer)
+            return answer
+
+        if user_message and self._turn_answer and self._turn_answer[0] == turn:
+            return self._turn_answer[1]
+        return self._reply()
+
+    def _call(self, turn: int, tools: List[Tuple[str, Dict[str, Any]]]) -> Dict[str, Any]:
+        schemas = dict(tools)
+        scripted = self._calls[turn] if turn < len(self._calls) else None
+        if scripted and scripted["name"] in schemas:
+            name, arguments = scripted["name"], scripted.get("arguments", {})
+        else:
+            name = min(schemas, key=lambda tool: self._call_counts.get(tool, 0))
+            arguments = _example_arguments(schemas[name])
+        self._call_counts[name] = self._call_counts.get(name, 0) + 1
+        return {"call": name, "arguments": arguments}
+
+    def _reply(self) -> Dict[str, Any]:
+        reply = self._replies[self._reply_count % len(self._replies)]
+        self._reply_count += 1
+        return {"text": reply}
+
+
+class EmulatedTranscribeSTTService(STTService):
+    """Stand-in for ``AWSTranscribeSTTService`` driven by VAD events.
+
+    Args:
+        script: Conversation script providing the user's transcripts
+        profile: Latency profile; defaults to the ``EMULATOR_STT_*`` settings
+    """
+
+    def __init__(
+        self,
+        script: ConversationScript,
+        profile: Optional[LatencyProfile] = None,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self._script = script
+        self._profile = profile or stt_profile()
+        self._interim_task = None
+        self._final_tasks = []
+        self._turns = 0
+        self._transcript: Optional[str] = None
+
+    async def run_stt(self, audio: bytes):
+        # Transcripts follow the VAD events, not the audio itself
+        yield None
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if isinstance(frame, UserStartedSpeakingFrame):
+            await self._cancel_interim_task()
+            # What the user says is known from the start, as interim results show it
+            self._transcript = self._script.next_transcript()
+            self._interim_task = self.create_task(self._emit_interim_transcripts(self._transcript))
+        elif isinstance(frame, UserStoppedSpeakingFrame):
+            await self._cancel_interim_task()
+            # Unregister the transcripts already sent; each turn has its own task
+            for task in [task for task in self._final_tasks if task.done()]:
+                self._final_tasks.remove(task)
+                await self.wait_for_task(task)
+            self._turns += 1
+            transcript, self._transcript = self._transcript or self._script.next_transcript(), None
+            task = self.create_task(
+                self._emit_final_transcript(transcript), f"final_transcript#{self._turns}"
+            )
+            self._final_tasks.append(task)
+
+    async def cleanup(self):
+        await super().cleanup()
+        await self._cancel_interim_task()
+        for task in self._final_tasks:
+            await self.cancel_task(task)
+        self._final_tasks = []
+
+    async def _cancel_interim_task(self):
+        if self._interim_task:
+            await self.cancel_task(self._interim_task)
+            self._interim_task = None
+
+    async def _emit_interim_transcripts(self, transcript: str):
+        words = transcript.split()
+        for count in range(1, len(words)):
+            await asyncio.sleep(1 / self._profile.throughput)
+            await self.push_frame(
+                InterimTranscriptionFrame(" ".join(words[:count]), "", time_now_iso8601())
+            )
+
+    async def _emit_final_transcript(self, transcript: str):
+        await asyncio.sleep(self._profile.first_byte_secs())
+        if self._profile.throttled():
+            await self.push_error(
+                ErrorFrame("LimitExceededException: emulated Transcribe throttling")
+            )
+            return
+        await self.push_frame(TranscriptionFrame(transcript, "", time_now_iso8601()))
+
+
+class EmulatedBedrockClient:
+    """Stand-in for the boto ``bedrock-runtime`` client (``converse_stream`` only).
+
+    Args:
+        script: Conversation script deciding the answers
+        profile: Latency profile; defaults to the ``EMULATOR_LLM_*`` settings
+    """
+
+    # Prefixes written to the prompt cache, shared like Bedrock's across sessions
+    _cached_prefixes: Set[str] = set()
+
+    def __init__(self, script: ConversationScript, profile: Optional[LatencyProfile] = None):
+        self._script = script
+        self._profile = profile or llm_profile()
+
+    def converse_stream(self, **request) -> Dict[str, Any]:
+        if self._profile.throttled():
+            raise ClientError(
+                {"Error": {"Code": "ThrottlingException", "Message": "Emulated throttling"}},
+                "ConverseStream",
+            )
+        usage = self._input_usage(request)
+        # boto returns once the response starts streaming
+        time.sleep(self._profile.first_byte_secs() + self._prefill_secs(usage))
+
+        tools = _tool_schemas(request.get("toolConfig", {}).get("tools", []))
+        answer = self._script.respond(tools, user_message=_ends_with_user_text(request["messages"]))
+        return {"stream": self._stream(answer, usage)}
+
+    def converse(self, **request) -> Dict[str, Any]:
+        """Non-streaming answer (e.g. a summary): the first quarter of the last user
+        text, up to ``maxTokens`` words."""
+        usage = self._input_usage(request)
+        content = request["messages"][-1]["content"]
+        text = content if isinstance(content, str) else " ".join(block.get("text", "") for block in content)
+        words = text.split()
+        words = words[: min(max(len(words) // 4, 1), request.get("inferenceConfig", {}).get("maxTokens", 256))]
+        time.sleep(self._profile.first_byte_secs() + self._prefill_secs(usage))
+        time.sleep(len(words) / self._profile.throughput)
+        return {
+            "output": {"message": {"role": "assistant", "content": [{"text": " ".join(words)}]}},
+            "stopReason": "end_turn",
+            "usage": {**usage, "outputTokens": len(words), "totalTokens": sum(usage.values()) + len(words)},
+        }
+
+    def _prefill_secs(self, usage: Dict[str, int]) -> float:
+        """Time to process the input before the first byte; cache reads are much faster."""
+        if not LLM_PREFILL_RATE:
+            return 0.0
+        tokens = usage["inputTokens"] + usage.get("cacheWriteInputTokens", 0)
+        return (tokens + usage.get("cacheReadInputTokens", 0) / 10) / LLM_PREFILL_RATE
+
+    def _input_usage(self, request: Dict[str, Any]) -> Dict[str, int]:
+        """Input token counts of a request, split at its cache checkpoints as Bedrock does.
+
+        A checkpoint whose prefix was seen before is read from the cache; the
+        tokens up to the last checkpoint not read are written to it.
+        """
+        blocks = [*request.get("toolConfig", {}).get("tools", []), *(request.get("system") or [])]
+        for message in request["messages"]:
+            content = message["content"]
+            blocks.append({"role": message["role"]})
+            blocks.extend([{"text": content}] if isinstance(content, str) else content)
+
+        prefix = hashlib.sha256()
+        tokens = read = cached = 0
+        for block in blocks:
+            if "cachePoint" in block:
+                key = prefix.hexdigest()
+                if key in self._cached_prefixes:
+                    read = tokens
+                self._cached_prefixes.add(key)
+                cached = tokens
+                continue
+            serialized = json.dumps(block, sort_keys=True, default=str)
+            prefix.update(serialized.encode())
+            tokens += len(serialized.split())
+
+        usage = {"inputTokens": tokens - cached}
+        if cached:
+            usage.update(cacheReadInputTokens=read, cacheWriteInputTokens=cached - read)
+        return usage
+
+    def _stream(self, answer: Dict[str, Any], input_usage: Dict[str, int]) -> Iterator[Dict[str, Any]]:
+        token_secs = 1 / self._profile.throughput
+        yield {"messageStart": {"role": "assistant"}}
+        if "text" in answer:
+            tokens = [word + " " for word in answer["text"].split()]
+            for token in tokens:
+                yield {"contentBlockDelta": {"contentBlockIndex": 0, "delta": {"text": token}}}
+                time.sleep(token_secs)
+            stop_reason = "end_turn"
+        else:
+            arguments = json.dumps(answer["arguments"])
+            tokens = [arguments]
+            yield {
+                "contentBlockStart": {
+                    "contentBlockIndex": 0,
+                    "start": {"toolUse": {"toolUseId": _tool_call_id(), "name": answer["call"]}},
+                }
+            }
+            time.sleep(token_secs * max(len(arguments.split()), 1))
+            yield {
+                "contentBlockDelta": {
+                    "contentBlockIndex": 0,
+                    "delta": {"toolUse": {"input": arguments}},
+                }
+            }
+            stop_reason = "tool_use"
+        yield {"contentBlockStop": {"contentBlockIndex": 0}}
+        yield {"messageStop": {"stopReason": stop_reason}}
+        yield {
+            "metadata": {
+                "usage": {
+                    **input_usage,
+                    "outputTokens": len(tokens),
+                    "totalTokens": sum(input_usage.values()) + len(tokens),
+                }
+            }
+        }
+
+
+class EmulatedPollyClient:
+    """Stand-in for the boto Polly client (``synthesize_speech`` to PCM only).
+
+    Args:
+        profile: Latency profile; defaults to the ``EMULATOR_TTS_*`` settings
+    """
+
+    def __init__(self, profile: Optional[LatencyProfile] = None):
+        self._profile = profile or tts_profile()
+
+    def synthesize_speech(self, **params) -> Dict[str, Any]:
+        if self._profile.throttled():
+            raise ClientError(
+                {"Error": {"Code": "ThrottlingException", "Message": "Emulated throttling"}},
+                "SynthesizeSpeech",
+            )
+        time.sleep(self._profile.first_byte_secs())
+
+        text = re.sub(r"<[^>]+>", " ", params["Text"])
+        audio = speech_audio(text, int(params.get("SampleRate", "16000")))
+        duration = len(audio) / (int(params.get("SampleRate", "16000")) * 2)
+        return {"AudioStream": _AudioStream(audio, duration / self._profile.throughput)}
+
+
+class _AudioStream:
+    def __init__(self, audio: bytes, generation_secs: float):
+        self._audio = audio
+        self._generation_secs = generation_secs
+
+    def read(self) -> bytes:
+        # The rest of the audio is generated while the caller reads it
+        time.sleep(self._generation_secs)
+        return self._audio
+
+
+class EmulatedNovaSonicLLMService(LLMService):
+    """Stand-in for ``AWSNovaSonicLLMService``.
+
+    Answers each user turn (per VAD) with the script: pushes the user
+    transcript, then either streams the reply text and audio or calls a
+    function and answers its result.
+
+    A session lasting ``session_secs`` is closed, and the conversation reset
+    as the service does when its stream fails: the user audio and turns
+    reaching no session meanwhile are counted as lost. It also has the
+    session hooks of ``session_rotation``.
+
+    Args:
+        script: Conversation script deciding the answers
+        profile: Latency profile; defaults to the ``EMULATOR_SONIC_*`` settings
+        sample_rate: Sample rate of the reply audio
+        session_secs: Longest a session lasts
+    """
+
+    adapter_class = AWSBedrockLLMAdapter
+
+    def __init__(
+        self,
+        script: ConversationScript,
+        profile: Optional[LatencyProfile] = None,
+        sample_rate: int = 24000,
+        session_secs: float = SONIC_SESSION_SECS,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self._script = script
+        self._profile = profile or sonic_profile()
+        self._sample_rate = sample_rate
+        self._session_secs = session_secs
+        self._context: Optional[AWSBedrockLLMContext] = None
+        self._connected = False
+        self._response_task = None
+        # When the current session's stream was opened, and its expiry watch
+        self._session_opened_at = 0.0
+        self._expiry_task = None
+        self._counters = {"expired_sessions": 0, "lost_audio_ms": 0.0, "lost_turns": 0}
+
+    def stats(self) -> Dict[str, Any]:
+        """Sessions expired, and the user audio and turns that reached no session."""
+        return dict(self._counters)
+
+    async def start(self, frame: StartFrame):
+        await super().start(frame)
+        await self._start_connecting()
+        self._expiry_task = self.create_task(self._expire_sessions())
+
+    async def stop(self, frame: EndFrame):
+        await super().stop(frame)
+        await self._stop_expiry()
+        await self._disconnect()
+
+    async def cancel(self, frame: CancelFrame):
+        await super().cancel(frame)
+        await self._stop_expiry()
+        await self._disconnect()
+
+    async def reset_conversation(self):
+        """Connect again keeping the context, as the service does when its stream fails."""
+        context = self._context
+        await self._disconnect()
+        # The service's disconnect waits a second for its receive task
+        await asyncio.sleep(1)
+        self._context = context
+        await self._start_connecting()
+
+    def create_context_aggregator(
+        self,
+        context: OpenAILLMContext,
+        *,
+        user_params: LLMUserAggregatorParams = LLMUserAggregatorParams(),
+        assistant_params: LLMAssistantAggregatorParams = LLMAssistantAggregatorParams(),
+    ) -> AWSBedrockContextAggregatorPair:
+        context.set_llm_adapter(self.get_llm_adapter())
+        if not isinstance(context, AWSBedrockLLMContext):
+            context = AWSBedrockLLMContext.from_openai_context(context)
+        user = AWSBedrockUserContextAggregator(context, params=user_params)
+        assistant = AWSBedrockAssistantContextAggregator(context, params=assistant_params)
+        return AWSBedrockContextAggregatorPair(_user=user, _assistant=assistant)
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if isinstance(frame, OpenAILLMContextFrame):
+            # The initial context (greeting) or a function result
+            await self._handle_context(frame.context)
+            self._respond(user_turn=False)
+        elif isinstance(frame, InputAudioRawFrame):
+            await self._handle_input_audio_frame(frame)
+            await self.push_frame(frame, direction)
+        elif isinstance(frame, UserStoppedSpeakingFrame):
+            await self.push_frame(frame, direction)
+            if self._context and self._connected:
+                self._respond(user_turn=True)
+            elif self._context:
+                self._counters["lost_turns"] += 1
+        elif isinstance(frame, StartInterruptionFrame):
+            if self._response_task:
+                await self.cancel_task(self._response_task)
+                self._response_task = None
+            await self.push_frame(frame, direction)
+        else:
+            await self.push_frame(frame, direction)
+
+    async def cleanup(self):
+        await super().cleanup()
+        await self._stop_expiry()
+        if self._response_task:
+            await self.cancel_task(self._response_task)
+            self._response_task = None
+
+    async def _start_connecting(self):
+        # The stream and its session, as AWSNovaSonicLLMService opens them on start
+        if self._connected:
+            return
+        opened_at = time.monotonic()
+        await asyncio.sleep(SONIC_CONNECT_MS / 1000)
+        if self._context is not None:
+            # Connecting again: the prompt is set up from the context kept
+            await asyncio.sleep(SONIC_SETUP_MS / 1000)
+        self._session_opened_at = opened_at
+        self._connected = True
+
+    async def _handle_context(self, context: OpenAILLMContext):
+        # The first context sets up the prompt; later ones only update it
+        first = self._context is None
+        self._context = AWSBedrockLLMContext.upgrade_to_bedrock(context)
+        if first:
+            await asyncio.sleep(SONIC_SETUP_MS / 1000)
+
+    async def _disconnect(self):
+        if self._response_task:
+            await self.cancel_task(self._response_task)
+            self._response_task = None
+        self._connected = False
+
+    async def _handle_input_audio_frame(self, frame: InputAudioRawFrame):
+        if not self._connected and self._context:
+            self._counters["lost_audio_ms"] += len(frame.audio) / (frame.sample_rate * frame.num_channels * 2) * 1000
+
+    async def _open_session(self) -> float:
+        # An emulated session is only the time its stream was opened
+        opened_at = time.monotonic()
+        await asyncio.sleep(SONIC_CONNECT_MS / 1000)
+        return opened_at
+
+    async def _prime_session(self, session: float):
+        await asyncio.sleep(SONIC_SETUP_MS / 1000)
+
+    def _switch_session(self, session: float) -> float:
+        previous, self._session_opened_at = self._session_opened_at, session
+        return previous
+
+    async def _close_session(self, session: float):
+        pass
+
+    async def _expire_sessions(self):
+        while True:
+            expires_at = self._session_opened_at + self._session_secs
+            if not self._connected or time.monotonic() < expires_at:
+                await asyncio.sleep(max(expires_at - time.monotonic(), 0.1))
+                continue
+            logger.warning(f"{self}: Nova Sonic session reached its {self._session_secs:.0f}s limit")
+            self._counters["expired_sessions"] += 1
+            await self.reset_conversation()
+
+    async def _stop_expiry(self):
+        task, self._expiry_task = self._expiry_task, None
+        if task:
+            await self.cancel_task(task)
+
+    def _respond(self, user_turn: bool):
+        self._response_task = self.create_task(self._response(user_turn))
+
+    async def _response(self, user_turn: bool):
+        await asyncio.sleep(self._profile.first_byte_secs())
+        if self._profile.throttled():
+            await self.push_error(ErrorFrame("ThrottlingException: emulated Nova Sonic throttling"))
+            return
+
+        if user_turn:
+            transcript = self._script.next_transcript()
+            self._context.add_message({"role": "user", "content": [{"text": transcript}]})
+            await self.push_frame(TranscriptionFrame(transcript, "", time_now_iso8601()))
+
+        answer = self._script.respond(_tool_schemas(self._context.tools))
+        if "call" in answer:
+            await self.call_function(
+                context=self._context,
+                tool_call_id=_tool_call_id(),
+                function_name=answer["call"],
+                arguments=answer["arguments"],
+            )
+            return
+
+        await self.push_frame(LLMFullResponseStartFrame())
+        await self.push_frame(TTSStartedFrame())
+        await self.push_frame(LLMTextFrame(answer["text"]))
+        await self.push_frame(TTSTextFrame(answer["text"]))
+        audio = speech_audio(answer["text"], self._sample_rate)
+        chunk_size = int(self._sample_rate * 0.04) * 2
+        for i in range(0, len(audio), chunk_size):
+            await self.push_frame(TTSAudioRawFrame(audio[i : i + chunk_size], self._sample_rate, 1))
+            await asyncio.sleep(0.04 / self._profile.throughput)
+        await self.push_frame(TTSStoppedFrame())
+        await self.push_frame(LLMFullResponseEndFrame())
+
+
+def speech_audio(text: str, sample_rate: int) -> bytes:
+    """16-bit PCM standing in for ``text`` spoken at ``WORDS_PER_SECOND``."""
+    seconds = max(len(text.split()), 1) / WORDS_PER_SECOND
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    return (0.1 * np.sin(2 * np.pi * TONE_HZ * t) * 32767).astype(np.int16).tobytes()
+
+
+def _tool_schemas(tools) -> List[Tuple[str, Dict[str, Any]]]:
+    """``(name, JSON schema)`` pairs from Bedrock ``toolSpec`` tools or a ToolsSchema."""
+    if isinstance(tools, ToolsSchema):
+        return [
+            (tool.name, {"properties": tool.properties, "required": tool.required})
+            for tool in tools.standard_tools
+        ]
+    schemas = []
+    for tool in tools or []:
+        spec = tool.get("toolSpec", {})
+        if "name" in spec:
+            schemas.append((spec["name"], spec.get("inputSchema", {}).get("json", {})))
+    return schemas
+
+
+def _example_arguments(schema: Dict[str, Any]) -> Dict[str, Any]:
+    properties = schema.get("properties", {})
+    return {
+        name: _example_value(properties.get(name, {})) for name in schema.get("required", [])
+    }
+
+
+def _example_value(schema: Dict[str, Any]) -> Any:
+    if schema.get("enum"):
+        return schema["enum"][0]
+    kind = schema.get("type", "string")
+    if kind == "array":
+        return [_example_value(schema.get("items", {}))]
+    if kind == "object":
+        return _example_arguments(schema)
+    if kind in ("integer", "number"):
+        return 1
+    if kind == "boolean":
+        return True
+    return "example"
+
+
+def _ends_with_user_text(messages: List[Dict[str, Any]]) -> bool:
+    """Whether the last message is the user's words rather than a function result."""
+    if not messages or messages[-1]["role"] != "user":
+        return False
+    content = messages[-1]["content"]
+    return isinstance(content, str) or not any("toolResult" in block for block in content)
+
+
+def _tool_call_id() -> str:
+    return f"tooluse_{uuid.uuid4().hex[:22]}"
+
+
+def emulate_bedrock(llm, script: ConversationScript):
+    """Make an ``AWSBedrockLLMService`` talk to ``EmulatedBedrockClient``."""
+    llm._client = EmulatedBedrockClient(script)
+
+
+def emulate_polly(tts):
+    """Make an ``AWSPollyTTSService`` talk to ``EmulatedPollyClient``."""
+    tts._polly_client = EmulatedPollyClient()
@@ -0,0 +1,115 @@
+"""Time from the participant joining to the bot's first audio, with and without eager connect.
+
+Runs ``--sessions`` sessions at once against the emulated Nova Sonic (see
+``aws_emulators``: ``EMULATOR_SONIC_CONNECT_MS`` to open the stream,
+``EMULATOR_SONIC_SETUP_MS`` to set up the prompt). In each, a replay
+participant joins ``--join-delay-ms`` after the bot started, waits for the
+greeting and leaves. Three setups:
+
+- ``lazy``: the prompt is set up when the participant joins
+- ``eager``: the prompt is set up while the bot waits (see ``eager_connect``)
+- ``eager_late_join``: eager, but the participant joins after
+  ``--timeout-ms``: the primed session is discarded and a new one set up
+
+and reports per setup the time from the join to the first bot audio, and
+how many sessions got no greeting.
+
+Usage:
+    python -m benchmarks.eager_connect --sessions 20 --output eager_connect.json
+"""
+
+import argparse
+import asyncio
+import json
+from typing import List, Optional
+
+from pipecat.adapters.schemas.function_schema import FunctionSchema
+from pipecat.adapters.schemas.tools_schema import ToolsSchema
+from pipecat.pipeline.pipeline import Pipeline
+from pipecat.pipeline.runner import PipelineRunner
+from pipecat.pipeline.task import PipelineTask
+from pipecat.services.aws.llm import AWSBedrockLLMContext
+
+from aws_emulators import ConversationScript, EmulatedNovaSonicLLMService
+from benchmarks.load_test import summarize
+from eager_connect import eager_connecting
+from replay_transport import ReplayParams, ReplayTransport
+
+SYSTEM_INSTRUCTION = "You are a friendly assistant. Keep your responses short. Start by greeting the user."
+
+TOOLS = ToolsSchema(
+    standard_tools=[
+        FunctionSchema(
+            name="get_current_weather",
+            description="Get the current weather",
+            properties={"location": {"type": "string"}, "format": {"type": "string"}},
+            required=["location", "format"],
+        )
+    ]
+)
+
+
+async def run_session(eager: bool, join_delay_secs: float, timeout_secs: float) -> Optional[float]:
+    transport = ReplayTransport(
+        ReplayParams(audio_in_enabled=True, audio_out_enabled=True, join_delay_secs=join_delay_secs)
+    )
+    if eager:
+        llm = eager_connecting(EmulatedNovaSonicLLMService)(
+            script=ConversationScript(), join_timeout_secs=timeout_secs
+        )
+    else:
+        llm = EmulatedNovaSonicLLMService(ConversationScript())
+    context = AWSBedrockLLMContext(messages=[{"role": "system", "content": SYSTEM_INSTRUCTION}], tools=TOOLS)
+    context_aggregator = llm.create_context_aggregator(context)
+    if eager:
+        llm.prime(context_aggregator.user().context)
+
+    pipeline = Pipeline(
+        [transport.input(), context_aggregator.user(), llm, transport.output(), context_aggregator.assistant()]
+    )
+    task = PipelineTask(pipeline, idle_timeout_secs=None)
+
+    @transport.event_handler("on_first_participant_joined")
+    async def on_first_participant_joined(transport, participant):
+        await task.queue_frames([context_aggregator.user().get_context_frame()])
+
+    @transport.event_handler("on_participant_left")
+    async def on_participant_left(transport, participant, reason):
+        await task.cancel()
+
+    await PipelineRunner(handle_sigint=False).run(task)
+    return transport.stats()["join_to_first_audio_ms"]
+
+
+async def run_setup(eager: bool, sessions: int, join_delay_secs: float, timeout_secs: float) -> dict:
+    latencies: List[Optional[float]] = await asyncio.gather(
+        *(run_session(eager, join_delay_secs, timeout_secs) for _ in range(sessions))
+    )
+    return {
+        "join_to_first_audio_ms": summarize([latency for latency in latencies if latency is not None]),
+        "missed_greetings": sum(latency is None for latency in latencies),
+    }
+
+
+async def benchmark(sessions: int, join_delay_secs: float, timeout_secs: float) -> dict:
+    return {
+        "lazy": await run_setup(False, sessions, join_delay_secs, timeout_secs),
+        "eager": await run_setup(True, sessions, join_delay_secs, timeout_secs),
+        "eager_late_join": await run_setup(True, sessions, timeout_secs + join_delay_secs, timeout_secs),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Eager connect benchmark")
+    parser.add_argument("--sessions", type=int, default=20, help="Concurrent sessions")
+    parser.add_argument("--join-delay-ms", type=float, default=2000, help="Time from bot start to the join")
+    parser.add_argument("--timeout-ms", type=float, default=3000, help="Join timeout of the primed session")
+    parser.add_argument("--output", type=str, help="Write the results to this JSON file")
+
+    config = parser.parse_args()
+
+    results = asyncio.run(benchmark(config.sessions, config.join_delay_ms / 1000, config.timeout_ms / 1000))
+    print(json.dumps(results, indent=2))
+    if config.output:
+        with open(config.output, "w") as f:
+            json.dump(results, f, indent=2)
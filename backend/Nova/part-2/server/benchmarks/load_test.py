@@ -0,0 +1,231 @@
+"""Offline load test: concurrent conversations over the replay transport.
+
+Runs N conversations at the same time, each in its own process (as the server
+runs bots by default). Each conversation runs the complete ``bot.create_bot``
+pipeline, with the flows of ``flow.py`` in part-1, on a
+``replay_transport.ReplayTransport`` instead of a Daily room. A simulated
+participant plays the WAV utterances in ``--utterances`` (sorted by file
+name, one per turn) in real time.
+
+Reports:
+
+- time to the greeting: the participant joining to the first bot audio
+- turn latency percentiles: end of an utterance to the first bot audio
+- CPU (cores, i.e. CPU seconds per second) and peak RSS per session
+- late and dropped input frames and late output frames
+
+Results are written as JSON so runs of different releases can be compared.
+With ``--baseline``, the run is compared against an earlier result file and
+the command fails if a metric regressed by more than ``--tolerance``.
+
+Usage:
+    python -m benchmarks.load_test --utterances recordings/ --conversations 10 --output load.json
+    python -m benchmarks.load_test --utterances recordings/ --baseline load.json
+"""
+
+import argparse
+import asyncio
+import glob
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+# Metrics compared against a baseline (all "lower is better")
+REGRESSION_METRICS = (
+    ("turn_latency_ms", "p50"),
+    ("turn_latency_ms", "p95"),
+    ("cpu_cores_per_session", "mean"),
+    ("max_rss_mb_per_session", "mean"),
+)
+
+
+async def run_conversation(index: int, utterances: List[str], capture_dir: Optional[str]) -> dict:
+    from pipecat.pipeline.runner import PipelineRunner
+
+    import bot
+    from replay_transport import ReplayParams, ReplayTransport
+
+    vad_analyzer = bot.create_vad_analyzer()
+    transport = ReplayTransport(
+        ReplayParams(
+            audio_in_enabled=True,
+            audio_out_enabled=True,
+            vad_analyzer=vad_analyzer,
+            utterances=utterances,
+            capture_path=os.path.join(capture_dir, f"bot-{index}.wav") if capture_dir else None,
+        )
+    )
+    task = await bot.create_bot(f"replay://{index}", "", vad_analyzer=vad_analyzer, transport=transport)
+
+    usage_before = resource.getrusage(resource.RUSAGE_SELF)
+    started = time.monotonic()
+    await PipelineRunner(handle_sigint=False).run(task)
+    wall_secs = time.monotonic() - started
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+
+    cpu_secs = (usage.ru_utime + usage.ru_stime) - (usage_before.ru_utime + usage_before.ru_stime)
+    return {
+        **transport.stats(),
+        "wall_secs": wall_secs,
+        "cpu_secs": cpu_secs,
+        "cpu_cores": cpu_secs / wall_secs if wall_secs else 0.0,
+        # ru_maxrss is in kilobytes on Linux
+        "max_rss_mb": usage.ru_maxrss / 1024,
+    }
+
+
+def run_child(index: int, utterances: List[str], capture_dir: Optional[str], result_path: str):
+    result = asyncio.run(run_conversation(index, utterances, capture_dir))
+    with open(result_path, "w") as f:
+        json.dump(result, f)
+
+
+def summarize(values: List[float]) -> Dict[str, Optional[float]]:
+    ordered = sorted(values)
+    if not ordered:
+        return {"count": 0, "mean": None, "p50": None, "p90": None, "p95": None, "p99": None, "max": None}
+
+    def pick(percent):
+        return ordered[min(int(round(percent / 100 * (len(ordered) - 1))), len(ordered) - 1)]
+
+    return {
+        "count": len(ordered),
+        "mean": sum(ordered) / len(ordered),
+        "p50": pick(50),
+        "p90": pick(90),
+        "p95": pick(95),
+        "p99": pick(99),
+        "max": ordered[-1],
+    }
+
+
+def run(conversations: int, utterances: List[str], capture_dir: Optional[str]) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        result_paths = [os.path.join(tmp, f"result-{i}.json") for i in range(conversations)]
+        started = time.monotonic()
+        children = [
+            subprocess.Popen(
+                [sys.executable, "-m", "benchmarks.load_test", "--child", str(i), "--result", path]
+                + ["--utterances", *utterances]
+                + (["--capture-dir", capture_dir] if capture_dir else []),
+                # Keep our stdout for the results
+                stdout=sys.stderr,
+            )
+            for i, path in enumerate(result_paths)
+        ]
+        for child in children:
+            child.wait()
+        wall_secs = time.monotonic() - started
+
+        sessions = []
+        for path in result_paths:
+            try:
+                with open(path) as f:
+                    sessions.append(json.load(f))
+            except (OSError, json.JSONDecodeError):
+                sessions.append(None)
+
+    completed = [session for session in sessions if session]
+    return {
+        "metadata": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "conversations": conversations,
+            "utterances": [os.path.basename(path) for path in utterances],
+            "wall_secs": wall_secs,
+        },
+        "failed_sessions": len(sessions) - len(completed),
+        "join_to_first_audio_ms": summarize(
+            [
+                session["join_to_first_audio_ms"]
+                for session in completed
+                if session["join_to_first_audio_ms"] is not None
+            ]
+        ),
+        "turn_latency_ms": summarize(
+            [latency for session in completed for latency in session["turn_latencies_ms"]]
+        ),
+        "missed_replies": sum(session["missed_replies"] for session in completed),
+        "cpu_cores_per_session": summarize([session["cpu_cores"] for session in completed]),
+        "max_rss_mb_per_session": summarize([session["max_rss_mb"] for session in completed]),
+        "input_late_frames": sum(session["input_late_frames"] for session in completed),
+        "input_dropped_frames": sum(session["input_dropped_frames"] for session in completed),
+        "output_late_frames": sum(session["output_late_frames"] for session in completed),
+        "sessions": sessions,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Metrics that regressed by more than ``tolerance`` relative to the baseline."""
+    regressions = []
+    for metric, stat in REGRESSION_METRICS:
+        current = results.get(metric, {}).get(stat)
+        previous = baseline.get(metric, {}).get(stat)
+        if current is None or not previous:
+            continue
+        change = (current - previous) / previous
+        if change > tolerance:
+            regressions.append(f"{metric}.{stat}: {previous:.2f} -> {current:.2f} (+{change:.0%})")
+    return regressions
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline bot load test")
+    parser.add_argument(
+        "--utterances",
+        type=str,
+        nargs="+",
+        required=True,
+        help="WAV files, or a directory of WAV files, played in order as the user's turns",
+    )
+    parser.add_argument("--conversations", type=int, default=4, help="Concurrent conversations")
+    parser.add_argument("--capture-dir", type=str, help="Save each conversation's bot audio here")
+    parser.add_argument("--output", type=str, help="Write the results to this JSON file")
+    parser.add_argument("--baseline", type=str, help="Compare against this earlier result file")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed regression (0.1 = 10%%)")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--result", type=str, help=argparse.SUPPRESS)
+
+    config = parser.parse_args()
+
+    utterances = []
+    for path in config.utterances:
+        if os.path.isdir(path):
+            utterances.extend(sorted(glob.glob(os.path.join(path, "*.wav"))))
+        else:
+            utterances.append(path)
+    utterances = [os.path.abspath(path) for path in utterances]
+
+    if config.child is not None:
+        run_child(config.child, utterances, config.capture_dir, config.result)
+        sys.exit(0)
+
+    results = run(config.conversations, utterances, config.capture_dir)
+    print(json.dumps({key: value for key, value in results.items() if key != "sessions"}, indent=2))
+    if config.output:
+        with open(config.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if config.baseline:
+        with open(config.baseline) as f:
+            regressions = compare(results, json.load(f), config.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,279 @@
+"""Checks session rotation of the Nova Sonic service itself, against fake bidirectional streams.
+
+The session rotation benchmark runs against the emulated Nova Sonic, which
+brings its own session hooks. This check drives
+``rotating_sessions(AWSNovaSonicLLMService)`` instead, with the session
+hooks of ``NovaSonicSessionsMixin``, and replaces only the service's
+``_create_client``: each stream it opens records the events the service
+sends it and never answers. The caller streams microphone audio. A function
+call starts ``--call-at-secs`` into the session and gets its result
+``--call-secs`` later, after the session is ``--rotate-after-secs`` old.
+The bot answers the result, and the conversation then stays quiet until the
+session is rotated. The check verifies that:
+
+- the session is not rotated while the function call waits for its result
+- the replacement stream gets its session started, then the prompt with the
+  tools, the system instruction and the history, then the audio input
+  started, and all user audio from the handover on
+- the old stream gets no user audio after the handover, ends its prompt and
+  session, and is closed
+- the service takes over the replacement's stream, prompt, receive loop and
+  connection time, and the session object keeps nothing but its stream's state
+
+It reports the events each stream got and the result of each check, and
+exits with status 1 if any check fails. It needs the Nova Sonic SDK
+(``pipecat-ai[aws-nova-sonic]``) but no AWS account.
+
+Usage:
+    python -m benchmarks.nova_sonic_sessions
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from pipecat.adapters.schemas.function_schema import FunctionSchema
+from pipecat.adapters.schemas.tools_schema import ToolsSchema
+from pipecat.frames.frames import (
+    BotStartedSpeakingFrame,
+    BotStoppedSpeakingFrame,
+    CancelFrame,
+    EndFrame,
+    Frame,
+    FunctionCallInProgressFrame,
+    FunctionCallResultFrame,
+    InputAudioRawFrame,
+    StartFrame,
+)
+from pipecat.pipeline.pipeline import Pipeline
+from pipecat.pipeline.runner import PipelineRunner
+from pipecat.pipeline.task import PipelineTask
+from pipecat.processors.aggregators.openai_llm_context import OpenAILLMContext, OpenAILLMContextFrame
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+from pipecat.services.aws_nova_sonic.aws import AWSNovaSonicLLMService
+
+from session_rotation import _SESSION_ATTRIBUTES, rotating_sessions
+
+SYSTEM_INSTRUCTION = "You are a friendly assistant. Keep your responses short."
+
+HISTORY = [
+    {"role": "user", "content": "What's the weather like in Seattle?"},
+    {"role": "assistant", "content": "Let me check that for you."},
+]
+
+TOOLS = ToolsSchema(
+    standard_tools=[
+        FunctionSchema(
+            name="get_weather",
+            description="Get the current weather for a city",
+            properties={"city": {"type": "string", "description": "The city"}},
+            required=["city"],
+        )
+    ]
+)
+
+SAMPLE_RATE = 16000
+
+# Duration in seconds of the microphone audio chunks
+CHUNK_SECS = 0.02
+
+# How long the bot speaks to answer the function result
+ANSWER_SECS = 0.5
+
+# Longest wait for the rotation once the bot has answered
+ROTATION_TIMEOUT_SECS = 5
+
+
+class FakeInputStream:
+    """Input side of a fake stream: records the events sent on it, with when they were sent."""
+
+    def __init__(self):
+        self.events: List[Dict[str, Any]] = []
+        self.closed = False
+
+    async def send(self, chunk):
+        event = json.loads(chunk.value.bytes_)["event"]
+        name = next(iter(event))
+        self.events.append({"name": name, "at": time.monotonic(), **event[name]})
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeStream:
+    """Bidirectional stream on which Nova Sonic never answers."""
+
+    def __init__(self):
+        self.input_stream = FakeInputStream()
+
+    async def await_output(self):
+        # The receive loop waits here until it is cancelled
+        await asyncio.Event().wait()
+
+
+class FakeClient:
+    """Opens fake streams, keeping them in ``streams``."""
+
+    def __init__(self, streams: List[FakeStream]):
+        self._streams = streams
+
+    async def invoke_model_with_bidirectional_stream(self, operation_input):
+        stream = FakeStream()
+        self._streams.append(stream)
+        return stream
+
+
+class FakeStreamNovaSonicLLMService(AWSNovaSonicLLMService):
+    """``AWSNovaSonicLLMService`` with a fake client; the streams it opens are in ``streams``."""
+
+    def __init__(self, **kwargs):
+        super().__init__(secret_access_key="fake", access_key_id="fake", region="us-east-1", **kwargs)
+        self.streams: List[FakeStream] = []
+
+    def _create_client(self):
+        return FakeClient(self.streams)
+
+
+class Microphone(FrameProcessor):
+    """Streams microphone audio (silence) in real time."""
+
+    def __init__(self):
+        super().__init__()
+        self._task: Optional[asyncio.Task] = None
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+        if isinstance(frame, StartFrame):
+            await self.push_frame(frame, direction)
+            self._task = self.create_task(self._stream_audio())
+            return
+        if isinstance(frame, (EndFrame, CancelFrame)) and self._task:
+            await self.cancel_task(self._task)
+        await self.push_frame(frame, direction)
+
+    async def _stream_audio(self):
+        audio = b"\x00" * (int(SAMPLE_RATE * CHUNK_SECS) * 2)
+        next_time = time.monotonic()
+        while True:
+            await self.push_frame(InputAudioRawFrame(audio=audio, sample_rate=SAMPLE_RATE, num_channels=1))
+            next_time += CHUNK_SECS
+            await asyncio.sleep(max(next_time - time.monotonic(), 0))
+
+
+async def converse(llm, task: PipelineTask, config: argparse.Namespace) -> Dict[str, Any]:
+    """Plays the conversation; returns what the checks need from its course."""
+    call = {"function_name": "get_weather", "tool_call_id": "call-1", "arguments": {"city": "Seattle"}}
+    await asyncio.sleep(config.call_at_secs)
+    first_connected_time = llm._connected_time
+    await llm.push_frame(FunctionCallInProgressFrame(**call))
+    await asyncio.sleep(config.call_secs)
+    rotated_during_call = llm.rotation_stats()["rotations"] > 0
+    await llm.push_frame(FunctionCallResultFrame(**call, result={"conditions": "rain"}))
+    await task.queue_frame(BotStartedSpeakingFrame())
+    await asyncio.sleep(ANSWER_SECS)
+    await task.queue_frame(BotStoppedSpeakingFrame())
+
+    deadline = time.monotonic() + ROTATION_TIMEOUT_SECS
+    while not llm.rotation_stats()["rotations"] and time.monotonic() < deadline:
+        await asyncio.sleep(0.1)
+    # The old session is closed a second after the handover
+    await asyncio.sleep(1.5)
+    return {"first_connected_time": first_connected_time, "rotated_during_call": rotated_during_call}
+
+
+def check(llm, course: Dict[str, Any]) -> Dict[str, bool]:
+    checks = {"two_streams": len(llm.streams) == 2}
+    if not checks["two_streams"]:
+        return checks
+    old, new = (stream.input_stream.events for stream in llm.streams)
+    names = [event["name"] for event in new]
+    prompt_start = next((event for event in new if event["name"] == "promptStart"), {})
+    texts = [event["content"] for event in new if event["name"] == "textInput"]
+    audio = [event for event in new if event["name"] == "audioInput"]
+    handover_at = audio[0]["at"] if audio else float("inf")
+    audio_start = next(
+        (i for i, event in enumerate(new) if event["name"] == "contentStart" and event.get("type") == "AUDIO"), -1
+    )
+    session = llm._session
+
+    checks.update(
+        {
+            "no_rotation_while_call_pending": not course["rotated_during_call"],
+            "replacement_set_up_in_order": bool(audio)
+            and names[:2] == ["sessionStart", "promptStart"]
+            and max(i for i, name in enumerate(names) if name == "textInput")
+            < audio_start
+            < names.index("audioInput"),
+            "replacement_prompt_has_tools": "get_weather" in json.dumps(prompt_start.get("toolConfiguration")),
+            "replacement_has_system_instruction_and_history": SYSTEM_INSTRUCTION in texts
+            and all(message["content"] in texts for message in HISTORY),
+            "audio_to_replacement_prompt": bool(audio)
+            and all(event["promptName"] == prompt_start.get("promptName") for event in audio),
+            "no_audio_to_old_stream_after_handover": not any(
+                event["name"] == "audioInput" and event["at"] >= handover_at for event in old
+            ),
+            "old_stream_ended_and_closed": [event["name"] for event in old[-2:]] == ["promptEnd", "sessionEnd"]
+            and llm.streams[0].input_stream.closed,
+            "service_uses_replacement": llm._stream is llm.streams[1]
+            and llm._prompt_name == prompt_start.get("promptName")
+            and llm._receive_task is session._receive_task
+            and llm._receive_task is not None
+            and not llm._receive_task.done(),
+            "service_has_replacement_connected_time": llm._connected_time is not None
+            and llm._connected_time != course["first_connected_time"]
+            and llm._connected_time == session._connected_time,
+            "session_keeps_only_stream_state": set(vars(session)) <= _SESSION_ATTRIBUTES,
+        }
+    )
+    return checks
+
+
+async def run(config: argparse.Namespace) -> Dict[str, Any]:
+    llm = rotating_sessions(FakeStreamNovaSonicLLMService)(
+        max_secs=config.session_secs,
+        rotate_after_secs=config.rotate_after_secs,
+        silence_ms=config.silence_ms,
+        system_instruction=SYSTEM_INSTRUCTION,
+        tools=TOOLS,
+    )
+    task = PipelineTask(Pipeline([Microphone(), llm]), idle_timeout_secs=None)
+    context = OpenAILLMContext(messages=[{"role": "system", "content": SYSTEM_INSTRUCTION}, *HISTORY])
+    await task.queue_frames([OpenAILLMContextFrame(context)])
+    runner = asyncio.create_task(PipelineRunner(handle_sigint=False).run(task))
+
+    course = await converse(llm, task, config)
+    checks = check(llm, course)
+    await task.queue_frame(EndFrame())
+    await runner
+    return {
+        "streams": [[event["name"] for event in stream.input_stream.events] for stream in llm.streams],
+        "rotation": llm.rotation_stats(),
+        "checks": checks,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Nova Sonic session rotation check")
+    parser.add_argument("--session-secs", type=float, default=30, help="Scaled-down Nova Sonic session limit")
+    parser.add_argument("--rotate-after-secs", type=float, default=5, help="Session age at which it is rotated")
+    parser.add_argument("--silence-ms", type=float, default=300, help="Silence before the replacement is set up")
+    parser.add_argument("--call-at-secs", type=float, default=1, help="When the function call starts")
+    parser.add_argument("--call-secs", type=float, default=5, help="How long the function call takes")
+    parser.add_argument("--output", type=str, help="Write the results to this JSON file")
+
+    config = parser.parse_args()
+
+    results = asyncio.run(run(config))
+    # Audio events collapsed, so the streams' set-up and ending stay readable
+    for i, names in enumerate(results["streams"]):
+        results["streams"][i] = [
+            name for j, name in enumerate(names) if name != "audioInput" or j == 0 or names[j - 1] != "audioInput"
+        ]
+    print(json.dumps(results, indent=2))
+    if config.output:
+        with open(config.output, "w") as f:
+            json.dump(results, f, indent=2)
+    sys.exit(0 if all(results["checks"].values()) else 1)
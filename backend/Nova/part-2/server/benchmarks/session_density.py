@@ -0,0 +1,144 @@
+"""Memory per session: process-per-call versus multi-session workers.
+
+Builds complete bot sessions with ``bot.create_bot`` (transport, AWS services,
+VAD analyzer, pipeline task) without joining a room, in both deployment
+models, and compares their memory footprint:
+
+- process: one interpreter per session, as started by the server by default
+- worker: many sessions in one interpreter, as hosted by ``session_worker``
+
+Memory is measured as PSS where the kernel provides it (shared pages are split
+between the processes sharing them) and RSS otherwise. The maximum number of
+sessions per host is extrapolated from the memory currently available.
+
+Usage:
+    python -m benchmarks.session_density --sessions 20 --output density.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import List, Optional
+
+ROOM_URL = "https://stub.daily.co/bench-{index}"
+
+
+async def build_sessions(count: int):
+    import bot
+
+    tasks = [await bot.create_bot(ROOM_URL.format(index=i), "bench-token") for i in range(count)]
+    print("ready", flush=True)
+    # Keep the sessions alive until the parent has measured us
+    await asyncio.get_running_loop().run_in_executor(None, sys.stdin.read)
+    return tasks
+
+
+def process_memory_mb(pid: int) -> Optional[float]:
+    """PSS (or RSS when PSS is unavailable) of a process in MB."""
+    for path, field in ((f"/proc/{pid}/smaps_rollup", "Pss:"), (f"/proc/{pid}/status", "VmRSS:")):
+        try:
+            with open(path) as f:
+                for line in f:
+                    if line.startswith(field):
+                        return int(line.split()[1]) / 1024
+        except OSError:
+            continue
+    return None
+
+
+def available_memory_mb() -> Optional[float]:
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def start_children(session_counts: List[int]) -> List[subprocess.Popen]:
+    children = [
+        subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.session_density", "--child", str(count)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        for count in session_counts
+    ]
+    for child in children:
+        # Skip whatever the bot prints while it builds its sessions
+        for line in child.stdout:
+            if line.strip() == "ready":
+                break
+        else:
+            raise RuntimeError(f"benchmark child {child.pid} failed to build its sessions")
+    return children
+
+
+def measure(session_counts: List[int]) -> List[float]:
+    children = start_children(session_counts)
+    try:
+        # Let background threads (Daily, onnxruntime) settle before measuring
+        time.sleep(2)
+        return [process_memory_mb(child.pid) or 0.0 for child in children]
+    finally:
+        for child in children:
+            child.stdin.close()
+            child.wait()
+
+
+def run(sessions: int) -> dict:
+    process_mb = measure([1] * sessions)
+    baseline_mb, worker_mb = measure([0, sessions])
+
+    process_per_session = sum(process_mb) / sessions
+    worker_per_session = (worker_mb - baseline_mb) / sessions
+    available_mb = available_memory_mb()
+    workers = os.cpu_count() or 1
+
+    result = {
+        "sessions": sessions,
+        "process": {
+            "total_mb": sum(process_mb),
+            "per_session_mb": process_per_session,
+        },
+        "worker": {
+            "baseline_mb": baseline_mb,
+            "total_mb": worker_mb,
+            "per_session_mb": worker_per_session,
+            "per_session_amortized_mb": worker_mb / sessions,
+        },
+        "available_mb": available_mb,
+    }
+    if available_mb:
+        result["process"]["max_sessions_per_host"] = int(available_mb / process_per_session)
+        if worker_per_session > 0:
+            result["worker"]["max_sessions_per_host"] = int(
+                max(available_mb - workers * baseline_mb, 0) / worker_per_session
+            )
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Session memory benchmark")
+    parser.add_argument("--sessions", type=int, default=10, help="Number of sessions to build")
+    parser.add_argument("--output", type=str, help="Write the results to this JSON file")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+
+    config = parser.parse_args()
+
+    if config.child is not None:
+        asyncio.run(build_sessions(config.child))
+        sys.exit(0)
+
+    results = run(config.sessions)
+    print(json.dumps(results, indent=2))
+    if config.output:
+        with open(config.output, "w") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,180 @@
+"""User audio and turns lost when Nova Sonic sessions reach their time limit, with and without rotation.
+
+Runs ``--sessions`` conversations of ``--minutes`` at once against the
+emulated Nova Sonic, with its session limit scaled down to
+``--session-secs`` (see ``aws_emulators``: ``EMULATOR_SONIC_CONNECT_MS`` to
+open a stream, ``EMULATOR_SONIC_SETUP_MS`` to set up the prompt). In each, a
+caller streams microphone audio in real time and, turn by turn, speaks for
+``--turn-secs`` (per VAD), waits for the reply and pauses ``--pause-secs``.
+Two setups:
+
+- ``expiry``: the session reaches its limit and the conversation is reset
+- ``rotation``: the session is rotated ``--rotate-after-secs`` into it (see
+  ``session_rotation``)
+
+and reports per setup the sessions that expired, the user audio (ms) and
+turns that reached no session, the rotations (forced, and replacements
+discarded as stale) and the audio gap of the handovers.
+
+Usage:
+    python -m benchmarks.session_rotation --sessions 5 --output session_rotation.json
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import numpy as np
+
+from pipecat.frames.frames import (
+    BotStartedSpeakingFrame,
+    BotStoppedSpeakingFrame,
+    CancelFrame,
+    EndFrame,
+    Frame,
+    InputAudioRawFrame,
+    StartFrame,
+    UserStartedSpeakingFrame,
+    UserStoppedSpeakingFrame,
+)
+from pipecat.pipeline.pipeline import Pipeline
+from pipecat.pipeline.runner import PipelineRunner
+from pipecat.pipeline.task import PipelineTask
+from pipecat.processors.aggregators.openai_llm_context import OpenAILLMContextFrame
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+from pipecat.services.aws.llm import AWSBedrockLLMContext
+
+from aws_emulators import ConversationScript, EmulatedNovaSonicLLMService
+from benchmarks.load_test import summarize
+from replay_transport import ReplayParams, ReplayTransport
+from session_rotation import rotating_sessions
+
+SYSTEM_INSTRUCTION = "You are a friendly assistant. Keep your responses short. Start by greeting the user."
+
+SAMPLE_RATE = 16000
+
+# Duration in seconds of the microphone audio chunks
+CHUNK_SECS = 0.02
+
+
+class Caller(FrameProcessor):
+    """Streams microphone audio and takes turns with the bot, as its VAD would report them."""
+
+    def __init__(self, minutes: float, turn_secs: float, pause_secs: float, reply_timeout: float = 15.0):
+        super().__init__()
+        self._minutes = minutes
+        self._turn_secs = turn_secs
+        self._pause_secs = pause_secs
+        self._reply_timeout = reply_timeout
+        self._speaking = False
+        self._bot_started = asyncio.Event()
+        self._bot_stopped = asyncio.Event()
+        self._tasks = []
+        self.finished = asyncio.Event()
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+        if isinstance(frame, StartFrame):
+            await self.push_frame(frame, direction)
+            self._tasks = [self.create_task(self._microphone()), self.create_task(self._talk())]
+            return
+        if isinstance(frame, BotStartedSpeakingFrame):
+            self._bot_started.set()
+        elif isinstance(frame, BotStoppedSpeakingFrame):
+            self._bot_stopped.set()
+        elif isinstance(frame, (EndFrame, CancelFrame)):
+            for task in self._tasks:
+                await self.cancel_task(task)
+        await self.push_frame(frame, direction)
+
+    async def _microphone(self):
+        samples = int(SAMPLE_RATE * CHUNK_SECS)
+        t = np.arange(samples) / SAMPLE_RATE
+        speech = (0.1 * np.sin(2 * np.pi * 220 * t) * 32767).astype(np.int16).tobytes()
+        silence = b"\x00" * (samples * 2)
+        next_time = time.monotonic()
+        while True:
+            audio = speech if self._speaking else silence
+            await self.push_frame(InputAudioRawFrame(audio=audio, sample_rate=SAMPLE_RATE, num_channels=1))
+            next_time += CHUNK_SECS
+            await asyncio.sleep(max(next_time - time.monotonic(), 0))
+
+    async def _wait_for_reply(self):
+        try:
+            await asyncio.wait_for(self._bot_started.wait(), self._reply_timeout)
+            await self._bot_stopped.wait()
+        except asyncio.TimeoutError:
+            pass
+
+    async def _talk(self):
+        ends_at = time.monotonic() + self._minutes * 60
+        await self._wait_for_reply()
+        while time.monotonic() < ends_at:
+            await asyncio.sleep(self._pause_secs)
+            self._bot_started.clear()
+            self._bot_stopped.clear()
+            self._speaking = True
+            await self.push_frame(UserStartedSpeakingFrame())
+            await asyncio.sleep(self._turn_secs)
+            self._speaking = False
+            await self.push_frame(UserStoppedSpeakingFrame())
+            await self._wait_for_reply()
+        self.finished.set()
+
+
+async def run_session(rotation: bool, config: argparse.Namespace) -> dict:
+    llm_params = {"script": ConversationScript(), "session_secs": config.session_secs}
+    if rotation:
+        llm = rotating_sessions(EmulatedNovaSonicLLMService)(
+            max_secs=config.session_secs, rotate_after_secs=config.rotate_after_secs, **llm_params
+        )
+    else:
+        llm = EmulatedNovaSonicLLMService(**llm_params)
+    transport = ReplayTransport(ReplayParams(audio_out_enabled=True))
+    caller = Caller(config.minutes, config.turn_secs, config.pause_secs)
+    task = PipelineTask(Pipeline([caller, llm, transport.output()]), idle_timeout_secs=None)
+    context = AWSBedrockLLMContext(messages=[{"role": "system", "content": SYSTEM_INSTRUCTION}])
+    await task.queue_frames([OpenAILLMContextFrame(context)])
+
+    async def hang_up():
+        await caller.finished.wait()
+        await task.queue_frame(EndFrame())
+
+    await asyncio.gather(PipelineRunner(handle_sigint=False).run(task), hang_up())
+    return {**llm.stats(), **(llm.rotation_stats() if rotation else {})}
+
+
+async def run_setup(rotation: bool, config: argparse.Namespace) -> dict:
+    sessions = await asyncio.gather(*(run_session(rotation, config) for _ in range(config.sessions)))
+    gaps = [session["max_gap_ms"] for session in sessions if session.get("max_gap_ms") is not None]
+    totals = {
+        name: sum(session.get(name, 0) for session in sessions)
+        for name in ("expired_sessions", "lost_audio_ms", "lost_turns", "rotations", "forced", "discarded", "failed")
+    }
+    return {**totals, "handover_gap_ms": summarize(gaps)}
+
+
+async def benchmark(config: argparse.Namespace) -> dict:
+    return {
+        "expiry": await run_setup(False, config),
+        "rotation": await run_setup(True, config),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Session rotation benchmark")
+    parser.add_argument("--sessions", type=int, default=5, help="Concurrent conversations")
+    parser.add_argument("--minutes", type=float, default=2, help="Length of each conversation")
+    parser.add_argument("--session-secs", type=float, default=45, help="Scaled-down Nova Sonic session limit")
+    parser.add_argument("--rotate-after-secs", type=float, default=30, help="Session age at which it is rotated")
+    parser.add_argument("--turn-secs", type=float, default=2, help="Time the caller speaks per turn")
+    parser.add_argument("--pause-secs", type=float, default=2.5, help="Pause after each reply")
+    parser.add_argument("--output", type=str, help="Write the results to this JSON file")
+
+    config = parser.parse_args()
+
+    results = asyncio.run(benchmark(config))
+    print(json.dumps(results, indent=2))
+    if config.output:
+        with open(config.output, "w") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,118 @@
+"""Spawn-to-ready latency: cold ``python3`` start versus zygote fork.
+
+Measures how long it takes until a new bot process has the bot modules
+imported and the Silero VAD model loaded, i.e. until it could join a room:
+
+- cold: a fresh interpreter importing ``bot_zygote`` (the bot modules and the
+  VAD model), as ``python3 -m bot`` does
+- zygote: a child forked by ``bot_spawner.ZygoteSpawner``
+
+It also reports the unique (private) memory of each kind of process, which is
+what every additional bot really costs once shared pages are accounted for.
+
+Usage:
+    python -m benchmarks.spawn_latency --spawns 20 --output spawn.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import List, Optional
+
+from bot_spawner import ZygoteSpawner
+
+# Seconds a benchmark child stays alive so its memory can be measured
+HOLD_SECS = 3.0
+
+
+def unique_memory_mb(pid: int) -> Optional[float]:
+    """Private (unshared) memory of a process in MB."""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            private_kb = sum(
+                int(line.split()[1]) for line in f if line.startswith(("Private_Clean:", "Private_Dirty:"))
+            )
+        return private_kb / 1024
+    except OSError:
+        return None
+
+
+def percentiles_ms(samples: List[float]) -> dict:
+    ordered = sorted(samples)
+
+    def pick(percent):
+        index = min(int(round(percent / 100 * (len(ordered) - 1))), len(ordered) - 1)
+        return ordered[index] * 1000
+
+    return {"p50": pick(50), "p90": pick(90), "p99": pick(99), "max": ordered[-1] * 1000}
+
+
+def measure_cold(spawns: int) -> dict:
+    latencies, memory = [], []
+    for _ in range(spawns):
+        started = time.monotonic()
+        child = subprocess.Popen(
+            [
+                sys.executable,
+                "-c",
+                f"import bot_zygote, time; print('ready', flush=True); time.sleep({HOLD_SECS})",
+            ],
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        if child.stdout.readline().strip() != "ready":
+            raise RuntimeError("cold benchmark child failed to start")
+        latencies.append(time.monotonic() - started)
+        memory.append(unique_memory_mb(child.pid))
+        child.terminate()
+        child.wait()
+    return {"spawn_latency_ms": percentiles_ms(latencies), "unique_memory_mb": _mean(memory)}
+
+
+async def measure_zygote(spawns: int) -> dict:
+    spawner = ZygoteSpawner(cwd=os.getcwd())
+    started = time.monotonic()
+    await spawner.start()
+    startup_secs = time.monotonic() - started
+
+    memory = []
+    for _ in range(spawns):
+        bot = await spawner.spawn_idle(HOLD_SECS)
+        memory.append(unique_memory_mb(bot.pid))
+        bot.terminate()
+        await bot.wait()
+
+    stats = spawner.stats()
+    await spawner.stop()
+    return {
+        "zygote_startup_secs": startup_secs,
+        "spawn_latency_ms": stats["spawn_latency_ms"],
+        "unique_memory_mb": _mean(memory),
+    }
+
+
+def _mean(values: List[Optional[float]]) -> Optional[float]:
+    values = [value for value in values if value is not None]
+    return sum(values) / len(values) if values else None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bot spawn latency benchmark")
+    parser.add_argument("--spawns", type=int, default=10, help="Number of bots to spawn per mode")
+    parser.add_argument("--output", type=str, help="Write the results to this JSON file")
+
+    config = parser.parse_args()
+
+    results = {
+        "spawns": config.spawns,
+        "cold": measure_cold(config.spawns),
+        "zygote": asyncio.run(measure_zygote(config.spawns)),
+    }
+    print(json.dumps(results, indent=2))
+    if config.output:
+        with open(config.output, "w") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,124 @@
+"""Function-call tool latency and upstream calls, with and without the tool cache.
+
+Runs ``--sessions`` sessions in one process, as a session worker does, each
+calling ``get_current_weather`` ``--calls`` times, ``--think-ms`` apart. The
+locations are drawn from ``--locations`` cities, with popular cities asked
+about more often (Zipf distribution), and spelled as users would say them
+(case and spacing vary). The upstream answers after ``--latency-ms``.
+Sessions start together, so the first calls for a city overlap. Reports, per
+setup (``uncached``, ``cached``):
+
+- upstream requests
+- function call latency, from the call to its result, in milliseconds
+- hit and coalesce rates of the cache
+
+Usage:
+    python -m benchmarks.tool_cache --sessions 50 --output tool_cache.json
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Dict, List
+
+from pipecat.services.llm_service import FunctionCallParams
+
+from benchmarks.load_test import summarize
+from tool_cache import ToolCacheSession, ToolResultCache
+
+CITIES = [
+    "San Francisco, CA", "New York, NY", "Seattle, WA", "Austin, TX", "Chicago, IL", "Boston, MA",
+    "Denver, CO", "Miami, FL", "Portland, OR", "Atlanta, GA", "Phoenix, AZ", "Nashville, TN",
+]
+
+
+def spoken(city: str, rng: random.Random) -> str:
+    """``city`` as an LLM might spell it from a transcript."""
+    return rng.choice([city, city.lower(), f" {city}", city.replace(", ", ",  ")])
+
+
+async def session(
+    index: int, handler, locations: int, calls: int, think_secs: float, latencies: List[float]
+):
+    rng = random.Random(index)
+    weights = [1 / (rank + 1) for rank in range(locations)]
+    for call in range(calls):
+        city = rng.choices(CITIES[:locations], weights)[0]
+        answered = asyncio.Event()
+
+        async def result_callback(result, *, properties=None):
+            answered.set()
+
+        started = time.perf_counter()
+        await handler(
+            FunctionCallParams(
+                function_name="get_current_weather",
+                tool_call_id=f"call_{index}_{call}",
+                arguments={"location": spoken(city, rng), "format": "fahrenheit"},
+                llm=None,
+                context=None,
+                result_callback=result_callback,
+            )
+        )
+        await answered.wait()
+        latencies.append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(think_secs)
+
+
+async def run_setup(cached: bool, sessions: int, locations: int, calls: int, latency_secs: float, think_secs: float):
+    upstream_calls = 0
+
+    async def fetch_weather(params: FunctionCallParams):
+        nonlocal upstream_calls
+        upstream_calls += 1
+        await asyncio.sleep(latency_secs)
+        await params.result_callback({"conditions": "nice", "temperature": 75, "format": params.arguments["format"]})
+
+    cache = ToolResultCache()
+    latencies: List[float] = []
+    tasks = []
+    for index in range(sessions):
+        handler = fetch_weather
+        if cached:
+            handler = ToolCacheSession(cache).cached("get_current_weather", fetch_weather)
+        tasks.append(session(index, handler, locations, calls, think_secs, latencies))
+    await asyncio.gather(*tasks)
+
+    stats = cache.stats()
+    return {
+        "upstream_calls": upstream_calls,
+        "function_call_ms": summarize(latencies),
+        "hit_rate": stats["hit_rate"],
+        "coalesce_rate": stats["coalesce_rate"],
+    }
+
+
+async def benchmark(sessions: int, locations: int, calls: int, latency_secs: float, think_secs: float) -> Dict:
+    return {
+        setup: await run_setup(setup == "cached", sessions, locations, calls, latency_secs, think_secs)
+        for setup in ("uncached", "cached")
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tool cache benchmark")
+    parser.add_argument("--sessions", type=int, default=50, help="Concurrent sessions")
+    parser.add_argument("--calls", type=int, default=5, help="Function calls per session")
+    parser.add_argument("--locations", type=int, default=len(CITIES), help="Distinct cities asked about")
+    parser.add_argument("--latency-ms", type=float, default=300, help="Upstream response time")
+    parser.add_argument("--think-ms", type=float, default=2000, help="Time between two calls of a session")
+    parser.add_argument("--output", type=str, help="Write the results to this JSON file")
+
+    config = parser.parse_args()
+    if not 0 < config.locations <= len(CITIES):
+        parser.error(f"--locations must be between 1 and {len(CITIES)}")
+
+    results = asyncio.run(
+        benchmark(config.sessions, config.locations, config.calls, config.latency_ms / 1000, config.think_ms / 1000)
+    )
+    print(json.dumps(results, indent=2))
+    if config.output:
+        with open(config.output, "w") as f:
+            json.dump(results, f, indent=2)
@@ -2,6 +2,7 @@ import asyncio
 import os
 import argparse
 import aiohttp
+import boto3
 from datetime import datetime
 from dotenv import load_dotenv
 
@@ -16,8 +17,31 @@ from pipecat.services.aws.llm import AWSBedrockLLMContext
 from pipecat.services.llm_service import FunctionCallParams
 from pipecat.transports.services.daily import DailyParams, DailyTransport
 
+from audio_stage import AUDIO_STAGE, AudioOutputStage
+from aws_clients import SHARED_AWS_CLIENTS, shared_aws_clients, sharing_aws_clients
+from aws_emulators import (
+    AWS_EMULATORS,
+    ConversationScript,
+    EmulatedBedrockClient,
+    EmulatedNovaSonicLLMService,
+    EmulatedPollyClient,
+)
+from context_compaction import CONTEXT_COMPACTION, CONTEXT_SUMMARY_MODEL, BedrockSummarizer, ContextCompactor
+from eager_connect import EAGER_CONNECT, eager_connecting
+from filler_audio import FILLER_AUDIO, FunctionCallFiller, shared_filler_clips
+from latency_tracing import TurnLatencyTracer
+from rate_budget import AWS_RATE_BUDGET, rate_budgeted
+from session_rotation import SESSION_ROTATION, rotating_sessions
+from tool_cache import TOOL_CACHE, ToolCacheSession, tool_cache
+
 load_dotenv(override=True)
 
+# Bedrock text model summarizing older turns when CONTEXT_SUMMARY_MODEL is not set
+DEFAULT_SUMMARY_MODEL = "us.amazon.nova-lite-v1:0"
+
+# How long a weather report is reused for the same location and unit
+WEATHER_CACHE_TTL_SECS = float(os.getenv("WEATHER_CACHE_TTL_SECS", "600"))
+
 
 async def fetch_weather_from_api(params: FunctionCallParams):
     temperature = 75 if params.arguments["format"] == "fahrenheit" else 24
@@ -51,18 +75,71 @@ weather_function = FunctionSchema(
 # Create tools schema
 tools = ToolsSchema(standard_tools=[weather_function])
 
-async def main(room_url, token):
-    """Main bot execution function.
+# Tools slow enough to leave the caller in silence, which get filler clips;
+# get_current_weather answers at once, so the clips (and Polly) are not needed
+SLOW_TOOLS = set()
+
+
+def create_polly_client():
+    """Create the Polly client rendering filler clips (see ``filler_audio``)."""
+    if AWS_EMULATORS:
+        return EmulatedPollyClient()
+    return create_aws_client("polly")
+
+
+def create_aws_client(service):
+    """Create the boto client of ``service``, shared by the sessions of the process unless disabled (see ``aws_clients``)."""
+    if SHARED_AWS_CLIENTS:
+        return shared_aws_clients().client(service, os.getenv("AWS_REGION"))
+    return boto3.client(
+        service,
+        region_name=os.getenv("AWS_REGION"),
+        aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+        aws_session_token=os.getenv("AWS_SESSION_TOKEN"),
+    )
+
+
+def create_vad_analyzer(shared=False):
+    """Create the Silero VAD analyzer used by the Daily transport.
+
+    Loading the Silero model is one of the slowest parts of bot startup, so
+    pre-warmed workers call this before they are assigned a room.
 
-    Sets up and runs the bot pipeline including:
+    Args:
+        shared: Use the process-wide batched VAD model (see ``shared_vad``)
+            instead of a model per session
+    """
+    params = VADParams(stop_secs=0.5)
+    if shared:
+        from shared_vad import SharedSileroVADAnalyzer
+
+        return SharedSileroVADAnalyzer(params=params)
+    return SileroVADAnalyzer(params=params)
+
+
+async def create_bot(room_url, token, vad_analyzer=None, transport=None):
+    """Build the bot pipeline for a room without running it.
+
+    Sets up the bot pipeline including:
     - Set up WebRTC transport
     - Speech-to-text and text-to-speech services
     - Language model integration
+
+    Args:
+        room_url: Daily room URL to join
+        token: Daily meeting token for the room
+        vad_analyzer: Optional pre-loaded VAD analyzer (see ``create_vad_analyzer``)
+        transport: Optional transport to use instead of joining the Daily room
+            (e.g. ``replay_transport.ReplayTransport`` for offline benchmarks)
+
+    Returns:
+        PipelineTask: The task to run with a ``PipelineRunner``
     """
-    async with aiohttp.ClientSession() as session:
-        print(f"Starting server with room: {room_url}")
+    print(f"Starting server with room: {room_url}")
 
-        # Set up Daily transport with audio parameters
+    # Set up Daily transport with audio parameters
+    if transport is None:
         transport = DailyTransport(
             room_url,
             token,
@@ -73,72 +150,159 @@ async def main(room_url, token):
                 camera_in_enabled=False,
                 camera_out_enabled=False,
                 vad_enabled=True,
-                vad_analyzer=SileroVADAnalyzer(
-                    params=VADParams(stop_secs=0.5)
-                ),
+                vad_analyzer=vad_analyzer or create_vad_analyzer(),
                 transcription_enabled=True,
             ),
         )
 
-        # Initialize LLM service
-        llm = AWSNovaSonicLLMService(
-            access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-            secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
-            region=os.getenv("AWS_REGION"),
-            voice_id="tiffany",  # matthew, tiffany, amy
-        )
+    # Initialize LLM service
+    if AWS_EMULATORS:
+        # Local stand-in for Nova Sonic (see aws_emulators)
+        llm_class = EmulatedNovaSonicLLMService
+        llm_params = {"script": ConversationScript()}
+    else:
+        llm_class = AWSNovaSonicLLMService
+        llm_params = {
+            "access_key_id": os.getenv("AWS_ACCESS_KEY_ID"),
+            "secret_access_key": os.getenv("AWS_SECRET_ACCESS_KEY"),
+            "region": os.getenv("AWS_REGION"),
+            "voice_id": "tiffany",  # matthew, tiffany, amy
+        }
+        # Streams opened with the process's shared client and current credentials (see aws_clients)
+        if SHARED_AWS_CLIENTS:
+            llm_class = sharing_aws_clients(llm_class)
+        # Open the stream once the server's AWS rate budget allows (see rate_budget)
+        if AWS_RATE_BUDGET:
+            llm_class = rate_budgeted(llm_class)
+    # Replace the session before Nova Sonic's time limit ends it (see session_rotation)
+    if SESSION_ROTATION:
+        llm_class = rotating_sessions(llm_class)
+    # Set the session up while the bot waits for the participant (see eager_connect)
+    if EAGER_CONNECT:
+        llm_class = eager_connecting(llm_class)
+    llm = llm_class(**llm_params)
 
-        # Register function for function calls
-        llm.register_function("get_current_weather", fetch_weather_from_api)
+    # Register function for function calls. Results are shared with the other
+    # sessions of the process, and identical calls in flight share one request
+    tool_cache_session = ToolCacheSession()
+    llm.register_function(
+        "get_current_weather",
+        tool_cache_session.cached("get_current_weather", fetch_weather_from_api, ttl_secs=WEATHER_CACHE_TTL_SECS),
+    )
 
-        # Set up context and context management.
-        system_instruction = (
-            "You are a friendly assistant. The user and you will engage in a spoken dialog exchanging "
-            "the transcripts of a natural real-time conversation. Keep your responses short, generally "
-            "two or three sentences for chatty scenarios. "
-            "Start by greeting the user."
-        )
-        context = AWSBedrockLLMContext(messages=[
-                {"role": "system", "content": f"{system_instruction}"}
-            ],
-            tools=tools,
-        )
-        context_aggregator = llm.create_context_aggregator(context)
-
-        # Build the pipeline
-        pipeline = Pipeline(
-            [
-                transport.input(),
-                context_aggregator.user(),
-                llm,
-                transport.output(),
-                context_aggregator.assistant(),
-            ]
-        )
+    # Set up context and context management.
+    system_instruction = (
+        "You are a friendly assistant. The user and you will engage in a spoken dialog exchanging "
+        "the transcripts of a natural real-time conversation. Keep your responses short, generally "
+        "two or three sentences for chatty scenarios. "
+        "Start by greeting the user."
+    )
+    context = AWSBedrockLLMContext(messages=[
+            {"role": "system", "content": f"{system_instruction}"}
+        ],
+        tools=tools,
+    )
+    context_aggregator = llm.create_context_aggregator(context)
+    if EAGER_CONNECT:
+        llm.prime(context_aggregator.user().context)
 
-        # Configure the pipeline task
-        task = PipelineTask(
-            pipeline,
-            params=PipelineParams(
-                allow_interruptions=True,
-                enable_metrics=True,
-                enable_usage_metrics=True,
-            ),
-        )
+    # Summarize the older turns of long conversations, so reconnecting and
+    # rotated sessions replay a bounded history to Nova Sonic (see context_compaction)
+    compaction = []
+    if CONTEXT_COMPACTION:
+        if AWS_EMULATORS:
+            bedrock = EmulatedBedrockClient(ConversationScript())
+        else:
+            bedrock = create_aws_client("bedrock-runtime")
+        summarizer = BedrockSummarizer(bedrock, CONTEXT_SUMMARY_MODEL or DEFAULT_SUMMARY_MODEL)
+        compaction = [ContextCompactor(context_aggregator.user().context, summarizer)]
+
+    # Build the pipeline
+    # Voice-to-voice latency of every turn, broken down by stage. Nova Sonic
+    # produces the user transcript, the response text and its audio itself.
+    tracer = TurnLatencyTracer()
+
+    # "One moment" while a slow tool call leaves the caller in silence. Nova
+    # Sonic speaks for itself, so the clips are rendered with Polly (see filler_audio)
+    filler = []
+    if FILLER_AUDIO and SLOW_TOOLS:
+        filler = [FunctionCallFiller(shared_filler_clips(create_polly_client))]
+
+    # Output audio converted into whole transport chunks in preallocated buffers (see audio_stage)
+    audio_stage = [AudioOutputStage()] if AUDIO_STAGE else []
+
+    pipeline = Pipeline(
+        [
+            transport.input(),
+            tracer.tap("vad_stop"),
+            *compaction,
+            context_aggregator.user(),
+            llm,
+            tracer.tap("stt_final", "llm_first_token", "tts_first_audio"),
+            *filler,
+            *audio_stage,
+            transport.output(),
+            tracer.tap("first_audio_out"),
+            context_aggregator.assistant(),
+        ]
+    )
+
+    # Configure the pipeline task
+    task = PipelineTask(
+        pipeline,
+        params=PipelineParams(
+            allow_interruptions=True,
+            enable_metrics=True,
+            enable_usage_metrics=True,
+        ),
+    )
+
+    @transport.event_handler("on_first_participant_joined")
+    async def on_first_participant_joined(transport, participant):
+        await transport.capture_participant_transcription(participant["id"])
+        await task.queue_frames([context_aggregator.user().get_context_frame()])
 
-        @transport.event_handler("on_first_participant_joined")
-        async def on_first_participant_joined(transport, participant):
-            await transport.capture_participant_transcription(participant["id"])
-            await task.queue_frames([context_aggregator.user().get_context_frame()])
+    @transport.event_handler("on_participant_left")
+    async def on_participant_left(transport, participant, reason):
+        print(f"Participant left: {participant}")
+        await task.cancel()
 
-        @transport.event_handler("on_participant_left")
-        async def on_participant_left(transport, participant, reason):
-            print(f"Participant left: {participant}")
-            await task.cancel()
+    return task
+
+
+async def main(room_url, token, vad_analyzer=None):
+    """Main bot execution function.
+
+    Builds the bot pipeline with ``create_bot`` and runs it until the call ends.
+
+    Args:
+        room_url: Daily room URL to join
+        token: Daily meeting token for the room
+        vad_analyzer: Optional pre-loaded VAD analyzer (see ``create_vad_analyzer``)
+    """
+    async with aiohttp.ClientSession() as session:
+        task = await create_bot(room_url, token, vad_analyzer=vad_analyzer)
 
         runner = PipelineRunner(handle_sigint=False)
         await runner.run(task)
 
+        await end_session()
+        await end_process()
+
+
+async def end_session():
+    """Report what the sessions of this process share, once a session has ended."""
+    if TOOL_CACHE:
+        await tool_cache().report()
+    if SHARED_AWS_CLIENTS:
+        await shared_aws_clients().report()
+
+
+async def end_process():
+    """Close what the sessions of this process share, once the last one has ended."""
+    if SHARED_AWS_CLIENTS:
+        shared_aws_clients().close()
+
 
 if __name__ == "__main__":
     # Parse command line arguments for server configuration
@@ -0,0 +1,53 @@
+"""Pre-warmed bot worker.
+
+A worker imports the bot pipeline (pipecat, boto, Daily transport) and loads
+the Silero VAD model before it is needed, reports ``ready`` on stdout and then
+blocks until the server assigns it a room by writing a single JSON line to
+stdin:
+
+    {"room_url": "https://...", "token": "..."}
+
+The worker then runs ``bot.main`` for that room and exits when the call ends.
+Workers are started and handed out by ``bot_pool.BotWorkerPool``.
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+import bot
+
+READY_MESSAGE = "ready"
+
+
+def wait_for_assignment():
+    """Block until the server sends a room assignment.
+
+    Returns:
+        dict | None: The assignment, or None if stdin was closed without one
+    """
+    line = sys.stdin.readline()
+    if not line.strip():
+        return None
+    return json.loads(line)
+
+
+def run():
+    vad_analyzer = bot.create_vad_analyzer()
+
+    sys.stdout.write(f"{READY_MESSAGE}\n")
+    sys.stdout.flush()
+    # The server stops reading our stdout once we are ready, so route any
+    # further output to stderr instead of filling up an unread pipe.
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+    assignment = wait_for_assignment()
+    if assignment is None:
+        return
+
+    asyncio.run(bot.main(assignment["room_url"], assignment["token"], vad_analyzer=vad_analyzer))
+
+
+if __name__ == "__main__":
+    run()
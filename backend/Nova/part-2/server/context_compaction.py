@@ -0,0 +1,250 @@
+"""Bounded LLM context for long conversations.
+
+The LLM context only ever grows: every turn adds the user's words, the
+reply, and any function calls and results. Part-1 sends the whole context
+with every Bedrock request, so time to first token and input tokens grow
+with the length of the call (e.g. when ``verify_itinerary`` loops back
+through ``revise_plan`` to ``get_dates``); part-2 replays it to Nova Sonic
+whenever a session connects.
+
+``ContextCompactor`` keeps the context within ``CONTEXT_TOKEN_BUDGET``. When
+the user starts speaking and the context is over budget, everything before
+the last ``CONTEXT_KEEP_TURNS`` user turns is summarized in the background
+and, at the next turn boundary, replaced by the summary. What is kept:
+
+- the system prompt
+- the current flow node's task message, placed after the summary
+- the last turns verbatim, with their function calls and results
+
+The summary is made by a separate Bedrock request (``BedrockSummarizer``)
+while the user speaks, so the conversation never waits for it. The context
+itself is only changed by ``process_frame``, when the user starts or stops
+speaking and before that frame goes on to the context aggregators, so the
+messages are never rewritten while a turn is being aggregated. If the next
+LLM request starts before the summary is ready, it uses the full context.
+The summary only replaces the older messages if they are still unchanged
+when it is applied (e.g. not reset by a flow node).
+"""
+
+import asyncio
+import copy
+import json
+import os
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+
+from pipecat.frames.frames import Frame, UserStartedSpeakingFrame, UserStoppedSpeakingFrame
+from pipecat.processors.aggregators.openai_llm_context import OpenAILLMContext
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+from pipecat.services.aws.llm import AWSBedrockLLMContext
+
+# Whether the bot summarizes older turns of long conversations
+CONTEXT_COMPACTION = os.getenv("CONTEXT_COMPACTION", "false").lower() in ("1", "true", "yes")
+
+# Estimated size of the context above which older turns are summarized, in tokens
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+
+# Number of most recent user turns kept verbatim
+CONTEXT_KEEP_TURNS = int(os.getenv("CONTEXT_KEEP_TURNS", "4"))
+
+# Maximum length of a summary, in tokens
+CONTEXT_SUMMARY_TOKENS = int(os.getenv("CONTEXT_SUMMARY_TOKENS", "300"))
+
+# Bedrock model writing the summaries; by default the bot's own text model
+CONTEXT_SUMMARY_MODEL = os.getenv("CONTEXT_SUMMARY_MODEL")
+
+# Rough characters per token, to estimate the size of the context
+CHARS_PER_TOKEN = 4
+
+SUMMARY_PROMPT = (
+    "Summarize this part of a phone conversation between a user and an assistant in a few "
+    "sentences. Keep every fact the assistant still needs: the user's choices and preferences, "
+    "names, dates, and the results of function calls. Leave out greetings and small talk."
+)
+
+SUMMARY_PREFIX = "Summary of the conversation so far:\n"
+
+
+def estimate_tokens(context: OpenAILLMContext) -> int:
+    """Rough number of input tokens the context takes, system prompt and tools included."""
+    payload = [context.messages, getattr(context, "system", None), context.tools]
+    return len(json.dumps(payload, default=str)) // CHARS_PER_TOKEN
+
+
+def render_transcript(messages: List[Dict[str, Any]]) -> str:
+    """Plain-text transcript of Bedrock or OpenAI format messages, for summarizing."""
+    lines = []
+    for message in messages:
+        role = message["role"]
+        if role == "system":
+            continue
+        content = message.get("content")
+        blocks = [{"text": content}] if isinstance(content, str) else content or []
+        for block in blocks:
+            if block.get("text"):
+                label = "Function result" if role == "tool" else role.capitalize()
+                lines.append(f"{label}: {block['text']}")
+            elif "toolUse" in block:
+                call = block["toolUse"]
+                lines.append(f"Function call: {call['name']}({json.dumps(call.get('input', {}))})")
+            elif "toolResult" in block:
+                lines.append(f"Function result: {json.dumps(block['toolResult'].get('content'))}")
+        for call in message.get("tool_calls") or []:
+            lines.append(f"Function call: {call['function']['name']}({call['function']['arguments']})")
+    return "\n".join(lines)
+
+
+def _is_user_turn(message: Dict[str, Any]) -> bool:
+    """Whether a message starts a user turn (rather than returning a function result)."""
+    if message["role"] != "user":
+        return False
+    content = message["content"]
+    return isinstance(content, str) or not any("toolResult" in block for block in content)
+
+
+def _texts(message: Dict[str, Any]) -> List[str]:
+    content = message.get("content")
+    if isinstance(content, str):
+        return [content]
+    return [block["text"] for block in content or [] if isinstance(block, dict) and "text" in block]
+
+
+class BedrockSummarizer:
+    """Summarizes conversation transcripts with a Bedrock ``converse`` request.
+
+    Args:
+        client: boto ``bedrock-runtime`` client
+        model_id: Bedrock model writing the summaries
+        max_tokens: Maximum length of a summary
+    """
+
+    def __init__(self, client, model_id: str, max_tokens: int = CONTEXT_SUMMARY_TOKENS):
+        self._client = client
+        self._model_id = model_id
+        self._max_tokens = max_tokens
+
+    async def __call__(self, transcript: str) -> str:
+        # boto blocks until the whole summary is there; keep it off the event loop
+        response = await asyncio.to_thread(
+            self._client.converse,
+            modelId=self._model_id,
+            system=[{"text": SUMMARY_PROMPT}],
+            messages=[{"role": "user", "content": [{"text": transcript}]}],
+            inferenceConfig={"maxTokens": self._max_tokens, "temperature": 0.0},
+        )
+        return "".join(block.get("text", "") for block in response["output"]["message"]["content"])
+
+
+class ContextCompactor(FrameProcessor):
+    """Summarizes the older turns of the context once it grows over a token budget.
+
+    Place it anywhere before the user context aggregator.
+
+    Args:
+        context: The conversation context (of the context aggregators)
+        summarize: Returns the summary of a transcript (see ``BedrockSummarizer``)
+        token_budget: Estimated context size above which older turns are summarized
+        keep_turns: Number of most recent user turns kept verbatim
+        pinned_texts: Texts kept verbatim wherever they are, if they are the
+            last of them in the context (the task messages of the flow nodes)
+    """
+
+    def __init__(
+        self,
+        context: OpenAILLMContext,
+        summarize: Callable[[str], Awaitable[str]],
+        *,
+        token_budget: int = CONTEXT_TOKEN_BUDGET,
+        keep_turns: int = CONTEXT_KEEP_TURNS,
+        pinned_texts: Iterable[str] = (),
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self._context = context
+        self._summarize = summarize
+        self._token_budget = token_budget
+        self._keep_turns = max(keep_turns, 1)
+        self._pinned_texts = set(pinned_texts)
+        self._compaction_task: Optional[asyncio.Task] = None
+        self._summary: Optional[Tuple[int, int, List[Dict[str, Any]], str, int]] = None
+        self._compactions = 0
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+        if isinstance(frame, (UserStartedSpeakingFrame, UserStoppedSpeakingFrame)):
+            # A turn boundary: the aggregators have not picked up this frame yet
+            await self._apply_summary()
+            if isinstance(frame, UserStartedSpeakingFrame):
+                await self._maybe_compact()
+        await self.push_frame(frame, direction)
+
+    async def cleanup(self):
+        if self._compaction_task:
+            await self.cancel_task(self._compaction_task)
+            self._compaction_task = None
+        await super().cleanup()
+
+    async def _maybe_compact(self):
+        if self._compaction_task:
+            return
+
+        if estimate_tokens(self._context) <= self._token_budget:
+            return
+        messages = self._context.messages
+        start = 1 if messages and messages[0]["role"] == "system" else 0
+        turns = [i for i in range(start, len(messages)) if _is_user_turn(messages[i])]
+        if len(turns) <= self._keep_turns or turns[-self._keep_turns] <= start:
+            return
+        self._compactions += 1
+        self._compaction_task = self.create_task(
+            self._compact(start, turns[-self._keep_turns]), f"compact#{self._compactions}"
+        )
+
+    async def _compact(self, start: int, cut: int):
+        older = copy.deepcopy(self._context.messages[start:cut])
+        tokens_before = estimate_tokens(self._context)
+        try:
+            summary = await self._summarize(render_transcript(older))
+        except Exception as e:
+            logger.warning(f"{self}: failed to summarize the conversation, keeping it whole: {e}")
+            return
+        self._summary = (start, cut, older, summary, tokens_before)
+
+    async def _apply_summary(self):
+        if not self._compaction_task or not self._compaction_task.done():
+            return
+        await self.wait_for_task(self._compaction_task)
+        self._compaction_task = None
+        if not self._summary:
+            return
+        (start, cut, older, summary, tokens_before), self._summary = self._summary, None
+
+        messages = self._context.messages
+        if messages[start:cut] != older or len(messages) <= cut:
+            logger.debug(f"{self}: context changed while summarizing, summary dropped")
+            return
+
+        head = [SUMMARY_PREFIX + summary.strip()]
+        if not any(text in self._pinned_texts for message in messages[cut:] for text in _texts(message)):
+            # The current node's task message is among the summarized turns
+            pinned = [text for message in older for text in _texts(message) if text in self._pinned_texts]
+            head += pinned[-1:]
+        if len(json.dumps(head)) >= len(json.dumps(older, default=str)):
+            logger.debug(f"{self}: summary is no shorter than the turns it replaces, dropped")
+            return
+        messages[start : cut + 1] = [self._prepend(messages[cut], head)]
+        logger.info(
+            f"{self}: summarized {cut - start} messages, context ~{tokens_before} -> "
+            f"~{estimate_tokens(self._context)} tokens"
+        )
+
+    def _prepend(self, message: Dict[str, Any], texts: List[str]) -> Dict[str, Any]:
+        content = message["content"]
+        if isinstance(content, str):
+            return {**message, "content": "\n\n".join(texts + [content])}
+        if isinstance(self._context, AWSBedrockLLMContext):
+            blocks = [{"text": text} for text in texts]
+        else:
+            blocks = [{"type": "text", "text": text} for text in texts]
+        return {**message, "content": blocks + list(content)}
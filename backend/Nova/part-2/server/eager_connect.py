@@ -0,0 +1,117 @@
+"""Nova Sonic sessions set up before the participant joins.
+
+``AWSNovaSonicLLMService`` opens its bidirectional stream and starts the
+session when the pipeline starts, but only sets up the prompt (prompt start
+with the tool configuration, system prompt, history and audio input start)
+when it gets its first context, i.e. when ``on_first_participant_joined``
+queues it. That setup then delays the bot's first words.
+
+``EagerConnectMixin`` sets the prompt up from the bot's context right after
+the stream is open, while the bot waits in the room, so the join only has to
+start the conversation. If nobody joins within ``EAGER_CONNECT_TIMEOUT_SECS``
+the primed session is discarded (session end events, stream closed) rather
+than left to time out on the Nova Sonic side; a participant joining later
+gets a new session set up the usual way.
+"""
+
+import asyncio
+import os
+import time
+from typing import Optional
+
+from loguru import logger
+
+from pipecat.frames.frames import CancelFrame, EndFrame, Frame, StartFrame
+from pipecat.processors.aggregators.openai_llm_context import OpenAILLMContext, OpenAILLMContextFrame
+from pipecat.processors.frame_processor import FrameDirection
+
+# Whether Nova Sonic sessions are set up before the participant joins
+EAGER_CONNECT = os.getenv("EAGER_CONNECT", "true").lower() in ("1", "true", "yes")
+
+# How long a primed session waits for the participant before it is discarded
+EAGER_CONNECT_TIMEOUT_SECS = float(os.getenv("EAGER_CONNECT_TIMEOUT_SECS", "30"))
+
+
+class EagerConnectMixin:
+    """Sets up the Nova Sonic prompt when the pipeline starts.
+
+    Mix into ``AWSNovaSonicLLMService`` (or its emulator) with
+    ``eager_connecting``, and give it the bot's context with ``prime``
+    before the pipeline runs.
+
+    Args:
+        join_timeout_secs: How long the primed session waits for the participant
+    """
+
+    def __init__(self, *, join_timeout_secs: float = EAGER_CONNECT_TIMEOUT_SECS, **kwargs):
+        super().__init__(**kwargs)
+        self._join_timeout_secs = join_timeout_secs
+        self._eager_context: Optional[OpenAILLMContext] = None
+        self._joined = False
+        self._discarding = False
+        self._join_timeout_task: Optional[asyncio.Task] = None
+
+    def prime(self, context: OpenAILLMContext):
+        """Set up the prompt from ``context`` as soon as the stream is open.
+
+        Args:
+            context: The context the bot queues when the participant joins
+        """
+        self._eager_context = context
+
+    async def start(self, frame: StartFrame):
+        await super().start(frame)
+        if self._eager_context is None or self._joined:
+            return
+        started = time.monotonic()
+        await self._handle_context(self._eager_context)
+        logger.info(f"{self}: session primed in {(time.monotonic() - started) * 1000:.0f} ms")
+        self._join_timeout_task = self.create_task(self._discard_unless_joined())
+
+    async def stop(self, frame: EndFrame):
+        await self._cancel_join_timeout()
+        await super().stop(frame)
+
+    async def cancel(self, frame: CancelFrame):
+        await self._cancel_join_timeout()
+        await super().cancel(frame)
+
+    async def cleanup(self):
+        await self._cancel_join_timeout()
+        await super().cleanup()
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        if isinstance(frame, OpenAILLMContextFrame) and not self._joined:
+            await self._participant_joined()
+        await super().process_frame(frame, direction)
+
+    async def _participant_joined(self):
+        self._joined = True
+        task, self._join_timeout_task = self._join_timeout_task, None
+        if task is None:
+            return
+        if not self._discarding:
+            await self.cancel_task(task)
+            return
+        # Too late: let the discard finish, then connect again; the context
+        # frame sets the prompt up as it would without eager connect
+        await self.wait_for_task(task)
+        await self._start_connecting()
+
+    async def _discard_unless_joined(self):
+        await asyncio.sleep(self._join_timeout_secs)
+        self._discarding = True
+        logger.info(f"{self}: nobody joined within {self._join_timeout_secs:.0f}s, discarding the primed session")
+        await self._disconnect()
+        # The service keeps its context across disconnects; the next one is set up anew
+        self._context = None
+
+    async def _cancel_join_timeout(self):
+        task, self._join_timeout_task = self._join_timeout_task, None
+        if task:
+            await self.cancel_task(task)
+
+
+def eager_connecting(llm_class: type) -> type:
+    """A subclass of ``llm_class`` that sets up its Nova Sonic session before the participant joins."""
+    return type(f"EagerConnect{llm_class.__name__}", (EagerConnectMixin, llm_class), {})
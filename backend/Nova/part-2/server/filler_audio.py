@@ -0,0 +1,405 @@
+"""Filler audio masking slow function calls.
+
+While a function call runs (a flow handler, a tool such as
+``get_current_weather``) the caller hears silence, and after a few hundred
+milliseconds often starts talking over the bot. ``FunctionCallFiller`` sits
+right before the transport output and starts a timer when a function call
+starts. If the call has not returned within ``FILLER_THRESHOLD_MS`` of the
+bot going quiet, it plays a short pre-rendered clip such as "One moment."
+The clip is pushed in real time, a few tens of milliseconds ahead of
+playback, and when the reply's audio arrives the clip fades out right away,
+so the two never overlap and the reply is not held back. A call that
+returns in time plays nothing. At most one clip is played per batch of
+concurrent calls, and none once the user interrupts.
+
+The clips (``FILLER_PHRASES``) are rendered once per host with Polly and
+kept as PCM files in ``FILLER_AUDIO_DIR``; sessions load them when the
+pipeline starts, resampled once per process to the pipeline's output rate.
+
+Per tool, the filler counts calls, calls that triggered a clip, call time
+and perceived latency: the time from the call until the caller hears the
+bot again, clip or reply. Each bot posts its session's counters to the
+server (``FILLER_STATS_URL``) when the session ends.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import soxr
+from loguru import logger
+
+from pipecat.frames.frames import (
+    BotStartedSpeakingFrame,
+    BotStoppedSpeakingFrame,
+    CancelFrame,
+    EndFrame,
+    Frame,
+    FunctionCallCancelFrame,
+    FunctionCallInProgressFrame,
+    FunctionCallResultFrame,
+    OutputAudioRawFrame,
+    StartFrame,
+    StartInterruptionFrame,
+)
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+
+from stats_reporting import post_stats
+
+# Whether the bot plays filler audio during slow function calls
+FILLER_AUDIO = os.getenv("FILLER_AUDIO", "true").lower() in ("1", "true", "yes")
+
+# Silence, in milliseconds, after which a pending function call gets a filler clip
+FILLER_THRESHOLD_MS = int(os.getenv("FILLER_THRESHOLD_MS", "700"))
+
+# Filler phrases, separated by "|", played in turn
+FILLER_PHRASES = [
+    phrase.strip()
+    for phrase in os.getenv("FILLER_PHRASES", "One moment.|Let me check that for you.|Just a second.").split("|")
+    if phrase.strip()
+]
+
+# Directory of the rendered clips, shared by the bot processes of the host
+FILLER_AUDIO_DIR = os.getenv("FILLER_AUDIO_DIR", os.path.join(tempfile.gettempdir(), "nova-filler-audio"))
+
+# Server endpoint the session counters are posted to; only logged when unset
+FILLER_STATS_URL = os.getenv("FILLER_STATS_URL")
+
+# Polly renders PCM at 16 kHz at most; clips are resampled to the output rate
+SAMPLE_RATE = 16000
+
+# Length of the audio chunks a clip is pushed in; the last one pushed when the
+# reply cuts a clip short is faded out
+CHUNK_SECS = 0.02
+
+# How far a clip is pushed ahead of its playback: the longest the reply waits
+LEAD_SECS = 0.06
+
+
+class FillerClips:
+    """Pre-rendered filler clips, loaded from disk or rendered with Polly.
+
+    Args:
+        polly_client: Polly client (boto ``polly`` or ``EmulatedPollyClient``)
+            rendering missing clips
+        phrases: The filler phrases
+        voice_id: Polly voice
+        engine: Polly engine
+        directory: Where rendered clips are kept, or None to render every time
+    """
+
+    def __init__(
+        self,
+        polly_client: Any,
+        phrases: Sequence[str] = FILLER_PHRASES,
+        voice_id: str = "Joanna",
+        engine: str = "generative",
+        directory: Optional[str] = FILLER_AUDIO_DIR,
+    ):
+        self._polly_client = polly_client
+        self._phrases = list(phrases)
+        self._voice_id = voice_id
+        self._engine = engine
+        self._directory = directory
+        self._clips: List[bytes] = []
+        # The clips at each output rate they were asked for
+        self._resampled: Dict[int, List[bytes]] = {}
+        self._next = 0
+        self._loading: Optional[asyncio.Task] = None
+
+    async def load(self):
+        """Load (or render) every clip; concurrent callers share one load."""
+        if self._loading is None:
+            self._loading = asyncio.create_task(self._load())
+        await asyncio.shield(self._loading)
+
+    def next_clip(self, sample_rate: int = SAMPLE_RATE) -> Optional[bytes]:
+        """The next clip in turn, or None if none is loaded yet.
+
+        Args:
+            sample_rate: Sample rate of the clip; each clip is resampled once
+                per rate
+
+        Returns:
+            Optional[bytes]: The clip, 16-bit mono PCM
+        """
+        if not self._clips:
+            return None
+        if len(self._resampled.get(sample_rate, ())) != len(self._clips):
+            self._resampled[sample_rate] = [self._resample(clip, sample_rate) for clip in self._clips]
+        clips = self._resampled[sample_rate]
+        clip = clips[self._next % len(clips)]
+        self._next += 1
+        return clip
+
+    @staticmethod
+    def _resample(clip: bytes, sample_rate: int) -> bytes:
+        if sample_rate == SAMPLE_RATE:
+            return clip
+        samples = np.frombuffer(clip, dtype=np.int16)
+        return soxr.resample(samples, SAMPLE_RATE, sample_rate, quality="HQ").tobytes()
+
+    async def _load(self):
+        for phrase in self._phrases:
+            try:
+                self._clips.append(await asyncio.to_thread(self._clip, phrase))
+            except Exception as e:
+                logger.warning(f"Failed to render filler clip [{phrase}]: {e}")
+
+    def _clip(self, phrase: str) -> bytes:
+        key = json.dumps([phrase, self._voice_id, self._engine, SAMPLE_RATE])
+        path = None
+        if self._directory:
+            path = os.path.join(self._directory, f"{hashlib.sha256(key.encode()).hexdigest()}.pcm")
+            try:
+                with open(path, "rb") as f:
+                    return f.read()
+            except OSError:
+                pass
+
+        response = self._polly_client.synthesize_speech(
+            Text=phrase,
+            OutputFormat="pcm",
+            VoiceId=self._voice_id,
+            Engine=self._engine,
+            SampleRate=str(SAMPLE_RATE),
+        )
+        audio = response["AudioStream"].read()
+        if path:
+            os.makedirs(self._directory, exist_ok=True)
+            # Write then rename, so other bots never read a partial clip
+            fd, tmp_path = tempfile.mkstemp(dir=self._directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(audio)
+            os.replace(tmp_path, path)
+        return audio
+
+
+_shared_clips: Dict[tuple, FillerClips] = {}
+
+
+def shared_filler_clips(
+    polly_client: Callable[[], Any], voice_id: str = "Joanna", engine: str = "generative"
+) -> FillerClips:
+    """The process-wide clips of a voice, configured from the ``FILLER_*`` variables.
+
+    Args:
+        polly_client: Returns the Polly client rendering the clips; only
+            called the first time the clips of the voice are needed
+        voice_id: Polly voice
+        engine: Polly engine
+
+    Returns:
+        FillerClips: The clips, loaded when the first pipeline starts
+    """
+    key = (voice_id, engine)
+    if key not in _shared_clips:
+        _shared_clips[key] = FillerClips(polly_client(), voice_id=voice_id, engine=engine)
+    return _shared_clips[key]
+
+
+@dataclass
+class _PendingCall:
+    function_name: str
+    started: float
+    # Whether the caller heard the bot since the call started
+    heard: bool = False
+
+
+class FunctionCallFiller(FrameProcessor):
+    """Plays a filler clip when a function call leaves the caller in silence.
+
+    Place it right before ``transport.output()``, so it sees the function
+    call frames and the bot's audio on their way out and the bot's speaking
+    state on its way back.
+
+    Args:
+        clips: The filler clips (see ``shared_filler_clips``)
+        threshold_secs: Silence after which a pending call gets a clip
+    """
+
+    def __init__(self, clips: FillerClips, threshold_secs: float = FILLER_THRESHOLD_MS / 1000, **kwargs):
+        super().__init__(**kwargs)
+        self._clips = clips
+        self._threshold_secs = threshold_secs
+        self._pending: Dict[str, _PendingCall] = {}
+        # Calls that returned before the caller heard anything: heard with the reply
+        self._awaiting_reply: List[_PendingCall] = []
+        # Calls started while no other call was pending form a batch; one clip per batch
+        self._batch = 0
+        self._batch_started = asyncio.Event()
+        self._bot_quiet = asyncio.Event()
+        self._bot_quiet.set()
+        self._bot_quiet_since = 0.0
+        # The clip being played and how much of it was pushed
+        self._clip: Optional[bytes] = None
+        self._clip_position = 0
+        # Clips are played at the pipeline's output rate, learnt at StartFrame
+        self._sample_rate = SAMPLE_RATE
+        self._chunk_size = round(SAMPLE_RATE * CHUNK_SECS) * 2
+        self._filler_task: Optional[asyncio.Task] = None
+        self._counters: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {"calls": 0, "fillers": 0, "heard": 0, "call_ms": 0, "perceived_ms": 0}
+        )
+        self._max_perceived_ms: Dict[str, float] = defaultdict(float)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per tool: calls, filler trigger rate, mean call time and perceived latency."""
+        stats = {}
+        for name, counters in self._counters.items():
+            stats[name] = {
+                **counters,
+                "trigger_rate": counters["fillers"] / counters["calls"] if counters["calls"] else None,
+                "mean_call_ms": counters["call_ms"] / counters["calls"] if counters["calls"] else None,
+                "mean_perceived_ms": counters["perceived_ms"] / counters["heard"] if counters["heard"] else None,
+                "max_perceived_ms": self._max_perceived_ms[name],
+            }
+        return stats
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if isinstance(frame, StartFrame):
+            self._sample_rate = frame.audio_out_sample_rate
+            self._chunk_size = round(self._sample_rate * CHUNK_SECS) * 2
+            await self.push_frame(frame, direction)
+            self._filler_task = self.create_task(self._filler_loop())
+            return
+
+        if isinstance(frame, FunctionCallInProgressFrame) and direction == FrameDirection.DOWNSTREAM:
+            self._call_started(frame)
+        elif isinstance(frame, (FunctionCallResultFrame, FunctionCallCancelFrame)):
+            if direction == FrameDirection.DOWNSTREAM:
+                self._call_finished(frame.tool_call_id)
+        elif isinstance(frame, OutputAudioRawFrame) and direction == FrameDirection.DOWNSTREAM:
+            # The reply: fade out the clip it cuts short
+            await self._cut_clip()
+            self._heard()
+        elif isinstance(frame, BotStartedSpeakingFrame):
+            self._bot_quiet.clear()
+        elif isinstance(frame, BotStoppedSpeakingFrame):
+            self._bot_quiet_since = time.monotonic()
+            self._bot_quiet.set()
+        elif isinstance(frame, StartInterruptionFrame):
+            # The user is talking: no filler until the next batch of calls, and
+            # the caller did not wait in silence for what is left
+            self._batch += 1
+            self._clip = None
+            for call in [*self._pending.values(), *self._awaiting_reply]:
+                call.heard = True
+            self._awaiting_reply = []
+        elif isinstance(frame, (EndFrame, CancelFrame)):
+            await self._stop()
+            await self._report()
+
+        await self.push_frame(frame, direction)
+
+    async def cleanup(self):
+        await super().cleanup()
+        await self._stop()
+
+    def _call_started(self, frame: FunctionCallInProgressFrame):
+        if not self._pending:
+            self._batch += 1
+            self._batch_started.set()
+        self._pending[frame.tool_call_id] = _PendingCall(frame.function_name, time.monotonic())
+        self._counters[frame.function_name]["calls"] += 1
+
+    def _call_finished(self, tool_call_id: str):
+        call = self._pending.pop(tool_call_id, None)
+        if call is None:
+            return
+        self._counters[call.function_name]["call_ms"] += round((time.monotonic() - call.started) * 1000)
+        if not call.heard:
+            self._awaiting_reply.append(call)
+
+    def _heard(self):
+        now = time.monotonic()
+        for call in [*self._pending.values(), *self._awaiting_reply]:
+            if call.heard:
+                continue
+            call.heard = True
+            perceived_ms = (now - call.started) * 1000
+            counters = self._counters[call.function_name]
+            counters["heard"] += 1
+            counters["perceived_ms"] += round(perceived_ms)
+            self._max_perceived_ms[call.function_name] = max(
+                self._max_perceived_ms[call.function_name], perceived_ms
+            )
+        self._awaiting_reply = []
+
+    async def _filler_loop(self):
+        await self._clips.load()
+        while True:
+            await self._batch_started.wait()
+            self._batch_started.clear()
+            batch = self._batch
+            if await self._silence_outlasted_threshold(batch):
+                await self._play(batch)
+
+    async def _silence_outlasted_threshold(self, batch: int) -> bool:
+        # The calls may return while this sleeps: it finds out when it wakes up
+        while True:
+            await self._bot_quiet.wait()
+            if batch != self._batch or not self._pending:
+                return False
+            started = min(call.started for call in self._pending.values())
+            remaining = self._threshold_secs - (time.monotonic() - max(started, self._bot_quiet_since))
+            if remaining <= 0:
+                return True
+            await asyncio.sleep(remaining)
+
+    async def _play(self, batch: int):
+        clip = self._clips.next_clip(self._sample_rate)
+        if clip is None:
+            logger.debug(f"{self}: no filler clip loaded")
+            return
+        for call in self._pending.values():
+            self._counters[call.function_name]["fillers"] += 1
+        self._heard()
+
+        # Pushed in real time, little ahead of playback, so the reply can cut it short
+        self._clip, self._clip_position = clip, 0
+        started = time.monotonic()
+        while self._clip is clip and batch == self._batch and self._clip_position < len(clip):
+            chunk = clip[self._clip_position : self._clip_position + self._chunk_size]
+            self._clip_position += len(chunk)
+            await self.push_frame(OutputAudioRawFrame(chunk, self._sample_rate, 1))
+            ahead = self._clip_position / (self._sample_rate * 2) - (time.monotonic() - started)
+            if ahead > LEAD_SECS:
+                await asyncio.sleep(ahead - LEAD_SECS)
+        if self._clip is clip:
+            self._clip = None
+
+    async def _cut_clip(self):
+        clip, self._clip = self._clip, None
+        if clip is None:
+            return
+        tail = np.frombuffer(clip[self._clip_position : self._clip_position + self._chunk_size], dtype=np.int16)
+        if len(tail):
+            faded = (tail * np.linspace(1.0, 0.0, len(tail))).astype(np.int16)
+            await self.push_frame(OutputAudioRawFrame(faded.tobytes(), self._sample_rate, 1))
+
+    async def _stop(self):
+        task, self._filler_task = self._filler_task, None
+        if task:
+            await self.cancel_task(task)
+
+    async def _report(self):
+        stats = self.stats()
+        if not stats:
+            return
+        logger.info(f"{self}: function call filler {stats}")
+        if not FILLER_STATS_URL:
+            return
+        counters = {
+            f"{name}.{counter}": value for name, tool in self._counters.items() for counter, value in tool.items()
+        }
+        await post_stats(FILLER_STATS_URL, counters, "filler stats")
@@ -0,0 +1,530 @@
+"""Cross-process budget of AWS requests, handed out by the server.
+
+Each bot process calls AWS on its own, so at busy times the bots of a server
+exceed the account's request rate quotas together. They are throttled, and
+their retries and back-off add seconds to turns in every live call. Instead,
+the server keeps a token bucket per AWS API and region (``AWS_RATE_LIMITS``),
+and the bots acquire a permit from it before each request, over a Unix socket
+(``AWS_RATE_SOCKET``). Requests beyond the rate wait in line at the server
+instead of failing at AWS.
+
+Requests of conversations under way are served before those of sessions
+whose user has not spoken yet (the greeting), since a pause in the middle of
+a conversation is worse than a slower hello. A bot that waits longer than
+``AWS_RATE_MAX_WAIT_MS`` for a permit, or cannot reach the server, sends its
+request anyway.
+
+The protocol is one JSON object per line. A bot asks for a permit with
+
+    {"id": 1, "api": "polly", "region": "us-east-1", "priority": "turn"}
+
+and the server answers ``{"id": 1, "wait_ms": 12.5}`` when it is granted. A
+bot that stops waiting sends ``{"id": 1, "cancel": true}``.
+
+The bots' services acquire their permits through ``rate_budgeted``, and
+their Bedrock requests through ``RateBudgetedBedrockClient``, which the
+speculative replies and context summaries share. The limits apply per
+server: with several servers, set each one's share of the account's quotas.
+The budget is off by default, since the default limits are no account's
+quotas.
+"""
+
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Set, Tuple
+
+from loguru import logger
+
+from pipecat.frames.frames import Frame, LLMFullResponseStartFrame, UserStartedSpeakingFrame
+from pipecat.processors.frame_processor import FrameDirection
+
+# Whether the bots acquire a permit from the server before each AWS request
+AWS_RATE_BUDGET = os.getenv("AWS_RATE_BUDGET", "false").lower() in ("1", "true", "yes")
+
+# Unix socket the server hands out permits on; set by the server for its bots
+AWS_RATE_SOCKET = os.getenv("AWS_RATE_SOCKET")
+
+# Requests per second allowed per AWS API and region; APIs not listed are
+# not limited
+AWS_RATE_LIMITS = os.getenv("AWS_RATE_LIMITS", "polly=8,bedrock=20,transcribe=25,nova-sonic=10")
+
+# Seconds of requests a bucket holds when idle, sent at once in a burst
+AWS_RATE_BURST_SECS = float(os.getenv("AWS_RATE_BURST_SECS", "1"))
+
+# Longest a bot waits for a permit before it sends its request anyway
+AWS_RATE_MAX_WAIT_MS = float(os.getenv("AWS_RATE_MAX_WAIT_MS", "2000"))
+
+# Seconds before a bot tries to reach an unreachable server again
+RECONNECT_SECS = 5
+
+# Priorities of a request, served in this order
+TURN = "turn"
+GREETING = "greeting"
+PRIORITIES = (TURN, GREETING)
+
+
+def parse_limits(spec: str) -> Dict[str, float]:
+    """Requests per second per API, from ``api=rate`` items separated by commas.
+
+    Raises:
+        ValueError: If an item has no rate or its rate is not a positive number
+    """
+    limits = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        api, _, rate = item.partition("=")
+        limits[api.strip()] = float(rate)
+        if limits[api.strip()] <= 0:
+            raise ValueError(f"Invalid AWS rate limit: {item}")
+    return limits
+
+
+class _Bucket:
+    """Token bucket of an API and region, with a line of waiters per priority."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.waiters: Dict[str, Deque[asyncio.Future]] = {priority: deque() for priority in PRIORITIES}
+        self.dispatcher: Optional[asyncio.Task] = None
+        self.counters: Dict[str, float] = {"cancelled": 0, "max_wait_ms": 0.0}
+        for priority in PRIORITIES:
+            self.counters.update({f"{priority}_permits": 0, f"{priority}_throttled": 0, f"{priority}_wait_ms": 0.0})
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def queued(self) -> bool:
+        for line in self.waiters.values():
+            while line and line[0].done():
+                line.popleft()
+            if line:
+                return True
+        return False
+
+    def next_waiter(self) -> Optional[asyncio.Future]:
+        self.queued()
+        for priority in PRIORITIES:
+            if self.waiters[priority]:
+                return self.waiters[priority].popleft()
+        return None
+
+
+class RateCoordinator:
+    """Token buckets per AWS API and region, shared by the bots of the server.
+
+    Args:
+        limits: Requests per second per API; defaults to ``AWS_RATE_LIMITS``
+        burst_secs: Seconds of requests a bucket holds when idle
+    """
+
+    def __init__(self, limits: Optional[Dict[str, float]] = None, burst_secs: float = AWS_RATE_BURST_SECS):
+        self._limits = parse_limits(AWS_RATE_LIMITS) if limits is None else limits
+        self._burst_secs = burst_secs
+        self._buckets: Dict[Tuple[str, str], _Bucket] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections: Set[asyncio.StreamWriter] = set()
+        self._handlers: Set[asyncio.Task] = set()
+        self._path: Optional[str] = None
+
+    async def acquire(self, api: str, region: str, priority: str = TURN) -> float:
+        """Wait for a permit to send a request to ``api`` in ``region``.
+
+        Args:
+            api: API name, e.g. ``"polly"``
+            region: AWS region of the request
+            priority: ``TURN`` or ``GREETING``; turns are served first
+
+        Returns:
+            Seconds waited for the permit
+        """
+        bucket = self._bucket(api, region)
+        if bucket is None:
+            return 0.0
+        if priority not in PRIORITIES:
+            priority = TURN
+        bucket.refill()
+        if bucket.tokens >= 1 and not bucket.queued():
+            bucket.tokens -= 1
+            bucket.counters[f"{priority}_permits"] += 1
+            return 0.0
+
+        started = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        bucket.waiters[priority].append(future)
+        bucket.counters[f"{priority}_throttled"] += 1
+        if bucket.dispatcher is None or bucket.dispatcher.done():
+            bucket.dispatcher = asyncio.create_task(self._dispatch(bucket))
+        try:
+            await future
+        except asyncio.CancelledError:
+            bucket.counters["cancelled"] += 1
+            raise
+        wait_ms = (time.monotonic() - started) * 1000
+        bucket.counters[f"{priority}_permits"] += 1
+        bucket.counters[f"{priority}_wait_ms"] += wait_ms
+        bucket.counters["max_wait_ms"] = max(bucket.counters["max_wait_ms"], wait_ms)
+        return wait_ms / 1000
+
+    def stats(self) -> Dict[str, Any]:
+        """Permits per API and region.
+
+        Returns:
+            dict: per ``api/region``, the rate, permits granted, requests held
+            back (throttled) and the time they waited, per priority, and
+            requests whose bot stopped waiting (cancelled)
+        """
+        stats = {}
+        for (api, region), bucket in self._buckets.items():
+            entry: Dict[str, Any] = {"rate": bucket.rate, **bucket.counters}
+            for priority in PRIORITIES:
+                throttled = bucket.counters[f"{priority}_throttled"]
+                entry[f"{priority}_mean_wait_ms"] = bucket.counters[f"{priority}_wait_ms"] / throttled if throttled else None
+            entry["queued"] = sum(not waiter.done() for line in bucket.waiters.values() for waiter in line)
+            stats[f"{api}/{region}"] = entry
+        return stats
+
+    async def start(self, path: str):
+        """Hand out permits to the bots on the Unix socket at ``path``."""
+        if os.path.exists(path):
+            os.unlink(path)
+        self._server = await asyncio.start_unix_server(self._serve, path=path)
+        self._path = path
+        logger.info(f"AWS rate budget on {path}: {self._limits}")
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            for writer in self._connections:
+                writer.close()
+            await self._server.wait_closed()
+            # Let the handlers see their connection closed, rather than be
+            # cancelled with the loop
+            await asyncio.gather(*self._handlers, return_exceptions=True)
+            self._server = None
+        for bucket in self._buckets.values():
+            if bucket.dispatcher:
+                bucket.dispatcher.cancel()
+        if self._path and os.path.exists(self._path):
+            os.unlink(self._path)
+
+    def _bucket(self, api: str, region: str) -> Optional[_Bucket]:
+        rate = self._limits.get(api)
+        if rate is None:
+            return None
+        bucket = self._buckets.get((api, region))
+        if bucket is None:
+            bucket = self._buckets[(api, region)] = _Bucket(rate, rate * self._burst_secs)
+        return bucket
+
+    async def _dispatch(self, bucket: _Bucket):
+        while bucket.queued():
+            bucket.refill()
+            while bucket.tokens >= 1:
+                future = bucket.next_waiter()
+                if future is None:
+                    break
+                bucket.tokens -= 1
+                future.set_result(None)
+            if not bucket.queued():
+                break
+            await asyncio.sleep((1 - bucket.tokens) / bucket.rate)
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        pending: Dict[Any, asyncio.Task] = {}
+        self._connections.add(writer)
+        self._handlers.add(asyncio.current_task())
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                    request_id = request["id"]
+                except (ValueError, TypeError, KeyError) as e:
+                    logger.warning(f"Invalid AWS rate budget request {line!r}: {e}")
+                    continue
+                if request.get("cancel"):
+                    task = pending.pop(request_id, None)
+                    if task:
+                        task.cancel()
+                    continue
+                pending[request_id] = asyncio.create_task(self._grant(request, writer, pending))
+        except ConnectionError:
+            pass
+        finally:
+            # The bot went away: its requests no longer need a permit
+            for task in pending.values():
+                task.cancel()
+            self._connections.discard(writer)
+            self._handlers.discard(asyncio.current_task())
+            writer.close()
+
+    async def _grant(self, request: Dict[str, Any], writer: asyncio.StreamWriter, pending: Dict[Any, asyncio.Task]):
+        try:
+            waited = await self.acquire(str(request.get("api")), str(request.get("region")), request.get("priority", TURN))
+            if not writer.is_closing():
+                writer.write(json.dumps({"id": request["id"], "wait_ms": waited * 1000}).encode() + b"\n")
+        finally:
+            pending.pop(request["id"], None)
+
+
+class RateBudgetClient:
+    """Acquires permits from the server's ``RateCoordinator``.
+
+    Args:
+        path: Unix socket of the coordinator; without one, requests are sent
+            without a permit
+        max_wait_ms: Longest to wait for a permit before sending anyway
+    """
+
+    def __init__(self, path: Optional[str] = AWS_RATE_SOCKET, max_wait_ms: float = AWS_RATE_MAX_WAIT_MS):
+        self._path = path
+        self._max_wait_secs = max_wait_ms / 1000
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._next_id = 0
+        self._reconnect_at = 0.0
+        self.pid = os.getpid()
+
+    async def acquire(self, api: str, region: str, priority: str = TURN) -> float:
+        """Wait for a permit to send a request to ``api`` in ``region``.
+
+        Returns:
+            Seconds waited; after ``max_wait_ms``, or when the server cannot
+            be reached, the request is sent without a permit
+        """
+        started = time.monotonic()
+        if not await self._connected():
+            return 0.0
+        self._next_id += 1
+        request_id = self._next_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            self._send({"id": request_id, "api": api, "region": region, "priority": priority})
+            await asyncio.wait_for(future, self._max_wait_secs)
+        except asyncio.TimeoutError:
+            logger.warning(f"No {api} permit after {self._max_wait_secs * 1000:.0f} ms; sending the request anyway")
+            self._send({"id": request_id, "cancel": True})
+        except ConnectionError as e:
+            logger.warning(f"AWS rate budget connection lost: {e}")
+        finally:
+            self._pending.pop(request_id, None)
+        return time.monotonic() - started
+
+    async def _connected(self) -> bool:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop, self._lock, self._writer = loop, asyncio.Lock(), None
+        async with self._lock:
+            if self._writer and not self._writer.is_closing():
+                return True
+            if not self._path or time.monotonic() < self._reconnect_at:
+                return False
+            try:
+                reader, self._writer = await asyncio.open_unix_connection(self._path)
+            except OSError as e:
+                logger.warning(f"AWS rate budget unavailable at {self._path}: {e}")
+                self._reconnect_at = time.monotonic() + RECONNECT_SECS
+                return False
+            loop.create_task(self._read(reader))
+            return True
+
+    def _send(self, message: Dict[str, Any]):
+        if not self._writer or self._writer.is_closing():
+            raise ConnectionError("not connected")
+        self._writer.write(json.dumps(message).encode() + b"\n")
+
+    async def _read(self, reader: asyncio.StreamReader):
+        try:
+            while line := await reader.readline():
+                future = self._pending.get(json.loads(line).get("id"))
+                if future and not future.done():
+                    future.set_result(None)
+        except (ConnectionError, ValueError) as e:
+            logger.warning(f"AWS rate budget connection failed: {e}")
+        if self._writer:
+            self._writer.close()
+            self._writer = None
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("rate budget server went away"))
+
+
+_shared_client: Optional[RateBudgetClient] = None
+
+
+def shared_rate_budget() -> RateBudgetClient:
+    """The process-wide client of the server's rate budget."""
+    global _shared_client
+    if _shared_client is None or _shared_client.pid != os.getpid():
+        _shared_client = RateBudgetClient()
+    return _shared_client
+
+
+def _region() -> str:
+    return os.getenv("AWS_REGION") or "us-east-1"
+
+
+class RateBudgetMixin:
+    """Acquires a permit from the server's rate budget before an AWS request.
+
+    Requests count as greetings until the user first starts speaking in the
+    session, and as turns afterwards. The subclasses below hook the method of
+    each service that sends the request.
+    """
+
+    _rate_api = ""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._conversation_started = False
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        if isinstance(frame, UserStartedSpeakingFrame):
+            self._conversation_started = True
+        await super().process_frame(frame, direction)
+
+    async def _acquire_permit(self):
+        await shared_rate_budget().acquire(self._rate_api, _region(), self._priority())
+
+    def _priority(self) -> str:
+        return TURN if self._conversation_started else GREETING
+
+
+class PollyRateBudgetMixin(RateBudgetMixin):
+    _rate_api = "polly"
+
+    async def run_tts(self, text: str):
+        await self._acquire_permit()
+        async for frame in super().run_tts(text):
+            yield frame
+
+
+class BedrockRateBudgetMixin(RateBudgetMixin):
+    """Acquires the permit of each reply's request ahead of it, on the service's ``RateBudgetedBedrockClient``.
+
+    The permit is acquired once the reply's ``LLMFullResponseStartFrame`` is
+    on its way downstream, so the wait counts as part of the reply.
+    """
+
+    _rate_api = "bedrock"
+
+    async def push_frame(self, frame: Frame, direction: FrameDirection = FrameDirection.DOWNSTREAM):
+        await super().push_frame(frame, direction)
+        if isinstance(frame, LLMFullResponseStartFrame):
+            await self._client.acquire_permit(self._priority())
+
+
+class TranscribeRateBudgetMixin(RateBudgetMixin):
+    _rate_api = "transcribe"
+
+    async def _connect(self):
+        await self._acquire_permit()
+        await super()._connect()
+
+
+class NovaSonicRateBudgetMixin(RateBudgetMixin):
+    _rate_api = "nova-sonic"
+
+    async def _start_connecting(self):
+        await self._acquire_permit()
+        await super()._start_connecting()
+
+
+class RateBudgetedBedrockClient:
+    """boto ``bedrock-runtime`` client whose requests each take a permit from the server's rate budget.
+
+    Requests sent from a worker thread (speculative replies, context
+    summaries) wait for their permit in that thread, as turns. The LLM
+    service sends its requests on the event loop, which a wait would stall
+    for the whole session: ``BedrockRateBudgetMixin`` acquires their permit
+    ahead of time with ``acquire_permit``. A permit left unused, because a
+    speculative reply answered the turn, is kept for the next request.
+
+    Everything else goes to the wrapped client.
+
+    Args:
+        client: The boto client to wrap; create it on the session's event loop
+    """
+
+    def __init__(self, client):
+        self._client = client
+        self._loop = asyncio.get_running_loop()
+        self._permit_held = False
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    async def acquire_permit(self, priority: str = TURN):
+        """Acquire the permit of the next request sent on the event loop, unless one is held already."""
+        if not self._permit_held:
+            await shared_rate_budget().acquire("bedrock", _region(), priority)
+            self._permit_held = True
+
+    def converse(self, **params) -> Dict[str, Any]:
+        self._take_permit()
+        return self._client.converse(**params)
+
+    def converse_stream(self, **params) -> Dict[str, Any]:
+        self._take_permit()
+        return self._client.converse_stream(**params)
+
+    def _take_permit(self):
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # A worker thread: wait here, on the session's loop
+            if self._loop.is_running():
+                asyncio.run_coroutine_threadsafe(
+                    shared_rate_budget().acquire("bedrock", _region(), TURN), self._loop
+                ).result()
+            return
+        # The event loop, with the permit acquired ahead of time (or sent without)
+        self._permit_held = False
+
+
+# Mixin per pipecat AWS service, by class name (Nova Sonic's needs an SDK
+# part 1 does not install)
+RATE_BUDGET_MIXINS = {
+    "AWSPollyTTSService": PollyRateBudgetMixin,
+    "AWSBedrockLLMService": BedrockRateBudgetMixin,
+    "AWSTranscribeSTTService": TranscribeRateBudgetMixin,
+    "AWSNovaSonicLLMService": NovaSonicRateBudgetMixin,
+}
+
+
+def rate_budgeted(service_class: type) -> type:
+    """A subclass of ``service_class`` acquiring a permit before each AWS request.
+
+    The mixin goes right above the pipecat AWS service in the method
+    resolution order, below subclasses that answer without a request (the
+    TTS cache) or send it ahead of time (pipelined synthesis). A Bedrock
+    service also needs its client wrapped in a ``RateBudgetedBedrockClient``.
+
+    Raises:
+        TypeError: If ``service_class`` is not a pipecat AWS service
+    """
+    aws_class = next(
+        (
+            cls
+            for cls in service_class.__mro__
+            if cls.__name__ in RATE_BUDGET_MIXINS and cls.__module__.startswith("pipecat.")
+        ),
+        None,
+    )
+    if aws_class is None:
+        raise TypeError(f"{service_class.__name__} is not a pipecat AWS service")
+    budgeted = type(f"RateBudgeted{aws_class.__name__}", (RATE_BUDGET_MIXINS[aws_class.__name__], aws_class), {})
+    if service_class is aws_class:
+        return budgeted
+    return type(f"RateBudgeted{service_class.__name__}", (service_class, budgeted), {})
@@ -0,0 +1,316 @@
+"""Replay transport for running the bot without Daily.
+
+``ReplayTransport`` stands in for ``DailyTransport``. A simulated participant
+joins, waits for the bot's greeting and then, turn by turn, plays pre-recorded
+WAV utterances into the pipeline in real time. After each utterance it waits
+until the bot has replied and gone quiet. Between utterances the participant
+streams silence, like a real microphone. Bot audio is "played" at real-time
+speed and can be captured to a WAV file.
+
+The transport measures what a caller would experience:
+
+- time to the greeting: from the participant joining to the first bot audio
+  written
+- turn latency: from the end of an utterance to the first bot audio written
+- input late/dropped frames: input chunks sent late because the event loop
+  fell behind, and chunks skipped to catch up with real time
+- output late frames: gaps in the middle of a bot reply, where the output ran
+  dry before the next audio arrived
+
+When all utterances are played, the participant leaves, which fires
+``on_participant_left`` like ``DailyTransport`` does.
+"""
+
+import asyncio
+import wave
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+from pipecat.audio.utils import create_default_resampler
+from pipecat.frames.frames import InputAudioRawFrame, StartFrame
+from pipecat.processors.frame_processor import FrameProcessor
+from pipecat.transports.base_input import BaseInputTransport
+from pipecat.transports.base_output import BOT_VAD_STOP_SECS, BaseOutputTransport
+from pipecat.transports.base_transport import BaseTransport, TransportParams
+
+# Duration in seconds of the input audio chunks sent by the participant
+INPUT_CHUNK_SECS = 0.02
+
+# Gap in seconds after which bot audio in the middle of a reply counts as late
+OUTPUT_LATE_SECS = 0.02
+
+PARTICIPANT = {"id": "replay-participant", "info": {"userName": "Replay"}}
+
+
+class ReplayParams(TransportParams):
+    """Replay transport parameters.
+
+    Parameters:
+        utterances: WAV files (16-bit PCM) the participant says, one per turn
+        reply_timeout: Seconds to wait for the bot to start replying
+        pause_secs: Seconds the bot must stay quiet before the next utterance
+        join_delay_secs: Seconds the participant takes to join after the bot
+        max_input_lag_secs: Input lag after which chunks are dropped to catch up
+        capture_path: Optional WAV file the bot's audio is written to
+    """
+
+    utterances: List[str] = []
+    reply_timeout: float = 15.0
+    pause_secs: float = 1.0
+    join_delay_secs: float = 0.0
+    max_input_lag_secs: float = 0.2
+    capture_path: Optional[str] = None
+
+
+class ReplayInputTransport(BaseInputTransport):
+    """Streams the participant's audio: utterances, and silence in between."""
+
+    _params: ReplayParams
+
+    def __init__(self, transport: "ReplayTransport", params: ReplayParams, **kwargs):
+        super().__init__(params, **kwargs)
+        self._transport = transport
+        self._utterance = b""
+        self._utterance_done: Optional[asyncio.Event] = None
+        self._clock_task = None
+        self._participant_task = None
+        self.late_frames = 0
+        self.dropped_frames = 0
+
+    async def start(self, frame: StartFrame):
+        await super().start(frame)
+        await self.set_transport_ready(frame)
+        if not self._clock_task:
+            self._clock_task = self.create_task(self._clock_task_handler())
+            self._participant_task = self.create_task(self._participant_task_handler())
+
+    async def stop(self, frame):
+        await super().stop(frame)
+        await self._cancel_tasks()
+
+    async def cancel(self, frame):
+        await super().cancel(frame)
+        await self._cancel_tasks()
+
+    async def play(self, audio: bytes):
+        """Send an utterance and wait until its last chunk has been sent."""
+        self._utterance_done = asyncio.Event()
+        self._utterance = audio
+        await self._utterance_done.wait()
+
+    async def _cancel_tasks(self):
+        for task in (self._participant_task, self._clock_task):
+            if task:
+                await self.cancel_task(task)
+        self._participant_task = self._clock_task = None
+
+    def _next_chunk(self, size: int) -> bytes:
+        if not self._utterance:
+            return b"\x00" * size
+        chunk, self._utterance = self._utterance[:size], self._utterance[size:]
+        if not self._utterance:
+            self._utterance_done.set()
+        return chunk.ljust(size, b"\x00")
+
+    async def _clock_task_handler(self):
+        loop = asyncio.get_running_loop()
+        channels = self._params.audio_in_channels
+        chunk_size = int(self.sample_rate * INPUT_CHUNK_SECS) * channels * 2
+        next_time = loop.time()
+        while True:
+            await self.push_audio_frame(
+                InputAudioRawFrame(
+                    audio=self._next_chunk(chunk_size),
+                    sample_rate=self.sample_rate,
+                    num_channels=channels,
+                )
+            )
+            next_time += INPUT_CHUNK_SECS
+            delay = next_time - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+
+            # Behind real time: count the chunk as late, and drop chunks when
+            # too far behind, as a jitter buffer would
+            if -delay > INPUT_CHUNK_SECS:
+                self.late_frames += 1
+            if -delay > self._params.max_input_lag_secs:
+                dropped = int(-delay / INPUT_CHUNK_SECS)
+                for _ in range(dropped):
+                    self._next_chunk(chunk_size)
+                self.dropped_frames += dropped
+                next_time += dropped * INPUT_CHUNK_SECS
+
+    async def _participant_task_handler(self):
+        loop = asyncio.get_running_loop()
+        await asyncio.sleep(self._params.join_delay_secs)
+        self._transport.participant_joined(loop.time())
+        await self._transport._call_event_handler("on_first_participant_joined", PARTICIPANT)
+
+        # Let the bot greet the participant first
+        await self._transport.wait_for_reply(after=loop.time())
+        for path in self._params.utterances:
+            audio = await read_wav(path, self.sample_rate, self._params.audio_in_channels)
+            await self.play(audio)
+            self._transport.user_stopped_speaking(loop.time())
+            await self._transport.wait_for_reply(after=loop.time())
+
+        await self._transport._call_event_handler("on_participant_left", PARTICIPANT, "leftCall")
+
+
+class ReplayOutputTransport(BaseOutputTransport):
+    """Plays the bot's audio at real-time speed and optionally captures it."""
+
+    _params: ReplayParams
+
+    def __init__(self, transport: "ReplayTransport", params: ReplayParams, **kwargs):
+        super().__init__(params, **kwargs)
+        self._transport = transport
+        self._playing_until = 0.0
+        self._capture: Optional[wave.Wave_write] = None
+        self.late_frames = 0
+
+    async def start(self, frame: StartFrame):
+        await super().start(frame)
+        if self._params.capture_path and not self._capture:
+            self._capture = wave.open(self._params.capture_path, "wb")
+            self._capture.setnchannels(self._params.audio_out_channels)
+            self._capture.setsampwidth(2)
+            self._capture.setframerate(self.sample_rate)
+        await self.set_transport_ready(frame)
+
+    async def stop(self, frame):
+        await super().stop(frame)
+        self._close_capture()
+
+    async def cancel(self, frame):
+        await super().cancel(frame)
+        self._close_capture()
+
+    def idle_secs(self, now: float) -> float:
+        """Seconds since the last bot audio finished playing."""
+        return max(now - self._playing_until, 0.0)
+
+    async def write_raw_audio_frames(self, frames: bytes, destination: Optional[str] = None):
+        now = asyncio.get_running_loop().time()
+        gap = now - self._playing_until
+        if gap > BOT_VAD_STOP_SECS:
+            # The start of a new reply
+            self._transport.bot_started_speaking(now)
+            self._playing_until = now
+        elif gap > 0:
+            # The bot is still replying but its audio ran dry
+            if gap > OUTPUT_LATE_SECS:
+                self.late_frames += 1
+            self._playing_until = now
+
+        if self._capture:
+            self._capture.writeframes(frames)
+
+        duration = len(frames) / (self.sample_rate * self._params.audio_out_channels * 2)
+        self._playing_until += duration
+        # Block like a sound device with one chunk of buffer
+        await asyncio.sleep(max(self._playing_until - duration - now, 0.0))
+
+    def _close_capture(self):
+        if self._capture:
+            self._capture.close()
+            self._capture = None
+
+
+class ReplayTransport(BaseTransport):
+    """Transport that replays recorded utterances as a simulated participant.
+
+    Args:
+        params: Replay transport parameters
+    """
+
+    def __init__(self, params: ReplayParams, **kwargs):
+        super().__init__(**kwargs)
+        self._params = params
+        self._input: Optional[ReplayInputTransport] = None
+        self._output: Optional[ReplayOutputTransport] = None
+        self._joined_at: Optional[float] = None
+        self._join_to_first_audio: Optional[float] = None
+        self._user_stopped_at: Optional[float] = None
+        self._bot_started_at = 0.0
+        self._turn_latencies: List[float] = []
+        self._missed_replies = 0
+
+        self._register_event_handler("on_first_participant_joined")
+        self._register_event_handler("on_participant_left")
+
+    def input(self) -> FrameProcessor:
+        if not self._input:
+            self._input = ReplayInputTransport(self, self._params, name=self._input_name)
+        return self._input
+
+    def output(self) -> FrameProcessor:
+        if not self._output:
+            self._output = ReplayOutputTransport(self, self._params, name=self._output_name)
+        return self._output
+
+    async def capture_participant_transcription(self, participant_id: str):
+        # Transcription is done by the pipeline's STT service
+        pass
+
+    def participant_joined(self, now: float):
+        self._joined_at = now
+
+    def user_stopped_speaking(self, now: float):
+        self._user_stopped_at = now
+
+    def bot_started_speaking(self, now: float):
+        self._bot_started_at = now
+        if self._joined_at is not None and self._join_to_first_audio is None:
+            self._join_to_first_audio = now - self._joined_at
+        if self._user_stopped_at is not None:
+            self._turn_latencies.append(now - self._user_stopped_at)
+            self._user_stopped_at = None
+
+    async def wait_for_reply(self, after: float):
+        """Wait until the bot replied after ``after`` and then went quiet."""
+        loop = asyncio.get_running_loop()
+        while self._bot_started_at < after:
+            if loop.time() - after > self._params.reply_timeout:
+                logger.warning("Replay participant got no reply from the bot")
+                self._missed_replies += 1
+                self._user_stopped_at = None
+                return
+            await asyncio.sleep(0.05)
+        # Replies may come in several parts (e.g. around function calls)
+        while self._output.idle_secs(loop.time()) < self._params.pause_secs:
+            await asyncio.sleep(0.05)
+
+    def stats(self) -> Dict[str, Any]:
+        """Greeting and turn latencies in milliseconds and frame counters of the conversation."""
+        return {
+            "join_to_first_audio_ms": (
+                self._join_to_first_audio * 1000 if self._join_to_first_audio is not None else None
+            ),
+            "turn_latencies_ms": [latency * 1000 for latency in self._turn_latencies],
+            "missed_replies": self._missed_replies,
+            "input_late_frames": self._input.late_frames if self._input else 0,
+            "input_dropped_frames": self._input.dropped_frames if self._input else 0,
+            "output_late_frames": self._output.late_frames if self._output else 0,
+        }
+
+
+async def read_wav(path: str, sample_rate: int, num_channels: int) -> bytes:
+    """Read a 16-bit PCM WAV file as audio at the given sample rate.
+
+    Raises:
+        ValueError: If the file is not 16-bit PCM or its channel count differs
+    """
+    with wave.open(path, "rb") as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError(f"{path}: only 16-bit PCM WAV files are supported")
+        if wav.getnchannels() != num_channels:
+            raise ValueError(f"{path}: expected {num_channels} channel(s), got {wav.getnchannels()}")
+        audio = wav.readframes(wav.getnframes())
+        wav_rate = wav.getframerate()
+    if wav_rate != sample_rate:
+        audio = await create_default_resampler().resample(audio, wav_rate, sample_rate)
+    return audio
@@ -0,0 +1,213 @@
+"""Pre-provisioned Daily rooms and meeting tokens.
+
+Creating a room and then a token through ``DailyRESTHelper`` costs two
+sequential REST round trips. ``RoomPool`` keeps a number of ready
+``(room_url, token)`` pairs in the background so a new connection can take one
+in O(1), and only falls back to creating a room on demand when the pool has
+run dry.
+
+Rooms and tokens are created with a matching expiry, and entries that are too
+close to expiring to be useful are discarded instead of being handed out.
+The pool only replaces the rooms it hands out, and the rooms that expire
+while it is in use: a server nobody connects to lets its rooms expire rather
+than create new ones every hour. The first connection after that finds the
+pool empty and fills it again. To exercise the pool offline, point
+``DAILY_API_URL`` at ``daily_stub.py``.
+"""
+
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Optional, Set
+
+from loguru import logger
+
+from pipecat.transports.services.helpers.daily_rest import (
+    DailyRESTHelper,
+    DailyRoomParams,
+    DailyRoomProperties,
+)
+
+from stats_reporting import percentile
+
+# Number of refill latency samples kept for reporting
+LATENCY_WINDOW = 100
+
+
+@dataclass
+class ProvisionedRoom:
+    room_url: str
+    token: str
+    expires_at: float
+
+
+class RoomPool:
+    """Keeps ``size`` Daily rooms and tokens ready to be handed out.
+
+    Args:
+        rest: Daily REST helper used to create rooms and tokens
+        size: Number of ready rooms to keep (0 disables pre-provisioning)
+        ttl: Lifetime in seconds of each room and token
+        min_remaining: Rooms with less than this many seconds left are discarded
+        parallelism: Maximum number of rooms provisioned concurrently
+    """
+
+    def __init__(
+        self,
+        rest: DailyRESTHelper,
+        size: int,
+        ttl: float = 3600,
+        min_remaining: float = 600,
+        parallelism: int = 2,
+    ):
+        self._rest = rest
+        self._size = size
+        self._ttl = ttl
+        self._min_remaining = min_remaining
+        self._semaphore = asyncio.Semaphore(max(parallelism, 1))
+        self._ready: Deque[ProvisionedRoom] = deque()
+        self._inflight = 0
+        # Rooms to provision on the next refill, and when a room was last taken
+        self._wanted = 0
+        self._last_acquired = 0.0
+        self._refill_event = asyncio.Event()
+        self._refill_task: Optional[asyncio.Task] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._hits = 0
+        self._misses = 0
+        self._expired = 0
+        self._failures = 0
+        self._refill_latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+    async def start(self):
+        """Start the background refill loop."""
+        if self._size <= 0:
+            return
+        self._wanted = self._size
+        self._refill_task = asyncio.create_task(self._refill_loop())
+        self._refill_event.set()
+
+    async def stop(self):
+        """Stop refilling and wait for in-flight provisioning to settle."""
+        if self._refill_task:
+            self._refill_task.cancel()
+            try:
+                await self._refill_task
+            except asyncio.CancelledError:
+                pass
+            self._refill_task = None
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def acquire(self) -> tuple[str, str]:
+        """Take a ready room and token, creating one on demand if none is left.
+
+        Returns:
+            tuple[str, str]: A tuple containing (room_url, token)
+
+        Raises:
+            RuntimeError: If on-demand room creation or token generation fails
+        """
+        now = time.time()
+        self._last_acquired = now
+        while self._ready:
+            room = self._ready.popleft()
+            self._wanted += 1
+            if room.expires_at - now < self._min_remaining:
+                self._expired += 1
+                continue
+            self._hits += 1
+            self._refill_event.set()
+            return room.room_url, room.token
+
+        # In use again after running dry: fill the whole pool
+        self._misses += 1
+        self._wanted = self._size
+        self._refill_event.set()
+        room = await self._provision()
+        return room.room_url, room.token
+
+    def stats(self) -> Dict[str, Any]:
+        """Current pool depth, hit/miss counters and refill latency."""
+        latencies = sorted(self._refill_latencies)
+        requests = self._hits + self._misses
+        return {
+            "target_size": self._size,
+            "depth": len(self._ready),
+            "inflight": self._inflight,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": self._hits / requests if requests else None,
+            "expired": self._expired,
+            "failures": self._failures,
+            "refill_latency_secs": {
+                "last": self._refill_latencies[-1] if latencies else None,
+                "p50": percentile(latencies, 50),
+                "p95": percentile(latencies, 95),
+                "max": latencies[-1] if latencies else None,
+            },
+        }
+
+    async def _provision(self) -> ProvisionedRoom:
+        expires_at = time.time() + self._ttl
+        room = await self._rest.create_room(
+            DailyRoomParams(properties=DailyRoomProperties(exp=expires_at))
+        )
+        if not room.url:
+            raise RuntimeError("Failed to create room")
+
+        token = await self._rest.get_token(room.url, expiry_time=self._ttl)
+        if not token:
+            raise RuntimeError(f"Failed to get token for room: {room.url}")
+
+        return ProvisionedRoom(room_url=room.url, token=token, expires_at=expires_at)
+
+    async def _refill_loop(self):
+        while True:
+            # Wake up on demand, and at least often enough to replace rooms
+            # before they expire.
+            try:
+                await asyncio.wait_for(
+                    self._refill_event.wait(), timeout=max(self._ttl - self._min_remaining, 1)
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._refill_event.clear()
+
+            now = time.time()
+            while self._ready and self._ready[0].expires_at - now < self._min_remaining:
+                self._ready.popleft()
+                self._expired += 1
+                # Replaced only if the pool was used during the room's lifetime
+                if now - self._last_acquired < self._ttl:
+                    self._wanted += 1
+
+            missing = min(self._wanted, self._size - len(self._ready) - self._inflight)
+            self._wanted = 0
+            for _ in range(max(missing, 0)):
+                self._inflight += 1
+                task = asyncio.create_task(self._refill_one())
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+    async def _refill_one(self):
+        try:
+            async with self._semaphore:
+                started = time.monotonic()
+                room = await self._provision()
+                self._refill_latencies.append(time.monotonic() - started)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._failures += 1
+            logger.error(f"Failed to pre-provision Daily room: {e}")
+            await asyncio.sleep(5)
+            self._wanted += 1
+            self._refill_event.set()
+            return
+        finally:
+            self._inflight -= 1
+
+        self._ready.append(room)
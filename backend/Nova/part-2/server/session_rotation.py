@@ -0,0 +1,428 @@
+"""Nova Sonic session rotation for long calls.
+
+Nova Sonic ends a bidirectional stream after ``SESSION_MAX_SECS``.
+``AWSNovaSonicLLMService`` then sees its receive loop fail and resets the
+conversation: it closes the stream, waits a second, opens a new one and sets
+the prompt up again, and whatever the caller says in the meantime reaches no
+session (seconds of lost audio, often a lost turn).
+
+``SessionRotationMixin`` replaces the session before the limit instead:
+
+- once the session is ``SESSION_ROTATION_AFTER_SECS`` old, a replacement
+  stream is opened and its session started in the background, while the
+  conversation goes on in the current one
+- in the next silence window detected by the VAD (nobody has spoken for
+  ``SESSION_ROTATION_SILENCE_MS``, no function call is waiting for its
+  result, and no user turn or function result for its answer), the
+  replacement's prompt is set up from the context: the tool
+  configuration, the system prompt and the conversation history (kept
+  bounded by ``context_compaction``), then its audio input is started
+- the user audio switches to the replacement between two audio frames, and
+  the old session is ended and closed
+- speech or a reply while the prompt is being set up leaves its history
+  stale: the replacement is discarded and a new one is opened for the next
+  window. A session not rotated ``FORCE_BEFORE_LIMIT_SECS`` before the limit
+  is rotated regardless of the window
+
+Each handover records its audio gap: the time from the last user audio sent
+to the old session to the first sent to the new one. Each bot posts its
+session's rotation counters to the server (``SESSION_ROTATION_STATS_URL``)
+when the session ends.
+"""
+
+import asyncio
+import os
+import time
+import types
+import uuid
+from typing import Any, Dict, List, Optional, Set
+
+from loguru import logger
+
+from pipecat.frames.frames import (
+    BotStartedSpeakingFrame,
+    BotStoppedSpeakingFrame,
+    Frame,
+    FunctionCallCancelFrame,
+    FunctionCallInProgressFrame,
+    FunctionCallResultFrame,
+    InputAudioRawFrame,
+    UserStartedSpeakingFrame,
+    UserStoppedSpeakingFrame,
+)
+from pipecat.processors.frame_processor import FrameDirection
+
+from stats_reporting import post_stats
+
+# Whether Nova Sonic sessions are rotated before they reach their time limit
+SESSION_ROTATION = os.getenv("SESSION_ROTATION", "true").lower() in ("1", "true", "yes")
+
+# Longest a Nova Sonic session lasts, and the age at which its replacement is opened
+SESSION_MAX_SECS = float(os.getenv("SESSION_MAX_SECS", "480"))
+SESSION_ROTATION_AFTER_SECS = float(os.getenv("SESSION_ROTATION_AFTER_SECS", "420"))
+
+# Silence before the replacement is set up; longer than the service's wait for
+# the last assistant text (1.25 s after the bot stops), so the history is complete
+SESSION_ROTATION_SILENCE_MS = float(os.getenv("SESSION_ROTATION_SILENCE_MS", "1500"))
+
+# Server endpoint the session counters are posted to; only logged when unset
+SESSION_ROTATION_STATS_URL = os.getenv("SESSION_ROTATION_STATS_URL")
+
+# A session still not rotated this close to its limit is rotated without a silence window
+FORCE_BEFORE_LIMIT_SECS = 10
+
+# How long a user turn or function result may wait for its answer before the silence counts as a window
+ANSWER_WAIT_SECS = 5
+
+# Interval at which the rotation checks for a silence window
+WINDOW_POLL_SECS = 0.1
+
+# Wait before trying again after a replacement failed to open or set up
+RETRY_SECS = 5
+
+# Event code of AWSNovaSonicLLMService that runs against a given stream
+_SESSION_METHODS = (
+    "_send_client_event",
+    "_send_session_start_event",
+    "_send_prompt_start_event",
+    "_send_text_event",
+    "_send_audio_input_start_event",
+    "_send_session_end_events",
+    "_finish_connecting_if_context_available",
+    "_receive_task_handler",
+)
+
+# State of one stream, kept per session; whatever else the event code writes
+# is the conversation's and goes to the service
+_SESSION_ATTRIBUTES = frozenset(
+    (
+        "_service",
+        "_client",
+        "_stream",
+        "_prompt_name",
+        "_input_audio_content_name",
+        "_receive_task",
+        "_connected_time",
+        "_retired",
+    )
+)
+
+
+class SessionRotationMixin:
+    """Rotates the Nova Sonic session before it reaches its time limit.
+
+    Mix into ``AWSNovaSonicLLMService`` (or its emulator) with
+    ``rotating_sessions``. The service provides the session hooks:
+    ``_open_session`` (a new stream with its session started),
+    ``_prime_session`` (prompt set up from the context, audio input started),
+    ``_switch_session`` (makes a session the current one and returns the
+    previous one) and ``_close_session``.
+
+    Args:
+        max_secs: Longest a session lasts
+        rotate_after_secs: Session age at which its replacement is opened
+        silence_ms: Silence before the replacement is set up
+    """
+
+    def __init__(
+        self,
+        *,
+        max_secs: float = SESSION_MAX_SECS,
+        rotate_after_secs: float = SESSION_ROTATION_AFTER_SECS,
+        silence_ms: float = SESSION_ROTATION_SILENCE_MS,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self._max_secs = max_secs
+        self._rotate_after_secs = rotate_after_secs
+        self._silence_secs = silence_ms / 1000
+        self._session_started_at: Optional[float] = None
+        self._rotation_task: Optional[asyncio.Task] = None
+        self._replacement: Any = None
+        self._replacement_opened_at = 0.0
+        # What the VAD and the output say about the conversation; any change
+        # of ``_activity`` makes a replacement set up meanwhile stale
+        self._user_speaking = False
+        self._bot_speaking = False
+        self._quiet_since = time.monotonic()
+        self._turn_waiting_since: Optional[float] = None
+        # Function calls whose result the session has not been sent yet, by tool call id
+        self._pending_calls: Set[str] = set()
+        self._activity = 0
+        # Last user audio sent, and the last one sent to the previous session
+        # until the first one reaches the new session
+        self._last_audio_at: Optional[float] = None
+        self._handover_from: Optional[float] = None
+        self._gaps_ms: List[float] = []
+        self._rotation_counters = {"rotations": 0, "forced": 0, "discarded": 0, "failed": 0, "gaps": 0, "gap_ms": 0}
+
+    def rotation_stats(self) -> Dict[str, Any]:
+        """Rotation counters of this session.
+
+        Returns:
+            dict: rotations (forced without a silence window), replacements
+            discarded as stale or failed, and the mean and longest audio gap
+            of the handovers
+        """
+        return {
+            **self._rotation_counters,
+            "mean_gap_ms": sum(self._gaps_ms) / len(self._gaps_ms) if self._gaps_ms else None,
+            "max_gap_ms": max(self._gaps_ms, default=None),
+        }
+
+    async def cleanup(self):
+        await self._stop_rotation()
+        await super().cleanup()
+        await self._report()
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        now = time.monotonic()
+        if isinstance(frame, UserStartedSpeakingFrame):
+            self._user_speaking = True
+            self._activity += 1
+        elif isinstance(frame, UserStoppedSpeakingFrame):
+            self._user_speaking = False
+            self._quiet_since = self._turn_waiting_since = now
+            self._activity += 1
+        elif isinstance(frame, BotStartedSpeakingFrame):
+            self._bot_speaking = True
+            self._turn_waiting_since = None
+            self._activity += 1
+        elif isinstance(frame, BotStoppedSpeakingFrame):
+            self._bot_speaking = False
+            self._quiet_since = now
+        await super().process_frame(frame, direction)
+
+    async def push_frame(self, frame: Frame, direction: FrameDirection = FrameDirection.DOWNSTREAM):
+        # The service pushes the frames of its function calls (each both ways)
+        if isinstance(frame, FunctionCallInProgressFrame):
+            if frame.tool_call_id not in self._pending_calls:
+                self._pending_calls.add(frame.tool_call_id)
+                self._activity += 1
+        elif isinstance(frame, (FunctionCallResultFrame, FunctionCallCancelFrame)):
+            if frame.tool_call_id in self._pending_calls:
+                self._pending_calls.discard(frame.tool_call_id)
+                self._activity += 1
+                if isinstance(frame, FunctionCallResultFrame):
+                    # The session answers the result, as it does a user turn
+                    self._quiet_since = self._turn_waiting_since = time.monotonic()
+        await super().push_frame(frame, direction)
+
+    async def _start_connecting(self):
+        opened_at = time.monotonic()
+        await super()._start_connecting()
+        if self._session_started_at is None:
+            self._session_started_at = opened_at
+            self._rotation_task = self.create_task(self._rotate_sessions())
+
+    async def _disconnect(self):
+        await self._stop_rotation()
+        self._session_started_at = None
+        await super()._disconnect()
+
+    async def _handle_input_audio_frame(self, frame: InputAudioRawFrame):
+        await super()._handle_input_audio_frame(frame)
+        now = time.monotonic()
+        if self._handover_from is not None:
+            gap_ms = (now - self._handover_from) * 1000
+            self._handover_from = None
+            self._gaps_ms.append(gap_ms)
+            self._rotation_counters["gaps"] += 1
+            self._rotation_counters["gap_ms"] += round(gap_ms)
+            logger.debug(f"{self}: session handover audio gap {gap_ms:.0f} ms")
+        self._last_audio_at = now
+
+    def _in_silence_window(self) -> bool:
+        now = time.monotonic()
+        if self._user_speaking or self._bot_speaking or self._pending_calls:
+            return False
+        if self._turn_waiting_since is not None and now - self._turn_waiting_since < ANSWER_WAIT_SECS:
+            return False
+        return now - self._quiet_since >= self._silence_secs
+
+    async def _wait_for_silence_window(self, deadline: float) -> bool:
+        """Wait for a silence window; False if ``deadline`` came first."""
+        while not self._in_silence_window():
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(WINDOW_POLL_SECS)
+        return True
+
+    async def _rotate_sessions(self):
+        while True:
+            rotate_at = self._session_started_at + self._rotate_after_secs
+            if time.monotonic() < rotate_at:
+                await asyncio.sleep(rotate_at - time.monotonic())
+                continue
+            try:
+                await self._rotate()
+            except Exception as e:
+                self._rotation_counters["failed"] += 1
+                logger.error(f"{self}: session rotation failed: {e}")
+                await self._discard_replacement()
+                await asyncio.sleep(RETRY_SECS)
+
+    async def _rotate(self):
+        force_at = self._session_started_at + self._max_secs - FORCE_BEFORE_LIMIT_SECS
+        while True:
+            if self._replacement is None:
+                self._replacement_opened_at = time.monotonic()
+                self._replacement = await self._open_session()
+            forced = not await self._wait_for_silence_window(force_at)
+            activity = self._activity
+            await self._prime_session(self._replacement)
+            if forced or activity == self._activity:
+                break
+            # The conversation went on while the prompt was set up
+            self._rotation_counters["discarded"] += 1
+            await self._discard_replacement()
+
+        session, self._replacement = self._replacement, None
+        previous = self._switch_session(session)
+        self._session_started_at = self._replacement_opened_at
+        self._handover_from = self._last_audio_at
+        self._rotation_counters["rotations"] += 1
+        self._rotation_counters["forced"] += forced
+        logger.info(f"{self}: rotated the Nova Sonic session{' (forced)' if forced else ''}")
+        await self._close_session(previous)
+
+    async def _discard_replacement(self):
+        session, self._replacement = self._replacement, None
+        if session is not None:
+            await self._close_session(session)
+
+    async def _stop_rotation(self):
+        task, self._rotation_task = self._rotation_task, None
+        if task:
+            await self.cancel_task(task)
+        await self._discard_replacement()
+
+    async def _report(self):
+        stats = self.rotation_stats()
+        if not stats["rotations"] and not stats["failed"]:
+            return
+        logger.info(f"{self}: session rotation {stats}")
+        await post_stats(SESSION_ROTATION_STATS_URL, self._rotation_counters, "session rotation stats")
+
+
+class _NovaSonicSession:
+    """One bidirectional stream of an ``AWSNovaSonicLLMService``.
+
+    Runs the service's own event code (``_SESSION_METHODS``) against this
+    stream and its prompt, and reads everything else from the service, so a
+    replacement is set up and read exactly like the first session while the
+    current one stays in use. The code's writes to the state of the stream
+    (``_SESSION_ATTRIBUTES``) stay on the session, until it becomes the
+    current one; its other writes go to the service.
+    """
+
+    def __init__(
+        self,
+        service: "NovaSonicSessionsMixin",
+        client: Any,
+        stream: Any,
+        prompt_name: Optional[str] = None,
+        input_audio_content_name: Optional[str] = None,
+    ):
+        self._service = service
+        self._client = client
+        self._stream = stream
+        self._prompt_name = prompt_name or str(uuid.uuid4())
+        self._input_audio_content_name = input_audio_content_name or str(uuid.uuid4())
+        self._receive_task: Optional[asyncio.Task] = None
+        self._connected_time: Optional[float] = None
+        self._retired = False
+
+    def __str__(self):
+        return str(self._service)
+
+    def __getattr__(self, name: str) -> Any:
+        if name in _SESSION_METHODS:
+            method = getattr(super(NovaSonicSessionsMixin, type(self._service)), name)
+            return types.MethodType(method, self)
+        return getattr(self._service, name)
+
+    def __setattr__(self, name: str, value: Any):
+        if name in _SESSION_ATTRIBUTES:
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._service, name, value)
+
+    @property
+    def _triggering_assistant_response(self) -> bool:
+        # The trigger that makes the bot greet is the first session's only
+        return False
+
+    @property
+    def _wants_connection(self) -> bool:
+        # A retired stream failing must not reset the conversation
+        return not self._retired and self._service._wants_connection
+
+    @property
+    def _disconnecting(self) -> bool:
+        return self._retired or self._service._disconnecting
+
+    def retire(self):
+        """Stop reading the stream once its receive loop wakes up."""
+        self._retired = True
+
+
+class NovaSonicSessionsMixin:
+    """The session hooks of ``SessionRotationMixin`` for ``AWSNovaSonicLLMService``."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._session: Optional[_NovaSonicSession] = None
+
+    async def _receive_task_handler(self):
+        # The receive loop reads its own stream, not whichever is current, so
+        # the loop of a rotated-out stream never reads its replacement
+        self._session = _NovaSonicSession(
+            self, self._client, self._stream, self._prompt_name, self._input_audio_content_name
+        )
+        await self._session._receive_task_handler()
+
+    async def _open_session(self) -> _NovaSonicSession:
+        from aws_sdk_bedrock_runtime.client import InvokeModelWithBidirectionalStreamOperationInput
+
+        client = self._create_client()
+        stream = await client.invoke_model_with_bidirectional_stream(
+            InvokeModelWithBidirectionalStreamOperationInput(model_id=self._model)
+        )
+        session = _NovaSonicSession(self, client, stream)
+        await session._send_session_start_event()
+        return session
+
+    async def _prime_session(self, session: _NovaSonicSession):
+        await session._finish_connecting_if_context_available()
+
+    def _switch_session(self, session: _NovaSonicSession) -> _NovaSonicSession:
+        previous, self._session = self._session, session
+        previous._receive_task = self._receive_task
+        self._client, self._stream = session._client, session._stream
+        self._prompt_name = session._prompt_name
+        self._input_audio_content_name = session._input_audio_content_name
+        self._receive_task = session._receive_task
+        self._connected_time = session._connected_time
+        return previous
+
+    async def _close_session(self, session: _NovaSonicSession):
+        session.retire()
+        try:
+            # Only a primed session has a prompt (and a receive loop) to end
+            if session._receive_task:
+                await session._send_session_end_events()
+            await session._stream.input_stream.close()
+        except Exception as e:
+            logger.warning(f"{self}: error closing a Nova Sonic session: {e}")
+        # As the service's disconnect: give the stream a second before
+        # cancelling its receive loop
+        await asyncio.sleep(1)
+        if session._receive_task:
+            await self.cancel_task(session._receive_task, timeout=1.0)
+
+
+def rotating_sessions(llm_class: type) -> type:
+    """A subclass of ``llm_class`` that rotates its Nova Sonic session before the time limit."""
+    hooks = () if hasattr(llm_class, "_open_session") else (NovaSonicSessionsMixin,)
+    return type(f"SessionRotating{llm_class.__name__}", (SessionRotationMixin, *hooks, llm_class), {})
@@ -0,0 +1,135 @@
+"""Multi-session bot worker.
+
+Runs many bot sessions in one process, each as its own asyncio task with its
+own ``PipelineTask`` and ``PipelineRunner``, so pipecat, the AWS clients and the
+Silero model code are loaded once per process instead of once per call.
+
+The server (``session_scheduler.WorkerScheduler``) drives the worker with JSON
+lines on stdin:
+
+    {"cmd": "start", "session_id": 1, "room_url": "https://...", "token": "..."}
+    {"cmd": "stop", "session_id": 1}
+
+and the worker reports back with JSON lines on its original stdout:
+
+    {"event": "ready"}
+    {"event": "started", "session_id": 1}
+    {"event": "ended", "session_id": 1, "error": null}
+
+Sessions are isolated from each other: an exception or a cancellation only
+ends the session it happened in. Unless ``SHARED_VAD`` is disabled, all
+sessions of a worker share one batched Silero VAD model (see ``shared_vad``).
+"""
+
+import asyncio
+import json
+import os
+import sys
+from typing import Dict, Optional
+
+from loguru import logger
+
+from pipecat.pipeline.runner import PipelineRunner
+
+import bot
+
+# Share one batched VAD model between the sessions of this worker
+SHARED_VAD = os.getenv("SHARED_VAD", "true").lower() in ("1", "true", "yes")
+
+
+class SessionWorker:
+    """Hosts concurrent bot sessions in the current event loop.
+
+    Args:
+        events: Writable text stream the worker reports session events to
+    """
+
+    def __init__(self, events):
+        self._events = events
+        self._sessions: Dict[int, asyncio.Task] = {}
+
+    def emit(self, event: str, **kwargs):
+        self._events.write(json.dumps({"event": event, **kwargs}) + "\n")
+        self._events.flush()
+
+    def start_session(self, session_id: int, room_url: str, token: str):
+        if session_id in self._sessions:
+            logger.warning(f"Session {session_id} is already running")
+            return
+        self._sessions[session_id] = asyncio.create_task(
+            self._run_session(session_id, room_url, token), name=f"session-{session_id}"
+        )
+
+    def stop_session(self, session_id: int):
+        task = self._sessions.get(session_id)
+        if task:
+            task.cancel()
+
+    async def stop_all(self):
+        for task in self._sessions.values():
+            task.cancel()
+        await asyncio.gather(*self._sessions.values(), return_exceptions=True)
+
+    async def _run_session(self, session_id: int, room_url: str, token: str):
+        error: Optional[str] = None
+        try:
+            vad_analyzer = bot.create_vad_analyzer(shared=SHARED_VAD)
+            task = await bot.create_bot(room_url, token, vad_analyzer=vad_analyzer)
+            self.emit("started", session_id=session_id)
+            runner = PipelineRunner(handle_sigint=False)
+            await runner.run(task)
+        except asyncio.CancelledError:
+            error = "cancelled"
+        except Exception as e:
+            logger.exception(f"Session {session_id} failed: {e}")
+            error = str(e) or type(e).__name__
+        finally:
+            self._sessions.pop(session_id, None)
+            self.emit("ended", session_id=session_id, error=error)
+        # Also after a stopped session, as bot.main does after each call
+        try:
+            await bot.end_session()
+        except Exception as e:
+            logger.warning(f"Failed to end session {session_id}: {e}")
+
+
+async def read_commands(worker: SessionWorker):
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+
+    while True:
+        line = await reader.readline()
+        if not line:
+            # The server went away; take our sessions down with us
+            break
+        try:
+            command = json.loads(line)
+        except json.JSONDecodeError:
+            logger.error(f"Invalid worker command: {line!r}")
+            continue
+
+        if command.get("cmd") == "start":
+            worker.start_session(command["session_id"], command["room_url"], command["token"])
+        elif command.get("cmd") == "stop":
+            worker.stop_session(command["session_id"])
+        else:
+            logger.error(f"Unknown worker command: {command}")
+
+    await worker.stop_all()
+    await bot.end_process()
+
+
+def run():
+    # Keep the original stdout for session events only and send everything
+    # the bots print to stderr, so their output cannot corrupt the protocol.
+    events = os.fdopen(os.dup(sys.stdout.fileno()), "w")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+    worker = SessionWorker(events)
+    worker.emit("ready")
+    asyncio.run(read_commands(worker))
+
+
+if __name__ == "__main__":
+    run()
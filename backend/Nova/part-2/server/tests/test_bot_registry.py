@@ -0,0 +1,141 @@
+import asyncio
+
+from bot_registry import FINISHED, RUNNING, BotRegistry
+
+
+class FakeProcess:
+    """Process handle that exits when ``exit`` is called."""
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.returncode = None
+        self._exited = asyncio.Event()
+
+    async def wait(self) -> int:
+        await self._exited.wait()
+        return self.returncode
+
+    def exit(self, returncode: int = 0):
+        self.returncode = returncode
+        self._exited.set()
+
+    def terminate(self):
+        self.exit(-15)
+
+
+async def settle():
+    # Let the reaper tasks see the exits
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+
+def test_indexes_running_bots_by_room():
+    async def run():
+        registry = BotRegistry()
+        procs = [FakeProcess(1), FakeProcess(2), FakeProcess(3)]
+        registry.add(procs[0], "room-a")
+        registry.add(procs[1], "room-a")
+        registry.add(procs[2], "room-b")
+
+        assert registry.running_in_room("room-a") == 2
+        assert registry.running_in_room("room-b") == 1
+        assert registry.running_in_room("room-c") == 0
+        assert {entry.pid for entry in registry.running()} == {1, 2, 3}
+        assert registry.counts() == {RUNNING: 3, FINISHED: 0}
+        await registry.terminate_all()
+
+    asyncio.run(run())
+
+
+def test_reaps_exited_bots_and_calls_back():
+    async def run():
+        registry = BotRegistry()
+        exited = []
+        registry.on_exit(exited.append)
+        proc = FakeProcess(7)
+        registry.add(proc, "room-a")
+
+        proc.exit(3)
+        await settle()
+
+        entry = registry.get(7)
+        assert entry.state == FINISHED
+        assert entry.returncode == 3
+        assert entry.finished_at is not None
+        assert registry.running_in_room("room-a") == 0
+        assert registry.running() == []
+        assert registry.counts() == {RUNNING: 0, FINISHED: 1}
+        assert exited == [entry]
+
+    asyncio.run(run())
+
+
+def test_failing_exit_callback_does_not_stop_reaping():
+    async def run():
+        registry = BotRegistry()
+        exited = []
+
+        def fail(entry):
+            raise RuntimeError("callback failed")
+
+        registry.on_exit(fail)
+        registry.on_exit(exited.append)
+        proc = FakeProcess(7)
+        registry.add(proc, "room-a")
+        proc.exit()
+        await settle()
+
+        assert registry.get(7).state == FINISHED
+        assert len(exited) == 1
+
+    asyncio.run(run())
+
+
+def test_prunes_finished_bots_after_retention():
+    async def run():
+        registry = BotRegistry(retention=0)
+        proc = FakeProcess(7)
+        registry.add(proc, "room-a")
+        proc.exit()
+        await settle()
+
+        assert registry.get(7) is None
+        assert registry.counts() == {RUNNING: 0, FINISHED: 0}
+
+    asyncio.run(run())
+
+
+def test_recycled_pid_replaces_finished_entry():
+    async def run():
+        registry = BotRegistry()
+        first = FakeProcess(7)
+        registry.add(first, "room-a")
+        first.exit()
+        await settle()
+
+        second = FakeProcess(7)
+        registry.add(second, "room-b")
+
+        entry = registry.get(7)
+        assert entry.state == RUNNING
+        assert entry.room_url == "room-b"
+        assert registry.counts() == {RUNNING: 1, FINISHED: 0}
+        await registry.terminate_all()
+
+    asyncio.run(run())
+
+
+def test_terminate_all_waits_for_every_bot():
+    async def run():
+        registry = BotRegistry()
+        procs = [FakeProcess(pid) for pid in (1, 2)]
+        for proc in procs:
+            registry.add(proc, "room-a")
+
+        await registry.terminate_all()
+
+        assert [proc.returncode for proc in procs] == [-15, -15]
+        assert registry.running() == []
+        assert registry.running_in_room("room-a") == 0
+
+    asyncio.run(run())
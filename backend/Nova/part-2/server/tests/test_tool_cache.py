@@ -0,0 +1,227 @@
+import asyncio
+
+import pytest
+
+from pipecat.services.llm_service import FunctionCallParams
+
+import tool_cache
+from tool_cache import ToolCacheSession, ToolResultCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class Weather:
+    """Tool handler counting its upstream calls; holds them until released."""
+
+    def __init__(self, hold: bool = False):
+        self.calls = 0
+        self.released = asyncio.Event()
+        if not hold:
+            self.released.set()
+
+    async def __call__(self, params: FunctionCallParams):
+        self.calls += 1
+        await self.released.wait()
+        await params.result_callback({"location": params.arguments["location"], "temperature": 21})
+
+
+class Failing:
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self, params: FunctionCallParams):
+        self.calls += 1
+        await asyncio.sleep(0)
+        raise RuntimeError("upstream down")
+
+
+def call_params(results, **arguments):
+    async def result_callback(result, *, properties=None):
+        results.append(result)
+
+    return FunctionCallParams(
+        function_name="get_current_weather",
+        tool_call_id="call",
+        arguments=arguments,
+        llm=None,
+        context=None,
+        result_callback=result_callback,
+    )
+
+
+def test_reuses_results_until_they_expire():
+    async def run():
+        clock = Clock()
+        cache = ToolResultCache(clock=clock)
+        weather = Weather()
+        results = []
+
+        call = lambda: cache.call(
+            "get_current_weather", weather, call_params(results, location="Paris"), ttl_secs=60
+        )
+        assert await call() == "miss"
+        clock.now = 59
+        assert await call() == "hit"
+        clock.now = 61
+        assert await call() == "miss"
+
+        assert weather.calls == 2
+        assert len(results) == 3
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 2
+
+    asyncio.run(run())
+
+
+def test_normalized_arguments_share_an_entry():
+    async def run():
+        cache = ToolResultCache()
+        weather = Weather()
+        results = []
+
+        await cache.call("get_current_weather", weather, call_params(results, location="San Francisco, CA"))
+        outcome = await cache.call(
+            "get_current_weather", weather, call_params(results, location="  san francisco,   ca")
+        )
+
+        assert outcome == "hit"
+        assert weather.calls == 1
+
+    asyncio.run(run())
+
+
+def test_coalesces_identical_calls_in_flight():
+    async def run():
+        cache = ToolResultCache()
+        weather = Weather(hold=True)
+        results = []
+
+        calls = [
+            asyncio.create_task(
+                cache.call("get_current_weather", weather, call_params(results, location="Paris"))
+            )
+            for _ in range(3)
+        ]
+        await asyncio.sleep(0.01)
+        assert cache.stats()["in_flight"] == 1
+        weather.released.set()
+        outcomes = await asyncio.gather(*calls)
+
+        assert sorted(outcomes) == ["coalesced", "coalesced", "miss"]
+        assert weather.calls == 1
+        assert len(results) == 3
+        # Every caller gets its own copy of the result
+        results[0]["temperature"] = 0
+        assert results[1]["temperature"] == 21
+
+    asyncio.run(run())
+
+
+def test_cancelled_caller_does_not_cancel_the_upstream_call():
+    async def run():
+        cache = ToolResultCache()
+        weather = Weather(hold=True)
+        results = []
+
+        first = asyncio.create_task(
+            cache.call("get_current_weather", weather, call_params([], location="Paris"))
+        )
+        second = asyncio.create_task(
+            cache.call("get_current_weather", weather, call_params(results, location="Paris"))
+        )
+        await asyncio.sleep(0.01)
+        first.cancel()
+        weather.released.set()
+
+        assert await second == "coalesced"
+        assert weather.calls == 1
+        assert len(results) == 1
+
+    asyncio.run(run())
+
+
+def test_failures_reach_every_waiter_and_are_not_cached():
+    async def run():
+        cache = ToolResultCache()
+        failing = Failing()
+
+        calls = [
+            asyncio.create_task(cache.call("get_current_weather", failing, call_params([], location="Paris")))
+            for _ in range(2)
+        ]
+        outcomes = await asyncio.gather(*calls, return_exceptions=True)
+        assert all(isinstance(outcome, RuntimeError) for outcome in outcomes)
+
+        with pytest.raises(RuntimeError):
+            await cache.call("get_current_weather", failing, call_params([], location="Paris"))
+        assert failing.calls == 2
+        assert cache.stats()["errors"] == 2
+        assert len(cache) == 0
+
+    asyncio.run(run())
+
+
+def test_evicts_least_recently_used_results():
+    async def run():
+        cache = ToolResultCache(max_entries=2)
+        weather = Weather()
+
+        for location in ("Paris", "Rome", "Paris", "Oslo"):
+            await cache.call("get_current_weather", weather, call_params([], location=location))
+
+        assert len(cache) == 2
+        assert cache.stats()["evictions"] == 1
+        # Rome was used least recently
+        assert await cache.call("get_current_weather", weather, call_params([], location="Paris")) == "hit"
+        assert await cache.call("get_current_weather", weather, call_params([], location="Rome")) == "miss"
+
+    asyncio.run(run())
+
+
+def test_session_counts_its_own_calls(monkeypatch):
+    monkeypatch.setattr(tool_cache, "TOOL_CACHE", True)
+
+    async def run():
+        cache = ToolResultCache()
+        weather = Weather()
+        sessions = [ToolCacheSession(cache), ToolCacheSession(cache)]
+
+        for session in sessions:
+            handler = session.cached("get_current_weather", weather)
+            await handler(call_params([], location="Paris"))
+
+        assert sessions[0].stats()["misses"] == 1
+        assert sessions[1].stats()["hits"] == 1
+        assert cache.stats()["hits"] + cache.stats()["misses"] == 2
+
+    asyncio.run(run())
+
+
+def test_reports_counters_since_the_last_report(monkeypatch):
+    posted = []
+
+    async def post_stats(url, payload, what):
+        posted.append(payload)
+
+    monkeypatch.setattr(tool_cache, "post_stats", post_stats)
+
+    async def run():
+        cache = ToolResultCache()
+        weather = Weather()
+
+        await cache.call("get_current_weather", weather, call_params([], location="Paris"))
+        await cache.report()
+        await cache.call("get_current_weather", weather, call_params([], location="Paris"))
+        await cache.report()
+
+    asyncio.run(run())
+    assert posted == [
+        {"hits": 0, "misses": 1, "coalesced": 0, "errors": 0},
+        {"hits": 1, "misses": 0, "coalesced": 0, "errors": 0},
+    ]
@@ -0,0 +1,300 @@
+"""Cached, coalesced results of function-call tools.
+
+Tools such as ``get_current_weather`` call an upstream API on every function
+call, even when many sessions of a process ask about the same location at
+the same time. ``ToolResultCache`` sits in front of ``llm.register_function``
+handlers and keeps their results for a per-tool TTL:
+
+- arguments are normalized before they are used as the key (keys sorted,
+  strings case-folded with their whitespace collapsed), so ``"San Francisco,
+  CA"`` and ``"san francisco,  ca"`` share an entry; tools can give their own
+  key function instead
+- single flight: while a call is in flight, identical calls wait for its
+  result instead of calling the upstream again. The upstream call runs in its
+  own task, so a session whose function call is cancelled (e.g. on
+  interruption) does not cancel it for the others
+- entries are evicted once expired, or least recently used first above
+  ``TOOL_CACHE_MAX_ENTRIES``
+
+Only tools whose result depends on nothing but their arguments should be
+cached. One cache is shared by all sessions of a process (``tool_cache``);
+``ToolCacheSession`` wraps the handlers of one session and counts its hits,
+misses and coalesced calls. Each bot posts what its process counted since
+the last report to the server (``TOOL_CACHE_STATS_URL``) when a session ends.
+"""
+
+import asyncio
+import copy
+import json
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from functools import wraps
+from typing import Any, Callable, Dict, Hashable, Mapping, Optional, Tuple
+
+from loguru import logger
+
+from pipecat.services.llm_service import FunctionCallParams, FunctionCallResultProperties
+
+from stats_reporting import post_stats
+
+# Whether tool results are cached
+TOOL_CACHE = os.getenv("TOOL_CACHE", "true").lower() in ("1", "true", "yes")
+
+# How long a tool result is kept, for tools without their own TTL
+TOOL_CACHE_TTL_SECS = float(os.getenv("TOOL_CACHE_TTL_SECS", "300"))
+
+# Maximum number of results kept per process
+TOOL_CACHE_MAX_ENTRIES = int(os.getenv("TOOL_CACHE_MAX_ENTRIES", "1024"))
+
+# Server endpoint the session counters are posted to; only logged when unset
+TOOL_CACHE_STATS_URL = os.getenv("TOOL_CACHE_STATS_URL")
+
+# Handler of a function call, as taken by ``llm.register_function``
+ToolHandler = Callable[[FunctionCallParams], Any]
+
+# Counter of each way a call can be answered
+OUTCOME_COUNTERS = {"hit": "hits", "miss": "misses", "coalesced": "coalesced"}
+
+# Counters posted to the server, as differences since the last report
+REPORTED_COUNTERS = ("hits", "misses", "coalesced", "errors")
+
+
+@dataclass(frozen=True)
+class _Entry:
+    result: Any
+    properties: Optional[FunctionCallResultProperties]
+    expires_at: float
+
+
+def normalize_arguments(arguments: Any) -> Any:
+    """Canonical form of function call arguments, for use in a cache key.
+
+    Args:
+        arguments: The arguments, as decoded from the LLM's JSON
+
+    Returns:
+        The arguments with strings case-folded, stripped and their whitespace
+        collapsed, and dictionaries with sorted keys
+    """
+    if isinstance(arguments, str):
+        return " ".join(arguments.split()).casefold()
+    if isinstance(arguments, Mapping):
+        return {str(key): normalize_arguments(value) for key, value in sorted(arguments.items())}
+    if isinstance(arguments, (list, tuple)):
+        return [normalize_arguments(value) for value in arguments]
+    return arguments
+
+
+def default_key(arguments: Mapping[str, Any]) -> Hashable:
+    """Cache key of the normalized arguments (see ``normalize_arguments``)."""
+    return json.dumps(normalize_arguments(arguments), sort_keys=True, default=str)
+
+
+class ToolResultCache:
+    """Results of function-call tools, shared by the sessions of a process.
+
+    Args:
+        max_entries: Maximum number of results kept
+        clock: Time source, in seconds
+    """
+
+    def __init__(self, max_entries: int = TOOL_CACHE_MAX_ENTRIES, clock: Callable[[], float] = time.monotonic):
+        self._max_entries = max_entries
+        self._clock = clock
+        self._entries: "OrderedDict[Tuple[str, Hashable], _Entry]" = OrderedDict()
+        self._in_flight: Dict[Tuple[str, Hashable], asyncio.Future] = {}
+        self._tasks = set()
+        self._counters = {"hits": 0, "misses": 0, "coalesced": 0, "errors": 0, "evictions": 0}
+        self._reported = dict.fromkeys(REPORTED_COUNTERS, 0)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters of all calls through the cache, with hit and coalesce rates."""
+        calls = self._counters["hits"] + self._counters["misses"] + self._counters["coalesced"]
+        return {
+            **self._counters,
+            "entries": len(self._entries),
+            "in_flight": len(self._in_flight),
+            "hit_rate": self._counters["hits"] / calls if calls else None,
+            "coalesce_rate": self._counters["coalesced"] / calls if calls else None,
+        }
+
+    async def call(
+        self,
+        function_name: str,
+        handler: ToolHandler,
+        params: FunctionCallParams,
+        *,
+        ttl_secs: float = TOOL_CACHE_TTL_SECS,
+        key: Callable[[Mapping[str, Any]], Hashable] = default_key,
+        counters: Optional[Dict[str, int]] = None,
+    ) -> str:
+        """Answer a function call from the cache, an identical call in flight, or ``handler``.
+
+        The result is passed to ``params.result_callback`` as ``handler``
+        would have. Each caller gets its own copy of the result.
+
+        Args:
+            function_name: Name of the tool, part of the key
+            handler: The tool's handler
+            params: The function call
+            ttl_secs: How long the result is kept
+            key: Key of the call's arguments
+            counters: Also count how the call was answered here (e.g. per session)
+
+        Returns:
+            str: How the call was answered: ``"hit"``, ``"coalesced"`` or ``"miss"``
+
+        Raises:
+            Exception: Whatever ``handler`` raised, for the caller that ran it
+                and the calls that waited for it
+        """
+        cache_key = (function_name, key(params.arguments))
+        entry = self._entries.get(cache_key)
+        if entry is not None and entry.expires_at > self._clock():
+            self._entries.move_to_end(cache_key)
+            self._count("hit", counters)
+            await self._deliver(params, entry.result, entry.properties)
+            return "hit"
+
+        future = self._in_flight.get(cache_key)
+        outcome = "coalesced"
+        if future is None:
+            outcome = "miss"
+            future = asyncio.get_running_loop().create_future()
+            # Nobody may wait for a failed call; retrieve its exception anyway
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+            self._in_flight[cache_key] = future
+            task = asyncio.create_task(self._fetch(cache_key, handler, params, ttl_secs, future))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        self._count(outcome, counters)
+
+        answer = await asyncio.shield(future)
+        if answer is not None:
+            await self._deliver(params, *answer)
+        return outcome
+
+    def _count(self, outcome: str, counters: Optional[Dict[str, int]]):
+        for totals in (self._counters, counters):
+            if totals is not None:
+                totals[OUTCOME_COUNTERS[outcome]] += 1
+
+    def clear(self):
+        """Drop every cached result; calls in flight still complete."""
+        self._entries.clear()
+
+    async def report(self):
+        """Log the counters and post what changed since the last report to ``TOOL_CACHE_STATS_URL``."""
+        counters = {name: self._counters[name] - self._reported[name] for name in REPORTED_COUNTERS}
+        self._reported = {name: self._counters[name] for name in REPORTED_COUNTERS}
+        logger.info(f"Tool cache {self.stats()}")
+        await post_stats(TOOL_CACHE_STATS_URL, counters, "tool cache stats")
+
+    async def _fetch(self, cache_key, handler: ToolHandler, params: FunctionCallParams, ttl_secs: float, future):
+        async def capture(result: Any, *, properties: Optional[FunctionCallResultProperties] = None):
+            if future.done():
+                return
+            self._store(cache_key, _Entry(result, properties, self._clock() + ttl_secs))
+            # Answered: later calls are hits, whatever the handler still does
+            self._in_flight.pop(cache_key, None)
+            future.set_result((result, properties))
+
+        try:
+            await handler(replace(params, result_callback=capture))
+            if not future.done():
+                # The handler gave no result; neither do the calls waiting for it
+                future.set_result(None)
+        except Exception as e:
+            self._counters["errors"] += 1
+            logger.warning(f"Tool {cache_key[0]} failed: {e}")
+            if not future.done():
+                future.set_exception(e)
+        finally:
+            if self._in_flight.get(cache_key) is future:
+                del self._in_flight[cache_key]
+
+    def _store(self, cache_key, entry: _Entry):
+        self._entries[cache_key] = entry
+        self._entries.move_to_end(cache_key)
+        now = self._clock()
+        while self._entries:
+            oldest_key, oldest = next(iter(self._entries.items()))
+            if len(self._entries) <= self._max_entries and oldest.expires_at > now:
+                break
+            del self._entries[oldest_key]
+            self._counters["evictions"] += 1
+
+    async def _deliver(self, params: FunctionCallParams, result: Any, properties):
+        await params.result_callback(copy.deepcopy(result), properties=properties)
+
+
+_shared_cache: Optional[ToolResultCache] = None
+
+
+def tool_cache() -> ToolResultCache:
+    """The process-wide tool result cache, created on first use."""
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = ToolResultCache()
+    return _shared_cache
+
+
+class ToolCacheSession:
+    """Wraps the tool handlers of one session with the shared ``ToolResultCache``.
+
+    Args:
+        cache: The cache; the process-wide one by default
+    """
+
+    def __init__(self, cache: Optional[ToolResultCache] = None):
+        self._cache = cache if cache is not None else tool_cache()
+        self._counters = {"hits": 0, "misses": 0, "coalesced": 0, "errors": 0}
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters of this session's calls, with hit and coalesce rates."""
+        calls = self._counters["hits"] + self._counters["misses"] + self._counters["coalesced"]
+        return {
+            **self._counters,
+            "hit_rate": self._counters["hits"] / calls if calls else None,
+            "coalesce_rate": self._counters["coalesced"] / calls if calls else None,
+        }
+
+    def cached(
+        self,
+        function_name: str,
+        handler: ToolHandler,
+        *,
+        ttl_secs: float = TOOL_CACHE_TTL_SECS,
+        key: Callable[[Mapping[str, Any]], Hashable] = default_key,
+    ) -> ToolHandler:
+        """Handler answering ``function_name`` calls through the cache.
+
+        Args:
+            function_name: Name the handler is registered under
+            handler: Handler taking ``FunctionCallParams``
+            ttl_secs: How long results are kept
+            key: Key of the call's arguments; normalized arguments by default
+
+        Returns:
+            ToolHandler: The handler to register with ``llm.register_function``,
+                or ``handler`` itself when ``TOOL_CACHE`` is off
+        """
+        if not TOOL_CACHE:
+            return handler
+
+        @wraps(handler)
+        async def cached_handler(params: FunctionCallParams):
+            try:
+                await self._cache.call(
+                    function_name, handler, params, ttl_secs=ttl_secs, key=key, counters=self._counters
+                )
+            except Exception:
+                self._counters["errors"] += 1
+                raise
+
+        return cached_handler